@@ -51,10 +51,19 @@ except ImportError as e:
 try:
     # Import models package/modules to ensure they are registered with Base.metadata
     import models.user
+    import models.email_outbox
+    import models.refresh_token_revocation
+    import models.rate_limit_state
+    import models.space
+    import models.company
+    import models.block
+    import models.profile_embedding
+    import models.embedding_pipeline_state
+    import models.message
+    import models.notification
+    import models.audit_event
+    import models.workstation_allocation
     # Add other model imports here as they are created
-    # e.g., import models.space
-    #      import models.company
-    #      etc.
     print("DEBUG [env.py]: Successfully imported models")
 except ImportError as e:
     print(f"ERROR [env.py]: Could not import models: {e}")
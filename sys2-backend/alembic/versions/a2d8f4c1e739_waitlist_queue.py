@@ -0,0 +1,70 @@
+"""Waitlist queue position, referrals and workstation capacity
+
+Revision ID: a2d8f4c1e739
+Revises: f7c3a9e1d264
+Create Date: 2026-10-19 12:00:00.000000
+
+Existing users are queued at their signup time, without bonuses. Run
+`python -m core.waitlist --rescore` afterwards to apply them.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a2d8f4c1e739'
+down_revision: Union[str, None] = 'f7c3a9e1d264'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BACKFILL_BATCH_SIZE = 10000
+WAITLIST_WHERE = "status IN ('Waitlisted', 'ActiveWaitlist')"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    is_postgresql = op.get_bind().dialect.name == "postgresql"
+    op.add_column('users', sa.Column('referred_by_id', sa.Integer(), nullable=True))
+    op.add_column('users', sa.Column('referral_count', sa.Integer(), server_default='0', nullable=False))
+    # SQLite can't add a column with a non-constant default; the app always sets it there
+    op.add_column('users', sa.Column(
+        'waitlist_queued_at', sa.DateTime(timezone=True), server_default=sa.text('now()') if is_postgresql else None, nullable=True
+    ))
+    if is_postgresql:
+        op.create_foreign_key('fk_users_referred_by_id_users', 'users', 'users', ['referred_by_id'], ['id'], ondelete='SET NULL')
+    op.add_column('spaces', sa.Column('workstation_capacity', sa.Integer(), nullable=True))
+
+    bind = op.get_bind()
+    with op.get_context().autocommit_block():
+        max_id = bind.scalar(sa.text("SELECT coalesce(max(id), 0) FROM users"))
+        for low in range(0, max_id, BACKFILL_BATCH_SIZE):
+            bind.execute(sa.text(
+                "UPDATE users SET waitlist_queued_at = coalesce(created_at, CURRENT_TIMESTAMP) "
+                "WHERE id > :low AND id <= :high"
+            ), {'low': low, 'high': low + BACKFILL_BATCH_SIZE})
+
+    if is_postgresql:
+        op.alter_column('users', 'waitlist_queued_at', nullable=False)
+        with op.get_context().autocommit_block():
+            op.create_index(
+                'ix_users_waitlist_queue', 'users', ['waitlist_queued_at', 'id'], unique=False,
+                postgresql_where=sa.text(WAITLIST_WHERE), postgresql_concurrently=True,
+            )
+    else:
+        op.create_index('ix_users_waitlist_queue', 'users', ['waitlist_queued_at', 'id'], unique=False, sqlite_where=sa.text(WAITLIST_WHERE))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name == "postgresql":
+        with op.get_context().autocommit_block():
+            op.drop_index('ix_users_waitlist_queue', table_name='users', postgresql_concurrently=True)
+        op.drop_constraint('fk_users_referred_by_id_users', 'users', type_='foreignkey')
+    else:
+        op.drop_index('ix_users_waitlist_queue', table_name='users')
+    op.drop_column('spaces', 'workstation_capacity')
+    op.drop_column('users', 'waitlist_queued_at')
+    op.drop_column('users', 'referral_count')
+    op.drop_column('users', 'referred_by_id')
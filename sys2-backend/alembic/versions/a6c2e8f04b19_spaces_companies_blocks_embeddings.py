@@ -0,0 +1,98 @@
+"""Spaces, companies, blocks and profile embeddings for matching
+
+Revision ID: a6c2e8f04b19
+Revises: f3a8d2c6b901
+Create Date: 2026-10-18 17:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from config import settings
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a6c2e8f04b19'
+down_revision: Union[str, None] = 'f3a8d2c6b901'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _embedding_type():
+    if op.get_bind().dialect.name == "postgresql" and settings.EMBEDDING_STORAGE == "pgvector":
+        from pgvector.sqlalchemy import Vector
+        op.execute("CREATE EXTENSION IF NOT EXISTS vector")
+        return Vector(settings.EMBEDDING_DIM)
+    return sa.LargeBinary()
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('spaces',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('location', sa.String(), nullable=True),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    op.create_index(op.f('ix_spaces_id'), 'spaces', ['id'], unique=False)
+    op.create_table('companies',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('logo_url', sa.String(), nullable=True),
+    sa.Column('industry_focus', sa.String(), nullable=True),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('website_link', sa.String(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    op.create_index(op.f('ix_companies_id'), 'companies', ['id'], unique=False)
+
+    op.add_column('users', sa.Column('space_id', sa.Integer(), nullable=True))
+    op.add_column('users', sa.Column('company_id', sa.Integer(), nullable=True))
+    if op.get_bind().dialect.name != "sqlite": # SQLite can't add constraints in place; batch mode would drop ix_users_email_lower
+        op.create_foreign_key('fk_users_space_id_spaces', 'users', 'spaces', ['space_id'], ['id'])
+        op.create_foreign_key('fk_users_company_id_companies', 'users', 'companies', ['company_id'], ['id'])
+    op.create_index(op.f('ix_users_space_id'), 'users', ['space_id'], unique=False)
+
+    op.create_table('blocks',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('blocker_id', sa.Integer(), nullable=False),
+    sa.Column('blocked_id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['blocker_id'], ['users.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['blocked_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('blocker_id', 'blocked_id', name='uq_blocks_blocker_blocked')
+    )
+    op.create_index(op.f('ix_blocks_blocked_id'), 'blocks', ['blocked_id'], unique=False)
+
+    op.create_table('profile_embeddings',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('embedding', _embedding_type(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    if op.get_bind().dialect.name == "postgresql" and settings.EMBEDDING_STORAGE == "pgvector":
+        op.execute("CREATE INDEX ix_profile_embeddings_embedding_hnsw ON profile_embeddings USING hnsw (embedding vector_cosine_ops)")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('profile_embeddings')
+    op.drop_index(op.f('ix_blocks_blocked_id'), table_name='blocks')
+    op.drop_table('blocks')
+    op.drop_index(op.f('ix_users_space_id'), table_name='users')
+    if op.get_bind().dialect.name != "sqlite":
+        op.drop_constraint('fk_users_company_id_companies', 'users', type_='foreignkey')
+        op.drop_constraint('fk_users_space_id_spaces', 'users', type_='foreignkey')
+    op.drop_column('users', 'company_id')
+    op.drop_column('users', 'space_id')
+    op.drop_index(op.f('ix_companies_id'), table_name='companies')
+    op.drop_table('companies')
+    op.drop_index(op.f('ix_spaces_id'), table_name='spaces')
+    op.drop_table('spaces')
@@ -0,0 +1,53 @@
+"""Workstation allocations and per-space allocation version
+
+Revision ID: b5e9c3f7a214
+Revises: a2d8f4c1e739
+Create Date: 2026-10-19 15:00:00.000000
+
+Every active user with a space gets a member seat (an allocation without an
+end) from their signup, so existing members count against the capacity.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b5e9c3f7a214'
+down_revision: Union[str, None] = 'a2d8f4c1e739'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('spaces', sa.Column('allocation_version', sa.Integer(), server_default='0', nullable=False))
+    op.create_table('workstation_allocations',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('space_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('seats', sa.Integer(), nullable=False),
+    sa.Column('starts_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('ends_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.ForeignKeyConstraint(['space_id'], ['spaces.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='SET NULL'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_workstation_allocations_space_id_ends_at', 'workstation_allocations', ['space_id', 'ends_at'], unique=False)
+    op.create_index('ix_workstation_allocations_user_id', 'workstation_allocations', ['user_id'], unique=False)
+
+    op.execute("""
+        INSERT INTO workstation_allocations (space_id, user_id, seats, starts_at, ends_at, created_at)
+        SELECT space_id, id, 1, coalesce(created_at, CURRENT_TIMESTAMP), NULL, CURRENT_TIMESTAMP
+        FROM users WHERE status = 'Active' AND space_id IS NOT NULL
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_workstation_allocations_user_id', table_name='workstation_allocations')
+    op.drop_index('ix_workstation_allocations_space_id_ends_at', table_name='workstation_allocations')
+    op.drop_table('workstation_allocations')
+    op.drop_column('spaces', 'allocation_version')
@@ -0,0 +1,28 @@
+"""Plain-text part for outbox emails
+
+Revision ID: b7d2e4f1a903
+Revises: 65a556c96d90
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7d2e4f1a903'
+down_revision: Union[str, None] = '65a556c96d90'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('email_outbox', sa.Column('text_content', sa.Text(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('email_outbox', 'text_content')
@@ -0,0 +1,35 @@
+"""Refresh token revocation store
+
+Revision ID: c41f8a2d6e57
+Revises: b7d2e4f1a903
+Create Date: 2026-10-18 13:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c41f8a2d6e57'
+down_revision: Union[str, None] = 'b7d2e4f1a903'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('refresh_token_revocations',
+    sa.Column('token_id', sa.String(length=32), nullable=False),
+    sa.Column('kind', sa.String(length=8), nullable=False),
+    sa.Column('expires_at', sa.DateTime(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('token_id')
+    )
+    op.create_index(op.f('ix_refresh_token_revocations_expires_at'), 'refresh_token_revocations', ['expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_refresh_token_revocations_expires_at'), table_name='refresh_token_revocations')
+    op.drop_table('refresh_token_revocations')
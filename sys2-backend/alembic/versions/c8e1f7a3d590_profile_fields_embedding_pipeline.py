@@ -0,0 +1,64 @@
+"""Profile text fields and incremental embedding pipeline state
+
+Revision ID: c8e1f7a3d590
+Revises: a6c2e8f04b19
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c8e1f7a3d590'
+down_revision: Union[str, None] = 'a6c2e8f04b19'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('users', sa.Column('short_bio', sa.Text(), nullable=True))
+    op.add_column('users', sa.Column('project_interests_goals', sa.Text(), nullable=True))
+    op.add_column('users', sa.Column('skills_tags', sa.JSON(), nullable=True))
+    op.add_column('users', sa.Column('industry_focus_tags', sa.JSON(), nullable=True))
+    op.add_column('users', sa.Column('tools_technologies_tags', sa.JSON(), nullable=True))
+    op.add_column('users', sa.Column('collaboration_preferences_tags', sa.JSON(), nullable=True))
+
+    op.add_column('profile_embeddings', sa.Column('content_hash', sa.String(length=64), nullable=True))
+    op.add_column('profile_embeddings', sa.Column('source_updated_at', sa.DateTime(timezone=True), nullable=True))
+
+    op.create_table('embedding_pipeline_states',
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('encoder', sa.String(), nullable=False),
+    sa.Column('watermark_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('watermark_id', sa.Integer(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+    if op.get_bind().dialect.name == "postgresql":
+        with op.get_context().autocommit_block():
+            op.create_index('ix_users_updated_at_id', 'users', ['updated_at', 'id'], unique=False, postgresql_concurrently=True)
+    else:
+        op.create_index('ix_users_updated_at_id', 'users', ['updated_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name == "postgresql":
+        with op.get_context().autocommit_block():
+            op.drop_index('ix_users_updated_at_id', table_name='users', postgresql_concurrently=True)
+    else:
+        op.drop_index('ix_users_updated_at_id', table_name='users')
+    op.drop_table('embedding_pipeline_states')
+    op.drop_column('profile_embeddings', 'source_updated_at')
+    op.drop_column('profile_embeddings', 'content_hash')
+    op.drop_column('users', 'collaboration_preferences_tags')
+    op.drop_column('users', 'tools_technologies_tags')
+    op.drop_column('users', 'industry_focus_tags')
+    op.drop_column('users', 'skills_tags')
+    op.drop_column('users', 'project_interests_goals')
+    op.drop_column('users', 'short_bio')
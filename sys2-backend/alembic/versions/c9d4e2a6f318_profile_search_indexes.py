@@ -0,0 +1,69 @@
+"""Profile search indexes
+
+Revision ID: c9d4e2a6f318
+Revises: b5e9c3f7a214
+Create Date: 2026-10-19 18:00:00.000000
+
+On PostgreSQL: pg_trgm, and GIN indexes over the users' weighted search
+document, company names and lowercased full names (core.search). The
+expressions must stay identical to models.user.search_document and
+models.company.COMPANY_SEARCH_DOCUMENT, or queries won't use the indexes.
+Other databases search with the in-process index and only get
+ix_users_company_id.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c9d4e2a6f318'
+down_revision: Union[str, None] = 'b5e9c3f7a214'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+USER_SEARCH_DOCUMENT = (
+    "(setweight(to_tsvector('simple'::regconfig, coalesce(full_name, '')), 'A') || "
+    "setweight(to_tsvector('simple'::regconfig, coalesce(CAST(skills_tags AS TEXT), '') || ' ' || "
+    "coalesce(CAST(tools_technologies_tags AS TEXT), '') || ' ' || "
+    "coalesce(CAST(industry_focus_tags AS TEXT), '')), 'B'))"
+)
+COMPANY_SEARCH_DOCUMENT = "to_tsvector('simple'::regconfig, name)"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name != "postgresql":
+        op.create_index('ix_users_company_id', 'users', ['company_id'], unique=False)
+        return
+
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    with op.get_context().autocommit_block():
+        op.create_index('ix_users_company_id', 'users', ['company_id'], unique=False, postgresql_concurrently=True)
+        op.create_index(
+            'ix_users_search_document', 'users', [sa.text(USER_SEARCH_DOCUMENT)], unique=False,
+            postgresql_using='gin', postgresql_concurrently=True,
+        )
+        op.create_index(
+            'ix_users_full_name_trgm', 'users', [sa.text('lower(full_name) gin_trgm_ops')], unique=False,
+            postgresql_using='gin', postgresql_concurrently=True,
+        )
+        op.create_index(
+            'ix_companies_search_document', 'companies', [sa.text(COMPANY_SEARCH_DOCUMENT)], unique=False,
+            postgresql_using='gin', postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != "postgresql":
+        op.drop_index('ix_users_company_id', table_name='users')
+        return
+
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_companies_search_document', table_name='companies', postgresql_concurrently=True)
+        op.drop_index('ix_users_full_name_trgm', table_name='users', postgresql_concurrently=True)
+        op.drop_index('ix_users_search_document', table_name='users', postgresql_concurrently=True)
+        op.drop_index('ix_users_company_id', table_name='users', postgresql_concurrently=True)
+    # pg_trgm stays installed: other objects may have come to depend on it
@@ -0,0 +1,30 @@
+"""Per-user refresh token revocation
+
+Revision ID: d3f8a1c5e924
+Revises: c9d4e2a6f318
+Create Date: 2026-10-20 10:00:00.000000
+
+/auth/refresh rejects refresh tokens issued before users.refresh_tokens_revoked_at,
+which password resets and deactivation set.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd3f8a1c5e924'
+down_revision: Union[str, None] = 'c9d4e2a6f318'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('users', sa.Column('refresh_tokens_revoked_at', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('users', 'refresh_tokens_revoked_at')
@@ -0,0 +1,44 @@
+"""Direct messages for the chat gateway
+
+Revision ID: d4b7a1e9c362
+Revises: c8e1f7a3d590
+Create Date: 2026-10-18 19:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4b7a1e9c362'
+down_revision: Union[str, None] = 'c8e1f7a3d590'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('messages',
+    sa.Column('id', sa.BigInteger().with_variant(sa.Integer(), 'sqlite'), nullable=False),
+    sa.Column('uid', sa.String(length=32), nullable=False),
+    sa.Column('sender_id', sa.Integer(), nullable=False),
+    sa.Column('recipient_id', sa.Integer(), nullable=False),
+    sa.Column('content', sa.Text(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('read_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['recipient_id'], ['users.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['sender_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('uid')
+    )
+    op.create_index('ix_messages_sender_recipient_created', 'messages', ['sender_id', 'recipient_id', 'created_at'], unique=False)
+    op.create_index('ix_messages_recipient_sender_created', 'messages', ['recipient_id', 'sender_id', 'created_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_messages_recipient_sender_created', table_name='messages')
+    op.drop_index('ix_messages_sender_recipient_created', table_name='messages')
+    op.drop_table('messages')
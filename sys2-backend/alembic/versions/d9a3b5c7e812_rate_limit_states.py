@@ -0,0 +1,37 @@
+"""Rate limit state table
+
+Revision ID: d9a3b5c7e812
+Revises: c41f8a2d6e57
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd9a3b5c7e812'
+down_revision: Union[str, None] = 'c41f8a2d6e57'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('rate_limit_states',
+    sa.Column('key', sa.String(), nullable=False),
+    sa.Column('level', sa.Float(), nullable=False),
+    sa.Column('stamp', sa.Float(), nullable=False),
+    sa.Column('previous_level', sa.Float(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('key')
+    )
+    op.create_index(op.f('ix_rate_limit_states_updated_at'), 'rate_limit_states', ['updated_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_rate_limit_states_updated_at'), table_name='rate_limit_states')
+    op.drop_table('rate_limit_states')
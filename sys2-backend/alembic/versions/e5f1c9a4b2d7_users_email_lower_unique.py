@@ -0,0 +1,54 @@
+"""Case-insensitive unique index on users.email
+
+Revision ID: e5f1c9a4b2d7
+Revises: d9a3b5c7e812
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5f1c9a4b2d7'
+down_revision: Union[str, None] = 'd9a3b5c7e812'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _check_no_case_duplicates() -> None:
+    duplicates = op.get_bind().execute(sa.text(
+        "SELECT lower(email) FROM users GROUP BY lower(email) HAVING count(*) > 1 LIMIT 10"
+    )).scalars().all()
+    if duplicates:
+        raise RuntimeError(
+            f"Cannot create ix_users_email_lower: emails differing only in case exist ({', '.join(duplicates)}). "
+            "Merge or rename these accounts, then re-run the migration."
+        )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    _check_no_case_duplicates()
+    if op.get_bind().dialect.name == "postgresql":
+        # CONCURRENTLY can't run inside a transaction; build without blocking writes to users
+        with op.get_context().autocommit_block():
+            op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_users_email_lower") # Leftover INVALID index from an interrupted build
+            op.create_index('ix_users_email_lower', 'users', [sa.text('lower(email)')], unique=True, postgresql_concurrently=True)
+            op.drop_index('ix_users_email', table_name='users', postgresql_concurrently=True)
+    else:
+        op.create_index('ix_users_email_lower', 'users', [sa.text('lower(email)')], unique=True)
+        op.drop_index('ix_users_email', table_name='users')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name == "postgresql":
+        with op.get_context().autocommit_block():
+            op.create_index('ix_users_email', 'users', ['email'], unique=True, postgresql_concurrently=True)
+            op.drop_index('ix_users_email_lower', table_name='users', postgresql_concurrently=True)
+    else:
+        op.create_index('ix_users_email', 'users', ['email'], unique=True)
+        op.drop_index('ix_users_email_lower', table_name='users')
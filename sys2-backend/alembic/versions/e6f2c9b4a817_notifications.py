@@ -0,0 +1,59 @@
+"""Notification inbox and unread counters
+
+Revision ID: e6f2c9b4a817
+Revises: d4b7a1e9c362
+Create Date: 2026-10-18 21:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e6f2c9b4a817'
+down_revision: Union[str, None] = 'd4b7a1e9c362'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+UNREAD = sa.text("read_at IS NULL")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('notifications',
+    sa.Column('id', sa.BigInteger().with_variant(sa.Integer(), 'sqlite'), nullable=False),
+    sa.Column('recipient_id', sa.Integer(), nullable=False),
+    sa.Column('type', sa.String(length=50), nullable=False),
+    sa.Column('coalesce_key', sa.String(length=100), nullable=True),
+    sa.Column('event_count', sa.Integer(), nullable=False),
+    sa.Column('actor_id', sa.Integer(), nullable=True),
+    sa.Column('data', sa.JSON(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('read_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['actor_id'], ['users.id'], ondelete='SET NULL'),
+    sa.ForeignKeyConstraint(['recipient_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_notifications_recipient_id', 'notifications', ['recipient_id', 'id'], unique=False)
+    op.create_index('ix_notifications_unread_recipient_id', 'notifications', ['recipient_id', 'id'], unique=False,
+                    postgresql_where=UNREAD, sqlite_where=UNREAD)
+    op.create_index('uq_notifications_unread_coalesce', 'notifications', ['recipient_id', 'coalesce_key'], unique=True,
+                    postgresql_where=UNREAD, sqlite_where=UNREAD)
+    op.create_table('notification_counters',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('unread', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('notification_counters')
+    op.drop_index('uq_notifications_unread_coalesce', table_name='notifications')
+    op.drop_index('ix_notifications_unread_recipient_id', table_name='notifications')
+    op.drop_index('ix_notifications_recipient_id', table_name='notifications')
+    op.drop_table('notifications')
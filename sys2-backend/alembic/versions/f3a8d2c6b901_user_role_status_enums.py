@@ -0,0 +1,128 @@
+"""Enum-typed users.role/status with partial indexes
+
+Revision ID: f3a8d2c6b901
+Revises: e5f1c9a4b2d7
+Create Date: 2026-10-18 16:00:00.000000
+
+On PostgreSQL the string columns are converted to native enum types without
+a table rewrite under lock: new enum columns are added, kept in sync by a
+trigger while existing rows are backfilled in id batches (each batch its own
+transaction), then swapped in with a short final transaction. Indexes are
+built CONCURRENTLY afterwards. On SQLite the columns stay VARCHAR and only
+the indexes are added.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3a8d2c6b901'
+down_revision: Union[str, None] = 'e5f1c9a4b2d7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Frozen copies of core.enums at this revision
+USER_ROLES = ('Startup', 'Freelancer', 'Corporate', 'StartupAdmin', 'StartupMember', 'CorporateAdmin', 'SysAdmin')
+USER_STATUSES = ('Waitlisted', 'ActiveWaitlist', 'PendingOnboarding', 'ActivePending', 'Active', 'Inactive')
+
+BACKFILL_BATCH_SIZE = 10000
+
+INDEXES = [
+    # (name, columns, where)
+    ('ix_users_waitlist_role_created', ['role', 'created_at'], "status IN ('Waitlisted', 'ActiveWaitlist')"),
+    ('ix_users_active_role', ['role'], "status = 'Active'"),
+    ('ix_users_status_role', ['status', 'role'], None),
+]
+
+
+def _check_known_values() -> None:
+    bind = op.get_bind()
+    for column, allowed in (('role', USER_ROLES), ('status', USER_STATUSES)):
+        unknown = bind.execute(
+            sa.text(f"SELECT DISTINCT {column} FROM users WHERE {column} NOT IN :allowed LIMIT 10")
+            .bindparams(sa.bindparam('allowed', expanding=True)),
+            {'allowed': list(allowed)},
+        ).scalars().all()
+        if unknown:
+            raise RuntimeError(f"users.{column} has values outside the enum: {', '.join(unknown)}. Fix them, then re-run.")
+
+
+def _create_indexes(concurrently: bool) -> None:
+    for name, columns, where in INDEXES:
+        where_clause = sa.text(where) if where else None
+        op.create_index(
+            name, 'users', columns, unique=False,
+            postgresql_where=where_clause, postgresql_concurrently=concurrently,
+            sqlite_where=where_clause,
+        )
+
+
+def _drop_indexes(concurrently: bool) -> None:
+    for name, _, _ in INDEXES:
+        op.drop_index(name, table_name='users', postgresql_concurrently=concurrently)
+
+
+def _upgrade_postgresql() -> None:
+    bind = op.get_bind()
+    sa.Enum(*USER_ROLES, name='user_role').create(bind, checkfirst=True)
+    sa.Enum(*USER_STATUSES, name='user_status').create(bind, checkfirst=True)
+    op.add_column('users', sa.Column('role_new', sa.Enum(*USER_ROLES, name='user_role', create_type=False), nullable=True))
+    op.add_column('users', sa.Column('status_new', sa.Enum(*USER_STATUSES, name='user_status', create_type=False), nullable=True))
+    # Rows written by the app during the backfill keep the new columns current
+    op.execute("""
+        CREATE FUNCTION users_sync_enum_columns() RETURNS trigger AS $$
+        BEGIN
+            NEW.role_new := NEW.role::user_role;
+            NEW.status_new := NEW.status::user_status;
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER users_sync_enum_columns BEFORE INSERT OR UPDATE OF role, status ON users
+        FOR EACH ROW EXECUTE FUNCTION users_sync_enum_columns()
+    """)
+
+    with op.get_context().autocommit_block():
+        max_id = bind.scalar(sa.text("SELECT coalesce(max(id), 0) FROM users"))
+        for low in range(0, max_id, BACKFILL_BATCH_SIZE):
+            bind.execute(sa.text(
+                "UPDATE users SET role_new = role::user_role, status_new = status::user_status "
+                "WHERE id > :low AND id <= :high AND (role_new IS NULL OR status_new IS NULL)"
+            ), {'low': low, 'high': low + BACKFILL_BATCH_SIZE})
+
+    # Short swap: every row is backfilled, so SET NOT NULL only has to scan
+    op.execute("DROP TRIGGER users_sync_enum_columns ON users")
+    op.execute("DROP FUNCTION users_sync_enum_columns()")
+    op.execute("UPDATE users SET role_new = role::user_role, status_new = status::user_status WHERE role_new IS NULL OR status_new IS NULL")
+    op.drop_column('users', 'role')
+    op.drop_column('users', 'status')
+    op.alter_column('users', 'role_new', new_column_name='role', nullable=False)
+    op.alter_column('users', 'status_new', new_column_name='status', nullable=False)
+
+    with op.get_context().autocommit_block():
+        _create_indexes(concurrently=True)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    _check_known_values()
+    if op.get_bind().dialect.name == "postgresql":
+        _upgrade_postgresql()
+    else:
+        _create_indexes(concurrently=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name == "postgresql":
+        with op.get_context().autocommit_block():
+            _drop_indexes(concurrently=True)
+        op.alter_column('users', 'role', type_=sa.String(), postgresql_using='role::text')
+        op.alter_column('users', 'status', type_=sa.String(), postgresql_using='status::text')
+        sa.Enum(name='user_role').drop(op.get_bind(), checkfirst=True)
+        sa.Enum(name='user_status').drop(op.get_bind(), checkfirst=True)
+    else:
+        _drop_indexes(concurrently=False)
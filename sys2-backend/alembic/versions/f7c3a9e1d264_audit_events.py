@@ -0,0 +1,76 @@
+"""Append-only audit event table, partitioned by month on Postgres
+
+Revision ID: f7c3a9e1d264
+Revises: e6f2c9b4a817
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f7c3a9e1d264'
+down_revision: Union[str, None] = 'e6f2c9b4a817'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = [
+    ('ix_audit_events_user_id_occurred_at', ['user_id', 'occurred_at']),
+    ('ix_audit_events_email_occurred_at', ['email', 'occurred_at']),
+    ('ix_audit_events_ip_occurred_at', ['ip', 'occurred_at']),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name == "postgresql":
+        # Monthly partitions (audit_events_yYYYYmMM) are created ahead of time by core.audit;
+        # the default partition only catches rows no partition was ready for
+        op.execute("""
+            CREATE TABLE audit_events (
+                id BIGINT GENERATED BY DEFAULT AS IDENTITY,
+                occurred_at TIMESTAMP WITH TIME ZONE NOT NULL,
+                type VARCHAR(50) NOT NULL,
+                user_id INTEGER,
+                email VARCHAR(255),
+                ip VARCHAR(45),
+                data JSON,
+                PRIMARY KEY (id, occurred_at)
+            ) PARTITION BY RANGE (occurred_at)
+        """)
+        op.execute("CREATE TABLE audit_events_default PARTITION OF audit_events DEFAULT")
+        op.execute("""
+            CREATE FUNCTION audit_events_append_only() RETURNS trigger LANGUAGE plpgsql AS $$
+            BEGIN
+                RAISE EXCEPTION 'audit_events is append-only';
+            END $$
+        """)
+        op.execute("""
+            CREATE TRIGGER audit_events_append_only BEFORE UPDATE OR DELETE ON audit_events
+            FOR EACH ROW EXECUTE FUNCTION audit_events_append_only()
+        """)
+    else:
+        op.create_table('audit_events',
+        sa.Column('id', sa.BigInteger().with_variant(sa.Integer(), 'sqlite'), nullable=False),
+        sa.Column('occurred_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('type', sa.String(length=50), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('email', sa.String(length=255), nullable=True),
+        sa.Column('ip', sa.String(length=45), nullable=True),
+        sa.Column('data', sa.JSON(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+        )
+    for name, columns in INDEXES: # Created on the parent, so every partition gets them
+        op.create_index(name, 'audit_events', columns, unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for name, _ in INDEXES:
+        op.drop_index(name, table_name='audit_events')
+    op.drop_table('audit_events') # Drops the partitions with it on Postgres
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute("DROP FUNCTION audit_events_append_only()")
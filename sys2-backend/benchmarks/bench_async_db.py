@@ -0,0 +1,72 @@
+"""Sync (threadpool) vs async DB sessions under concurrent load.
+
+Drives the `/login` email lookup through both the legacy `get_db` dependency
+and the new `get_async_db` dependency at 500 concurrent clients and reports
+requests/sec and p99 latency for each mode.
+
+    python -m benchmarks.bench_async_db [--concurrency 500] [--requests 5000]
+"""
+import argparse
+import asyncio
+
+from benchmarks.common import reset_database, run_concurrent, summarize
+
+from fastapi import Depends, FastAPI
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+import httpx
+
+from database import SessionLocal, async_engine, get_async_db, get_db
+from models.user import User
+
+BENCH_EMAIL = "bench@example.com"
+
+app = FastAPI()
+
+
+@app.get("/sync-lookup")
+def sync_lookup(db: Session = Depends(get_db)):
+    user = db.query(User).filter(User.email == BENCH_EMAIL).first()
+    return {"id": user.id}
+
+
+@app.get("/async-lookup")
+async def async_lookup(db: AsyncSession = Depends(get_async_db)):
+    user = await db.scalar(select(User).where(User.email == BENCH_EMAIL))
+    return {"id": user.id}
+
+
+def seed():
+    reset_database()
+    with SessionLocal() as db:
+        db.add(User(email=BENCH_EMAIL, hashed_password="x", role="Startup", status="Waitlisted"))
+        db.commit()
+
+
+async def bench(path, concurrency, total):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def hit(_):
+            response = await client.get(path)
+            response.raise_for_status()
+
+        return await run_concurrent(hit, concurrency, total)
+
+
+async def main(concurrency, total):
+    seed()
+    results = []
+    for name, path in (("sync (get_db)", "/sync-lookup"), ("async (get_async_db)", "/async-lookup")):
+        latencies, elapsed = await bench(path, concurrency, total)
+        results.append(summarize(f"{name} c={concurrency}", latencies, elapsed))
+    await async_engine.dispose()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=500)
+    parser.add_argument("--requests", type=int, default=5000)
+    args = parser.parse_args()
+    asyncio.run(main(args.concurrency, args.requests))
@@ -0,0 +1,199 @@
+"""Security audit log: login latency with auditing off / buffered / synchronous, and sustained event throughput.
+
+Login latency: `--logins` POST /auth/login against the app in-process
+(ASGI transport) with `--concurrency` clients. Every third login uses a
+wrong password, so each mode records both event kinds. bcrypt runs at
+cost 4, so the hash doesn't hide the audit write. Modes:
+
+- off: AUDIT_LOG_ENABLED=false
+- buffered: core.audit.AuditLog (append to the buffer, batched INSERTs)
+- synchronous: one INSERT + COMMIT per event inside the request, the
+  straightforward alternative
+
+Throughput: `--producers` tasks record `--events` events as fast as they
+can. Run once with the default buffer, and once with a small buffer to show
+back-pressure: waits, drops, and recorded == written == rows in the table.
+Last, a shutdown check: events buffered with a long flush interval must all
+be in the table after stop().
+
+    python -m benchmarks.bench_audit_log [--logins 2000] [--concurrency 32] [--events 200000] [--producers 200]
+"""
+import argparse
+import asyncio
+import os
+import time
+from datetime import datetime, timezone
+
+os.environ.setdefault("PASSWORD_HASH_SCHEMES", '["bcrypt"]')
+os.environ.setdefault("PASSWORD_BCRYPT_ROUNDS", "4")
+os.environ.setdefault("PASSWORD_HASH_WORKERS", "0")
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+os.environ.setdefault("EMAIL_TRANSPORT", "memory")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from benchmarks.common import reset_database, run_concurrent, summarize
+
+import httpx
+from prometheus_client import REGISTRY
+from sqlalchemy import func, insert, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from config import settings
+from core.audit import AuditLog, set_audit_log
+from core.security import get_password_hash
+from database import ASYNC_SQLALCHEMY_DATABASE_URL, AsyncSessionLocal, SessionLocal, async_engine, engine_options
+from main import app
+from models.audit_event import AuditEvent
+from models.user import User
+
+PASSWORD = "correct horse battery"
+
+
+class SynchronousAuditLog(AuditLog):
+    """Writes each event in its own transaction before returning (the unbuffered baseline).
+
+    It gets its own pool, sized for every client: on the request pool, once
+    all connections are held by requests waiting for a second one, the
+    writes deadlock until the pool timeout.
+    """
+
+    def __init__(self, connections):
+        super().__init__(1, 1, 1, 1)
+        self.engine = create_async_engine(
+            ASYNC_SQLALCHEMY_DATABASE_URL, **engine_options(ASYNC_SQLALCHEMY_DATABASE_URL, "audit_sync", is_async=True, pool_size=connections)
+        )
+        self.sessions = async_sessionmaker(bind=self.engine)
+
+    async def stop(self):
+        await super().stop()
+        await self.engine.dispose()
+
+    async def record(self, type, user_id=None, email=None, ip=None, data=None):
+        async with self.sessions() as db:
+            await db.execute(insert(AuditEvent).values(
+                occurred_at=datetime.now(timezone.utc), type=type, user_id=user_id, email=email, ip=ip, data=data
+            ))
+            await db.commit()
+        return True
+
+
+def buffered_log(**overrides) -> AuditLog:
+    options = dict(
+        buffer_size=settings.AUDIT_BUFFER_SIZE, batch_size=settings.AUDIT_BATCH_SIZE,
+        flush_seconds=settings.AUDIT_FLUSH_MS / 1000, backpressure_seconds=settings.AUDIT_BACKPRESSURE_MS / 1000,
+    )
+    options.update(overrides)
+    return AuditLog(**options)
+
+
+def seed(users):
+    reset_database()
+    hashed = get_password_hash(PASSWORD)
+    with SessionLocal() as db:
+        db.execute(insert(User), [
+            {"email": f"audited{i}@example.com", "hashed_password": hashed, "full_name": f"Audited {i}", "role": "Startup", "status": "Active"}
+            for i in range(users)
+        ])
+        db.commit()
+
+
+async def table_count() -> int:
+    async with AsyncSessionLocal() as db:
+        return await db.scalar(select(func.count()).select_from(AuditEvent))
+
+
+def counter(name) -> float:
+    return REGISTRY.get_sample_value(name) or 0.0
+
+
+async def login_latency(client, logins, concurrency, users):
+    async def login(i):
+        password = PASSWORD if i % 3 else "wrong password"
+        response = await client.post("/auth/login", data={"username": f"audited{i % users}@example.com", "password": password})
+        if response.status_code != (200 if i % 3 else 401):
+            raise RuntimeError(f"login {i}: unexpected {response.status_code}")
+
+    results = {}
+    for mode, audit_log in [
+        ("off", buffered_log(enabled=False)),
+        ("buffered", buffered_log()),
+        ("synchronous", SynchronousAuditLog(concurrency)),
+    ]:
+        set_audit_log(audit_log)
+        audit_log.start()
+        await run_concurrent(login, concurrency, concurrency * 4) # Warm up
+        latencies, elapsed = await run_concurrent(login, concurrency, logins)
+        await audit_log.stop()
+        results[mode] = summarize(f"login, audit {mode}", latencies, elapsed)
+    print()
+    for mode in ("buffered", "synchronous"):
+        print(f"audit {mode}: mean {results[mode]['mean_ms'] - results['off']['mean_ms']:+.2f} ms, "
+              f"p99 {results[mode]['p99_ms'] - results['off']['p99_ms']:+.2f} ms, "
+              f"throughput {results[mode]['rps'] / results['off']['rps']:.2f}x of auditing off")
+
+
+async def sustained(name, events, producers, **overrides):
+    audit_log = buffered_log(**overrides)
+    before = {metric: counter(metric) for metric in (
+        "audit_events_recorded_total", "audit_events_dropped_total", "audit_backpressure_waits_total",
+    )}
+    rows_before = await table_count()
+    counts = iter(range(events))
+
+    async def producer():
+        for i in counts:
+            await audit_log.record("login_failed", email=f"flood{i % 5000}@example.com", ip=f"10.0.{i % 250}.{i % 200}",
+                                   data={"reason": "bad_password"})
+
+    audit_log.start()
+    started = time.perf_counter()
+    await asyncio.gather(*(producer() for _ in range(producers)))
+    recorded_in = time.perf_counter() - started
+    await audit_log.stop()
+    written_in = time.perf_counter() - started
+
+    recorded, dropped, waits = (counter(metric) - value for metric, value in before.items())
+    rows = await table_count() - rows_before
+    print(f"{name:<32} {events / recorded_in:>9.0f} events/s recorded  {rows / written_in:>9.0f} rows/s written  "
+          f"waits {int(waits)}  dropped {int(dropped)}  "
+          f"table {'ok' if rows == recorded else f'MISMATCH ({rows} rows, {int(recorded)} recorded)'}")
+    return rows == recorded
+
+
+async def shutdown_flush(events):
+    audit_log = buffered_log(flush_seconds=3600, batch_size=events * 2) # Nothing is written before stop()
+    rows_before = await table_count()
+    audit_log.start()
+    for i in range(events):
+        await audit_log.record("logout", email=f"leaving{i}@example.com", ip="10.1.0.1")
+    unwritten = await table_count() - rows_before
+    await audit_log.stop()
+    rows = await table_count() - rows_before
+    ok = unwritten == 0 and rows == events
+    print(f"shutdown flush: {unwritten} rows before stop(), {rows}/{events} after: {'ok' if ok else 'FAILED'}")
+    return ok
+
+
+async def main(logins, concurrency, users, events, producers):
+    seed(users)
+    set_audit_log(buffered_log(enabled=False)) # Each section below installs its own
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+            await login_latency(client, logins, concurrency, users)
+        print()
+        ok = await sustained("events, default buffer", events, producers)
+        ok = await sustained("events, 2000-event buffer", events, producers, buffer_size=2000, batch_size=500, backpressure_seconds=0.05) and ok
+        ok = await shutdown_flush(5000) and ok
+    await async_engine.dispose()
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--events", type=int, default=200000)
+    parser.add_argument("--producers", type=int, default=200)
+    args = parser.parse_args()
+    raise SystemExit(0 if asyncio.run(main(args.logins, args.concurrency, args.users, args.events, args.producers)) else 1)
@@ -0,0 +1,460 @@
+"""Load test of the auth flows with a JSON report, and a comparison mode to gate on.
+
+`run` boots main:app under uvicorn (a separate process, as in production)
+against the database in DATABASE_URL. That is the local SQLite stand-in from
+benchmarks.common by default; point it at a disposable Postgres to measure
+that instead. Mail goes to the in-memory transport. Rate limits are off,
+since every virtual user comes from the same IP. The database is reset and
+seeded with `--users` active accounts.
+
+Virtual users then run a seeded, reproducible mix of journeys:
+
+- signup: register -> verify -> login -> me -> logout
+- returning: login -> me -> refresh -> logout
+- recovery: forgot-password -> reset-password -> login -> logout
+
+The verification and reset links would arrive by email. The harness mints
+the same tokens with the shared SECRET_KEY instead of reading the outbox.
+The journeys run `--flows` times at each `--concurrency` level, after
+`--warmup` untimed journeys. Each level records client-side throughput and
+latency percentiles per step. The server's /metrics is scraped before and
+after each level for its CPU seconds, statement count and response count.
+The report stores them as CPU ms and DB queries per request. Those totals
+include the background workers (email outbox polling, notification
+flushes), as they would in production.
+
+`compare` lines up two reports level by level. It flags every metric that
+got worse by more than `--tolerance`, or `--tail-tolerance` for the p90
+latency. p99s are shown but not gated; between identical runs on a shared
+box they move by half. Latency and CPU changes below `--floor-ms` are
+ignored as noise, and so are steps with fewer than `--min-samples` requests. It exits with status 1 if
+anything regressed.
+
+    python -m benchmarks.bench_auth_flows run [--mix default] [--concurrency 1,10] [--flows 300] [--output report.json]
+    python -m benchmarks.bench_auth_flows compare baseline.json candidate.json [--tolerance 0.1]
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from http.cookiejar import CookieJar, DefaultCookiePolicy
+
+from benchmarks.common import percentile, reset_database, run_concurrent, summarize
+
+import httpx
+from prometheus_client.parser import text_string_to_metric_families
+from sqlalchemy import insert
+
+from core.security import build_password_context, create_password_reset_token, create_verification_token
+from database import SessionLocal, async_engine
+from models.user import User
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PASSWORD = "load-test-password"
+NEW_PASSWORD = "load-test-password-2"
+
+# Journey weights; `--mix` also accepts e.g. "signup=1,returning=3"
+MIXES = {
+    "default": {"signup": 2, "returning": 7, "recovery": 1},
+    "signup": {"signup": 1},
+    "returning": {"returning": 1},
+    "recovery": {"recovery": 1},
+}
+
+# What `compare` shows: (report key, better when, which tolerance gates it; None = shown only).
+# p99s swing by 50% between identical runs on a shared box (lock waits, GC), so they aren't gated.
+CHECKS = [
+    ("throughput_rps", "higher", "tolerance"),
+    ("latency_ms.p50", "lower", "tolerance"),
+    ("latency_ms.p90", "lower", "tail_tolerance"),
+    ("latency_ms.p99", "lower", None),
+    ("cpu_ms_per_request", "lower", "tolerance"),
+    ("db_queries_per_request", "lower", "tolerance"),
+]
+STEP_CHECKS = [("p50_ms", "lower", "tolerance"), ("p90_ms", "lower", None), ("p99_ms", "lower", None)]
+
+
+class StepFailed(Exception):
+    pass
+
+
+class Journey:
+    """One virtual user's pass through a flow; every request is timed under its step name."""
+
+    def __init__(self, client: httpx.AsyncClient, email: str, stats):
+        self.client = client
+        self.email = email
+        self.stats = stats
+        self.access_token = None
+        self.refresh_token = None
+
+    async def step(self, name, method, path, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, path, **kwargs)
+        except httpx.HTTPError as e:
+            self.stats.failed(name, type(e).__name__)
+            raise StepFailed(name) from e
+        self.stats.timed(name, time.perf_counter() - started)
+        if response.status_code >= 400:
+            self.stats.failed(name, str(response.status_code))
+            raise StepFailed(name)
+        return response
+
+    async def register(self):
+        await self.step("register", "POST", "/auth/register", json={
+            "email": self.email, "password": PASSWORD, "full_name": "Load Test", "role": "Startup",
+        })
+
+    async def verify(self):
+        await self.step("verify", "GET", f"/auth/verify/{create_verification_token(self.email)}")
+
+    async def login(self, password=PASSWORD):
+        response = await self.step("login", "POST", "/auth/login", data={"username": self.email, "password": password})
+        self.access_token = response.cookies["access_token"]
+        self.refresh_token = response.json()["refresh_token"]
+
+    async def me(self):
+        await self.step("me", "GET", "/auth/me", headers={"Cookie": f"access_token={self.access_token}"})
+
+    async def refresh(self):
+        response = await self.step("refresh", "POST", "/auth/refresh", json={"refresh_token": self.refresh_token})
+        self.access_token = response.cookies["access_token"]
+        self.refresh_token = response.json()["refresh_token"]
+
+    async def forgot_password(self):
+        await self.step("forgot_password", "POST", "/auth/forgot-password", json={"email": self.email})
+
+    async def reset_password(self):
+        await self.step("reset_password", "POST", "/auth/reset-password", json={
+            "token": create_password_reset_token(self.email), "new_password": NEW_PASSWORD,
+        })
+
+    async def logout(self):
+        await self.step("logout", "POST", "/auth/logout", json={"refresh_token": self.refresh_token})
+
+
+async def signup(journey):
+    await journey.register()
+    await journey.verify()
+    await journey.login()
+    await journey.me()
+    await journey.logout()
+
+
+async def returning(journey):
+    await journey.login()
+    await journey.me()
+    await journey.refresh()
+    await journey.logout()
+
+
+async def recovery(journey):
+    await journey.forgot_password()
+    await journey.reset_password()
+    await journey.login(NEW_PASSWORD)
+    await journey.logout()
+
+
+FLOWS = {"signup": signup, "returning": returning, "recovery": recovery}
+
+
+class StepStats:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(Counter) # step -> {status code or exception: count}
+
+    def timed(self, step, seconds):
+        self.latencies[step].append(seconds)
+
+    def failed(self, step, reason):
+        self.errors[step][reason] += 1
+
+
+# --- Run ---
+
+def parse_mix(spec):
+    if spec in MIXES:
+        return MIXES[spec]
+    weights = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        if name not in FLOWS:
+            raise SystemExit(f"Unknown flow '{name}'; choose from {', '.join(FLOWS)}")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+def plan_flows(mix, count, rng):
+    names = list(mix)
+    return rng.choices(names, weights=[mix[name] for name in names], k=count)
+
+
+def seed(users, recovery_users, bcrypt_rounds):
+    """Active accounts for the returning (shared) and recovery (one per journey, their password changes) flows."""
+    reset_database()
+    hashed = build_password_context(schemes=["bcrypt"], bcrypt_rounds=bcrypt_rounds).hash(PASSWORD)
+    emails = [f"returning{i}@example.com" for i in range(users)] + [f"recovery{i}@example.com" for i in range(recovery_users)]
+    with SessionLocal() as db:
+        db.execute(insert(User), [
+            {"email": email, "hashed_password": hashed, "full_name": "Load Test", "role": "Startup", "status": "Active"}
+            for email in emails
+        ])
+        db.commit()
+
+
+def server_env(bcrypt_rounds):
+    return dict(
+        os.environ, EMAIL_TRANSPORT="memory", RATE_LIMIT_ENABLED="false", LOG_LEVEL="WARNING",
+        PASSWORD_HASH_SCHEMES='["bcrypt"]', PASSWORD_BCRYPT_ROUNDS=str(bcrypt_rounds),
+    )
+
+
+def start_server(port, bcrypt_rounds):
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=server_env(bcrypt_rounds),
+    )
+    started = time.perf_counter()
+    with httpx.Client(base_url=f"http://127.0.0.1:{port}") as client:
+        while True:
+            try:
+                if client.get("/").status_code == 200:
+                    return server
+            except httpx.TransportError:
+                pass
+            if time.perf_counter() - started > 60 or server.poll() is not None:
+                server.terminate()
+                raise RuntimeError("Server did not come up")
+            time.sleep(0.05)
+
+
+async def scrape(client):
+    """Server totals from /metrics: (process CPU seconds, statements executed, responses excluding /metrics)."""
+    text = (await client.get("/metrics")).text
+    cpu = queries = responses = 0.0
+    for family in text_string_to_metric_families(text):
+        for sample in family.samples:
+            if sample.name == "process_cpu_seconds_total":
+                cpu = sample.value
+            elif sample.name == "db_query_seconds_count":
+                queries += sample.value
+            elif sample.name == "http_responses_total" and sample.labels.get("route") != "/metrics":
+                responses += sample.value
+    return cpu, queries, responses
+
+
+def git_revision():
+    try:
+        revision = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=BACKEND_DIR, capture_output=True, text=True).stdout.strip()
+        return revision + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def latency_summary(latencies):
+    return {
+        "p50": percentile(latencies, 50) * 1000,
+        "p90": percentile(latencies, 90) * 1000,
+        "p99": percentile(latencies, 99) * 1000,
+        "mean": statistics.fmean(latencies) * 1000 if latencies else 0.0,
+        "max": max(latencies, default=0.0) * 1000,
+    }
+
+
+async def run_journey(client, flow, email, stats):
+    try:
+        await FLOWS[flow](Journey(client, email, stats))
+    except StepFailed:
+        pass # Counted in stats; the rest of the journey depends on the failed step
+
+
+async def run_level(client, plan, concurrency, next_email):
+    stats = StepStats()
+    before = await scrape(client)
+    _, elapsed = await run_concurrent(lambda i: run_journey(client, plan[i], next_email(plan[i]), stats), concurrency, len(plan))
+    after = await scrape(client)
+    cpu, queries, responses = (a - b for a, b in zip(after, before))
+
+    all_latencies = [seconds for latencies in stats.latencies.values() for seconds in latencies]
+    errors = sum(sum(reasons.values()) for reasons in stats.errors.values())
+    requests = len(all_latencies) + errors
+    print(f"\nconcurrency {concurrency}: {len(plan)} journeys ({dict(Counter(plan))})")
+    steps = {}
+    for step, latencies in stats.latencies.items():
+        result = summarize(f"  {step}", latencies, elapsed)
+        steps[step] = {
+            "requests": len(latencies), "errors": dict(stats.errors.get(step, {})),
+            "p50_ms": result["p50_ms"], "p90_ms": percentile(latencies, 90) * 1000, "p99_ms": result["p99_ms"], "mean_ms": result["mean_ms"],
+        }
+    for step, reasons in stats.errors.items():
+        steps.setdefault(step, {"requests": 0, "errors": dict(reasons)})
+    summarize("  all requests", all_latencies, elapsed)
+    level = {
+        "concurrency": concurrency,
+        "journeys": len(plan),
+        "requests": requests,
+        "errors": errors,
+        "error_rate": errors / requests if requests else 0.0,
+        "elapsed_s": elapsed,
+        "throughput_rps": requests / elapsed if elapsed else 0.0,
+        "journeys_per_s": len(plan) / elapsed if elapsed else 0.0,
+        "latency_ms": latency_summary(all_latencies),
+        "server_requests": responses,
+        "cpu_ms_per_request": cpu * 1000 / responses if responses else 0.0,
+        "db_queries_per_request": queries / responses if responses else 0.0,
+        "steps": steps,
+    }
+    print(f"  server: {level['cpu_ms_per_request']:.2f} CPU ms/request, {level['db_queries_per_request']:.2f} queries/request, "
+          f"{errors} errors {dict(sum(stats.errors.values(), Counter()))}")
+    return level
+
+
+async def run(args):
+    mix = parse_mix(args.mix)
+    levels = [int(level) for level in args.concurrency.split(",")]
+    rng = random.Random(args.seed)
+    plans = [plan_flows(mix, args.warmup, rng)] + [plan_flows(mix, args.flows, rng) for _ in levels]
+    seed(args.users, sum(plan.count("recovery") for plan in plans), args.bcrypt_rounds)
+
+    counters = Counter()
+
+    def next_email(flow):
+        counters[flow] += 1
+        if flow == "signup":
+            return f"signup{counters[flow]}@example.com"
+        if flow == "recovery":
+            return f"recovery{counters[flow] - 1}@example.com"
+        return f"returning{rng.randrange(args.users)}@example.com"
+
+    server = start_server(args.port, args.bcrypt_rounds)
+    try:
+        limits = httpx.Limits(max_connections=max(levels), max_keepalive_connections=max(levels))
+        # Journeys pass their access token explicitly; the shared client must not keep anyone's cookies
+        no_cookies = CookieJar(policy=DefaultCookiePolicy(allowed_domains=[]))
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", limits=limits, cookies=no_cookies, timeout=60) as client:
+            if args.warmup:
+                await run_concurrent(lambda i: run_journey(client, plans[0][i], next_email(plans[0][i]), StepStats()), max(levels), args.warmup)
+            results = [await run_level(client, plan, level, next_email) for plan, level in zip(plans[1:], levels)]
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+        await async_engine.dispose()
+
+    report = {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "database": async_engine.url.get_backend_name(),
+            "mix": mix,
+            "flows": args.flows,
+            "warmup": args.warmup,
+            "users": args.users,
+            "seed": args.seed,
+            "bcrypt_rounds": args.bcrypt_rounds,
+        },
+        "levels": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nreport written to {args.output}")
+    return 0
+
+
+# --- Compare ---
+
+def lookup(result, key):
+    for part in key.split("."):
+        result = result.get(part) if isinstance(result, dict) else None
+    return result
+
+
+def check(name, base, new, better, tolerance, floor=None):
+    """Returns (line, regressed) for one metric; tolerance None only reports the change."""
+    if base is None or new is None:
+        return None, False
+    change = (new - base) / base if base else 0.0
+    worse = tolerance is not None and (change < -tolerance if better == "higher" else change > tolerance)
+    if floor is not None and abs(new - base) < floor:
+        worse = False
+    return f"  {name:<36} {base:>10.2f} {new:>10.2f} {change:>+8.1%}  {'REGRESSION' if worse else ''}", worse
+
+
+def compare(args):
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+    for key in ("database", "mix", "bcrypt_rounds", "cpu_count"):
+        if baseline["meta"].get(key) != candidate["meta"].get(key):
+            print(f"warning: runs differ in {key}: {baseline['meta'].get(key)} vs {candidate['meta'].get(key)}")
+
+    regressions = 0
+    candidate_levels = {level["concurrency"]: level for level in candidate["levels"]}
+    print(f"baseline {baseline['meta'].get('git_revision')} vs candidate {candidate['meta'].get('git_revision')} "
+          f"(tolerance {args.tolerance:.0%}, tails {args.tail_tolerance:.0%}, floor {args.floor_ms} ms)")
+    for base in baseline["levels"]:
+        new = candidate_levels.get(base["concurrency"])
+        print(f"\nconcurrency {base['concurrency']}")
+        if new is None:
+            print("  missing from candidate")
+            continue
+        lines = []
+        for key, better, tolerance in CHECKS:
+            floor = args.floor_ms if key.startswith(("latency", "cpu")) else None
+            lines.append(check(key, lookup(base, key), lookup(new, key), better, getattr(args, tolerance) if tolerance else None, floor))
+        for step in sorted(base["steps"]):
+            # Percentiles of a handful of requests move by tens of percent between identical runs
+            gated = min(base["steps"][step]["requests"], lookup(new["steps"], f"{step}.requests") or 0) >= args.min_samples
+            for key, better, tolerance in STEP_CHECKS:
+                lines.append(check(f"{step}.{key}", lookup(base["steps"], f"{step}.{key}"), lookup(new["steps"], f"{step}.{key}"),
+                                   better, getattr(args, tolerance) if tolerance and gated else None, args.floor_ms))
+        if new["error_rate"] > base["error_rate"] + args.error_rate_tolerance:
+            lines.append((f"  {'error_rate':<36} {base['error_rate']:>10.2%} {new['error_rate']:>10.2%}  REGRESSION", True))
+        for line, regressed in lines:
+            if line is not None:
+                print(line)
+            regressions += regressed
+    print(f"\n{regressions} regression(s)" if regressions else "\nno regressions")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Load-test the auth flows and write a JSON report")
+    run_parser.add_argument("--mix", default="default", help=f"One of {', '.join(MIXES)}, or weights like signup=1,returning=3")
+    run_parser.add_argument("--concurrency", default="1,10", help="Comma-separated levels, each run with --flows journeys")
+    run_parser.add_argument("--flows", type=int, default=300, help="Journeys per concurrency level")
+    run_parser.add_argument("--warmup", type=int, default=30, help="Untimed journeys before the first level")
+    run_parser.add_argument("--users", type=int, default=200, help="Seeded accounts shared by returning journeys")
+    run_parser.add_argument("--bcrypt-rounds", type=int, default=4,
+                            help="Password hash cost on the server; use the production value (12) to include hashing cost")
+    run_parser.add_argument("--seed", type=int, default=20)
+    run_parser.add_argument("--port", type=int, default=8767)
+    run_parser.add_argument("--output", default="auth_flows_report.json")
+
+    compare_parser = commands.add_parser("compare", help="Flag regressions of a candidate report against a baseline")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("candidate")
+    compare_parser.add_argument("--tolerance", type=float, default=0.10, help="Allowed relative change before a metric is flagged")
+    compare_parser.add_argument("--tail-tolerance", type=float, default=0.25, help="Allowed relative change of the overall p90 latency")
+    compare_parser.add_argument("--min-samples", type=int, default=100, help="Steps with fewer requests are shown but not gated")
+    compare_parser.add_argument("--floor-ms", type=float, default=1.0, help="Latency/CPU changes smaller than this are ignored")
+    compare_parser.add_argument("--error-rate-tolerance", type=float, default=0.001)
+
+    args = parser.parse_args()
+    sys.exit(asyncio.run(run(args)) if args.command == "run" else compare(args))
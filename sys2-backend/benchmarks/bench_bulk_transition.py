@@ -0,0 +1,71 @@
+"""Promoting a large waitlist: row-by-row ORM loop vs chunked set-based UPDATE ... RETURNING.
+
+Both variants promote every `ActiveWaitlist` user to `Active` and queue one
+`waitlist_promoted` email per user. The ORM loop is what an admin endpoint
+built on the `verify_email` pattern would do: load the rows, mutate each
+object, add one outbox row per user, commit. The set-based variant goes
+through apply_bulk_transition (core.waitlist.promote_next), which also
+gives every promoted user a member seat in a space large enough for all.
+
+    python -m benchmarks.bench_bulk_transition [--users 50000] [--chunk-size 1000]
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks.common import reset_database
+
+from sqlalchemy import func, insert, select
+
+from core.user_admin import apply_bulk_transition
+from database import AsyncSessionLocal, SessionLocal, async_engine
+from models.email_outbox import EmailOutbox
+from models.space import Space
+from models.user import User
+from utils.email_queue import enqueue_rendered_email
+from utils.email_templates import render_email
+
+
+def seed(users):
+    reset_database()
+    with SessionLocal() as db:
+        db.add(Space(id=1, name="Munich", workstation_capacity=users))
+        db.execute(insert(User), [
+            {"email": f"user{i}@example.com", "hashed_password": "x", "full_name": f"User {i}", "role": "Startup", "status": "ActiveWaitlist"}
+            for i in range(users)
+        ])
+        db.commit()
+
+
+async def promote_row_by_row(db):
+    users = (await db.scalars(select(User).where(User.status == "ActiveWaitlist"))).all()
+    for user in users:
+        user.status = "Active"
+        enqueue_rendered_email(db, render_email("waitlist_promoted", to_email=user.email, full_name=user.full_name))
+    await db.commit()
+    return len(users)
+
+
+async def promote_bulk(db, chunk_size):
+    result = await apply_bulk_transition(db, "promote", statuses=["ActiveWaitlist"], space_id=1, chunk_size=chunk_size)
+    return result["updated"]
+
+
+async def main(users, chunk_size):
+    for name, promote in (("row-by-row ORM loop", promote_row_by_row), ("set-based UPDATE RETURNING", lambda db: promote_bulk(db, chunk_size))):
+        seed(users)
+        async with AsyncSessionLocal() as db:
+            started = time.perf_counter()
+            promoted = await promote(db)
+            elapsed = time.perf_counter() - started
+            queued = await db.scalar(select(func.count(EmailOutbox.id)))
+        print(f"{name:<28} {promoted:>7} users  {elapsed:>8.2f} s  {promoted / elapsed:>9.0f} users/s  ({queued} emails queued)")
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=50000)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    args = parser.parse_args()
+    asyncio.run(main(args.users, args.chunk_size))
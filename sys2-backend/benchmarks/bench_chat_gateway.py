@@ -0,0 +1,193 @@
+"""Load generator for the chat WebSocket gateway: messages/sec and delivery latency.
+
+Starts the API under uvicorn in a subprocess (SQLite benchmark database,
+local pub/sub), opens one authenticated socket per seeded user, then lets
+`--senders` of them send `--messages` messages to random other users.
+Each message carries its send timestamp, so every receiving socket records
+the end-to-end delivery latency. Slow-consumer disconnects and the
+persisted-row count are read back at the end.
+
+Compare batched persistence with a commit per message using
+`--persist-batch-size 1`.
+
+    python -m benchmarks.bench_chat_gateway [--sockets 10000] [--senders 500] [--messages 50000] [--rate 0]
+
+Needs `ulimit -n` above --sockets (client and server each hold one descriptor per socket).
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import signal
+import subprocess
+import sys
+import time
+
+from benchmarks.common import BENCH_DB_PATH, percentile, reset_database
+
+import httpx
+from sqlalchemy import func, insert, select
+from websockets.asyncio.client import connect
+
+from core.security import create_access_token
+from database import SessionLocal
+from models.message import Message
+from models.user import User
+
+
+def seed(users):
+    reset_database()
+    with SessionLocal() as db:
+        db.execute(insert(User), [
+            {"email": f"chat{i}@example.com", "hashed_password": "x", "full_name": f"Chat {i}", "role": "Startup", "status": "Active"}
+            for i in range(users)
+        ])
+        db.commit()
+        return db.execute(select(User.id, User.email).order_by(User.id)).all()
+
+
+def start_server(port, persist_batch_size, queue_size):
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{BENCH_DB_PATH}", EMAIL_TRANSPORT="memory", LOG_LEVEL="WARNING")
+    if persist_batch_size is not None:
+        env["CHAT_PERSIST_BATCH_SIZE"] = str(persist_batch_size)
+        if persist_batch_size == 1:
+            env["CHAT_PERSIST_FLUSH_MS"] = "0"
+    if queue_size is not None:
+        env["CHAT_SEND_QUEUE_SIZE"] = str(queue_size)
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning", "--ws", "websockets", "--loop", "uvloop"],
+        env=env,
+    )
+
+
+async def wait_until_up(base_url, timeout=30):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get(base_url + "/")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError("Server did not start")
+
+
+async def chat_metrics(base_url):
+    async with httpx.AsyncClient() as client:
+        text = (await client.get(base_url + "/metrics")).text
+    return {
+        line.split()[0]: float(line.split()[1])
+        for line in text.splitlines()
+        if line.startswith("chat_") and not line.startswith("chat_persist_pending") and "_created" not in line
+    }
+
+
+class Client:
+    def __init__(self, user_id, socket, stats):
+        self.user_id = user_id
+        self.socket = socket
+        self.stats = stats
+
+    async def receive(self):
+        try:
+            async for raw in self.socket:
+                frame = json.loads(raw)
+                if frame["type"] == "message":
+                    if frame["to"] == self.user_id:
+                        self.stats["latencies"].append(time.time() - float(frame["content"]))
+                        self.stats["delivered"] += 1
+                    else:
+                        self.stats["acks"] += 1
+                elif frame["type"] == "error":
+                    self.stats["errors"] += 1
+        except Exception:
+            pass
+        self.stats["closed"] += 1
+
+
+async def main(sockets, senders, messages, rate, port, connect_concurrency, persist_batch_size, queue_size):
+    users = seed(sockets)
+    base_url = f"http://127.0.0.1:{port}"
+    server = start_server(port, persist_batch_size, queue_size)
+    try:
+        await wait_until_up(base_url)
+        stats = {"latencies": [], "delivered": 0, "acks": 0, "errors": 0, "closed": 0}
+
+        started = time.perf_counter()
+        semaphore = asyncio.Semaphore(connect_concurrency)
+
+        async def open_client(user_id, email):
+            async with semaphore:
+                socket = await connect(
+                    f"ws://127.0.0.1:{port}/chat/ws",
+                    additional_headers={"Cookie": f"access_token={create_access_token({'sub': email})}"},
+                    ping_interval=None, open_timeout=60,
+                )
+            return Client(user_id, socket, stats)
+
+        clients = await asyncio.gather(*(open_client(user_id, email) for user_id, email in users))
+        print(f"{len(clients)} sockets connected in {time.perf_counter() - started:.1f} s", flush=True)
+        receivers = [asyncio.create_task(client.receive()) for client in clients]
+
+        rng = random.Random(5)
+        user_ids = [client.user_id for client in clients]
+        per_sender = messages // senders
+        interval = senders / rate if rate else 0
+
+        async def send_from(client):
+            for _ in range(per_sender):
+                recipient = rng.choice(user_ids)
+                while recipient == client.user_id:
+                    recipient = rng.choice(user_ids)
+                await client.socket.send(json.dumps({"type": "message", "to": recipient, "content": f"{time.time():.6f}"}))
+                if interval:
+                    await asyncio.sleep(interval)
+                else:
+                    await asyncio.sleep(0)
+
+        sent = per_sender * senders
+        started = time.perf_counter()
+        await asyncio.gather(*(send_from(client) for client in rng.sample(clients, senders)))
+        send_elapsed = time.perf_counter() - started
+        deadline = time.monotonic() + 60
+        while stats["delivered"] < sent and time.monotonic() < deadline and stats["closed"] < len(clients):
+            await asyncio.sleep(0.05)
+        elapsed = time.perf_counter() - started
+
+        latencies = stats["latencies"]
+        print(f"sent      {sent} messages from {senders} sockets in {send_elapsed:.2f} s ({sent / send_elapsed:.0f} msg/s offered)")
+        print(f"delivered {stats['delivered']} in {elapsed:.2f} s ({stats['delivered'] / elapsed:.0f} msg/s), "
+              f"{stats['acks']} acks, {stats['errors']} errors, {stats['closed']} sockets closed")
+        print(f"latency   p50 {percentile(latencies, 50) * 1000:.1f} ms  p99 {percentile(latencies, 99) * 1000:.1f} ms  "
+              f"max {max(latencies, default=0) * 1000:.1f} ms")
+        for name, value in sorted((await chat_metrics(base_url)).items()):
+            print(f"  {name} {value:.0f}")
+
+        for client in clients:
+            await client.socket.close()
+        await asyncio.gather(*receivers, return_exceptions=True)
+    finally:
+        server.send_signal(signal.SIGINT) # Lifespan shutdown flushes the message buffer
+        server.wait(timeout=60)
+
+    with SessionLocal() as db:
+        print(f"persisted {db.scalar(select(func.count()).select_from(Message))} messages")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sockets", type=int, default=10000)
+    parser.add_argument("--senders", type=int, default=500)
+    parser.add_argument("--messages", type=int, default=50000)
+    parser.add_argument("--rate", type=float, default=0, help="Target messages/s across all senders (0 = as fast as possible)")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--connect-concurrency", type=int, default=50)
+    parser.add_argument("--persist-batch-size", type=int, default=None, help="Overrides CHAT_PERSIST_BATCH_SIZE (1 = commit per message)")
+    parser.add_argument("--queue-size", type=int, default=None, help="Overrides CHAT_SEND_QUEUE_SIZE")
+    args = parser.parse_args()
+    asyncio.run(main(
+        args.sockets, args.senders, args.messages, args.rate, args.port,
+        args.connect_concurrency, args.persist_batch_size, args.queue_size,
+    ))
@@ -0,0 +1,63 @@
+"""Authenticated request throughput with and without the token/user caches.
+
+Calls `/auth/me` (which depends on `get_current_user`) with a valid
+access_token cookie, first with both caches disabled and then enabled.
+
+    python -m benchmarks.bench_current_user [--concurrency 50] [--requests 5000]
+"""
+import argparse
+import asyncio
+
+from benchmarks.common import reset_database, run_concurrent, summarize
+
+import httpx
+
+from core.dependencies import user_cache
+from core.security import access_token_cache, create_access_token
+from database import SessionLocal, async_engine
+from main import app
+from models.user import User
+
+BENCH_EMAIL = "bench@example.com"
+
+
+def seed():
+    reset_database()
+    with SessionLocal() as db:
+        db.add(User(email=BENCH_EMAIL, hashed_password="x", role="Startup", status="ActiveWaitlist"))
+        db.commit()
+
+
+def set_caches(enabled, sizes):
+    for cache, size in zip((access_token_cache, user_cache), sizes):
+        cache.clear()
+        cache.maxsize = size if enabled else 0
+
+
+async def bench(concurrency, total):
+    token = create_access_token({"sub": BENCH_EMAIL})
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", cookies={"access_token": token}) as client:
+        async def hit(_):
+            response = await client.get("/auth/me")
+            response.raise_for_status()
+
+        return await run_concurrent(hit, concurrency, total)
+
+
+async def main(concurrency, total):
+    seed()
+    sizes = (access_token_cache.maxsize, user_cache.maxsize)
+    for enabled in (False, True):
+        set_caches(enabled, sizes)
+        latencies, elapsed = await bench(concurrency, total)
+        summarize(f"get_current_user caches {'on' if enabled else 'off'}", latencies, elapsed)
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=5000)
+    args = parser.parse_args()
+    asyncio.run(main(args.concurrency, args.requests))
@@ -0,0 +1,68 @@
+"""Connection pool exhaustion stress test.
+
+Opens a deliberately small async pool and has `--clients` tasks each hold a
+connection for `--hold-ms` while running a query. Reports completed vs.
+timed-out checkouts, checkout wait percentiles and the pool state observed
+while saturated.
+
+    python -m benchmarks.bench_db_pool [--pool-size 2] [--max-overflow 1] [--pool-timeout 0.5] [--clients 40] [--hold-ms 100]
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks.common import percentile
+
+from sqlalchemy import exc as sa_exc
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from database import ASYNC_SQLALCHEMY_DATABASE_URL, engine_options, instrument_engine, pool_status
+
+
+async def main(pool_size, max_overflow, pool_timeout, clients, hold_ms):
+    stress_engine = create_async_engine(
+        ASYNC_SQLALCHEMY_DATABASE_URL,
+        **engine_options(
+            ASYNC_SQLALCHEMY_DATABASE_URL, "stress", is_async=True,
+            pool_size=pool_size, max_overflow=max_overflow, pool_timeout=pool_timeout,
+        )
+    )
+    instrument_engine(stress_engine.sync_engine, "stress")
+    waits, timeouts, saturated = [], 0, {}
+
+    async def client():
+        nonlocal timeouts
+        started = time.perf_counter()
+        try:
+            async with stress_engine.connect() as connection:
+                waits.append(time.perf_counter() - started)
+                await connection.execute(text("SELECT 1"))
+                await asyncio.sleep(hold_ms / 1000)
+        except sa_exc.TimeoutError:
+            timeouts += 1
+
+    async def observe():
+        await asyncio.sleep(hold_ms / 2000)
+        saturated.update(pool_status(stress_engine.sync_engine))
+
+    started = time.perf_counter()
+    await asyncio.gather(observe(), *(client() for _ in range(clients)))
+    elapsed = time.perf_counter() - started
+
+    print(f"pool_size={pool_size} max_overflow={max_overflow} pool_timeout={pool_timeout}s clients={clients} hold={hold_ms}ms")
+    print(f"completed {len(waits)}  timed out {timeouts}  wall {elapsed:.2f}s")
+    print(f"checkout wait p50 {percentile(waits, 50) * 1000:.1f} ms  p99 {percentile(waits, 99) * 1000:.1f} ms  max {max(waits, default=0) * 1000:.1f} ms")
+    print(f"pool while saturated: {saturated}")
+    await stress_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pool-size", type=int, default=2)
+    parser.add_argument("--max-overflow", type=int, default=1)
+    parser.add_argument("--pool-timeout", type=float, default=0.5)
+    parser.add_argument("--clients", type=int, default=40)
+    parser.add_argument("--hold-ms", type=int, default=100)
+    args = parser.parse_args()
+    asyncio.run(main(args.pool_size, args.max_overflow, args.pool_timeout, args.clients, args.hold_ms))
@@ -0,0 +1,55 @@
+"""Email rendering cost: inline f-string vs. compiled Jinja2 templates.
+
+Reports renders/sec for the old per-request f-string body, `render_email`
+per item, and `render_bulk` over a batch of personalized recipients.
+
+    python -m benchmarks.bench_email_templates [--count 10000]
+"""
+import argparse
+import time
+
+import benchmarks.common  # noqa: F401 - prepares the benchmark environment
+
+from utils.email_templates import load_email_templates, render_bulk, render_email
+
+
+def inline_fstring(token, full_name):
+    verification_url = f"http://localhost:3000/auth/verify/{token}"
+    return f"""
+    <html>
+        <body>
+            <h1>Verify your ShareYourSpace Account</h1>
+            <p>Thank you for registering, {full_name}. Please click the link below to verify your email address:</p>
+            <a href="{verification_url}">Verify Email</a>
+            <p>If you did not create this account, please ignore this email.</p>
+        </body>
+    </html>
+    """
+
+
+def timed(name, count, func):
+    started = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - started
+    print(f"{name:<28} {count:>7} mails  {count / elapsed:>10.0f} mails/s  {elapsed * 1e6 / count:>7.1f} us/mail")
+
+
+def main(count):
+    recipients = [
+        {"to_email": f"user{i}@example.com", "token": f"token-{i}", "full_name": f"User {i}"}
+        for i in range(count)
+    ]
+    started = time.perf_counter()
+    load_email_templates()
+    print(f"template compile (startup)   {(time.perf_counter() - started) * 1000:.2f} ms")
+
+    timed("inline f-string (html only)", count, lambda: [inline_fstring(r["token"], r["full_name"]) for r in recipients])
+    timed("render_email (html + text)", count, lambda: [render_email("verify_email", **r) for r in recipients])
+    timed("render_bulk (html + text)", count, lambda: list(render_bulk("verify_email", recipients)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=10000)
+    args = parser.parse_args()
+    main(args.count)
@@ -0,0 +1,83 @@
+"""Matching engine throughput and ANN recall at several space sizes.
+
+For each size, builds a SpaceIndex over synthetic clustered embeddings (with
+companies of ~10 users and some blocks), then measures:
+
+- exact search, one query per call and batched (`--batch` users per matmul)
+- HNSW search (if hnswlib is installed) and its recall@k against exact search
+
+Runs on the SpaceIndex directly; no database involved.
+
+    python -m benchmarks.bench_matching [--sizes 10000,100000,1000000] [--dim 128] [--k 20]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from core.vector_index import SpaceIndex, hnswlib
+
+
+def synthetic_space(n, dim, rng, clusters=64):
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32) * 2
+    vectors = centers[rng.integers(clusters, size=n)] + rng.standard_normal((n, dim)).astype(np.float32)
+    user_ids = np.arange(1, n + 1)
+    company_ids = np.where(rng.random(n) < 0.7, rng.integers(n // 10 + 1, size=n), -1) # 30% without a company
+    blocked_pairs = [tuple(pair) for pair in rng.integers(1, n + 1, size=(n // 100, 2))]
+    return user_ids, vectors, company_ids, blocked_pairs
+
+
+def timed_queries(index, query_ids, k, batch, exact):
+    started = time.perf_counter()
+    results = []
+    for start in range(0, len(query_ids), batch):
+        results.extend(index.query_batch(query_ids[start:start + batch], k, exact=exact))
+    elapsed = time.perf_counter() - started
+    return results, len(query_ids) / elapsed
+
+
+def recall(approximate, exact):
+    hits = total = 0
+    for found, expected in zip(approximate, exact):
+        expected_ids = {user_id for user_id, _ in expected}
+        hits += len(expected_ids & {user_id for user_id, _ in found})
+        total += len(expected_ids)
+    return hits / total if total else 1.0
+
+
+def main(sizes, dim, k, queries, batch, ef_search):
+    rng = np.random.default_rng(7)
+    for n in sizes:
+        user_ids, vectors, company_ids, blocked_pairs = synthetic_space(n, dim, rng)
+        query_ids = rng.choice(user_ids, size=min(queries, n), replace=False).tolist()
+
+        started = time.perf_counter()
+        index = SpaceIndex(user_ids, vectors, company_ids, blocked_pairs)
+        print(f"n={n:<8} dim={dim}  exact index built in {time.perf_counter() - started:6.2f} s")
+        _, single_qps = timed_queries(index, query_ids[:200], k, 1, exact=True)
+        exact_results, batch_qps = timed_queries(index, query_ids, k, batch, exact=True)
+        print(f"    exact, 1 per call          {single_qps:>10.1f} queries/s")
+        print(f"    exact, {batch:>3} per call        {batch_qps:>10.1f} queries/s")
+
+        if hnswlib is None:
+            print("    hnswlib not installed; skipping approximate search")
+            continue
+        started = time.perf_counter()
+        ann_index = SpaceIndex(user_ids, index.vectors, company_ids, blocked_pairs, ann_threshold=0, hnsw_ef_search=ef_search, normalized=True)
+        print(f"    HNSW built in {time.perf_counter() - started:6.2f} s")
+        _, ann_single_qps = timed_queries(ann_index, query_ids[:200], k, 1, exact=False)
+        ann_results, ann_batch_qps = timed_queries(ann_index, query_ids, k, batch, exact=False)
+        print(f"    HNSW, 1 per call           {ann_single_qps:>10.1f} queries/s")
+        print(f"    HNSW, {batch:>3} per call         {ann_batch_qps:>10.1f} queries/s   recall@{k} {recall(ann_results, exact_results):.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--dim", type=int, default=128)
+    parser.add_argument("--k", type=int, default=20)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--batch", type=int, default=64)
+    parser.add_argument("--ef-search", type=int, default=100)
+    args = parser.parse_args()
+    main([int(size) for size in args.sizes.split(",")], args.dim, args.k, args.queries, args.batch, args.ef_search)
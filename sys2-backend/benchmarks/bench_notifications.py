@@ -0,0 +1,156 @@
+"""Notification inbox reads at scale, and the fan-out write path.
+
+Seeds `--notifications` rows (default 1M) over `--users` inboxes, with one
+heavy inbox holding `--hot-share` of them, then measures on that inbox:
+
+- first page, and a page deep in the inbox: keyset (`?before=<id>`) against
+  LIMIT/OFFSET
+- the unread badge: the maintained counter against COUNT(*) over unread rows
+
+and the write path:
+
+- one event fanned out to every user (batched multi-row INSERTs)
+- a burst of registration events for the SYS admins, coalesced into one
+  unread row per admin
+
+and checks the counters against COUNT(*) at the end.
+
+    python -m benchmarks.bench_notifications [--notifications 1000000] [--users 10000]
+"""
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+from benchmarks.common import reset_database, summarize
+
+from sqlalchemy import func, insert, select, text
+
+from core.enums import UserRole
+from core.notifications import NotificationEvent, list_notifications, unread_count, write_notifications
+from database import AsyncSessionLocal, SessionLocal, async_engine
+from models.notification import Notification, NotificationCounter
+from models.user import User
+
+ADMINS = 20
+PAGE_SIZE = 50
+TYPES = ["email_verified", "waitlist_promoted", "role_changed", "account_deactivated"]
+
+
+def seed(users, notifications, hot_share, rng):
+    reset_database()
+    with SessionLocal() as db:
+        db.execute(insert(User), [
+            {"email": f"inbox{i}@example.com", "hashed_password": "x", "full_name": f"Inbox {i}",
+             "role": "SysAdmin" if i < ADMINS else "Startup", "status": "Active"}
+            for i in range(users)
+        ])
+        hot_user = ADMINS + 1
+        started_at = datetime.now(timezone.utc) - timedelta(days=365)
+        for start in range(0, notifications, 50000):
+            rows = []
+            for i in range(start, min(notifications, start + 50000)):
+                created_at = started_at + timedelta(seconds=i * 30)
+                rows.append({
+                    "recipient_id": hot_user if rng.random() < hot_share else rng.randint(1, users),
+                    "type": rng.choice(TYPES), "event_count": 1, "data": None,
+                    "created_at": created_at, "updated_at": created_at,
+                    "read_at": None if rng.random() < 0.3 else created_at,
+                })
+            db.execute(Notification.__table__.insert(), rows)
+        db.execute(text(
+            "INSERT INTO notification_counters (user_id, unread) "
+            "SELECT recipient_id, COUNT(*) FROM notifications WHERE read_at IS NULL GROUP BY recipient_id"
+        ))
+        db.commit()
+        db.execute(text("ANALYZE"))
+        return hot_user, db.scalar(select(func.count()).select_from(Notification).where(Notification.recipient_id == hot_user))
+
+
+async def timed(name, repeat, operation):
+    latencies = []
+    started = time.perf_counter()
+    for i in range(repeat):
+        call_started = time.perf_counter()
+        await operation(i)
+        latencies.append(time.perf_counter() - call_started)
+    return summarize(name, latencies, time.perf_counter() - started)
+
+
+async def main(users, notifications, hot_share, repeat):
+    rng = random.Random(17)
+    started = time.perf_counter()
+    hot_user, hot_rows = seed(users, notifications, hot_share, rng)
+    print(f"seeded {notifications} notifications ({hot_rows} in the measured inbox) in {time.perf_counter() - started:.1f} s\n")
+
+    try:
+        async with AsyncSessionLocal() as db:
+            deep = hot_rows // 2
+            cursor = (await db.execute(
+                select(Notification.id).where(Notification.recipient_id == hot_user)
+                .order_by(Notification.id.desc()).offset(deep).limit(1)
+            )).scalar_one()
+
+            async def offset_page(offset):
+                return (await db.scalars(
+                    select(Notification).where(Notification.recipient_id == hot_user)
+                    .order_by(Notification.id.desc()).offset(offset).limit(PAGE_SIZE)
+                )).all()
+
+            await timed("inbox first page (keyset)", repeat, lambda i: list_notifications(db, hot_user, limit=PAGE_SIZE))
+            await timed(f"page at row {deep} (keyset)", repeat, lambda i: list_notifications(db, hot_user, before=cursor, limit=PAGE_SIZE))
+            await timed(f"page at row {deep} (OFFSET)", max(1, repeat // 10), lambda i: offset_page(deep))
+            await timed("unread-only first page (keyset)", repeat, lambda i: list_notifications(db, hot_user, limit=PAGE_SIZE, unread_only=True))
+            await timed("unread count (counter)", repeat, lambda i: unread_count(db, hot_user))
+            await timed("unread count (COUNT(*))", max(1, repeat // 10), lambda i: db.scalar(
+                select(func.count()).select_from(Notification).where(Notification.recipient_id == hot_user, Notification.read_at.is_(None))
+            ))
+            assert await db.scalar(
+                select(func.count()).select_from(Notification).where(Notification.recipient_id == hot_user, Notification.read_at.is_(None))
+            ) == await unread_count(db, hot_user)
+            print()
+
+            started = time.perf_counter()
+            created = await write_notifications(db, [NotificationEvent("waitlist_promoted", recipient_ids=range(1, users + 1))])
+            await db.commit()
+            elapsed = time.perf_counter() - started
+            print(f"fan-out to {users} users: {created} rows in {elapsed:.2f} s ({created / elapsed:.0f} rows/s)")
+
+            burst = 1000
+            started = time.perf_counter()
+            created = await write_notifications(db, [
+                NotificationEvent("user_registered", recipient_role=UserRole.SYS_ADMIN, actor_id=ADMINS + 1 + i, data={"role": "Startup"})
+                for i in range(burst)
+            ])
+            created += await write_notifications(db, [ # A later flush folds into the same unread rows
+                NotificationEvent("user_registered", recipient_role=UserRole.SYS_ADMIN, actor_id=users - i, data={"role": "Startup"})
+                for i in range(burst)
+            ])
+            await db.commit()
+            elapsed = time.perf_counter() - started
+            event_counts = (await db.scalars(
+                select(Notification.event_count).where(Notification.type == "user_registered")
+            )).all()
+            print(f"{2 * burst} registrations x {ADMINS} admins: {created} rows created in {elapsed:.2f} s, "
+                  f"{len(event_counts)} unread rows with event_count {min(event_counts)}..{max(event_counts)}")
+
+            drift = (await db.execute(text(
+                "SELECT COUNT(*) FROM notification_counters c LEFT JOIN "
+                "(SELECT recipient_id, COUNT(*) AS unread FROM notifications WHERE read_at IS NULL GROUP BY recipient_id) n "
+                "ON n.recipient_id = c.user_id WHERE c.unread != COALESCE(n.unread, 0)"
+            ))).scalar_one()
+            counters = await db.scalar(select(func.count()).select_from(NotificationCounter))
+            print(f"unread counters checked against COUNT(*): {counters} users, {drift} mismatches")
+    finally:
+        await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--notifications", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--hot-share", type=float, default=0.2, help="Share of all notifications in the measured inbox")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(main(args.users, args.notifications, args.hot_share, args.repeat))
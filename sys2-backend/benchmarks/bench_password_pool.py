@@ -0,0 +1,45 @@
+"""Password verification throughput vs. hashing pool size.
+
+Fires concurrent `verify_password_async` calls (the CPU cost of a `/login`)
+against pools of 0..N worker processes and reports logins/sec overall and per
+worker. Pool size 0 is the inline threadpool fallback.
+
+    python -m benchmarks.bench_password_pool [--logins 64] [--max-workers 8]
+"""
+import argparse
+import asyncio
+import os
+import time
+
+import benchmarks.common  # noqa: F401 - prepares the benchmark environment
+
+from core.security import get_password_hash, init_password_hasher, shutdown_password_hasher, verify_password_async
+
+
+async def run(pool_size, logins, password, hashed):
+    init_password_hasher(max_workers=pool_size, max_pending=logins)
+    # Warm the workers so process start-up isn't counted
+    await asyncio.gather(*(verify_password_async(password, hashed) for _ in range(max(pool_size, 1))))
+    started = time.perf_counter()
+    results = await asyncio.gather(*(verify_password_async(password, hashed) for _ in range(logins)))
+    elapsed = time.perf_counter() - started
+    shutdown_password_hasher()
+    assert all(results)
+    return logins / elapsed
+
+
+async def main(logins, max_workers):
+    password = "benchmark-password"
+    hashed = get_password_hash(password)
+    print(f"{'pool size':>9}  {'logins/s':>9}  {'per worker':>10}")
+    for pool_size in range(0, max_workers + 1):
+        rate = await run(pool_size, logins, password, hashed)
+        print(f"{pool_size:>9}  {rate:>9.1f}  {rate / max(pool_size, 1):>10.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=64)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+    asyncio.run(main(args.logins, args.max_workers))
@@ -0,0 +1,73 @@
+"""Rate limiter overhead per request.
+
+Measures the cost of one limiter check in each backend across many distinct
+keys, and the end-to-end overhead of the dependency on a trivial endpoint.
+
+    python -m benchmarks.bench_rate_limit [--checks 200000] [--keys 50000] [--requests 3000]
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks.common import reset_database, run_concurrent, summarize
+
+import httpx
+from fastapi import Depends, FastAPI
+
+from core.rate_limit import DatabaseRateLimitBackend, MemoryRateLimitBackend, RateLimit, rate_limit, set_rate_limit_backend
+from database import async_engine
+
+RULES = (
+    RateLimit("bench:ip", limit=10**9, period=60, algorithm="token_bucket"),
+    RateLimit("bench:email", limit=10**9, period=60, key="email"),
+)
+
+
+async def bench_backend(name, backend, checks, keys):
+    started = time.perf_counter()
+    for i in range(checks):
+        now = time.time()
+        await backend.hit(f"bench:{i % keys}", RULES[i % 2], now)
+    elapsed = time.perf_counter() - started
+    print(f"{name:<10} {checks:>8} checks  {checks / elapsed:>10.0f} checks/s  {elapsed * 1e6 / checks:>7.2f} us/check")
+
+
+async def bench_endpoint(requests):
+    app = FastAPI()
+
+    @app.post("/plain")
+    async def plain():
+        return {}
+
+    @app.post("/limited", dependencies=[Depends(rate_limit(*RULES))])
+    async def limited():
+        return {}
+
+    set_rate_limit_backend(MemoryRateLimitBackend())
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        for path in ("/plain", "/limited"):
+            async def hit(i):
+                response = await client.post(path, json={"email": f"user{i}@example.com"})
+                response.raise_for_status()
+
+            latencies, elapsed = await run_concurrent(hit, 1, requests)
+            summarize(f"endpoint {path}", latencies, elapsed)
+
+
+async def main(checks, keys, requests):
+    reset_database()
+    memory = MemoryRateLimitBackend()
+    await bench_backend("memory", memory, checks, keys)
+    print(f"memory backend keys held: {len(memory)}")
+    await bench_backend("database", DatabaseRateLimitBackend(), max(checks // 100, 100), keys)
+    await bench_endpoint(requests)
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--checks", type=int, default=200000)
+    parser.add_argument("--keys", type=int, default=50000)
+    parser.add_argument("--requests", type=int, default=3000)
+    args = parser.parse_args()
+    asyncio.run(main(args.checks, args.keys, args.requests))
@@ -0,0 +1,205 @@
+"""Read throughput with 0..N read replicas, plus routing checks, on local SQLite stand-ins.
+
+The primary is the benchmark database. Each replica is a copy of it taken
+after seeding, i.e. a replica at zero lag. Rows written afterwards exist
+only on the primary, the same as a replica that hasn't replayed them yet.
+That makes routing observable.
+
+Checks (routing through database.RoutingSession):
+
+- a session that wrote reads its own write from the primary
+- a sticky client (recent write, core.db_routing) reads from the primary;
+  other clients read from a replica
+- a replica that fails its health check leaves the rotation, and reads
+  keep working
+
+Throughput: `--concurrency` workers run the /auth/login email lookup through
+routing sessions, with 0, 1, ... `--replicas` replicas. One writer updates
+rows on the primary at the same time. Each database gets a pool of
+DB_POOL_SIZE (default 4 here) connections and no overflow. A local file
+has no server behind it, so every lookup also waits `--server-ms` inside
+the database (a SQL function). That emulates the time a query occupies a
+connection on a real server. Throughput is then bounded by connections
+per database, as it is on a busy primary. With real servers, point
+DATABASE_URL and `--replica-url` at a primary and its replicas, and set
+`--server-ms 0`.
+
+    python -m benchmarks.bench_read_replicas [--replicas 3] [--concurrency 32] [--requests 3000] [--server-ms 5]
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import time
+
+os.environ.setdefault("DB_POOL_SIZE", "4")
+os.environ.setdefault("DB_MAX_OVERFLOW", "0")
+
+from benchmarks.common import BENCH_DB_PATH, percentile, reset_database, run_concurrent, summarize
+
+from prometheus_client import REGISTRY
+from sqlalchemy import event, func, insert, select, update
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from core.db_routing import RoutingState, _routing_state
+from database import (
+    ReplicaSet, RoutingSessionLocal, SessionLocal, async_engine, create_replica_set, engine, get_replica_set, set_replica_set,
+)
+from models.user import User, email_matches
+
+
+def seed(users):
+    reset_database()
+    with SessionLocal() as db:
+        db.execute(insert(User), [
+            {"email": f"reader{i}@example.com", "hashed_password": "x", "full_name": f"Reader {i}", "role": "Startup", "status": "Active"}
+            for i in range(users)
+        ])
+        db.commit()
+    engine.dispose()
+
+
+def replica_urls(count):
+    """Copies of the seeded primary file, one per replica."""
+    urls = []
+    for number in range(1, count + 1):
+        path = BENCH_DB_PATH.replace(".sqlite3", f"_replica{number}.sqlite3")
+        shutil.copyfile(BENCH_DB_PATH, path)
+        urls.append(f"sqlite:///{path}")
+    return urls
+
+
+def emulate_server_time(sync_engine):
+    @event.listens_for(sync_engine, "connect")
+    def _register(dbapi_connection, connection_record):
+        dbapi_connection.create_function("server_wait", 1, lambda ms: time.sleep(ms / 1000) or 0)
+
+
+def lookup(email, server_ms):
+    columns = [User.id, User.status] + ([func.server_wait(server_ms)] if server_ms else [])
+    return select(*columns).where(email_matches(email))
+
+
+async def routing_checks(server_ms):
+    failures = []
+
+    async with RoutingSessionLocal() as db:
+        found = await db.scalar(lookup("reader0@example.com", server_ms))
+        if found is None:
+            failures.append("seeded row not readable")
+        await db.execute(insert(User).values(email="fresh@example.com", hashed_password="x", role="Startup", status="Active"))
+        await db.commit()
+        if await db.scalar(lookup("fresh@example.com", server_ms)) is None:
+            failures.append("session did not read its own write")
+
+    async with RoutingSessionLocal() as db:
+        if await db.scalar(lookup("fresh@example.com", server_ms)) is not None:
+            failures.append("non-sticky read was served by the primary")
+
+    token = _routing_state.set(RoutingState(primary_until=time.time() + 10))
+    try:
+        async with RoutingSessionLocal() as db:
+            if await db.scalar(lookup("fresh@example.com", server_ms)) is None:
+                failures.append("sticky read was served by a replica")
+    finally:
+        _routing_state.reset(token)
+
+    replicas = get_replica_set()
+    broken = create_async_engine("sqlite+aiosqlite:////nonexistent-dir/replica.sqlite3")
+    mixed = ReplicaSet({**replicas.engines, "broken": broken}, replicas.max_lag_seconds)
+    set_replica_set(mixed)
+    try:
+        await mixed.check(timeout_seconds=2)
+        if mixed.engines["broken"] in mixed.in_rotation or len(mixed.in_rotation) != len(replicas.engines):
+            failures.append(f"health check left the rotation at {len(mixed.in_rotation)} replicas")
+        for _ in range(4):
+            async with RoutingSessionLocal() as db:
+                if await db.scalar(lookup("reader1@example.com", server_ms)) is None:
+                    failures.append("read failed with an unhealthy replica configured")
+                    break
+    finally:
+        set_replica_set(replicas)
+        await broken.dispose()
+
+    print(f"routing checks: {'ok' if not failures else 'FAILED: ' + '; '.join(failures)}")
+    return not failures
+
+
+def statements_by_engine():
+    return {
+        sample.labels["engine"]: sample.value
+        for metric in REGISTRY.collect() if metric.name == "db_query_seconds"
+        for sample in metric.samples if sample.name == "db_query_seconds_count" and sample.labels["statement"] == "SELECT"
+    }
+
+
+async def measure(replica_count, concurrency, total, users, server_ms):
+    done = False
+    write_latencies = []
+
+    async def writer():
+        i = 0
+        while not done:
+            started = time.perf_counter()
+            async with RoutingSessionLocal() as db:
+                await db.execute(update(User).where(User.id == i % users + 1).values(full_name=f"Writer {i}"))
+                await db.commit()
+            write_latencies.append(time.perf_counter() - started)
+            i += 1
+            await asyncio.sleep(0.01)
+
+    async def read(i):
+        async with RoutingSessionLocal() as db:
+            await db.scalar(lookup(f"reader{i % users}@example.com", server_ms))
+
+    before = statements_by_engine()
+    writer_task = asyncio.create_task(writer())
+    latencies, elapsed = await run_concurrent(read, concurrency, total)
+    done = True
+    await writer_task
+    after = statements_by_engine()
+
+    result = summarize(f"{replica_count} replica(s)", latencies, elapsed)
+    spread = {name: int(after[name] - before.get(name, 0)) for name in sorted(after) if after[name] - before.get(name, 0)}
+    print(f"    reads by engine {spread}; concurrent writes p50 {percentile(write_latencies, 50) * 1000:.1f} ms "
+          f"p99 {percentile(write_latencies, 99) * 1000:.1f} ms ({len(write_latencies)} writes)")
+    return result
+
+
+async def main(replicas, concurrency, total, users, server_ms, urls):
+    seed(users)
+    urls = urls or replica_urls(replicas)
+    full_set = create_replica_set(urls, max_lag_seconds=5)
+    if server_ms:
+        for sync_engine in [async_engine.sync_engine] + [replica.sync_engine for replica in full_set.engines.values()]:
+            emulate_server_time(sync_engine)
+    names = list(full_set.engines)
+
+    try:
+        set_replica_set(full_set)
+        ok = await routing_checks(server_ms)
+        print()
+
+        results = []
+        for count in range(len(names) + 1):
+            set_replica_set(ReplicaSet({name: full_set.engines[name] for name in names[:count]}, full_set.max_lag_seconds))
+            results.append(await measure(count, concurrency, total, users, server_ms))
+        print()
+        for count, result in enumerate(results):
+            print(f"{count} replica(s): {result['rps'] / results[0]['rps']:.2f}x primary-only read throughput")
+    finally:
+        await full_set.dispose()
+        await async_engine.dispose()
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--replicas", type=int, default=3, help="Local replica copies to create (ignored with --replica-url)")
+    parser.add_argument("--replica-url", action="append", help="Existing replica; repeat for several")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--server-ms", type=float, default=5, help="Emulated time each lookup occupies its connection")
+    args = parser.parse_args()
+    raise SystemExit(0 if asyncio.run(main(args.replicas, args.concurrency, args.requests, args.users, args.server_ms, args.replica_url)) else 1)
@@ -0,0 +1,89 @@
+"""Sustained refresh token rotation with a large number of live tokens.
+
+Pre-loads the revocation store with `--live` consumed token ids spread over
+the refresh token lifetime, then runs `--rotations` full rotations
+(decode -> family check -> consume -> issue new pair) and reports
+rotations/sec, per-check latency and the store's size.
+
+    python -m benchmarks.bench_refresh_tokens [--store memory|database] [--live 300000] [--rotations 20000]
+"""
+import argparse
+import asyncio
+import time
+import tracemalloc
+import uuid
+
+from benchmarks.common import percentile, reset_database
+
+from sqlalchemy import insert
+
+from core.security import REFRESH_TOKEN_EXPIRE_DAYS, create_refresh_token, decode_refresh_token
+from core.token_store import DatabaseRefreshTokenStore, MemoryRefreshTokenStore
+from database import AsyncSessionLocal, async_engine
+from models.refresh_token_revocation import RefreshTokenRevocation
+
+LIFETIME_SECONDS = REFRESH_TOKEN_EXPIRE_DAYS * 24 * 3600
+
+
+async def preload(store, db, live):
+    now = time.time()
+    if isinstance(store, MemoryRefreshTokenStore):
+        for i in range(live):
+            await store.consume(db, uuid.uuid4().hex, now + (i % LIFETIME_SECONDS))
+        return
+    from datetime import datetime, timezone
+    rows = [
+        {"token_id": uuid.uuid4().hex, "kind": "jti", "expires_at": datetime.fromtimestamp(now + (i % LIFETIME_SECONDS), timezone.utc)}
+        for i in range(live)
+    ]
+    for start in range(0, len(rows), 10000):
+        await db.execute(insert(RefreshTokenRevocation), rows[start:start + 10000])
+    await db.commit()
+
+
+async def rotate_chain(store, db, rotations):
+    token = create_refresh_token({"sub": "bench@example.com", "scope": "refresh"})
+    check_latencies = []
+    started = time.perf_counter()
+    for _ in range(rotations):
+        claims = decode_refresh_token(token)
+        check_started = time.perf_counter()
+        revoked = await store.is_family_revoked(db, claims["fid"])
+        fresh = await store.consume(db, claims["jti"], claims["exp"])
+        check_latencies.append(time.perf_counter() - check_started)
+        assert fresh and not revoked
+        await db.commit()
+        token = create_refresh_token({"sub": claims["sub"], "scope": "refresh"}, family_id=claims["fid"])
+    return check_latencies, time.perf_counter() - started
+
+
+async def main(store_name, live, rotations):
+    reset_database()
+    store = MemoryRefreshTokenStore() if store_name == "memory" else DatabaseRefreshTokenStore()
+    async with AsyncSessionLocal() as db:
+        tracemalloc.start()
+        preload_started = time.perf_counter()
+        await preload(store, db, live)
+        preload_elapsed = time.perf_counter() - preload_started
+        memory_bytes, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        latencies, elapsed = await rotate_chain(store, db, rotations)
+
+    print(f"store={store_name} live tokens={live} preload {preload_elapsed:.1f}s")
+    if store_name == "memory":
+        print(f"store entries {len(store)}  ~{memory_bytes / 1e6:.1f} MB ({memory_bytes / max(live, 1):.0f} B/token)")
+    print(
+        f"{rotations} rotations  {rotations / elapsed:.0f} rotations/s  "
+        f"store check p50 {percentile(latencies, 50) * 1e6:.1f} us  p99 {percentile(latencies, 99) * 1e6:.1f} us"
+    )
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--store", choices=("memory", "database"), default="memory")
+    parser.add_argument("--live", type=int, default=300000)
+    parser.add_argument("--rotations", type=int, default=20000)
+    args = parser.parse_args()
+    asyncio.run(main(args.store, args.live, args.rotations))
@@ -0,0 +1,90 @@
+"""Registration insert throughput under contention: pre-check + INSERT + refresh vs one upsert.
+
+The upsert mirrors routers/auth.register_user: one INSERT ... ON CONFLICT DO
+NOTHING RETURNING with the referrer resolved by a subquery in the same
+statement (every attempt names user0@example.com as its referrer).
+
+Workers register emails drawn from a pool smaller than the number of attempts,
+so many registrations race on the same address (in varying case). Password
+hashing and the verification email are left out to isolate the DB work.
+"Errors" counts IntegrityErrors (and, on SQLite, lock-upgrade failures of the
+read-then-write path) that would have surfaced as a 500.
+
+    python -m benchmarks.bench_registration [--concurrency 10] [--requests 600] [--emails 200]
+"""
+import argparse
+import asyncio
+
+from benchmarks.common import reset_database, run_concurrent, summarize
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+from database import AsyncSessionLocal, async_engine
+from models.user import User, email_matches
+
+CASINGS = (str.lower, str.upper, str.title)
+REFERRER = "user0@example.com"
+
+
+def email_for(i, pool):
+    return CASINGS[(i // pool) % len(CASINGS)](f"user{i % pool}@example.com")
+
+
+async def register_legacy(email, outcome):
+    async with AsyncSessionLocal() as db:
+        if await db.scalar(select(User).where(User.email == email)):
+            outcome["duplicate"] += 1
+            return
+        user = User(email=email, hashed_password="x", role="Startup", status="Waitlisted")
+        db.add(user)
+        await db.commit()
+        await db.refresh(user)
+        outcome["created"] += 1
+
+
+async def register_upsert(email, outcome):
+    async with AsyncSessionLocal() as db:
+        user = await db.scalar(
+            insert(User).values(
+                email=email, hashed_password="x", role="Startup", status="Waitlisted",
+                referred_by_id=select(User.id).where(email_matches(REFERRER)).scalar_subquery(),
+            )
+            .on_conflict_do_nothing(index_elements=[func.lower(User.email)])
+            .returning(User)
+        )
+        if user is None:
+            outcome["duplicate"] += 1
+            return
+        await db.commit()
+        outcome["created"] += 1
+
+
+async def main(concurrency, total, pool):
+    for name, register in (("pre-check + insert + refresh", register_legacy), ("insert on conflict returning", register_upsert)):
+        reset_database()
+        outcome = {"created": 0, "duplicate": 0, "errors": 0}
+
+        async def attempt(i):
+            try:
+                await register(email_for(i, pool), outcome)
+            except (IntegrityError, OperationalError):
+                outcome["errors"] += 1
+
+        latencies, elapsed = await run_concurrent(attempt, concurrency, total)
+        summarize(name, latencies, elapsed)
+        async with AsyncSessionLocal() as db:
+            accounts = await db.scalar(select(func.count(User.id)))
+            case_dupes = await db.scalar(select(func.count(User.id)).where(email_matches("user0@example.com")))
+        print(f"    {outcome}  accounts={accounts}  rows for user0@example.com={case_dupes}")
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--requests", type=int, default=600)
+    parser.add_argument("--emails", type=int, default=200, help="distinct addresses (before case variants)")
+    args = parser.parse_args()
+    asyncio.run(main(args.concurrency, args.requests, args.emails))
@@ -0,0 +1,179 @@
+"""Profile search: in-process index vs PostgreSQL full text, vs an ILIKE scan.
+
+Seeds `--users` profiles (default 1M) with generated names, companies and
+skill tags, then times queries of each kind, one at a time:
+
+- name: a user's first and last name
+- prefix: the first 3 letters of a last name (type-ahead)
+- name+company: a first name and a word of a company name
+- skill: one tag
+- typo: a last name with two letters swapped (the fuzzy fallback)
+- filtered: a prefix among Active users only; the in-process backend
+  over-fetches and checks the hits in SQL
+
+The in-process backend (core.text_index) always runs, including its build
+time and the cost of incremental updates. The PostgreSQL backend runs when
+DATABASE_URL points at PostgreSQL (pg_trgm is created if missing), and
+then also reports how far the two backends' top 20 overlap. The baseline is
+`full_name ILIKE '%term%'`, the full scan the indexes replace.
+
+    DATABASE_URL=postgresql://... python -m benchmarks.bench_search [--users 1000000] [--queries 200] [--baseline-queries 10]
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from benchmarks.common import percentile, reset_database
+
+from sqlalchemy import insert, select, text
+
+from core.enums import UserRole, UserStatus
+from core.search import InMemorySearchBackend, PostgresSearchBackend
+from database import AsyncSessionLocal, async_engine, engine
+from models.company import Company
+from models.user import User
+
+SYLLABLES = ["an", "bel", "car", "da", "el", "fer", "gio", "ha", "is", "jo", "ka", "li", "mar", "no", "or", "pe", "qui", "ra", "so", "ta", "ul", "vi", "wen", "xa", "yo", "zel"]
+COMPANY_SUFFIXES = ["Labs", "Systems", "Robotics", "Studio", "Ventures", "Health", "Energy", "Analytics"]
+SKILLS = [
+    "python", "rust", "go", "typescript", "react", "django", "fastapi", "postgres", "kubernetes", "terraform",
+    "pytorch", "tensorflow", "figma", "marketing", "sales", "fundraising", "hardware", "embedded", "biotech", "fintech",
+    "climate", "logistics", "edtech", "security", "devops", "design", "product", "growth", "legal", "finance",
+]
+KINDS = ("name", "prefix", "name+company", "skill", "typo", "filtered")
+
+
+def make_names(rng, count, syllables):
+    names = set()
+    while len(names) < count:
+        names.add("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(*syllables))).capitalize())
+    return sorted(names)
+
+
+def seed(users, companies, chunk=50_000):
+    if engine.dialect.name == "postgresql":
+        with engine.begin() as connection:
+            connection.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    reset_database()
+    rng = random.Random(42)
+    first_names = make_names(rng, 800, (2, 3))
+    last_names = make_names(rng, 20_000, (2, 4))
+    company_words = make_names(rng, companies, (2, 3))
+    statuses = [UserStatus.ACTIVE, UserStatus.ACTIVE_WAITLIST, UserStatus.WAITLISTED, UserStatus.INACTIVE]
+    profiles = []
+    with engine.begin() as connection:
+        connection.execute(insert(Company), [
+            {"id": i + 1, "name": f"{word} {rng.choice(COMPANY_SUFFIXES)}"} for i, word in enumerate(company_words)
+        ])
+        for offset in range(0, users, chunk):
+            rows = []
+            for i in range(offset, min(offset + chunk, users)):
+                first, last = rng.choice(first_names), rng.choice(last_names)
+                company_id = rng.randint(1, companies) if rng.random() < 0.6 else None
+                skills = rng.sample(SKILLS, rng.randint(1, 5))
+                rows.append({
+                    "email": f"user{i}@example.com", "hashed_password": "x", "full_name": f"{first} {last}",
+                    "role": UserRole.STARTUP, "status": rng.choices(statuses, (30, 40, 25, 5))[0],
+                    "company_id": company_id, "skills_tags": skills, "tools_technologies_tags": None, "industry_focus_tags": None,
+                })
+                if len(profiles) < 10_000:
+                    profiles.append((first, last, company_id, skills))
+            connection.execute(insert(User), rows)
+        connection.execute(text("ANALYZE users" if engine.dialect.name == "postgresql" else "ANALYZE"))
+    return profiles, {i + 1: word for i, word in enumerate(company_words)}
+
+
+def make_queries(profiles, company_words, count):
+    rng = random.Random(7)
+    queries = {kind: [] for kind in KINDS}
+    for _ in range(count):
+        first, last, company_id, skills = rng.choice(profiles)
+        queries["name"].append(f"{first} {last}")
+        queries["prefix"].append(last[:3])
+        company = company_words.get(company_id) or company_words[rng.randint(1, len(company_words))]
+        queries["name+company"].append(f"{first} {company}")
+        queries["skill"].append(rng.choice(skills))
+        i = rng.randrange(len(last) - 1)
+        queries["typo"].append(last[:i] + last[i + 1] + last[i] + last[i + 2:])
+        queries["filtered"].append(last[:3])
+    return queries
+
+
+async def time_backend(name, backend, queries, limit=20):
+    results = {}
+    empty = 0
+    async with AsyncSessionLocal() as db:
+        for kind in KINDS:
+            conditions = [User.status == UserStatus.ACTIVE] if kind == "filtered" else []
+            latencies = []
+            for query in queries[kind]:
+                started = time.perf_counter()
+                hits = await backend.search(db, query, limit, conditions)
+                latencies.append(time.perf_counter() - started)
+                results[kind, query] = [user_id for user_id, _ in hits]
+                empty += not hits and kind in ("name", "prefix", "typo")
+            print(f"{name:<9} {kind:<13} p50 {percentile(latencies, 50) * 1000:>8.2f} ms  p99 {percentile(latencies, 99) * 1000:>8.2f} ms")
+    if empty:
+        print(f"{name}: {empty} name/prefix/typo queries found nobody")
+    return results, not empty
+
+
+def time_updates(index, count):
+    rng = random.Random(3)
+    latencies = []
+    for _ in range(count):
+        user_id = rng.randint(1, len(index))
+        started = time.perf_counter()
+        index.add(user_id, f"Renamed Person{rng.randrange(1000)}", ["python", "climate"], None)
+        latencies.append(time.perf_counter() - started)
+    print(f"memory    update        p50 {percentile(latencies, 50) * 1e6:>8.1f} us  p99 {percentile(latencies, 99) * 1e6:>8.1f} us")
+
+
+async def time_baseline(queries, count):
+    latencies = []
+    async with AsyncSessionLocal() as db:
+        for query in queries["prefix"][:count]:
+            started = time.perf_counter()
+            await db.execute(select(User.id).where(User.full_name.ilike(f"%{query}%")).limit(20))
+            latencies.append(time.perf_counter() - started)
+    print(f"baseline  ILIKE scan    p50 {percentile(latencies, 50) * 1000:>8.2f} ms  p99 {percentile(latencies, 99) * 1000:>8.2f} ms")
+
+
+async def main(users, companies, query_count, baseline_count):
+    started = time.perf_counter()
+    profiles, company_words = seed(users, companies)
+    print(f"seeded {users} profiles, {companies} companies in {time.perf_counter() - started:.1f} s")
+    queries = make_queries(profiles, company_words, query_count)
+
+    memory = InMemorySearchBackend(refresh_seconds=3600)
+    started = time.perf_counter()
+    async with AsyncSessionLocal() as db:
+        index = await memory.get_index(db)
+    print(f"memory    build         {len(index)} profiles in {time.perf_counter() - started:.1f} s")
+    memory_results, ok = await time_backend("memory", memory, queries)
+
+    if engine.dialect.name == "postgresql":
+        postgres_results, postgres_ok = await time_backend("postgres", PostgresSearchBackend(), queries)
+        ok = ok and postgres_ok
+        for kind in KINDS:
+            overlaps = [
+                len(set(memory_results[kind, query]) & set(postgres_results[kind, query])) / max(len(memory_results[kind, query]), 1)
+                for query in queries[kind]
+            ]
+            print(f"top-20 overlap, {kind:<13} {sum(overlaps) / len(overlaps):.0%}")
+
+    await time_baseline(queries, baseline_count)
+    time_updates(index, 1000)
+    await async_engine.dispose()
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--companies", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=200, help="Queries per kind")
+    parser.add_argument("--baseline-queries", type=int, default=10)
+    args = parser.parse_args()
+    raise SystemExit(0 if asyncio.run(main(args.users, args.companies, args.queries, args.baseline_queries)) else 1)
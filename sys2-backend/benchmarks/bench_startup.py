@@ -0,0 +1,142 @@
+"""Cold start: import-time profile of `main` and time to first request, with budgets.
+
+For each of `--runs` fresh interpreters:
+
+- `python -X importtime -c "import main"`: total import time, plus the
+  slowest modules (cumulative) and the self time per top-level package
+- uvicorn serving main:app: time from process start until GET `--path`
+  answers 200 (what a readiness probe waits for), then the latency of the
+  first request to a few routes whose routers load on first use
+
+Medians are checked against `--import-budget-ms` and `--ttfr-budget-ms`; the
+script exits with status 1 when either is exceeded, so it can gate CI.
+Bytecode is compiled first, as in a built image.
+
+    python -m benchmarks.bench_startup [--runs 5] [--ttfr-budget-ms 900] [--import-budget-ms 600]
+"""
+import argparse
+import compileall
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+from benchmarks.common import BENCH_DB_PATH, reset_database
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+FIRST_USE_PATHS = ["/auth/me", "/notifications/unread-count", "/health/db"]
+
+
+def server_env():
+    return dict(os.environ, DATABASE_URL=f"sqlite:///{BENCH_DB_PATH}", EMAIL_TRANSPORT="memory", LOG_LEVEL="WARNING")
+
+
+def import_profile():
+    """Returns (total_ms, [(cumulative_ms, module)], {package: self_ms}) for one `import main`."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=BACKEND_DIR, env=server_env(), capture_output=True, text=True, check=True,
+    )
+    modules, packages = [], defaultdict(float)
+    total_ms = 0.0
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match is None:
+            continue
+        self_us, cumulative_us, indent, module = int(match[1]), int(match[2]), len(match[3]), match[4]
+        modules.append((cumulative_us / 1000, module))
+        packages[module.split(".")[0]] += self_us / 1000
+        if module == "main" and indent == 1:
+            total_ms = cumulative_us / 1000
+    return total_ms, sorted(modules, reverse=True), packages
+
+
+def time_to_first_request(port, path):
+    """Seconds from spawning uvicorn until `path` answers 200, and first-hit latency of FIRST_USE_PATHS."""
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=server_env(),
+    )
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=10) as client:
+            while True:
+                try:
+                    if client.get(path).status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                if time.perf_counter() - started > 60 or server.poll() is not None:
+                    raise RuntimeError("Server did not come up")
+                time.sleep(0.005)
+            ttfr = time.perf_counter() - started
+            first_use = {}
+            for first_use_path in FIRST_USE_PATHS:
+                request_started = time.perf_counter()
+                client.get(first_use_path)
+                first_use[first_use_path] = time.perf_counter() - request_started
+        return ttfr, first_use
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def main(runs, port, path, ttfr_budget_ms, import_budget_ms, top):
+    compileall.compile_dir(BACKEND_DIR, quiet=1)
+    reset_database()
+
+    import_totals, profiles = [], []
+    for _ in range(runs):
+        total_ms, modules, packages = import_profile()
+        import_totals.append(total_ms)
+        profiles.append((total_ms, modules, packages))
+    _, modules, packages = sorted(profiles, key=lambda profile: profile[0])[len(profiles) // 2]
+
+    print(f"import main: median {statistics.median(import_totals):.0f} ms (runs: {', '.join(f'{t:.0f}' for t in import_totals)})")
+    print("\nslowest imports (cumulative, median run):")
+    for cumulative_ms, module in modules[1:top + 1]:
+        print(f"  {cumulative_ms:8.1f} ms  {module}")
+    print("\nself time by top-level package:")
+    for package, self_ms in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]:
+        print(f"  {self_ms:8.1f} ms  {package}")
+
+    ttfrs, first_uses = [], defaultdict(list)
+    for _ in range(runs):
+        ttfr, first_use = time_to_first_request(port, path)
+        ttfrs.append(ttfr * 1000)
+        for first_use_path, seconds in first_use.items():
+            first_uses[first_use_path].append(seconds * 1000)
+    print(f"\ntime to first request (GET {path}): median {statistics.median(ttfrs):.0f} ms "
+          f"(runs: {', '.join(f'{t:.0f}' for t in ttfrs)})")
+    for first_use_path, latencies in first_uses.items():
+        print(f"  first GET {first_use_path:<28} median {statistics.median(latencies):6.1f} ms")
+
+    failures = []
+    if statistics.median(import_totals) > import_budget_ms:
+        failures.append(f"import main {statistics.median(import_totals):.0f} ms > budget {import_budget_ms} ms")
+    if statistics.median(ttfrs) > ttfr_budget_ms:
+        failures.append(f"time to first request {statistics.median(ttfrs):.0f} ms > budget {ttfr_budget_ms} ms")
+    print()
+    for failure in failures:
+        print(f"OVER BUDGET: {failure}")
+    if not failures:
+        print(f"within budget (import {import_budget_ms} ms, first request {ttfr_budget_ms} ms)")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--path", default="/", help="Readiness path polled until it answers 200")
+    parser.add_argument("--ttfr-budget-ms", type=float, default=900)
+    parser.add_argument("--import-budget-ms", type=float, default=600)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+    sys.exit(main(args.runs, args.port, args.path, args.ttfr_budget_ms, args.import_budget_ms, args.top))
@@ -0,0 +1,125 @@
+"""Hot users queries on a synthetic table, without and with the role/status indexes.
+
+Seeds `--users` rows (default 1M) with a realistic role/status mix, then
+times each query with the partial/composite indexes from models.user
+dropped and again with them created, printing the EXPLAIN plan for each so
+index use is verified rather than assumed. On PostgreSQL the plan comes
+from EXPLAIN ANALYZE; on SQLite from EXPLAIN QUERY PLAN.
+
+    python -m benchmarks.bench_user_indexes [--users 1000000] [--repeat 20]
+"""
+import argparse
+import random
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+
+from benchmarks.common import reset_database
+
+from sqlalchemy import func, insert, select, text
+
+from core.enums import UserRole, UserStatus
+from database import engine
+from models.user import IS_ACTIVE, IS_WAITLISTED, User
+
+BENCH_INDEXES = ("ix_users_waitlist_role_created", "ix_users_active_role", "ix_users_status_role")
+
+# (weight, role, status); most users sit on the waitlist during the pilot
+MIX = [
+    (40, UserRole.STARTUP, UserStatus.ACTIVE_WAITLIST),
+    (15, UserRole.STARTUP, UserStatus.WAITLISTED),
+    (20, UserRole.FREELANCER, UserStatus.ACTIVE_WAITLIST),
+    (5, UserRole.FREELANCER, UserStatus.WAITLISTED),
+    (8, UserRole.STARTUP, UserStatus.ACTIVE),
+    (4, UserRole.FREELANCER, UserStatus.ACTIVE),
+    (3, UserRole.CORPORATE, UserStatus.ACTIVE_PENDING),
+    (1, UserRole.CORPORATE, UserStatus.ACTIVE),
+    (4, UserRole.STARTUP, UserStatus.INACTIVE),
+]
+
+QUERIES = {
+    "waitlisted startups, oldest 50": (
+        select(User.id, User.email)
+        .where(User.role == UserRole.STARTUP, IS_WAITLISTED)
+        .order_by(User.created_at)
+        .limit(50)
+    ),
+    "active users per role": (
+        select(User.role, func.count()).where(IS_ACTIVE).group_by(User.role)
+    ),
+    "users per status and role": (
+        select(User.status, User.role, func.count()).group_by(User.status, User.role)
+    ),
+}
+
+
+def seed(users, chunk=50_000):
+    reset_database()
+    weights, combos = zip(*((weight, (role, status)) for weight, role, status in MIX))
+    rng = random.Random(42)
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    with engine.begin() as connection:
+        for offset in range(0, users, chunk):
+            rows = []
+            for i in range(offset, min(offset + chunk, users)):
+                role, status = rng.choices(combos, weights)[0]
+                rows.append({
+                    "email": f"user{i}@example.com", "hashed_password": "x", "role": role, "status": status,
+                    "created_at": start + timedelta(seconds=rng.randrange(300 * 86400)),
+                })
+            connection.execute(insert(User), rows)
+        if engine.dialect.name == "postgresql":
+            connection.execute(text("ANALYZE users"))
+        else:
+            connection.execute(text("ANALYZE"))
+
+
+def set_indexes(enabled):
+    indexes = [index for index in User.__table__.indexes if index.name in BENCH_INDEXES]
+    with engine.begin() as connection:
+        for index in indexes:
+            connection.execute(text(f"DROP INDEX IF EXISTS {index.name}"))
+            if enabled:
+                index.create(connection)
+        connection.execute(text("ANALYZE users" if engine.dialect.name == "postgresql" else "ANALYZE"))
+
+
+def explain(connection, query):
+    compiled = query.compile(engine, compile_kwargs={"literal_binds": True})
+    if engine.dialect.name == "postgresql":
+        rows = connection.execute(text(f"EXPLAIN (ANALYZE, BUFFERS) {compiled}")).scalars().all()
+    else:
+        rows = [row[-1] for row in connection.execute(text(f"EXPLAIN QUERY PLAN {compiled}"))]
+    return rows
+
+
+def time_query(connection, query, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        connection.execute(query).all()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples) * 1000
+
+
+def main(users, repeat):
+    started = time.perf_counter()
+    seed(users)
+    print(f"seeded {users} users in {time.perf_counter() - started:.1f} s ({engine.dialect.name})\n")
+    for enabled in (False, True):
+        set_indexes(enabled)
+        print(f"=== role/status indexes {'on' if enabled else 'off'} ===")
+        with engine.connect() as connection:
+            for name, query in QUERIES.items():
+                print(f"{name:<34} median {time_query(connection, query, repeat):>9.2f} ms")
+                for line in explain(connection, query):
+                    print(f"    {line}")
+        print()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    main(args.users, args.repeat)
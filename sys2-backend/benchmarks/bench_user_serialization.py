@@ -0,0 +1,131 @@
+"""Serializing 10k users per response: the old schema path against the new ones.
+
+Seeds `--users` users and requests them all in one response, `--repeat`
+times per variant, in process over httpx's ASGI transport:
+
+- before: ORM objects through response_model=List[...] of the previous
+  User schema (EmailStr, the is_active/is_superuser fields the model lacks),
+  encoded by FastAPI's JSONResponse (jsonable_encoder + json.dumps)
+- schema + orjson: the same ORM objects through the current schemas.user.User
+  and ORJSONResponse, the app's default response class
+- rows -> orjson: GET /admin/users, which selects the schema's columns and
+  encodes the rows directly (core.serialization.RowsResponse)
+
+The three payloads are checked against each other (minus the two fields that
+were dropped) before timing.
+
+    python -m benchmarks.bench_user_serialization [--users 10000] [--repeat 20]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import time
+from typing import List, Optional
+
+from benchmarks.common import reset_database, summarize
+
+import httpx
+from fastapi import Depends, FastAPI
+from fastapi.responses import JSONResponse, ORJSONResponse
+from pydantic import BaseModel, ConfigDict, EmailStr
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.dependencies import get_current_sys_admin
+from core.enums import UserRole, UserStatus
+from database import SessionLocal, async_engine, get_async_db
+from main import create_app
+from models.user import User
+from schemas import user as user_schemas
+
+
+class LegacyUser(BaseModel):
+    """schemas.user.User as it was before the serialization work."""
+    model_config = ConfigDict(from_attributes=True) # Was `class Config: orm_mode = True`
+
+    email: EmailStr
+    is_active: bool = True
+    is_superuser: bool = False
+    full_name: Optional[str] = None
+    id: int
+    role: UserRole
+    status: UserStatus
+
+
+def seed(users):
+    reset_database()
+    with SessionLocal() as db:
+        db.execute(insert(User), [
+            {"email": f"member{i}@example.com", "hashed_password": "x", "full_name": f"Member {i}",
+             "role": "Startup" if i % 3 else "Freelancer", "status": "Active", "space_id": None}
+            for i in range(users)
+        ])
+        db.commit()
+
+
+def orm_app(schema, response_class):
+    app = FastAPI(default_response_class=response_class)
+
+    @app.get("/admin/users", response_model=List[schema])
+    async def list_users(db: AsyncSession = Depends(get_async_db)):
+        return (await db.scalars(select(User).order_by(User.id))).all()
+
+    return app
+
+
+def fast_app():
+    app = create_app()
+    logging.getLogger("httpx").setLevel(logging.WARNING) # create_app configured INFO logging; one line per request otherwise
+    app.dependency_overrides[get_current_sys_admin] = lambda: None
+    return app
+
+
+async def fetch(app, users):
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        response = await client.get("/admin/users", params={"limit": users} if users else None)
+        response.raise_for_status()
+        return response
+
+
+async def main(users, repeat):
+    seed(users)
+    variants = [
+        ("before (EmailStr, JSONResponse)", orm_app(LegacyUser, JSONResponse), None),
+        ("schema + orjson", orm_app(user_schemas.User, ORJSONResponse), None),
+        ("rows -> orjson (/admin/users)", fast_app(), users),
+    ]
+    try:
+        payloads = []
+        for name, app, limit in variants:
+            body = (await fetch(app, limit)).json()
+            payloads.append(body["users"] if isinstance(body, dict) else body)
+        legacy = [{k: v for k, v in row.items() if k not in ("is_active", "is_superuser")} for row in payloads[0]]
+        assert len(legacy) == users, f"expected {users} users, got {len(legacy)}"
+        assert payloads[1] == payloads[2], "schema and rows paths disagree"
+        assert all(row.items() <= new.items() for row, new in zip(legacy, payloads[1])), "old and new payloads disagree"
+        print(f"{users} users per response; payloads match ({len(json.dumps(payloads[2])) / 1024:.0f} KiB)\n")
+
+        results = []
+        for name, app, limit in variants:
+            latencies = []
+            started = time.perf_counter()
+            for _ in range(repeat):
+                call_started = time.perf_counter()
+                await fetch(app, limit)
+                latencies.append(time.perf_counter() - call_started)
+            results.append(summarize(name, latencies, time.perf_counter() - started))
+        baseline = results[0]["p50_ms"]
+        print()
+        for result in results[1:]:
+            print(f"{result['name']:<32} {baseline / result['p50_ms']:.1f}x faster than before (p50)")
+    finally:
+        await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.users, args.repeat))
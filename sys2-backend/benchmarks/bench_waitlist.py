@@ -0,0 +1,175 @@
+"""Waitlist: ranked pages from the queue index vs sorting the table, and batch promotion.
+
+Seeds `--users` waitlisted users with spread-out signup dates, a mix of
+verified/unverified, referrals and partly filled profiles, queued by
+models.user.waitlist_queue_key. Then:
+
+- Ranked pages at increasing depth: keyset over ix_users_waitlist_queue
+  (list_waitlist) vs. scoring and sorting every waitlisted row in Python
+  per page, the approach without a stored queue position. OFFSET paging
+  over the index is shown too; its cost grows with the depth.
+- Incremental requeue: verifying users through the ORM, which recomputes
+  only their own queue position.
+- Promotion: promote_next() into a space with `--capacity` free
+  workstations, in batches of `--batch`. Checks that the promoted users are
+  exactly the head of the verified queue, and that no more are promoted than
+  there are workstations.
+
+    python -m benchmarks.bench_waitlist [--users 200000] [--pages 200] [--capacity 5000] [--batch 500]
+"""
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+from benchmarks.common import percentile, reset_database
+
+from sqlalchemy import func, insert, select
+
+from core.enums import UserStatus
+from core.waitlist import list_waitlist, promote_next
+from database import AsyncSessionLocal, SessionLocal, async_engine
+from models.email_outbox import EmailOutbox
+from models.space import Space
+from models.user import IS_VERIFIED_WAITLIST, IS_WAITLISTED, User, waitlist_bonus_days, waitlist_queue_key
+
+PAGE_SIZE = 50
+DEPTHS = (0, 1000, 10000, 100000)
+
+
+def seed(users, capacity):
+    reset_database()
+    rng = random.Random(42)
+    now = datetime.now(timezone.utc)
+    with SessionLocal() as db:
+        db.add(Space(id=1, name="Munich", workstation_capacity=capacity))
+        rows = []
+        for i in range(users):
+            created_at = now - timedelta(seconds=rng.randrange(365 * 24 * 3600))
+            status = UserStatus.ACTIVE_WAITLIST if rng.random() < 0.6 else UserStatus.WAITLISTED
+            referral_count = rng.choice((0, 0, 0, 1, 2, 7))
+            profile = {name: ("filled" if rng.random() < 0.5 else None) for name in ("short_bio", "project_interests_goals")}
+            rows.append({
+                "email": f"waiting{i}@example.com", "hashed_password": "x", "full_name": f"Waiting {i}",
+                "role": "Startup", "status": status, "referral_count": referral_count, "created_at": created_at,
+                "waitlist_queued_at": waitlist_queue_key(created_at, status, referral_count, profile),
+                "short_bio": profile["short_bio"], "project_interests_goals": profile["project_interests_goals"],
+            })
+            if len(rows) == 10000:
+                db.execute(insert(User), rows)
+                rows = []
+        if rows:
+            db.execute(insert(User), rows)
+        db.commit()
+
+
+async def page_keyset(db, depth, cursors):
+    after = cursors.get(depth)
+    return await list_waitlist(db, after=after, limit=PAGE_SIZE, columns=[User.id, User.waitlist_queued_at])
+
+
+async def page_offset(db, depth, cursors):
+    return (await db.execute(
+        select(User.id).where(IS_WAITLISTED).order_by(User.waitlist_queued_at, User.id).offset(depth).limit(PAGE_SIZE)
+    )).all()
+
+
+async def page_sorted_in_python(db, depth, cursors):
+    rows = (await db.execute(
+        select(User.id, User.status, User.created_at, User.referral_count, User.short_bio, User.project_interests_goals).where(IS_WAITLISTED)
+    )).all()
+    now = datetime.now(timezone.utc)
+
+    def score(row): # Days waited plus bonus days, computed fresh for every row
+        created_at = row.created_at if row.created_at.tzinfo else row.created_at.replace(tzinfo=timezone.utc)
+        return (now - created_at).total_seconds() / 86400 + waitlist_bonus_days(row.status, row.referral_count, row._mapping)
+
+    ranked = sorted(rows, key=lambda row: (-score(row), row.id))
+    return ranked[depth:depth + PAGE_SIZE]
+
+
+async def ranked_pages(pages, users):
+    depths = [depth for depth in DEPTHS if depth < users]
+    async with AsyncSessionLocal() as db:
+        # Cursor of the row just before each depth, as a client paging through would hold it
+        cursors = {}
+        for depth in depths:
+            if depth:
+                row = (await db.execute(
+                    select(User.waitlist_queued_at, User.id).where(IS_WAITLISTED)
+                    .order_by(User.waitlist_queued_at, User.id).offset(depth - 1).limit(1)
+                )).one()
+                cursors[depth] = (row.waitlist_queued_at, row.id)
+        first_keyset = [row.id for row in await page_keyset(db, 0, cursors)]
+        first_sorted = [row.id for row in await page_sorted_in_python(db, 0, cursors)]
+        print(f"first page agrees with a full sort: {'ok' if first_keyset == first_sorted else 'MISMATCH'}")
+
+        for name, fetch, repeat in (
+            ("keyset (queue index)", page_keyset, pages),
+            ("OFFSET (queue index)", page_offset, max(pages // 10, 5)),
+            ("sort all rows in Python", page_sorted_in_python, 5),
+        ):
+            for depth in depths:
+                latencies = []
+                for _ in range(repeat):
+                    started = time.perf_counter()
+                    await fetch(db, depth, cursors)
+                    latencies.append(time.perf_counter() - started)
+                print(f"{name:<26} depth {depth:>7}  p50 {percentile(latencies, 50) * 1000:>8.2f} ms  p99 {percentile(latencies, 99) * 1000:>8.2f} ms")
+    return first_keyset == first_sorted
+
+
+async def requeue_on_verify(count):
+    async with AsyncSessionLocal() as db:
+        users = (await db.scalars(select(User).where(User.status == UserStatus.WAITLISTED).limit(count))).all()
+        started = time.perf_counter()
+        for user in users:
+            user.status = UserStatus.ACTIVE_WAITLIST # before_update recomputes this user's queue position only
+        await db.commit()
+        elapsed = time.perf_counter() - started
+    print(f"requeue on verify: {len(users)} users in {elapsed * 1000:.1f} ms ({len(users) / elapsed:.0f} users/s)")
+
+
+async def promotion(capacity, batch):
+    async with AsyncSessionLocal() as db:
+        expected = (await db.scalars(
+            select(User.id).where(IS_WAITLISTED, IS_VERIFIED_WAITLIST).order_by(User.waitlist_queued_at, User.id).limit(capacity)
+        )).all()
+    latencies = []
+    promoted = 0
+    while True:
+        async with AsyncSessionLocal() as db:
+            started = time.perf_counter()
+            result = await promote_next(db, 1, limit=batch)
+            latencies.append(time.perf_counter() - started)
+        promoted += result["promoted"]
+        if not result["promoted"]:
+            break
+    async with AsyncSessionLocal() as db:
+        active = set((await db.scalars(select(User.id).where(User.space_id == 1, User.status == UserStatus.ACTIVE))).all())
+        queued = await db.scalar(select(func.count(EmailOutbox.id)))
+    ok = active == set(expected) and promoted == len(expected)
+    print(f"promotion: {promoted} users in batches of {batch}, p50 {percentile(latencies, 50) * 1000:.1f} ms  "
+          f"p99 {percentile(latencies, 99) * 1000:.1f} ms per batch  ({queued} emails queued)  "
+          f"head of queue, within capacity: {'ok' if ok else 'FAILED'}")
+    return ok
+
+
+async def main(users, pages, capacity, batch):
+    seed(users, capacity)
+    ok = await ranked_pages(pages, users)
+    await requeue_on_verify(1000)
+    ok = await promotion(capacity, batch) and ok
+    await async_engine.dispose()
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=200000)
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--capacity", type=int, default=5000)
+    parser.add_argument("--batch", type=int, default=500)
+    args = parser.parse_args()
+    raise SystemExit(0 if asyncio.run(main(args.users, args.pages, args.capacity, args.batch)) else 1)
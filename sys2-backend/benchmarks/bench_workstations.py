@@ -0,0 +1,206 @@
+"""Workstation availability: seat index vs SQL, and allocation contention.
+
+Seeds `--spaces` spaces of `--seats` seats each. Each space gets member
+seats for about half its capacity, plus `--bookings` bookings of 1-8 seats
+for 1-8 hours at random times over the next 30 days. Then:
+
+- Index build: preload() of every space, streamed in (space_id, id) order.
+- Availability: free seats at a moment, over a 4-hour range, and "can k
+  members be added", answered by the seat index and by SQL: a SUM for a
+  moment, and the overlapping rows swept in Python for a range, since SQL
+  has no max-overlap aggregate. Both answers are compared.
+- Contention: `--clients` concurrent 2-hour bookings, spread over all
+  spaces and then all into one space. Spaces are locked one at a time, so
+  spread-out clients don't queue behind each other.
+- Overbooking: the clients race for the last member seats of one space.
+  The space must end exactly full, never over capacity.
+
+    python -m benchmarks.bench_workstations [--spaces 100] [--seats 1000] [--bookings 500] [--queries 2000] [--clients 50]
+"""
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+from benchmarks.common import percentile, reset_database, run_concurrent, summarize
+
+from sqlalchemy import func, insert, or_, select
+
+from core.seat_index import as_utc
+from core.workstations import SeatAvailability, SeatsUnavailable, set_seat_availability
+from config import settings
+from database import AsyncSessionLocal, SessionLocal, async_engine
+from models.space import Space
+from models.workstation_allocation import WorkstationAllocation
+
+HOUR = timedelta(hours=1)
+
+
+def new_availability() -> SeatAvailability:
+    availability = SeatAvailability(settings.WORKSTATION_SLOT_MINUTES * 60, settings.WORKSTATION_BOOKING_HORIZON_DAYS, ttl_seconds=3600)
+    set_seat_availability(availability)
+    return availability
+
+
+def slot_start(moment):
+    slot_seconds = settings.WORKSTATION_SLOT_MINUTES * 60
+    return datetime.fromtimestamp(moment.timestamp() // slot_seconds * slot_seconds, timezone.utc)
+
+
+def seed(spaces, seats, bookings):
+    reset_database()
+    rng = random.Random(7)
+    now = slot_start(datetime.now(timezone.utc))
+    with SessionLocal() as db:
+        db.execute(insert(Space), [{"id": i, "name": f"Node {i}", "workstation_capacity": seats, "allocation_version": 0} for i in range(1, spaces + 1)])
+        rows = []
+        for space_id in range(1, spaces + 1):
+            for _ in range(seats // 20): # Member seats for half the capacity, 10 at a time
+                rows.append({"space_id": space_id, "seats": 10, "starts_at": now - 30 * 24 * HOUR, "ends_at": None, "created_at": now})
+            for _ in range(bookings):
+                starts_at = now + timedelta(minutes=settings.WORKSTATION_SLOT_MINUTES * rng.randrange(30 * 48))
+                rows.append({
+                    "space_id": space_id, "seats": rng.randint(1, 8), "starts_at": starts_at,
+                    "ends_at": starts_at + rng.randint(1, 8) * HOUR, "created_at": now,
+                })
+        db.execute(insert(WorkstationAllocation), rows)
+        db.commit()
+        return len(rows)
+
+
+async def sql_used_at(db, space_id, moment):
+    return await db.scalar(
+        select(func.coalesce(func.sum(WorkstationAllocation.seats), 0)).where(
+            WorkstationAllocation.space_id == space_id, WorkstationAllocation.starts_at <= moment,
+            or_(WorkstationAllocation.ends_at.is_(None), WorkstationAllocation.ends_at > moment),
+        )
+    )
+
+
+async def sql_used_between(db, space_id, starts_at, ends_at):
+    rows = (await db.execute(
+        select(WorkstationAllocation.seats, WorkstationAllocation.starts_at, WorkstationAllocation.ends_at).where(
+            WorkstationAllocation.space_id == space_id, WorkstationAllocation.starts_at < ends_at,
+            or_(WorkstationAllocation.ends_at.is_(None), WorkstationAllocation.ends_at > starts_at),
+        )
+    )).all()
+    events = []
+    for row in rows:
+        events.append((max(as_utc(row.starts_at), starts_at), row.seats))
+        if row.ends_at is not None and as_utc(row.ends_at) < ends_at:
+            events.append((as_utc(row.ends_at), -row.seats))
+    used = peak = 0
+    for _, delta in sorted(events, key=lambda event: (event[0], event[1])): # Releases before starts at the same time
+        used += delta
+        peak = max(peak, used)
+    return peak
+
+
+async def availability_queries(availability, spaces, queries):
+    rng = random.Random(11)
+    slot = timedelta(minutes=settings.WORKSTATION_SLOT_MINUTES)
+    base = slot_start(datetime.now(timezone.utc))
+    # Ranges start on slot boundaries (bookings do too), so the index's slot rounding matches the exact SQL answers
+    probes = [(rng.randint(1, spaces), base + slot * rng.randrange(1, 30 * 48)) for _ in range(queries)]
+
+    async with AsyncSessionLocal() as db:
+        async def index_at(space_id, moment):
+            return (await availability.get_index(db, space_id)).used(moment, moment)
+
+        async def index_range(space_id, moment):
+            return (await availability.get_index(db, space_id)).used(moment, moment + 4 * HOUR)
+
+        async def index_members(space_id, moment):
+            return (await availability.get_index(db, space_id)).free(datetime.now(timezone.utc)) >= 10
+
+        async def sql_range(space_id, moment):
+            return await sql_used_between(db, space_id, moment, moment + 4 * HOUR)
+
+        async def sql_at(space_id, moment):
+            return await sql_used_at(db, space_id, moment)
+
+        for name, run in (
+            ("moment: seat index", index_at),
+            ("moment: SQL SUM", sql_at),
+            ("4h range: seat index", index_range),
+            ("4h range: SQL + sweep", sql_range),
+            ("members: seat index", index_members),
+        ):
+            latencies = []
+            for space_id, moment in probes:
+                started = time.perf_counter()
+                await run(space_id, moment)
+                latencies.append(time.perf_counter() - started)
+            print(f"{name:<26} p50 {percentile(latencies, 50) * 1e6:>9.1f} us  p99 {percentile(latencies, 99) * 1e6:>9.1f} us")
+
+        mismatches = 0
+        for space_id, moment in probes[:200]:
+            mismatches += await index_at(space_id, moment) != await sql_at(space_id, moment)
+            mismatches += await index_range(space_id, moment) != await sql_range(space_id, moment)
+    print(f"index vs SQL on 200 probes: {'ok' if not mismatches else f'{mismatches} MISMATCHES'}")
+    return not mismatches
+
+
+async def contention(availability, spaces, clients, total):
+    rng = random.Random(13)
+    now = datetime.now(timezone.utc)
+
+    def booking(space_of):
+        async def book(i):
+            starts_at = now + timedelta(days=31 + rng.randrange(30), hours=rng.randrange(24))
+            async with AsyncSessionLocal() as db:
+                async with availability.allocating(db, space_of(i)) as seats:
+                    await seats.allocate(1, starts_at, starts_at + 2 * HOUR)
+        return book
+
+    summarize(f"book, {spaces} spaces", *await run_concurrent(booking(lambda i: i % spaces + 1), clients, total))
+    summarize("book, one space", *await run_concurrent(booking(lambda i: 1), clients, total))
+
+
+async def overbooking(availability, clients):
+    async with AsyncSessionLocal() as db:
+        free = (await availability.get_index(db, 2)).free(datetime.now(timezone.utc))
+    granted = refused = 0
+
+    async def claim(i):
+        nonlocal granted, refused
+        async with AsyncSessionLocal() as db:
+            try:
+                async with availability.allocating(db, 2) as seats:
+                    await seats.allocate(7, ends_at=None)
+                granted += 7
+            except SeatsUnavailable:
+                refused += 1
+
+    await run_concurrent(claim, clients, free // 7 + clients)
+    fresh = new_availability() # Rebuilt from the rows alone
+    async with AsyncSessionLocal() as db:
+        left = (await fresh.get_index(db, 2)).free(datetime.now(timezone.utc))
+    ok = granted == free - free % 7 and left == free % 7
+    print(f"overbooking: {free} member seats free, {granted} granted in 7s, {refused} refused, {left} left: {'ok' if ok else 'FAILED'}")
+    return ok
+
+
+async def main(spaces, seats, bookings, queries, clients):
+    rows = seed(spaces, seats, bookings)
+    availability = new_availability()
+    started = time.perf_counter()
+    built = await availability.preload()
+    print(f"preload: {built} spaces, {rows} allocations in {time.perf_counter() - started:.2f} s")
+    ok = await availability_queries(availability, spaces, queries)
+    await contention(availability, spaces, clients, clients * 20)
+    ok = await overbooking(availability, clients) and ok
+    await async_engine.dispose()
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--spaces", type=int, default=100)
+    parser.add_argument("--seats", type=int, default=1000)
+    parser.add_argument("--bookings", type=int, default=500)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--clients", type=int, default=50)
+    args = parser.parse_args()
+    raise SystemExit(0 if asyncio.run(main(args.spaces, args.seats, args.bookings, args.queries, args.clients)) else 1)
@@ -0,0 +1,67 @@
+"""Shared helpers for the benchmark scripts.
+
+Benchmarks run offline against a local SQLite stand-in, so the environment is
+prepared *before* any app module (config, database, ...) is imported.
+Run them from the sys2-backend directory, e.g. `python -m benchmarks.bench_async_db`.
+"""
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+BENCH_DB_PATH = os.path.join(tempfile.gettempdir(), "sys2_bench.sqlite3")
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{BENCH_DB_PATH}")
+os.environ.setdefault("SECRET_KEY", "benchmark-secret-key")
+os.environ.setdefault("SENDGRID_API_KEY", "benchmark-sendgrid-key")
+
+
+def reset_database():
+    """Drops and recreates all tables on the benchmark database."""
+    from database import Base, engine
+    import models  # noqa: F401 - registers the models with Base.metadata
+
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(name, latencies, elapsed):
+    """Prints and returns throughput and latency percentiles (in ms)."""
+    result = {
+        "name": name,
+        "requests": len(latencies),
+        "rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "mean_ms": (statistics.fmean(latencies) * 1000) if latencies else 0.0,
+    }
+    print(
+        f"{name:<32} {result['requests']:>7} req  {result['rps']:>9.1f} req/s  "
+        f"p50 {result['p50_ms']:>8.2f} ms  p99 {result['p99_ms']:>8.2f} ms"
+    )
+    return result
+
+
+async def run_concurrent(make_request, concurrency, total):
+    """Runs `total` calls of `make_request(i)` with `concurrency` workers; returns (latencies, elapsed)."""
+    latencies = []
+    counter = iter(range(total))
+
+    async def worker():
+        for i in counter:
+            started = time.perf_counter()
+            await make_request(i)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, time.perf_counter() - started
@@ -1,3 +1,5 @@
+from typing import List, Optional
+
 from pydantic_settings import BaseSettings
 
 
@@ -6,6 +8,162 @@ class Settings(BaseSettings):
     SECRET_KEY: str
     SENDGRID_API_KEY: str
 
+    # Database connection pool (applies to each engine, per worker process)
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT_SECONDS: float = 10 # Wait for a free connection before failing the request
+    DB_POOL_RECYCLE_SECONDS: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    DB_HEALTH_TIMEOUT_SECONDS: float = 2
+
+    # Read replicas (same URL format as DATABASE_URL, as a JSON list). Request sessions
+    # send read-only statements to a healthy replica, round-robin; everything else, and
+    # every read of a client that wrote recently, goes to the primary
+    DATABASE_REPLICA_URLS: List[str] = []
+    DB_REPLICA_MAX_LAG_SECONDS: float = 5 # Replicas further behind are taken out of rotation
+    DB_REPLICA_CHECK_SECONDS: float = 5
+    DB_READ_YOUR_WRITES_SECONDS: float = 10 # Reads stay on the primary this long after a client's write
+
+    # Password hashing policy. The first scheme hashes new passwords; hashes in the
+    # other schemes (or with a different cost) are upgraded on the next login.
+    PASSWORD_HASH_SCHEMES: List[str] = ["bcrypt", "argon2"]
+    PASSWORD_BCRYPT_ROUNDS: int = 12
+    PASSWORD_ARGON2_TIME_COST: int = 3
+    PASSWORD_ARGON2_MEMORY_COST: int = 65536 # KiB
+    PASSWORD_ARGON2_PARALLELISM: int = 4
+    PASSWORD_HASH_TARGET_MS: int = 50 # Verify latency budget used by core.calibrate_password_hash
+
+    # Password hashing executor (bcrypt runs in a separate process pool)
+    PASSWORD_HASH_WORKERS: Optional[int] = None # None = os.cpu_count(), 0 = hash inline in the threadpool
+    PASSWORD_HASH_MAX_PENDING: int = 64 # Queued + running hash jobs before we answer 503
+    PASSWORD_HASH_RETRY_AFTER_SECONDS: int = 1
+
+    # Authenticated request caches (per worker process)
+    TOKEN_CACHE_MAX_ENTRIES: int = 10000 # Verified access token claims, expire at the token's exp
+    USER_CACHE_MAX_ENTRIES: int = 10000
+    USER_CACHE_TTL_SECONDS: int = 30 # Bounds staleness across workers; local changes invalidate at once
+
+    # Refresh token rotation. 'database' is shared by all workers, 'memory' is per process
+    REFRESH_TOKEN_STORE: str = "database"
+    REFRESH_TOKEN_MEMORY_STORE_MAX_ENTRIES: int = 1_000_000
+
+    # Rate limiting for auth endpoints. 'memory' is per process, 'database' is shared by all workers
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_BACKEND: str = "memory"
+    RATE_LIMIT_SHARDS: int = 16
+    RATE_LIMIT_MAX_KEYS: int = 100_000 # Per process, across all shards
+    RATE_LIMIT_TRUST_FORWARDED_FOR: bool = False # Only enable behind a proxy that sets X-Forwarded-For
+
+    FRONTEND_BASE_URL: str = "http://localhost:3000" # Used for links in emails
+
+    # Email templates. Auto-reload re-checks template mtimes on render (dev only)
+    EMAIL_TEMPLATES_DIR: Optional[str] = None # Defaults to templates/email in the backend
+    EMAIL_TEMPLATES_AUTO_RELOAD: bool = False
+
+    # Outbound email. EMAIL_TRANSPORT is one of 'sendgrid', 'smtp', 'file', 'memory'
+    EMAIL_TRANSPORT: str = "sendgrid"
+    EMAIL_FROM: str = "verified_sender@example.com"
+    SMTP_HOST: str = "localhost"
+    SMTP_PORT: int = 1025 # Default port of local SMTP sinks like MailHog/Mailpit
+    SMTP_USERNAME: Optional[str] = None
+    SMTP_PASSWORD: Optional[str] = None
+    SMTP_USE_TLS: bool = False
+    EMAIL_FILE_SINK_DIR: str = "mail_sink"
+
+    # Email outbox worker
+    EMAIL_WORKER_BATCH_SIZE: int = 50
+    EMAIL_WORKER_POLL_SECONDS: float = 1.0
+    EMAIL_CLAIM_LEASE_SECONDS: float = 300 # A claimed batch is sent again after this long if its worker never records the results
+    EMAIL_MAX_ATTEMPTS: int = 6 # Then the message is dead-lettered
+    EMAIL_RETRY_BASE_SECONDS: float = 30 # Backoff doubles per attempt
+    EMAIL_RETRY_MAX_SECONDS: float = 3600
+
+    # Profile embeddings. EMBEDDING_STORAGE is 'bytes' (float32 blob, any database) or 'pgvector'
+    # (needs the vector extension and the pgvector package); set it before running migrations
+    EMBEDDING_DIM: int = 256
+    EMBEDDING_STORAGE: str = "bytes"
+
+    # Embedding pipeline (core.embedding_pipeline). EMBEDDING_ENCODER is 'hashing' (deterministic, offline)
+    # or 'package.module:factory' for a real model
+    EMBEDDING_ENCODER: str = "hashing"
+    EMBEDDING_BATCH_SIZE: int = 64 # Profiles per encoder call
+    EMBEDDING_SCAN_SIZE: int = 2048 # Profiles per page (one upsert + watermark commit)
+    EMBEDDING_WORKERS: Optional[int] = None # Encoder processes; None = os.cpu_count(), 0 = encode in-process
+    EMBEDDING_SETTLE_SECONDS: float = 5 # Profiles updated more recently wait for the next run
+    EMBEDDING_WORKER_ENABLED: bool = False # Run the pipeline inside the API process (enable on one instance only)
+    EMBEDDING_WORKER_POLL_SECONDS: float = 10
+
+    # Intra-space matching. MATCHING_BACKEND is 'numpy' (in-process index per space) or 'pgvector'
+    MATCHING_BACKEND: str = "numpy"
+    MATCHING_INDEX_TTL_SECONDS: int = 300 # Rebuild a space's index after this long
+    MATCHING_INDEX_DIR: Optional[str] = None # Snapshot indexes here and memory-map them (shared by workers)
+    MATCHING_ANN_THRESHOLD: int = 50_000 # Spaces this large use an HNSW index (needs hnswlib)
+    MATCHING_HNSW_M: int = 16
+    MATCHING_HNSW_EF_CONSTRUCTION: int = 200
+    MATCHING_HNSW_EF_SEARCH: int = 100
+
+    # Profile search (core.search). SEARCH_BACKEND is 'postgres' (GIN indexes), 'memory' (in-process index)
+    # or 'auto' (postgres on PostgreSQL, memory otherwise)
+    SEARCH_BACKEND: str = "auto"
+    SEARCH_REFRESH_SECONDS: float = 5 # In-process index: read the profiles changed since the last refresh this often
+    SEARCH_SETTLE_SECONDS: float = 5 # In-process index: re-read changes this recent, their transaction may commit late
+    SEARCH_SCAN_SIZE: int = 5000 # In-process index: rows per page when building or refreshing
+
+    # Chat gateway (core.chat). CHAT_PUBSUB_BACKEND is 'local' (single worker) or 'package.module:factory'
+    CHAT_PUBSUB_BACKEND: str = "local"
+    CHAT_ALLOWED_ORIGINS: List[str] = ["http://localhost:3000", "http://127.0.0.1:3000"] # Browser origins allowed to open sockets
+    CHAT_SEND_QUEUE_SIZE: int = 256 # Frames buffered per socket
+    CHAT_SLOW_CONSUMER_POLICY: str = "disconnect" # 'disconnect' or 'drop' (oldest frame) when a send queue is full
+    CHAT_MAX_MESSAGE_CHARS: int = 4000
+    CHAT_PERSIST_BATCH_SIZE: int = 500 # Messages per INSERT
+    CHAT_PERSIST_FLUSH_MS: int = 50 # Max time a message waits for its batch
+    CHAT_PERSIST_MAX_PENDING: int = 50_000 # Unwritten messages before senders get 'busy'
+
+    # Notifications (core.notifications)
+    NOTIFICATION_BATCH_SIZE: int = 1000 # Rows per INSERT
+    NOTIFICATION_FLUSH_MS: int = 200 # Events published from request handlers are coalesced and written this often
+    NOTIFICATION_MAX_PENDING: int = 100_000 # Buffered events before new ones are dropped
+
+    # Security audit log (core.audit). Events are buffered and written in batches
+    AUDIT_LOG_ENABLED: bool = True
+    AUDIT_BUFFER_SIZE: int = 20_000 # Buffered events before recorders have to wait
+    AUDIT_BATCH_SIZE: int = 1000 # Rows per INSERT; a full batch is flushed right away
+    AUDIT_FLUSH_MS: int = 250 # Max time an event waits for its batch
+    AUDIT_BACKPRESSURE_MS: int = 200 # How long a recorder waits for room in a full buffer before the event is dropped
+    AUDIT_PARTITION_MONTHS_AHEAD: int = 2 # Postgres: monthly partitions created ahead of time
+    AUDIT_RETENTION_MONTHS: Optional[int] = None # Postgres: drop partitions older than this (None = keep)
+
+    # Waitlist (core.waitlist). Users are queued by signup time, moved forward by these bonuses
+    WAITLIST_VERIFIED_BONUS_DAYS: float = 30 # Email verified
+    WAITLIST_REFERRAL_BONUS_DAYS: float = 7 # Per referred user who verified their email, up to WAITLIST_MAX_REFERRAL_BONUSES
+    WAITLIST_MAX_REFERRAL_BONUSES: int = 5
+    WAITLIST_PROFILE_BONUS_DAYS: float = 14 # Complete profile; scaled by the share of profile fields filled in
+    # Promotion scheduler: fills the free workstations of every space with a capacity set
+    WAITLIST_SCHEDULER_ENABLED: bool = True
+    WAITLIST_SCHEDULER_INTERVAL_SECONDS: float = 60 # Also runs at once when this process frees capacity
+
+    # Workstation allocations (core.workstations). Each worker keeps a seat index per space over
+    # fixed time slots; bookings may reach WORKSTATION_BOOKING_HORIZON_DAYS ahead
+    WORKSTATION_SLOT_MINUTES: int = 30
+    WORKSTATION_BOOKING_HORIZON_DAYS: int = 90
+    WORKSTATION_INDEX_TTL_SECONDS: float = 30 # Availability reads may miss other workers' changes this long
+    WORKSTATION_INDEX_PRELOAD: bool = True # Build every space's index in the background at startup
+
+    # Startup. Routers other than health/metrics are imported on their first request, and
+    # the rest in the background this long after startup (None = only on first request)
+    LAZY_ROUTERS: bool = True
+    LAZY_ROUTERS_PRELOAD_SECONDS: Optional[float] = 5
+
+    # Logging. LOG_FORMAT is 'json' (one object per line) or 'text'
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "json"
+
+    # Request profiling (debug only). Profiles are kept in memory and listed at /debug/profiles
+    PROFILING_ENABLED: bool = False
+    PROFILING_HEADER: str = "X-Profile" # Requests sending this header are always profiled
+    PROFILING_SAMPLE_RATE: float = 0.0 # Fraction of other requests profiled to find the slowest ones
+    PROFILING_KEEP_SLOWEST: int = 10
+
     class Config:
         env_file = ".env"
 
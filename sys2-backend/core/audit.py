@@ -0,0 +1,247 @@
+"""Security audit log: auth events buffered in memory and written in batches.
+
+Request handlers call `await get_audit_log().record(...)`. Normally that only
+appends a row to an in-memory buffer, so a login doesn't pay for an extra
+INSERT and commit. A background task writes the buffer every AUDIT_FLUSH_MS,
+or as soon as AUDIT_BATCH_SIZE events are waiting, as executemany INSERTs of
+up to a batch each.
+
+- Back-pressure: the buffer holds at most AUDIT_BUFFER_SIZE events (written
+  or in flight). A recorder that finds it full wakes the writer and waits up
+  to AUDIT_BACKPRESSURE_MS for room. Only then is its event dropped, and
+  counted in audit_events_dropped_total. A slow database therefore slows
+  logins down a little before the trail gets holes.
+- Failed writes keep their batch at the head of the buffer for the next
+  tick.
+- stop() writes whatever is still buffered, so a clean shutdown loses
+  nothing. A crash loses at most the unflushed buffer.
+- Storage: audit_events is append-only and, on Postgres, partitioned by
+  month. The writer creates partitions AUDIT_PARTITION_MONTHS_AHEAD months
+  ahead, and drops those older than AUDIT_RETENTION_MONTHS when set.
+"""
+import asyncio
+import logging
+import re
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Deque, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import settings
+from core.metrics import (
+    AUDIT_BACKPRESSURE_WAITS, AUDIT_BUFFERED, AUDIT_EVENTS_DROPPED, AUDIT_EVENTS_RECORDED, AUDIT_EVENTS_WRITTEN,
+    AUDIT_WRITE_FAILURES, AUDIT_WRITE_SPAN,
+)
+from database import AsyncSessionLocal
+from models.audit_event import AuditEvent
+
+logger = logging.getLogger(__name__)
+
+AUDIT_EVENT_TYPES = {
+    "registered",
+    "email_verified",
+    "login_succeeded",
+    "login_failed", # data: reason ('unknown_email' or 'bad_password')
+    "logout",
+    "password_reset_requested",
+    "password_reset",
+    "refresh_token_reuse", # A rotated refresh token was replayed; its family was revoked
+    "rate_limited", # data: rules (names of the exceeded limits)
+}
+
+PARTITION_MAINTENANCE_SECONDS = 3600
+PARTITION_NAME = re.compile(r"audit_events_y(\d{4})m(\d{2})")
+
+
+# --- Partitions (Postgres) ---
+
+def _add_months(month: datetime, months: int) -> datetime:
+    years, month_index = divmod(month.month - 1 + months, 12)
+    return month.replace(year=month.year + years, month=month_index + 1)
+
+
+def partition_name(month: datetime) -> str:
+    return f"audit_events_y{month.year}m{month.month:02d}"
+
+
+async def maintain_partitions(db: AsyncSession, now: datetime, months_ahead: int, retention_months: Optional[int]) -> None:
+    """Creates this and the next months_ahead monthly partitions and drops expired ones (no-op off Postgres)."""
+    if db.get_bind().dialect.name != "postgresql":
+        return
+    current = now.astimezone(timezone.utc).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    for offset in range(months_ahead + 1):
+        start = _add_months(current, offset)
+        try:
+            async with db.begin_nested():
+                await db.execute(text(
+                    f"CREATE TABLE IF NOT EXISTS {partition_name(start)} PARTITION OF audit_events "
+                    f"FOR VALUES FROM ('{start.isoformat()}') TO ('{_add_months(start, 1).isoformat()}')"
+                ))
+        except Exception:
+            # Typically rows for that month already sit in the default partition
+            logger.exception("Could not create audit partition %s", partition_name(start))
+    if retention_months is not None:
+        cutoff = _add_months(current, -retention_months)
+        partitions = (await db.execute(text(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent WHERE p.relname = 'audit_events'"
+        ))).scalars().all()
+        for name in partitions:
+            match = PARTITION_NAME.fullmatch(name)
+            if match and datetime(int(match[1]), int(match[2]), 1, tzinfo=timezone.utc) < cutoff:
+                await db.execute(text(f"DROP TABLE {name}")) # Whole months go at once; rows are never deleted
+                logger.info("Dropped expired audit partition %s", name)
+    await db.commit()
+
+
+# --- Writer ---
+
+class AuditLog:
+    """Bounded buffer of audit rows, written in batches by a background task."""
+
+    def __init__(self, buffer_size: int, batch_size: int, flush_seconds: float, backpressure_seconds: float, enabled: bool = True):
+        self.buffer_size = buffer_size
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.backpressure_seconds = backpressure_seconds
+        self.enabled = enabled
+        self._buffer: Deque[dict] = deque()
+        self._in_flight = 0 # Rows taken out of the buffer by a running write
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._drained: Optional[asyncio.Event] = None
+        self._stopping = False
+
+    def pending(self) -> int:
+        return len(self._buffer) + self._in_flight
+
+    async def record(
+        self, type: str, user_id: Optional[int] = None, email: Optional[str] = None,
+        ip: Optional[str] = None, data: Optional[dict] = None,
+    ) -> bool:
+        """Buffers one event. Waits for room if the buffer is full; False if it was dropped (or auditing is off)."""
+        if not self.enabled:
+            return False
+        if type not in AUDIT_EVENT_TYPES:
+            raise ValueError(f"Unknown audit event type '{type}'")
+        row = {
+            "occurred_at": datetime.now(timezone.utc), "type": type, "user_id": user_id,
+            "email": email.lower() if email else None, "ip": ip, "data": data,
+        }
+        if self.pending() >= self.buffer_size and not await self._wait_for_room():
+            AUDIT_EVENTS_DROPPED.inc()
+            return False
+        self._buffer.append(row)
+        AUDIT_EVENTS_RECORDED.inc()
+        if len(self._buffer) >= self.batch_size and self._wakeup is not None:
+            self._wakeup.set() # A full batch doesn't wait for the timer
+        return True
+
+    async def _wait_for_room(self) -> bool:
+        AUDIT_BACKPRESSURE_WAITS.inc()
+        if self._task is None:
+            return False # Nothing is draining the buffer
+        self._wakeup.set()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.backpressure_seconds
+        while self.pending() >= self.buffer_size:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return False
+            self._drained.clear()
+            try:
+                await asyncio.wait_for(self._drained.wait(), remaining)
+            except asyncio.TimeoutError:
+                return False
+        return True
+
+    def start(self) -> None:
+        if not self.enabled:
+            return
+        self._wakeup = asyncio.Event()
+        self._drained = asyncio.Event()
+        self._stopping = False
+        AUDIT_BUFFERED.set_function(self.pending)
+        self._task = asyncio.create_task(self._run(), name="audit-log-writer")
+
+    async def stop(self) -> None:
+        """Stops the writer and writes everything still buffered."""
+        if self._task is not None:
+            # Not cancelled: a write interrupted mid-transaction would have to be redone anyway
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        await self.flush() # Whatever was recorded while the last write ran
+        if self._buffer:
+            logger.error("Shutting down with %s audit events unwritten", len(self._buffer))
+
+    async def flush(self) -> int:
+        """Writes the buffer, a batch per transaction; stops at the first failure. Returns rows written."""
+        written = 0
+        while self._buffer:
+            batch = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+            self._in_flight = len(batch)
+            try:
+                with AUDIT_WRITE_SPAN.time():
+                    async with AsyncSessionLocal() as db:
+                        await db.execute(AuditEvent.__table__.insert(), batch)
+                        await db.commit()
+            except asyncio.CancelledError:
+                self._buffer.extendleft(reversed(batch)) # stop() writes them
+                raise
+            except Exception:
+                self._buffer.extendleft(reversed(batch)) # Retried on the next tick
+                AUDIT_WRITE_FAILURES.inc()
+                logger.exception("Writing %s audit events failed; retrying", len(batch))
+                return written
+            finally:
+                self._in_flight = 0
+            written += len(batch)
+            AUDIT_EVENTS_WRITTEN.inc(len(batch))
+            if self._drained is not None:
+                self._drained.set()
+        return written
+
+    async def _maintain_partitions(self) -> None:
+        try:
+            async with AsyncSessionLocal() as db:
+                await maintain_partitions(
+                    db, datetime.now(timezone.utc), settings.AUDIT_PARTITION_MONTHS_AHEAD, settings.AUDIT_RETENTION_MONTHS
+                )
+        except Exception:
+            logger.exception("Audit partition maintenance failed")
+
+    async def _run(self) -> None:
+        next_maintenance = 0.0
+        while not self._stopping:
+            if time.monotonic() >= next_maintenance:
+                await self._maintain_partitions()
+                next_maintenance = time.monotonic() + PARTITION_MAINTENANCE_SECONDS
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+
+_audit_log: Optional[AuditLog] = None
+
+
+def get_audit_log() -> AuditLog:
+    global _audit_log
+    if _audit_log is None:
+        _audit_log = AuditLog(
+            settings.AUDIT_BUFFER_SIZE, settings.AUDIT_BATCH_SIZE, settings.AUDIT_FLUSH_MS / 1000,
+            settings.AUDIT_BACKPRESSURE_MS / 1000, enabled=settings.AUDIT_LOG_ENABLED,
+        )
+    return _audit_log
+
+
+def set_audit_log(audit_log: Optional[AuditLog]) -> None:
+    global _audit_log
+    _audit_log = audit_log
@@ -0,0 +1,55 @@
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+
+class TTLCache:
+    """Bounded LRU cache whose entries expire at a per-entry absolute time.
+
+    Times are wall-clock epoch seconds so JWT `exp` claims can be used as-is.
+    A maxsize of 0 disables the cache. Not thread-safe; meant for use from the
+    event loop.
+    """
+
+    def __init__(self, maxsize: int, ttl_seconds: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        value, expires_at = entry
+        if expires_at <= time.time():
+            del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, expires_at: Optional[float] = None) -> None:
+        if self.maxsize <= 0:
+            return
+        if self.ttl_seconds is not None:
+            ttl_expiry = time.time() + self.ttl_seconds
+            expires_at = ttl_expiry if expires_at is None else min(expires_at, ttl_expiry)
+        if expires_at is None:
+            raise ValueError("expires_at is required when the cache has no ttl_seconds")
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def pop(self, key: Hashable) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
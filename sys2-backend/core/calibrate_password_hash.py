@@ -0,0 +1,85 @@
+"""Suggests password hashing costs that fit a verify latency budget on this machine.
+
+    python -m core.calibrate_password_hash [--budget-ms 50] [--samples 5]
+
+For each scheme the cost is raised step by step until the median verify time
+exceeds the budget; the last cost within budget is printed as .env settings.
+"""
+import argparse
+import statistics
+import time
+
+from config import settings
+from core.security import build_password_context
+
+SAMPLE_PASSWORD = "calibration-password"
+BCRYPT_ROUNDS_RANGE = range(4, 20) # bcrypt cost is log2, every step doubles the time
+ARGON2_TIME_COST_RANGE = range(1, 20)
+
+
+def measure_verify_ms(context, samples: int) -> float:
+    hashed = context.hash(SAMPLE_PASSWORD)
+    timings = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        context.verify(SAMPLE_PASSWORD, hashed)
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def calibrate(scheme: str, costs, make_context, budget_ms: float, samples: int):
+    """Returns (best_cost, its_latency_ms) for the highest cost within budget, or (None, None)."""
+    best = (None, None)
+    for cost in costs:
+        latency = measure_verify_ms(make_context(cost), samples)
+        print(f"  {scheme:<7} cost={cost:<3} verify median {latency:8.2f} ms")
+        if latency > budget_ms:
+            break
+        best = (cost, latency)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calibrate password hashing cost against a latency budget.")
+    parser.add_argument("--budget-ms", type=float, default=settings.PASSWORD_HASH_TARGET_MS)
+    parser.add_argument("--samples", type=int, default=5)
+    parser.add_argument("--argon2-memory-cost", type=int, default=settings.PASSWORD_ARGON2_MEMORY_COST, help="KiB")
+    args = parser.parse_args()
+
+    print(f"Calibrating for a verify budget of {args.budget_ms:.0f} ms")
+    suggestions = {}
+
+    rounds, latency = calibrate(
+        "bcrypt", BCRYPT_ROUNDS_RANGE,
+        lambda cost: build_password_context(schemes=["bcrypt"], bcrypt_rounds=cost),
+        args.budget_ms, args.samples,
+    )
+    if rounds is not None:
+        suggestions["PASSWORD_BCRYPT_ROUNDS"] = (rounds, latency)
+
+    try:
+        time_cost, latency = calibrate(
+            "argon2", ARGON2_TIME_COST_RANGE,
+            lambda cost: build_password_context(
+                schemes=["argon2"], argon2_time_cost=cost, argon2_memory_cost=args.argon2_memory_cost
+            ),
+            args.budget_ms, args.samples,
+        )
+        if time_cost is not None:
+            suggestions["PASSWORD_ARGON2_TIME_COST"] = (time_cost, latency)
+            suggestions["PASSWORD_ARGON2_MEMORY_COST"] = (args.argon2_memory_cost, None)
+    except Exception as e: # argon2-cffi missing or unsupported on this platform
+        print(f"  argon2  skipped: {e}")
+
+    if not suggestions:
+        print("No cost fits the budget; consider raising --budget-ms.")
+        return
+
+    print("\nSuggested .env settings:")
+    for key, (value, latency) in suggestions.items():
+        comment = f"  # ~{latency:.1f} ms per verify" if latency is not None else ""
+        print(f"{key}={value}{comment}")
+
+
+if __name__ == "__main__":
+    main()
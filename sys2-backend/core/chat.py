@@ -0,0 +1,461 @@
+"""WebSocket chat gateway.
+
+A client connects to /chat/ws with the access_token cookie set by
+/auth/login. The token and the account status are checked once, at connect.
+After that the socket stays open until the client leaves, the token
+expires or the account is deactivated: disconnect_users() tells every
+worker, over the pub/sub control channel, to close the user's sockets and
+forget them in recipient_cache and the user cache.
+
+Every socket gets a bounded send queue and its own sender task, so one slow
+reader never stalls delivery to anyone else. When a queue is full,
+CHAT_SLOW_CONSUMER_POLICY decides what happens:
+- 'disconnect': the socket is closed (1013, try again later). The client
+  reconnects and reloads history.
+- 'drop': the oldest queued frame is dropped. The client gets a `resync`
+  frame telling it to refetch history.
+
+Events go through a pub/sub backend (core.pubsub), with one channel per
+user, so a message reaches the recipient's sockets on any worker. A message
+is handed to MessageWriter before it is published, so nothing is delivered
+that the writer refused, but it is inserted later: the writer buffers rows
+and inserts them in batches of CHAT_PERSIST_BATCH_SIZE, at least every
+CHAT_PERSIST_FLUSH_MS. A crash can lose at most the unflushed buffer. When
+the buffer is full (the database is falling behind), senders get a `busy`
+error instead of unbounded memory growth.
+
+Client frames:  {"type": "message", "to": <user id>, "content": "...", "client_id": "..."}
+Server frames:  {"type": "message", "id", "from", "to", "content", "created_at", "client_id"}
+                (to the recipient's sockets and the sender's, as the ack)
+                {"type": "error", "code", "detail", "client_id"}
+                {"type": "resync", "missed": <frames dropped>}
+"""
+import asyncio
+import json
+import logging
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timezone
+from typing import Deque, Dict, Optional, Set
+
+from fastapi import WebSocket, WebSocketDisconnect, status
+from sqlalchemy import select, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import settings
+from core.cache import TTLCache
+from core.dependencies import invalidate_cached_user
+from core.enums import UserStatus
+from core.metrics import (
+    CHAT_CONNECTIONS, CHAT_FRAMES_DELIVERED, CHAT_FRAMES_DROPPED, CHAT_MESSAGES_PERSISTED, CHAT_MESSAGES_RECEIVED,
+    CHAT_PERSIST_FAILED, CHAT_PERSIST_PENDING, CHAT_PERSIST_SPAN, CHAT_SLOW_CONSUMER_DISCONNECTS,
+)
+from core.pubsub import PubSubBackend, build_pubsub
+from database import AsyncSessionLocal
+from models.block import Block
+from models.message import Message
+from models.user import User
+
+logger = logging.getLogger(__name__)
+
+PERSIST_RETRY_ATTEMPTS = 3
+RECIPIENT_LOOKUP_CHUNK = 500
+WS_1013_TRY_AGAIN_LATER = 1013
+CONTROL_CHANNEL = "chat:control" # Every worker subscribes; carries events about users rather than frames for them
+
+# user id -> whether the user can receive messages (exists and isn't inactive), shared by all sockets
+recipient_cache = TTLCache(maxsize=settings.USER_CACHE_MAX_ENTRIES, ttl_seconds=settings.USER_CACHE_TTL_SECONDS)
+
+
+def _user_channel(user_id: int) -> str:
+    return f"user:{user_id}"
+
+
+def _error_frame(code: str, detail: str, client_id=None) -> str:
+    return json.dumps({"type": "error", "code": code, "detail": detail, "client_id": client_id})
+
+
+# --- Connections ---
+
+class ClientConnection:
+    def __init__(self, websocket: WebSocket, user_id: int, queue_size: int, policy: str):
+        self.websocket = websocket
+        self.user_id = user_id
+        self.policy = policy
+        self.closed = False
+        self.missed = 0 # Frames dropped since the last resync notice
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._sender: Optional[asyncio.Task] = None
+        self.blocked_users: Set[int] = set() # Blocks in either direction, loaded at connect
+
+    def offer(self, frame: str) -> bool:
+        """Queues a frame without blocking; applies the slow-consumer policy when the queue is full."""
+        if self.closed:
+            return False
+        try:
+            self._queue.put_nowait(frame)
+            return True
+        except asyncio.QueueFull:
+            pass
+        if self.policy == "drop":
+            self._queue.get_nowait()
+            self._queue.put_nowait(frame)
+            self.missed += 1
+            CHAT_FRAMES_DROPPED.inc()
+            return True
+        CHAT_SLOW_CONSUMER_DISCONNECTS.inc()
+        self.close(WS_1013_TRY_AGAIN_LATER, "Slow consumer")
+        return False
+
+    def start(self) -> None:
+        self._sender = asyncio.create_task(self._send_loop())
+
+    async def _send_loop(self) -> None:
+        try:
+            while True:
+                frame = await self._queue.get()
+                if self.missed:
+                    missed, self.missed = self.missed, 0
+                    await self.websocket.send_text(json.dumps({"type": "resync", "missed": missed}))
+                await self.websocket.send_text(frame)
+        except asyncio.CancelledError:
+            raise
+        except Exception: # Socket went away mid-send; the receive loop notices and cleans up
+            self.closed = True
+
+    def close(self, code: int, reason: str = "") -> None:
+        if self.closed:
+            return
+        self.closed = True
+        if self._sender is not None:
+            self._sender.cancel()
+        asyncio.ensure_future(self._close_socket(code, reason))
+
+    async def _close_socket(self, code: int, reason: str) -> None:
+        try:
+            await self.websocket.close(code=code, reason=reason)
+        except Exception: # Already closed by the client
+            pass
+
+    async def stop(self) -> None:
+        if self._sender is not None:
+            self._sender.cancel()
+            try:
+                await self._sender
+            except asyncio.CancelledError:
+                pass
+
+
+class ChatHub:
+    """Sockets of this worker by user, subscribed to the users' pub/sub channels."""
+
+    def __init__(self, pubsub: PubSubBackend):
+        self.pubsub = pubsub
+        self.connections: Dict[int, Set[ClientConnection]] = {}
+
+    async def start(self) -> None:
+        await self.pubsub.start(self._dispatch)
+        await self.pubsub.subscribe(CONTROL_CHANNEL)
+
+    async def stop(self) -> None:
+        for connections in list(self.connections.values()):
+            for connection in list(connections):
+                connection.close(status.WS_1001_GOING_AWAY, "Server shutting down")
+        await self.pubsub.stop()
+
+    async def register(self, connection: ClientConnection) -> None:
+        connections = self.connections.setdefault(connection.user_id, set())
+        if not connections:
+            await self.pubsub.subscribe(_user_channel(connection.user_id))
+        connections.add(connection)
+        CHAT_CONNECTIONS.inc()
+
+    async def unregister(self, connection: ClientConnection) -> None:
+        connections = self.connections.get(connection.user_id)
+        if connections is None or connection not in connections:
+            return
+        connections.discard(connection)
+        CHAT_CONNECTIONS.dec()
+        if not connections:
+            del self.connections[connection.user_id]
+            await self.pubsub.unsubscribe(_user_channel(connection.user_id))
+
+    async def publish(self, user_ids, frame: str) -> None:
+        for user_id in set(user_ids):
+            await self.pubsub.publish(_user_channel(user_id), frame)
+
+    async def publish_control(self, event: dict) -> None:
+        await self.pubsub.publish(CONTROL_CHANNEL, json.dumps(event))
+
+    def _dispatch(self, channel: str, frame: str) -> None:
+        if channel == CONTROL_CHANNEL:
+            self._control(json.loads(frame))
+            return
+        user_id = int(channel.split(":", 1)[1])
+        for connection in list(self.connections.get(user_id, ())):
+            if connection.offer(frame):
+                CHAT_FRAMES_DELIVERED.inc()
+
+    def _control(self, event: dict) -> None:
+        if event.get("type") == "deactivated":
+            for user_id, email in event["users"]:
+                forget_user(user_id, email)
+                for connection in list(self.connections.get(user_id, ())):
+                    connection.close(status.WS_1008_POLICY_VIOLATION, "Account deactivated")
+
+
+# --- Persistence ---
+
+class MessageWriter:
+    """Buffers message rows and inserts them in batches, one transaction per batch."""
+
+    def __init__(self, batch_size: int, flush_seconds: float, max_pending: int):
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.max_pending = max_pending
+        self._pending: Deque[dict] = deque()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def submit(self, row: dict) -> bool:
+        """Buffers a row; False if the buffer is full."""
+        if len(self._pending) >= self.max_pending:
+            return False
+        self._pending.append(row)
+        CHAT_PERSIST_PENDING.set(len(self._pending))
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+        return True
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run(), name="chat-message-writer")
+
+    async def stop(self) -> None:
+        """Stops the flush loop and writes everything still buffered."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        while self._pending:
+            await self._write_batch()
+
+    async def _run(self) -> None:
+        while True:
+            if len(self._pending) < self.batch_size:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.flush_seconds)
+                except asyncio.TimeoutError:
+                    pass
+            if self._pending:
+                await self._write_batch()
+
+    def _insert_statement(self, dialect: str):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        return insert(Message).on_conflict_do_nothing(index_elements=[Message.uid]) # A retried batch may be half-written
+
+    async def _write_batch(self) -> None:
+        batch = [self._pending.popleft() for _ in range(min(self.batch_size, len(self._pending)))]
+        for attempt in range(1, PERSIST_RETRY_ATTEMPTS + 1):
+            try:
+                with CHAT_PERSIST_SPAN.time():
+                    async with AsyncSessionLocal() as db:
+                        await db.execute(self._insert_statement(db.get_bind().dialect.name), batch)
+                        await db.commit()
+                CHAT_MESSAGES_PERSISTED.inc(len(batch))
+                break
+            except asyncio.CancelledError:
+                self._pending.extendleft(reversed(batch)) # stop() writes them
+                raise
+            except Exception:
+                if attempt == PERSIST_RETRY_ATTEMPTS:
+                    CHAT_PERSIST_FAILED.inc(len(batch))
+                    logger.exception("Dropping %s chat messages after %s failed insert attempts", len(batch), attempt)
+                else:
+                    logger.warning("Chat message insert failed (attempt %s), retrying", attempt, exc_info=True)
+                    await asyncio.sleep(0.1 * 2 ** attempt)
+        CHAT_PERSIST_PENDING.set(len(self._pending))
+
+
+# --- Gateway ---
+
+def forget_user(user_id: int, email: str) -> None:
+    """Drops a user from this worker's caches, so the next check reads their current status."""
+    recipient_cache.pop(user_id)
+    invalidate_cached_user(email)
+
+
+async def load_blocked_users(db: AsyncSession, user_id: int) -> Set[int]:
+    """Users user_id blocked or was blocked by; messages between them are refused."""
+    return set((await db.scalars(union_all(
+        select(Block.blocked_id).where(Block.blocker_id == user_id),
+        select(Block.blocker_id).where(Block.blocked_id == user_id),
+    ))).all())
+
+
+class RecipientDirectory:
+    """Whether users can receive messages, from recipient_cache.
+
+    Cache misses are queued and resolved by a single lookup task, one IN query
+    per RECIPIENT_LOOKUP_CHUNK ids, so a burst of new recipients costs a few
+    queries and one pooled connection instead of one connection per message.
+    """
+
+    def __init__(self):
+        self._waiting: Dict[int, asyncio.Future] = {}
+        self._lookup: Optional[asyncio.Task] = None
+
+    async def can_receive(self, user_id: int) -> bool:
+        allowed = recipient_cache.get(user_id)
+        if allowed is not None:
+            return allowed
+        future = self._waiting.get(user_id)
+        if future is None:
+            future = self._waiting[user_id] = asyncio.get_running_loop().create_future()
+            if self._lookup is None:
+                self._lookup = asyncio.create_task(self._resolve_waiting())
+        return await asyncio.shield(future) # One caller leaving must not cancel the others' answer
+
+    async def _resolve_waiting(self) -> None:
+        try:
+            while self._waiting:
+                await asyncio.sleep(0) # Let the rest of this burst queue up
+                waiting, self._waiting = self._waiting, {}
+                try:
+                    statuses: Dict[int, UserStatus] = {}
+                    user_ids = list(waiting)
+                    async with AsyncSessionLocal() as db:
+                        for start in range(0, len(user_ids), RECIPIENT_LOOKUP_CHUNK):
+                            statuses.update((await db.execute(
+                                select(User.id, User.status).where(User.id.in_(user_ids[start:start + RECIPIENT_LOOKUP_CHUNK]))
+                            )).tuples().all())
+                except Exception as exc:
+                    for future in waiting.values():
+                        if not future.done():
+                            future.set_exception(exc)
+                    continue
+                for user_id, future in waiting.items():
+                    allowed = user_id in statuses and statuses[user_id] != UserStatus.INACTIVE
+                    recipient_cache.set(user_id, allowed)
+                    if not future.done():
+                        future.set_result(allowed)
+        finally:
+            self._lookup = None
+
+
+class ChatGateway:
+    def __init__(self, pubsub: Optional[PubSubBackend] = None):
+        self.hub = ChatHub(pubsub or build_pubsub())
+        self.recipients = RecipientDirectory()
+        self.writer = MessageWriter(
+            batch_size=settings.CHAT_PERSIST_BATCH_SIZE,
+            flush_seconds=settings.CHAT_PERSIST_FLUSH_MS / 1000,
+            max_pending=settings.CHAT_PERSIST_MAX_PENDING,
+        )
+
+    async def start(self) -> None:
+        await self.hub.start()
+        self.writer.start()
+
+    async def stop(self) -> None:
+        await self.hub.stop()
+        await self.writer.stop()
+
+    async def disconnect_users(self, users) -> None:
+        """Closes the sockets of deactivated users, given as (id, email), on every worker."""
+        users = [(user_id, email) for user_id, email in users]
+        for user_id, email in users: # Also here, in case the hub isn't running (scripts)
+            forget_user(user_id, email)
+        if users:
+            await self.hub.publish_control({"type": "deactivated", "users": users})
+
+    async def serve(self, websocket: WebSocket, user: User, blocked_users: Set[int], expires_at: float) -> None:
+        """Runs an accepted socket until it closes."""
+        connection = ClientConnection(websocket, user.id, settings.CHAT_SEND_QUEUE_SIZE, settings.CHAT_SLOW_CONSUMER_POLICY)
+        connection.blocked_users = blocked_users
+        expiry = asyncio.get_running_loop().call_later(
+            max(0.0, expires_at - time.time()), connection.close, status.WS_1008_POLICY_VIOLATION, "Access token expired"
+        )
+        await self.hub.register(connection)
+        connection.start()
+        try:
+            while not connection.closed:
+                await self._handle_frame(connection, await websocket.receive_text())
+        except (WebSocketDisconnect, RuntimeError): # RuntimeError: receive after we closed the socket
+            pass
+        finally:
+            expiry.cancel()
+            connection.closed = True
+            await self.hub.unregister(connection)
+            await connection.stop()
+
+    async def _handle_frame(self, connection: ClientConnection, text: str) -> None:
+        try:
+            frame = json.loads(text)
+        except ValueError:
+            connection.offer(_error_frame("invalid_frame", "Frames must be JSON objects"))
+            return
+        if not isinstance(frame, dict) or frame.get("type") != "message":
+            connection.offer(_error_frame("invalid_frame", "Unknown frame type"))
+            return
+        await self._send_message(connection, frame)
+
+    async def _send_message(self, connection: ClientConnection, frame: dict) -> None:
+        client_id = frame.get("client_id")
+        recipient_id, content = frame.get("to"), frame.get("content")
+        if not isinstance(recipient_id, int) or not isinstance(content, str) or not content.strip():
+            connection.offer(_error_frame("invalid_message", "'to' (user id) and non-empty 'content' are required", client_id))
+            return
+        if len(content) > settings.CHAT_MAX_MESSAGE_CHARS:
+            connection.offer(_error_frame("too_long", f"Messages are limited to {settings.CHAT_MAX_MESSAGE_CHARS} characters", client_id))
+            return
+        try:
+            allowed = await self._may_message(connection, recipient_id)
+        except Exception:
+            logger.warning("Recipient lookup failed for user %s", recipient_id, exc_info=True)
+            connection.offer(_error_frame("unavailable", "Couldn't check the recipient, try again shortly", client_id))
+            return
+        if not allowed:
+            connection.offer(_error_frame("forbidden", "You can't message this user", client_id))
+            return
+
+        CHAT_MESSAGES_RECEIVED.inc()
+        message_uid = uuid.uuid4().hex
+        created_at = datetime.now(timezone.utc)
+        if not self.writer.submit({
+            "uid": message_uid, "sender_id": connection.user_id, "recipient_id": recipient_id,
+            "content": content, "created_at": created_at,
+        }):
+            connection.offer(_error_frame("busy", "Too many messages in flight, try again shortly", client_id))
+            return
+        await self.hub.publish((recipient_id, connection.user_id), json.dumps({
+            "type": "message", "id": message_uid, "from": connection.user_id, "to": recipient_id,
+            "content": content, "created_at": created_at.isoformat(), "client_id": client_id,
+        }))
+
+    async def _may_message(self, connection: ClientConnection, recipient_id: int) -> bool:
+        """Recipient is someone else, exists, isn't inactive, and neither side blocked the other."""
+        if recipient_id == connection.user_id or recipient_id in connection.blocked_users:
+            return False
+        return await self.recipients.can_receive(recipient_id)
+
+
+_gateway: Optional[ChatGateway] = None
+
+
+def get_chat_gateway() -> ChatGateway:
+    global _gateway
+    if _gateway is None:
+        _gateway = ChatGateway()
+    return _gateway
+
+
+def set_chat_gateway(gateway: Optional[ChatGateway]) -> None:
+    global _gateway
+    _gateway = gateway
@@ -0,0 +1,85 @@
+"""Read-your-writes stickiness for replica routing (see database.RoutingSession).
+
+A replica may lag the primary by up to DB_REPLICA_MAX_LAG_SECONDS. Without
+stickiness, a client that just registered could be sent to a replica that
+hasn't seen the new row yet, and its next request would answer "User not
+found". ReadYourWritesMiddleware gives every request a RoutingState:
+
+- A request whose session committed a write answers with a
+  `db_primary_until` cookie, set DB_READ_YOUR_WRITES_SECONDS ahead.
+- Requests that carry an unexpired cookie read from the primary.
+
+The state lives in the cookie, not in the process, so stickiness holds
+across workers. Kept free of SQLAlchemy imports so main can add the
+middleware without importing the database layer.
+"""
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from http.cookies import SimpleCookie
+from typing import Optional
+
+STICKY_COOKIE = "db_primary_until"
+
+
+@dataclass
+class RoutingState:
+    primary_until: float = 0.0 # Unix time until which reads go to the primary
+    wrote: bool = False # A session committed a write during this request
+
+
+_routing_state: ContextVar[Optional[RoutingState]] = ContextVar("db_routing_state", default=None)
+
+
+def prefers_primary() -> bool:
+    """True inside a request from a client that wrote within the stickiness window."""
+    state = _routing_state.get()
+    return state is not None and state.primary_until > time.time()
+
+
+def note_write() -> None:
+    """Records that the current request committed a write (no-op outside requests)."""
+    state = _routing_state.get()
+    if state is not None:
+        state.wrote = True
+
+
+def _sticky_until(headers) -> float:
+    for name, value in headers:
+        if name == b"cookie":
+            morsel = SimpleCookie(value.decode("latin-1")).get(STICKY_COOKIE)
+            if morsel is not None:
+                try:
+                    return float(morsel.value)
+                except ValueError:
+                    return 0.0
+    return 0.0
+
+
+class ReadYourWritesMiddleware:
+    """Pure ASGI middleware that carries the stickiness window in a cookie (add it only when replicas exist)."""
+
+    def __init__(self, app, window_seconds: float):
+        self.app = app
+        self.window_seconds = window_seconds
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        # A mutable state object, so writes inside endpoints and threadpool copies of the context reach us
+        state = RoutingState(primary_until=_sticky_until(scope["headers"]))
+        token = _routing_state.set(state)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and state.wrote:
+                until = time.time() + self.window_seconds
+                cookie = f"{STICKY_COOKIE}={until:.3f}; Max-Age={int(self.window_seconds) + 1}; Path=/; HttpOnly; SameSite=Lax"
+                message["headers"] = list(message.get("headers", [])) + [(b"set-cookie", cookie.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _routing_state.reset(token)
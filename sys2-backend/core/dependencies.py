@@ -0,0 +1,89 @@
+from typing import Optional
+
+from fastapi import Cookie, Depends, HTTPException, status
+from sqlalchemy import event, inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
+
+from config import settings
+from core.cache import TTLCache
+from core.enums import SIGN_IN_STATUSES, UserRole
+from core.security import decode_access_token
+from database import get_async_db
+from models.user import User, email_matches
+
+credentials_exception = HTTPException(
+    status_code=status.HTTP_401_UNAUTHORIZED,
+    detail="Could not validate credentials",
+    headers={"WWW-Authenticate": "Bearer"},
+)
+
+# --- User Row Cache ---
+# email -> column values of the User row. Entries are dropped whenever this
+# process updates the row; the TTL bounds staleness for changes made elsewhere.
+
+user_cache = TTLCache(maxsize=settings.USER_CACHE_MAX_ENTRIES, ttl_seconds=settings.USER_CACHE_TTL_SECONDS)
+
+_USER_ATTRIBUTES = [attr.key for attr in inspect(User).column_attrs]
+
+
+def invalidate_cached_user(email: str) -> None:
+    user_cache.pop(email)
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_user_on_change(mapper, connection, target):
+    invalidate_cached_user(target.email)
+    for old_email in inspect(target).attrs.email.history.deleted or ():
+        invalidate_cached_user(old_email)
+
+
+def _user_from_cache(values: dict) -> User:
+    user = User(**values)
+    make_transient_to_detached(user) # Clears change history so it merges as an unmodified row
+    return user
+
+
+# --- Dependencies ---
+
+async def authenticate_access_token(db: AsyncSession, access_token: Optional[str]) -> Optional[User]:
+    """The user an access token belongs to, or None if the token is missing or invalid, or the user is gone or may not sign in."""
+    if not access_token:
+        return None
+    claims = decode_access_token(access_token)
+    if claims is None:
+        return None
+
+    email = claims["sub"]
+    values = user_cache.get(email)
+    if values is not None:
+        if values["status"] not in SIGN_IN_STATUSES:
+            return None
+        # Attach the cached row to this session without a SELECT
+        return await db.merge(_user_from_cache(values), load=False)
+
+    user = await db.scalar(select(User).where(email_matches(email)))
+    if user is None:
+        return None
+    user_cache.set(email, {key: getattr(user, key) for key in _USER_ATTRIBUTES})
+    if user.status not in SIGN_IN_STATUSES: # Deactivated since the token was issued
+        return None
+    return user
+
+
+async def get_current_user(
+    access_token: Optional[str] = Cookie(None),
+    db: AsyncSession = Depends(get_async_db),
+) -> User:
+    """Resolves the user from the access_token cookie set by /auth/login."""
+    user = await authenticate_access_token(db, access_token)
+    if user is None:
+        raise credentials_exception
+    return user
+
+
+async def get_current_sys_admin(current_user: User = Depends(get_current_user)) -> User:
+    if current_user.role != UserRole.SYS_ADMIN:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="SYS admin privileges required")
+    return current_user
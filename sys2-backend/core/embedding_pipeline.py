@@ -0,0 +1,385 @@
+"""Incremental profile embedding pipeline.
+
+    python -m core.embedding_pipeline [--once] [--reset] [--status] [--workers N] [--batch-size N]
+
+Profiles are read in (users.updated_at, users.id) order, one page of
+EMBEDDING_SCAN_SIZE rows at a time, starting after the watermark stored in
+`embedding_pipeline_states`. For each row the profile text is hashed
+together with the encoder name. Rows whose hash matches the stored
+embedding are skipped, so a touched but unchanged profile (a status change,
+a login that bumps updated_at) costs a hash and no encoder call. Dirty
+profiles are split into fixed-size EMBEDDING_BATCH_SIZE batches and encoded
+in a worker pool while the next page is read. The vectors are then written
+with one bulk upsert.
+
+The upsert and the watermark advance share one transaction per page, so a
+crash loses at most the page in flight, and a restart resumes after the
+last committed page. The watermark is advanced with compare-and-set, so a
+second runner can't move it backwards; it stops instead.
+
+Rows updated within the last EMBEDDING_SETTLE_SECONDS are left for the
+next run. A transaction that is still open when its updated_at timestamp
+is taken can commit after the watermark has passed it. `--reset` rescans
+everything and only re-encodes what actually changed.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Set, Tuple
+
+import numpy as np
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import delete, func, select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import settings
+from core.embeddings import PROFILE_TEXT_FIELDS, Encoder, build_encoder, content_hash, profile_text
+from core.logging_config import configure_logging
+from core.metrics import (
+    EMBEDDING_BACKLOG, EMBEDDING_ENCODE_SPAN, EMBEDDING_THROUGHPUT, EMBEDDINGS_UNCHANGED, EMBEDDINGS_WRITTEN,
+)
+from database import AsyncSessionLocal
+from models.embedding_pipeline_state import EmbeddingPipelineState
+from models.profile_embedding import ProfileEmbedding
+from models.user import User
+
+logger = logging.getLogger(__name__)
+
+PIPELINE_NAME = "profiles"
+
+Watermark = Tuple[Optional[datetime], Optional[int]] # (users.updated_at, users.id) of the last committed row
+
+
+@dataclass
+class PipelineStats:
+    scanned: int = 0 # Profiles read past the watermark
+    embedded: int = 0 # Profiles (re-)encoded and upserted
+    unchanged: int = 0 # Skipped: content hash matched
+    cleared: int = 0 # Embeddings deleted because the profile text is now empty
+    pages: int = 0
+    elapsed_seconds: float = 0.0
+    backlog: int = 0 # Profiles past the watermark after the run (including unsettled ones)
+    interrupted: bool = False # Another runner advanced the watermark first
+
+    @property
+    def profiles_per_second(self) -> float:
+        return self.embedded / self.elapsed_seconds if self.elapsed_seconds else 0.0
+
+
+@dataclass
+class _PagePlan:
+    embed_rows: list = field(default_factory=list) # Row objects whose text changed
+    texts: List[str] = field(default_factory=list)
+    hashes: List[str] = field(default_factory=list)
+    cleared_ids: List[int] = field(default_factory=list)
+    unchanged: int = 0
+    space_ids: Set[int] = field(default_factory=set)
+
+
+# --- Worker pool ---
+# Each worker process builds its own encoder once (a real model loads its weights here)
+
+_worker_encoder: Optional[Encoder] = None
+
+
+def _init_worker(encoder_spec: Optional[str], dim: int) -> None:
+    global _worker_encoder
+    _worker_encoder = build_encoder(encoder_spec, dim)
+
+
+def _encode_in_worker(texts: List[str]) -> np.ndarray:
+    return _worker_encoder.encode(texts)
+
+
+class EmbeddingPipeline:
+    def __init__(
+        self,
+        encoder_spec: Optional[str] = None,
+        batch_size: Optional[int] = None,
+        scan_size: Optional[int] = None,
+        workers: Optional[int] = None,
+        settle_seconds: Optional[float] = None,
+        name: str = PIPELINE_NAME,
+    ):
+        self.encoder_spec = encoder_spec
+        self.encoder = build_encoder(encoder_spec)
+        self.batch_size = batch_size or settings.EMBEDDING_BATCH_SIZE
+        self.scan_size = scan_size or settings.EMBEDDING_SCAN_SIZE
+        self.settle_seconds = settings.EMBEDDING_SETTLE_SECONDS if settle_seconds is None else settle_seconds
+        self.name = name
+        workers = settings.EMBEDDING_WORKERS if workers is None else workers
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._start_executor()
+
+    def _start_executor(self) -> None:
+        if self.workers > 0: # 0 = encode in the threadpool of this process
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, initializer=_init_worker, initargs=(self.encoder_spec, self.encoder.dim)
+            )
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    # --- State ---
+
+    async def _load_state(self, db: AsyncSession, reset: bool = False) -> EmbeddingPipelineState:
+        state = await db.get(EmbeddingPipelineState, self.name, populate_existing=True)
+        if state is None:
+            state = EmbeddingPipelineState(name=self.name, encoder=self.encoder.name)
+            db.add(state)
+        elif reset or state.encoder != self.encoder.name:
+            if state.encoder != self.encoder.name:
+                logger.info("Encoder changed from %s to %s, re-embedding all profiles", state.encoder, self.encoder.name)
+            state.encoder = self.encoder.name
+            state.watermark_at = state.watermark_id = None
+        await db.commit()
+        return state
+
+    def _timestamp(self, db: AsyncSession, value: datetime):
+        # SQLite compares timestamps as text: server-side now() stores 'YYYY-MM-DD HH:MM:SS' while bound
+        # datetimes render with microseconds, so normalize the bound value the same way
+        if db.get_bind().dialect.name == "sqlite":
+            return func.datetime(value)
+        return value
+
+    def _after(self, db: AsyncSession, watermark: Watermark) -> list:
+        watermark_at, watermark_id = watermark
+        if watermark_at is None:
+            return [User.updated_at.is_not(None)]
+        return [tuple_(User.updated_at, User.id) > tuple_(self._timestamp(db, watermark_at), watermark_id)]
+
+    async def backlog(self, db: AsyncSession, watermark: Optional[Watermark] = None) -> int:
+        """Profiles past the watermark; they'll be scanned (and re-encoded if changed) on the next run."""
+        if watermark is None:
+            state = await db.get(EmbeddingPipelineState, self.name, populate_existing=True)
+            watermark = (None, None) if state is None or state.encoder != self.encoder.name else (state.watermark_at, state.watermark_id)
+        return await db.scalar(select(func.count()).select_from(User).where(*self._after(db, watermark)))
+
+    # --- Pages ---
+
+    async def _fetch_page(self, db: AsyncSession, watermark: Watermark, cutoff: datetime) -> list:
+        return (await db.execute(
+            select(User.id, User.updated_at, User.space_id, ProfileEmbedding.content_hash,
+                   *(getattr(User, name) for name in PROFILE_TEXT_FIELDS))
+            .outerjoin(ProfileEmbedding, ProfileEmbedding.user_id == User.id)
+            .where(*self._after(db, watermark), User.updated_at <= self._timestamp(db, cutoff))
+            .order_by(User.updated_at, User.id)
+            .limit(self.scan_size)
+        )).all()
+
+    def _plan(self, page: list) -> _PagePlan:
+        plan = _PagePlan()
+        for row in page:
+            text = profile_text([getattr(row, name) for name in PROFILE_TEXT_FIELDS])
+            if not text: # Blank profiles aren't matched at all
+                if row.content_hash is not None:
+                    plan.cleared_ids.append(row.id)
+                    plan.space_ids.add(row.space_id)
+                continue
+            digest = content_hash(self.encoder.name, text)
+            if digest == row.content_hash:
+                plan.unchanged += 1
+                continue
+            plan.embed_rows.append(row)
+            plan.texts.append(text)
+            plan.hashes.append(digest)
+            plan.space_ids.add(row.space_id)
+        return plan
+
+    async def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        with EMBEDDING_ENCODE_SPAN.time(): # Includes time queued behind other batches
+            if self._executor is None:
+                return await run_in_threadpool(self.encoder.encode, texts)
+            try:
+                return await asyncio.get_running_loop().run_in_executor(self._executor, _encode_in_worker, texts)
+            except BrokenProcessPool:
+                # A worker died (e.g. OOM-killed); replace the pool, the page is retried on the next run
+                self.close()
+                self._start_executor()
+                raise
+
+    async def _encode(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, self.encoder.dim), dtype=np.float32)
+        batches = [texts[start:start + self.batch_size] for start in range(0, len(texts), self.batch_size)]
+        return np.concatenate(await asyncio.gather(*(self._encode_batch(batch) for batch in batches)))
+
+    def _upsert_statement(self, db: AsyncSession):
+        if db.get_bind().dialect.name == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        statement = insert(ProfileEmbedding)
+        return statement.on_conflict_do_update(
+            index_elements=[ProfileEmbedding.user_id],
+            set_={
+                "embedding": statement.excluded.embedding,
+                "content_hash": statement.excluded.content_hash,
+                "source_updated_at": statement.excluded.source_updated_at,
+                "updated_at": func.now(),
+            },
+        )
+
+    async def _commit_page(self, db: AsyncSession, plan: _PagePlan, vectors: np.ndarray, old: Watermark, new: Watermark) -> bool:
+        """Writes one page and advances the watermark in a single transaction; False if another runner got there first."""
+        if plan.embed_rows:
+            await db.execute(self._upsert_statement(db), [
+                {"user_id": row.id, "embedding": vector, "content_hash": digest, "source_updated_at": row.updated_at}
+                for row, vector, digest in zip(plan.embed_rows, vectors, plan.hashes)
+            ])
+        if plan.cleared_ids:
+            await db.execute(delete(ProfileEmbedding).where(ProfileEmbedding.user_id.in_(plan.cleared_ids)))
+
+        old_at, old_id = old
+        advanced = await db.execute(
+            update(EmbeddingPipelineState)
+            .where(
+                EmbeddingPipelineState.name == self.name,
+                EmbeddingPipelineState.encoder == self.encoder.name,
+                EmbeddingPipelineState.watermark_at.is_(None) if old_at is None else EmbeddingPipelineState.watermark_at == old_at,
+                EmbeddingPipelineState.watermark_id.is_(None) if old_id is None else EmbeddingPipelineState.watermark_id == old_id,
+            )
+            .values(watermark_at=new[0], watermark_id=new[1])
+            .execution_options(synchronize_session=False)
+        )
+        if advanced.rowcount != 1:
+            await db.rollback()
+            return False
+        await db.commit()
+        return True
+
+    async def run(self, db: AsyncSession, reset: bool = False, max_pages: Optional[int] = None) -> PipelineStats:
+        """Embeds every settled profile changed since the watermark; commits once per page."""
+        started = time.perf_counter()
+        stats = PipelineStats()
+        state = await self._load_state(db, reset=reset)
+        watermark: Watermark = (state.watermark_at, state.watermark_id)
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=self.settle_seconds)
+        changed_spaces: Set[int] = set()
+
+        page = await self._fetch_page(db, watermark, cutoff)
+        while page:
+            plan = self._plan(page)
+            encoding = asyncio.ensure_future(self._encode(plan.texts))
+            try:
+                next_watermark = (page[-1].updated_at, page[-1].id)
+                more = max_pages is None or stats.pages + 1 < max_pages
+                next_page = await self._fetch_page(db, next_watermark, cutoff) if more else [] # Overlaps the encoding
+                vectors = await encoding
+            finally:
+                if not encoding.done():
+                    encoding.cancel()
+
+            if not await self._commit_page(db, plan, vectors, watermark, next_watermark):
+                logger.warning("Embedding pipeline '%s' watermark moved under us; another runner is active, stopping", self.name)
+                stats.interrupted = True
+                break
+            watermark = next_watermark
+            stats.pages += 1
+            stats.scanned += len(page)
+            stats.embedded += len(plan.embed_rows)
+            stats.unchanged += plan.unchanged
+            stats.cleared += len(plan.cleared_ids)
+            changed_spaces |= plan.space_ids
+            EMBEDDINGS_WRITTEN.inc(len(plan.embed_rows))
+            EMBEDDINGS_UNCHANGED.inc(plan.unchanged)
+            page = next_page
+
+        stats.elapsed_seconds = time.perf_counter() - started
+        stats.backlog = await self.backlog(db, watermark)
+        await db.commit()
+        EMBEDDING_BACKLOG.set(stats.backlog)
+        if stats.embedded:
+            EMBEDDING_THROUGHPUT.set(stats.profiles_per_second)
+        self._invalidate_matching(changed_spaces)
+        return stats
+
+    def _invalidate_matching(self, space_ids: Set[int]) -> None:
+        from core.matching import get_matching_backend
+        backend = get_matching_backend()
+        for space_id in space_ids - {None}:
+            backend.invalidate(space_id)
+
+
+def format_stats(stats: PipelineStats) -> str:
+    return (
+        f"scanned {stats.scanned}, embedded {stats.embedded}, unchanged {stats.unchanged}, cleared {stats.cleared} "
+        f"in {stats.elapsed_seconds:.2f} s ({stats.profiles_per_second:.0f} profiles/s), backlog {stats.backlog}"
+    )
+
+
+# --- Background worker ---
+
+async def run_embedding_worker(pipeline: Optional[EmbeddingPipeline] = None) -> None:
+    """Runs the pipeline until cancelled; sleeps EMBEDDING_WORKER_POLL_SECONDS between runs."""
+    pipeline = pipeline or EmbeddingPipeline()
+    try:
+        while True:
+            try:
+                async with AsyncSessionLocal() as db:
+                    stats = await pipeline.run(db)
+                if stats.scanned:
+                    logger.info("Embedding pipeline: %s", format_stats(stats))
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Embedding pipeline run failed")
+            await asyncio.sleep(settings.EMBEDDING_WORKER_POLL_SECONDS)
+    finally:
+        pipeline.close()
+
+
+def start_embedding_worker() -> asyncio.Task:
+    return asyncio.create_task(run_embedding_worker(), name="embedding-pipeline-worker")
+
+
+async def stop_embedding_worker(task: asyncio.Task) -> None:
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+
+
+async def _main(args) -> None:
+    from database import async_engine
+
+    pipeline = EmbeddingPipeline(batch_size=args.batch_size, scan_size=args.scan_size, workers=args.workers)
+    try:
+        async with AsyncSessionLocal() as db:
+            if args.status:
+                print(f"encoder {pipeline.encoder.name}, backlog {await pipeline.backlog(db)}")
+                return
+            reset = args.reset
+            while True:
+                stats = await pipeline.run(db, reset=reset)
+                reset = False
+                print(format_stats(stats), flush=True)
+                if args.once or stats.interrupted:
+                    break
+                await asyncio.sleep(settings.EMBEDDING_WORKER_POLL_SECONDS)
+    finally:
+        pipeline.close()
+        await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Embed new and changed user profiles.")
+    parser.add_argument("--once", action="store_true", help="Run once instead of polling")
+    parser.add_argument("--reset", action="store_true", help="Rescan all profiles (only changed ones are re-encoded)")
+    parser.add_argument("--status", action="store_true", help="Print the backlog and exit")
+    parser.add_argument("--workers", type=int, default=None, help="Encoder processes (0 = in-process)")
+    parser.add_argument("--batch-size", type=int, default=None)
+    parser.add_argument("--scan-size", type=int, default=None)
+    args = parser.parse_args()
+    configure_logging(settings.LOG_LEVEL, settings.LOG_FORMAT)
+    asyncio.run(_main(args))
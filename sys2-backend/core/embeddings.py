@@ -0,0 +1,120 @@
+"""Profile text encoders.
+
+An encoder turns a batch of profile texts into a (batch x dim) float32
+matrix. Its `name` identifies the model *and* its parameters. The name is
+part of every content hash, so switching encoders re-embeds every profile.
+
+EMBEDDING_ENCODER picks the encoder:
+- 'hashing': HashingEncoder. Deterministic, no model download or network,
+  fine for offline tests and benchmarks.
+- 'package.module:factory': any callable taking `dim` and returning an
+  object with `name`, `dim` and `encode(texts)`. Use this to plug in a real
+  model, e.g. a sentence-transformers wrapper.
+"""
+import abc
+import hashlib
+import importlib
+import re
+from functools import lru_cache
+from typing import Iterable, Optional, Sequence, Tuple
+
+import numpy as np
+
+from config import settings
+
+TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9+#.]*")
+
+# User columns that make up the profile text, in the order they are concatenated
+PROFILE_TEXT_FIELDS = (
+    "short_bio",
+    "project_interests_goals",
+    "skills_tags",
+    "industry_focus_tags",
+    "tools_technologies_tags",
+    "collaboration_preferences_tags",
+)
+
+
+def profile_text(values: Sequence) -> str:
+    """Profile text from PROFILE_TEXT_FIELDS values (strings or tag lists); empty if the profile is blank."""
+    parts = []
+    for value in values:
+        if not value:
+            continue
+        if isinstance(value, (list, tuple)):
+            value = ", ".join(str(tag) for tag in value if tag)
+        parts.append(str(value).strip())
+    return "\n".join(part for part in parts if part)
+
+
+def content_hash(encoder_name: str, text: str) -> str:
+    return hashlib.sha256(f"{encoder_name}\n{text}".encode()).hexdigest()
+
+
+class Encoder(abc.ABC):
+    """What build_encoder returns; plugged-in encoders should subclass it."""
+    name: str
+    dim: int
+
+    @abc.abstractmethod
+    def encode(self, texts: Sequence[str]) -> np.ndarray:
+        """A (len(texts) x dim) float32 matrix, one row per text."""
+        ...
+
+
+@lru_cache(maxsize=1 << 17)
+def _bucket(feature: str, dim: int) -> Tuple[int, float]:
+    # Module level, so the cache doesn't hold on to encoder instances; shared by encoders of the same dim
+    digest = int.from_bytes(hashlib.blake2b(feature.encode(), digest_size=8).digest(), "little")
+    return digest % dim, 1.0 if digest >> 63 else -1.0 # Top bit picks the sign, so collisions cancel out on average
+
+
+class HashingEncoder(Encoder):
+    """
+    Feature hashing of unigrams and bigrams with sublinear TF weights
+    (1 + log tf), signed buckets and L2 normalization.
+
+    No IDF is applied. IDF weights depend on the whole corpus, so every
+    vector would change whenever any profile changes, and incremental
+    updates would be pointless. The same text always gives the same vector.
+    """
+
+    def __init__(self, dim: int, ngrams: int = 2):
+        self.dim = dim
+        self.ngrams = ngrams
+        self.name = f"hashing-v1-d{dim}-n{ngrams}"
+
+    def _features(self, text: str) -> Iterable[str]:
+        tokens = TOKEN_RE.findall(text.lower())
+        yield from tokens
+        for n in range(2, self.ngrams + 1):
+            for i in range(len(tokens) - n + 1):
+                yield " ".join(tokens[i:i + n])
+
+    def encode(self, texts):
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            counts = {}
+            for feature in self._features(text):
+                counts[feature] = counts.get(feature, 0) + 1
+            for feature, count in counts.items():
+                bucket, sign = _bucket(feature, self.dim)
+                vectors[row, bucket] += sign * (1.0 + np.log(count))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+
+def build_encoder(spec: Optional[str] = None, dim: Optional[int] = None) -> Encoder:
+    spec = spec or settings.EMBEDDING_ENCODER
+    dim = dim or settings.EMBEDDING_DIM
+    if spec == "hashing":
+        encoder = HashingEncoder(dim)
+    elif ":" in spec:
+        module_name, factory_name = spec.split(":", 1)
+        encoder = getattr(importlib.import_module(module_name), factory_name)(dim)
+    else:
+        raise ValueError(f"Unknown EMBEDDING_ENCODER '{spec}'. Use 'hashing' or 'package.module:factory'.")
+    if encoder.dim != dim:
+        raise ValueError(f"Encoder '{encoder.name}' produces {encoder.dim}-d vectors, EMBEDDING_DIM is {dim}.")
+    return encoder
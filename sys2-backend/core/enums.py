@@ -0,0 +1,43 @@
+"""Enums shared by the ORM models (as database enum types) and the API schemas.
+
+Members are `str` subclasses whose values are the strings stored before the
+columns became enums, so comparisons with plain strings keep working and
+existing rows convert without remapping.
+"""
+import enum
+
+
+class _StrEnum(str, enum.Enum):
+    def __str__(self) -> str:
+        return self.value # So f-strings and logs show 'Startup', not 'UserRole.STARTUP'
+
+
+class UserRole(_StrEnum):
+    STARTUP = "Startup"
+    FREELANCER = "Freelancer"
+    CORPORATE = "Corporate"
+    STARTUP_ADMIN = "StartupAdmin"
+    STARTUP_MEMBER = "StartupMember"
+    CORPORATE_ADMIN = "CorporateAdmin"
+    SYS_ADMIN = "SysAdmin"
+
+
+class UserStatus(_StrEnum):
+    WAITLISTED = "Waitlisted" # Registered, email not verified yet
+    ACTIVE_WAITLIST = "ActiveWaitlist" # Verified, waiting to be let in
+    PENDING_ONBOARDING = "PendingOnboarding" # Corporate, email not verified yet
+    ACTIVE_PENDING = "ActivePending" # Corporate, verified, onboarding not finished
+    ACTIVE = "Active"
+    INACTIVE = "Inactive"
+
+
+# Roles a user may pick at registration
+SELF_SERVICE_ROLES = (UserRole.STARTUP, UserRole.FREELANCER, UserRole.CORPORATE)
+WAITLIST_STATUSES = (UserStatus.WAITLISTED, UserStatus.ACTIVE_WAITLIST)
+# Statuses that may hold a session (refresh tokens): email verified and not deactivated
+SIGN_IN_STATUSES = (UserStatus.ACTIVE_WAITLIST, UserStatus.ACTIVE_PENDING, UserStatus.ACTIVE)
+
+
+def enum_values(enum_class) -> list:
+    """values_callable for sqlalchemy.Enum: store member values ('Startup'), not names ('STARTUP')."""
+    return [member.value for member in enum_class]
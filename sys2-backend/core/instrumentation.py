@@ -0,0 +1,151 @@
+import cProfile
+import heapq
+import io
+import itertools
+import pstats
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from config import settings
+from core.metrics import HTTP_REQUEST_SECONDS, HTTP_RESPONSES
+
+UNMATCHED_ROUTE = "<unmatched>" # Keeps 404 scans from creating one label per path
+
+
+# --- Request Metrics ---
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware recording latency and status per route template (e.g. /auth/me),
+    not per raw path, so label cardinality stays bounded.
+    """
+
+    def __init__(self, app, profiler: Optional["RequestProfiler"] = None):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500 # Reported if the app raises before starting a response
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        profile = self.profiler.start(scope) if self.profiler is not None else None
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            route = scope.get("route") # Set by the router once a route matched
+            route_label = getattr(route, "path", UNMATCHED_ROUTE)
+            method = scope["method"]
+            HTTP_REQUEST_SECONDS.labels(method, route_label).observe(elapsed)
+            HTTP_RESPONSES.labels(method, route_label, str(status_code)).inc()
+            if profile is not None:
+                self.profiler.finish(profile, scope, elapsed, status_code)
+
+
+# --- Request Profiling ---
+
+@dataclass(order=True)
+class RequestProfile:
+    duration_ms: float
+    id: int = field(compare=False)
+    method: str = field(compare=False)
+    path: str = field(compare=False)
+    status: int = field(compare=False)
+    forced: bool = field(compare=False) # Requested via header rather than sampled
+    stats: str = field(compare=False, repr=False)
+
+
+class RequestProfiler:
+    """
+    cProfile-based request profiler. Requests carrying `header` are always profiled; other
+    requests are sampled at `sample_rate` and only the `keep_slowest` slowest are retained.
+
+    cProfile hooks the whole event loop thread, so a profile also contains whatever other
+    requests ran while it was awaiting. Only one profile runs at a time per process.
+    """
+
+    def __init__(self, header: str, sample_rate: float, keep_slowest: int, keep_forced: int = 20):
+        self.header = header.lower().encode("latin-1")
+        self.sample_rate = sample_rate
+        self.keep_slowest = keep_slowest
+        self._slowest: List[RequestProfile] = [] # Min-heap on duration
+        self._forced: List[RequestProfile] = []
+        self._keep_forced = keep_forced
+        self._ids = itertools.count(1)
+        self._active = threading.Lock()
+
+    def _wanted(self, scope) -> Optional[bool]:
+        """True = forced by header, False = sampled, None = don't profile."""
+        for name, value in scope.get("headers", ()):
+            if name == self.header and value not in (b"", b"0", b"false"):
+                return True
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return False
+        return None
+
+    def start(self, scope):
+        forced = self._wanted(scope)
+        if forced is None or not self._active.acquire(blocking=False):
+            return None
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return profiler, forced
+
+    def finish(self, handle, scope, elapsed: float, status_code: int) -> None:
+        profiler, forced = handle
+        profiler.disable()
+        self._active.release()
+
+        duration_ms = elapsed * 1000
+        if not forced and len(self._slowest) >= self.keep_slowest and duration_ms <= self._slowest[0].duration_ms:
+            return # Faster than everything we keep; skip formatting the stats
+
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(40)
+        profile = RequestProfile(
+            duration_ms=round(duration_ms, 3),
+            id=next(self._ids),
+            method=scope["method"],
+            path=scope["path"],
+            status=status_code,
+            forced=forced,
+            stats=out.getvalue(),
+        )
+        if forced:
+            self._forced.append(profile)
+            del self._forced[:-self._keep_forced]
+        elif len(self._slowest) < self.keep_slowest:
+            heapq.heappush(self._slowest, profile)
+        else:
+            heapq.heapreplace(self._slowest, profile)
+
+    def profiles(self) -> List[RequestProfile]:
+        return sorted(self._slowest + self._forced, reverse=True)
+
+    def get(self, profile_id: int) -> Optional[RequestProfile]:
+        return next((p for p in self._slowest + self._forced if p.id == profile_id), None)
+
+
+_profiler: Optional[RequestProfiler] = None
+
+
+def get_profiler() -> Optional[RequestProfiler]:
+    """The process-wide profiler, or None when PROFILING_ENABLED is off."""
+    global _profiler
+    if _profiler is None and settings.PROFILING_ENABLED:
+        _profiler = RequestProfiler(
+            settings.PROFILING_HEADER, settings.PROFILING_SAMPLE_RATE, settings.PROFILING_KEEP_SLOWEST,
+        )
+    return _profiler
@@ -0,0 +1,108 @@
+"""Routers that are imported on first use.
+
+Importing a router module pulls in its schemas, services and their
+dependencies (NumPy for matching, email_validator for the auth schemas, ...).
+Importing every router up front makes the whole app pay for that before the
+first request is served. include_lazy_router registers a placeholder route
+for the router's prefix instead. The first request under the prefix imports
+the module, includes its router exactly as app.include_router would, removes
+the placeholder and routes the request again.
+
+A preload task (start_router_preload) imports the rest in a worker thread
+shortly after startup, so users rarely hit a cold router. The OpenAPI schema
+loads every router before it is built, so /docs stays complete. Set
+LAZY_ROUTERS=false to import everything at startup, e.g. to surface import
+errors in CI.
+"""
+import asyncio
+import importlib
+import logging
+from typing import List, Optional
+
+from fastapi import FastAPI
+from starlette.routing import BaseRoute, Match, NoMatchFound
+
+logger = logging.getLogger(__name__)
+
+
+class LazyRouterRoute(BaseRoute):
+    """Placeholder for `module_name.router`, mounted at prefix, until the first request under it."""
+
+    def __init__(self, app: FastAPI, module_name: str, prefix: str, **include_kwargs):
+        self.app = app
+        self.module_name = module_name
+        self.prefix = prefix
+        self.include_kwargs = include_kwargs
+        self.loaded = False
+
+    def matches(self, scope):
+        if scope["type"] in ("http", "websocket"):
+            path = scope["path"]
+            root_path = scope.get("root_path", "")
+            if root_path and path.startswith(root_path):
+                path = path[len(root_path):]
+            if path == self.prefix or path.startswith(self.prefix + "/"):
+                return Match.FULL, {}
+        return Match.NONE, {}
+
+    def load(self) -> None:
+        """Imports the router module (if needed) and swaps this placeholder for its routes."""
+        if self.loaded:
+            return
+        router = importlib.import_module(self.module_name).router
+        self.app.include_router(router, prefix=self.prefix, **self.include_kwargs)
+        self.app.router.routes.remove(self)
+        self.app.openapi_schema = None
+        self.loaded = True
+
+    async def handle(self, scope, receive, send):
+        self.load()
+        await self.app.router.app(scope, receive, send) # Dispatch again, now to the real routes
+
+    def url_path_for(self, name, /, **path_params):
+        raise NoMatchFound(name, path_params)
+
+
+def include_lazy_router(app: FastAPI, module_name: str, prefix: str, lazy: bool = True, **include_kwargs) -> None:
+    """app.include_router(module.router, prefix=prefix, ...), deferred to the first request if lazy."""
+    route = LazyRouterRoute(app, module_name, prefix, **include_kwargs)
+    app.router.routes.append(route)
+    if not lazy:
+        route.load()
+
+
+def pending_lazy_routers(app: FastAPI) -> List[LazyRouterRoute]:
+    return [route for route in app.router.routes if isinstance(route, LazyRouterRoute)]
+
+
+def load_lazy_routers(app: FastAPI) -> None:
+    for route in pending_lazy_routers(app):
+        route.load()
+
+
+async def _preload(app: FastAPI, delay_seconds: float) -> None:
+    await asyncio.sleep(delay_seconds)
+    for route in pending_lazy_routers(app):
+        try:
+            # The import runs in a thread; swapping in the routes stays on the event loop
+            await asyncio.to_thread(importlib.import_module, route.module_name)
+            route.load()
+        except Exception:
+            logger.exception("Preloading router %s failed; it loads on its first request instead", route.module_name)
+
+
+def start_router_preload(app: FastAPI, delay_seconds: Optional[float]) -> Optional[asyncio.Task]:
+    """Loads the remaining lazy routers in the background after delay_seconds (None = only on first use)."""
+    if delay_seconds is None or not pending_lazy_routers(app):
+        return None
+    return asyncio.create_task(_preload(app, delay_seconds), name="router-preload")
+
+
+async def stop_router_preload(task: Optional[asyncio.Task]) -> None:
+    if task is None:
+        return
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
@@ -0,0 +1,45 @@
+import json
+import logging
+import sys
+import time
+
+# Attributes every LogRecord has; anything else was passed via extra= and is emitted as a field
+_RESERVED_ATTRS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line. Arguments are only interpolated for records that pass the level check."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class _UTCFormatter(logging.Formatter):
+    converter = time.gmtime
+
+
+def configure_logging(level: str = "INFO", fmt: str = "json") -> None:
+    """Installs a single stdout handler on the root logger (replacing any existing ones)."""
+    handler = logging.StreamHandler(sys.stdout)
+    if fmt == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(_UTCFormatter("%(asctime)sZ %(levelname)s %(name)s: %(message)s"))
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(level.upper())
+    # SQLAlchemy logs every statement/pool event at INFO once the root level allows it. Pool
+    # loggers are named after the pool class's module, so our instrumented pools log under database.*
+    for name in ("sqlalchemy", "database.InstrumentedQueuePool", "database.InstrumentedAsyncQueuePool"):
+        logging.getLogger(name).setLevel(logging.WARNING)
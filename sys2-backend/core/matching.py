@@ -0,0 +1,239 @@
+"""Intra-space matching backends.
+
+Both backends answer "top-k users in my space most similar to me",
+excluding the user themselves, members of their company, inactive users
+and users blocked in either direction.
+
+- NumpyMatchingBackend keeps one SpaceIndex (core.vector_index) per space,
+  built from profile_embeddings on first use and rebuilt after
+  MATCHING_INDEX_TTL_SECONDS (or when invalidated). With MATCHING_INDEX_DIR
+  set, built indexes are snapshotted to disk and other workers memory-map
+  the snapshot instead of rebuilding it. A snapshot records a watermark of
+  the rows it was built from and is only used while the database still
+  gives the same one, so invalidations missed by this worker (e.g. while it
+  was down) can't keep a stale snapshot in use.
+- PgVectorMatchingBackend runs the search in PostgreSQL with the pgvector
+  `<=>` (cosine distance) operator; needs EMBEDDING_STORAGE=pgvector.
+"""
+import abc
+import asyncio
+import glob
+import os
+import shutil
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import Float, and_, exists, func, literal, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import settings
+from core.enums import UserStatus
+from core.vector_index import Match, SpaceIndex
+from models.block import Block
+from models.profile_embedding import ProfileEmbedding
+from models.user import User
+
+
+class MatchingBackend(abc.ABC):
+    @abc.abstractmethod
+    async def discover(self, db: AsyncSession, user: User, k: int) -> List[Match]:
+        ...
+
+    def invalidate(self, space_id: Optional[int] = None) -> None:
+        """Drops cached state for a space (or all spaces) after embeddings/blocks change."""
+
+
+def _matchable_in_space(space_id: int) -> list:
+    return [User.space_id == space_id, User.status != UserStatus.INACTIVE]
+
+
+# --- In-process (NumPy) ---
+
+class NumpyMatchingBackend(MatchingBackend):
+    def __init__(
+        self,
+        ttl_seconds: float = 300,
+        index_dir: Optional[str] = None,
+        ann_threshold: Optional[int] = None,
+        hnsw_m: int = 16,
+        hnsw_ef_construction: int = 200,
+        hnsw_ef_search: int = 100,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.index_dir = index_dir
+        self.index_options = {
+            "ann_threshold": ann_threshold,
+            "hnsw_m": hnsw_m,
+            "hnsw_ef_construction": hnsw_ef_construction,
+            "hnsw_ef_search": hnsw_ef_search,
+        }
+        self._indexes: Dict[int, Tuple[float, SpaceIndex]] = {} # space_id -> (built at, index)
+        self._locks: Dict[int, asyncio.Lock] = {}
+
+    def invalidate(self, space_id=None):
+        if space_id is None:
+            self._indexes.clear()
+        else:
+            self._indexes.pop(space_id, None)
+
+    async def discover(self, db, user, k):
+        if user.space_id is None:
+            return []
+        index = await self.get_index(db, user.space_id)
+        return await run_in_threadpool(index.query, user.id, k)
+
+    async def get_index(self, db: AsyncSession, space_id: int) -> SpaceIndex:
+        cached = self._indexes.get(space_id)
+        if cached is not None and time.time() - cached[0] < self.ttl_seconds:
+            return cached[1]
+        lock = self._locks.setdefault(space_id, asyncio.Lock())
+        async with lock: # One build per space at a time; waiters reuse its result
+            cached = self._indexes.get(space_id)
+            if cached is not None and time.time() - cached[0] < self.ttl_seconds:
+                return cached[1]
+            built_at, index = await self._load_or_build(db, space_id)
+            self._indexes[space_id] = (built_at, index)
+            return index
+
+    async def _load_blocks(self, db: AsyncSession, space_id: int) -> List[Tuple[int, int]]:
+        return (await db.execute(
+            select(Block.blocker_id, Block.blocked_id)
+            .join(User, User.id == Block.blocker_id)
+            .where(User.space_id == space_id)
+        )).all()
+
+    async def _watermark(self, db: AsyncSession, space_id: int) -> str:
+        """Summary of the rows an index of the space is built from; any change to them changes it."""
+        count, id_sum, users_updated_at, embeddings_updated_at = (await db.execute(
+            select(func.count(User.id), func.sum(User.id), func.max(User.updated_at), func.max(ProfileEmbedding.updated_at))
+            .join(ProfileEmbedding, ProfileEmbedding.user_id == User.id)
+            .where(*_matchable_in_space(space_id))
+        )).one()
+        return f"{count}:{id_sum or 0}:{users_updated_at}:{embeddings_updated_at}"
+
+    async def _load_or_build(self, db: AsyncSession, space_id: int) -> Tuple[float, SpaceIndex]:
+        blocked_pairs = await self._load_blocks(db, space_id) # Always fresh; snapshots don't include blocks
+        watermark = await self._watermark(db, space_id) if self.index_dir is not None else None
+        snapshot = self._latest_snapshot(space_id)
+        if snapshot is not None:
+            path, built_at = snapshot
+            if time.time() - built_at < self.ttl_seconds and self._snapshot_watermark(path) == watermark:
+                index = await run_in_threadpool(
+                    SpaceIndex.load, path, blocked_pairs, hnsw_ef_search=self.index_options["hnsw_ef_search"]
+                )
+                return built_at, index
+
+        built_at = time.time()
+        rows = (await db.execute(
+            select(User.id, User.company_id, ProfileEmbedding.embedding)
+            .join(ProfileEmbedding, ProfileEmbedding.user_id == User.id)
+            .where(*_matchable_in_space(space_id))
+            .order_by(User.id)
+        )).all()
+        index = await run_in_threadpool(self._build, rows, blocked_pairs)
+        if self.index_dir is not None:
+            await run_in_threadpool(self._save_snapshot, index, space_id, built_at, watermark)
+        return built_at, index
+
+    def _build(self, rows, blocked_pairs) -> SpaceIndex:
+        if not rows:
+            return SpaceIndex([], np.zeros((0, settings.EMBEDDING_DIM), dtype=np.float32), [], **self.index_options)
+        user_ids, company_ids, embeddings = zip(*rows)
+        return SpaceIndex(user_ids, np.stack(embeddings), company_ids, blocked_pairs, **self.index_options)
+
+    # Snapshots live in <index_dir>/space_<id>.<built_at_ns>; a new one is written
+    # under a .tmp name and renamed, so readers never see a partial directory.
+    # The watermark read before building is stored next to the index: if rows
+    # change during the build, the snapshot is already stale and gets rebuilt.
+
+    def _latest_snapshot(self, space_id: int) -> Optional[Tuple[str, float]]:
+        if self.index_dir is None:
+            return None
+        paths = [p for p in glob.glob(os.path.join(self.index_dir, f"space_{space_id}.*")) if not p.endswith(".tmp")]
+        if not paths:
+            return None
+        latest = max(paths, key=lambda p: int(p.rsplit(".", 1)[1]))
+        return latest, int(latest.rsplit(".", 1)[1]) / 1e9
+
+    @staticmethod
+    def _snapshot_watermark(path: str) -> Optional[str]:
+        try:
+            with open(os.path.join(path, "watermark")) as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _save_snapshot(self, index: SpaceIndex, space_id: int, built_at: float, watermark: str) -> None:
+        path = os.path.join(self.index_dir, f"space_{space_id}.{int(built_at * 1e9)}")
+        index.save(path + ".tmp")
+        with open(os.path.join(path + ".tmp", "watermark"), "w") as f:
+            f.write(watermark)
+        os.replace(path + ".tmp", path)
+        # Keep the previous snapshot: another worker may still be loading it
+        older = sorted(
+            (p for p in glob.glob(os.path.join(self.index_dir, f"space_{space_id}.*")) if not p.endswith(".tmp")),
+            key=lambda p: int(p.rsplit(".", 1)[1]),
+        )[:-2]
+        for old in older:
+            shutil.rmtree(old, ignore_errors=True)
+
+
+# --- PostgreSQL (pgvector) ---
+
+class PgVectorMatchingBackend(MatchingBackend):
+    async def discover(self, db, user, k):
+        if user.space_id is None:
+            return []
+        own_embedding = await db.scalar(select(ProfileEmbedding.embedding).where(ProfileEmbedding.user_id == user.id))
+        if own_embedding is None:
+            return []
+
+        distance = ProfileEmbedding.embedding.op("<=>", return_type=Float)(
+            literal(own_embedding, ProfileEmbedding.embedding.type)
+        )
+        blocked = exists().where(or_(
+            and_(Block.blocker_id == user.id, Block.blocked_id == User.id),
+            and_(Block.blocker_id == User.id, Block.blocked_id == user.id),
+        ))
+        conditions = [*_matchable_in_space(user.space_id), User.id != user.id, ~blocked]
+        if user.company_id is not None:
+            conditions.append(or_(User.company_id.is_(None), User.company_id != user.company_id))
+        rows = (await db.execute(
+            select(User.id, distance.label("distance"))
+            .join(ProfileEmbedding, ProfileEmbedding.user_id == User.id)
+            .where(*conditions)
+            .order_by(distance)
+            .limit(k)
+        )).all()
+        return [(row.id, 1.0 - row.distance) for row in rows]
+
+
+_backend: Optional[MatchingBackend] = None
+
+
+def get_matching_backend() -> MatchingBackend:
+    global _backend
+    if _backend is None:
+        if settings.MATCHING_BACKEND == "numpy":
+            _backend = NumpyMatchingBackend(
+                ttl_seconds=settings.MATCHING_INDEX_TTL_SECONDS,
+                index_dir=settings.MATCHING_INDEX_DIR,
+                ann_threshold=settings.MATCHING_ANN_THRESHOLD,
+                hnsw_m=settings.MATCHING_HNSW_M,
+                hnsw_ef_construction=settings.MATCHING_HNSW_EF_CONSTRUCTION,
+                hnsw_ef_search=settings.MATCHING_HNSW_EF_SEARCH,
+            )
+        elif settings.MATCHING_BACKEND == "pgvector":
+            if settings.EMBEDDING_STORAGE != "pgvector":
+                raise ValueError("MATCHING_BACKEND 'pgvector' requires EMBEDDING_STORAGE 'pgvector'.")
+            _backend = PgVectorMatchingBackend()
+        else:
+            raise ValueError(f"Unknown MATCHING_BACKEND '{settings.MATCHING_BACKEND}'. Valid options are 'numpy', 'pgvector'.")
+    return _backend
+
+
+def set_matching_backend(backend: Optional[MatchingBackend]) -> None:
+    global _backend
+    _backend = backend
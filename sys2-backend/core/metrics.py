@@ -0,0 +1,96 @@
+"""Prometheus metrics shared across the backend.
+
+Metrics are registered on prometheus_client's default registry.
+"""
+from prometheus_client import Counter, Gauge, Histogram
+
+# --- Database ---
+
+DB_POOL_SIZE = Gauge("db_pool_size", "Configured pool size", ["engine"])
+DB_POOL_CHECKED_OUT = Gauge("db_pool_checked_out", "Connections currently checked out", ["engine"])
+DB_POOL_OVERFLOW = Gauge("db_pool_overflow", "Connections open beyond pool_size", ["engine"])
+DB_POOL_WAIT_SECONDS = Histogram(
+    "db_pool_wait_seconds", "Time spent waiting to check out a connection", ["engine"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30),
+)
+DB_POOL_TIMEOUTS = Counter("db_pool_timeouts_total", "Checkouts that gave up after pool_timeout", ["engine"])
+DB_QUERY_SECONDS = Histogram(
+    "db_query_seconds", "Statement execution time", ["engine", "statement"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+DB_REPLICA_HEALTHY = Gauge("db_replica_healthy", "1 if the replica is in the read rotation", ["engine"])
+DB_REPLICA_LAG_SECONDS = Gauge("db_replica_lag_seconds", "Replication lag at the last health check", ["engine"])
+DB_READ_SESSIONS = Counter("db_read_sessions_total", "Request sessions by where their reads went", ["target"])
+
+# --- HTTP ---
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_seconds", "Request latency by route template", ["method", "route"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+HTTP_RESPONSES = Counter("http_responses_total", "Responses by route template and status code", ["method", "route", "status"])
+
+# --- Hot-path spans ---
+
+OPERATION_SECONDS = Histogram(
+    "operation_seconds", "Time spent in instrumented operations", ["operation"],
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+# Pre-bound children so the hot paths don't pay for a label lookup
+PASSWORD_HASH_SPAN = OPERATION_SECONDS.labels("password_hash")
+JWT_SIGN_SPAN = OPERATION_SECONDS.labels("jwt_sign")
+JWT_VERIFY_SPAN = OPERATION_SECONDS.labels("jwt_verify")
+EMAIL_SEND_SPAN = OPERATION_SECONDS.labels("email_send_batch")
+EMBEDDING_ENCODE_SPAN = OPERATION_SECONDS.labels("embedding_encode_batch")
+CHAT_PERSIST_SPAN = OPERATION_SECONDS.labels("chat_persist_batch")
+NOTIFICATION_WRITE_SPAN = OPERATION_SECONDS.labels("notification_write")
+AUDIT_WRITE_SPAN = OPERATION_SECONDS.labels("audit_write_batch")
+WAITLIST_PROMOTION_SPAN = OPERATION_SECONDS.labels("waitlist_promotion")
+PROFILE_SEARCH_SPAN = OPERATION_SECONDS.labels("profile_search")
+
+# --- Email ---
+
+EMAIL_SENT = Counter("email_sent_total", "Emails delivered to the transport")
+EMAIL_RETRIED = Counter("email_retried_total", "Email send failures scheduled for retry")
+EMAIL_DEAD_LETTERED = Counter("email_dead_lettered_total", "Emails given up on after EMAIL_MAX_ATTEMPTS")
+EMAIL_PENDING = Gauge("email_pending", "Outbox messages not sent yet, due or not (as of the worker's last check)")
+EMAIL_OLDEST_PENDING_AGE = Gauge("email_oldest_pending_age_seconds", "Age of the oldest unsent outbox message: how far delivery lags behind (0 when empty)")
+
+# --- Embedding pipeline ---
+
+EMBEDDINGS_WRITTEN = Counter("embeddings_written_total", "Profile embeddings (re-)computed and upserted")
+EMBEDDINGS_UNCHANGED = Counter("embeddings_unchanged_total", "Changed-since-watermark profiles skipped because their content hash matched")
+EMBEDDING_BACKLOG = Gauge("embedding_backlog", "Profiles past the embedding pipeline watermark after its last run")
+EMBEDDING_THROUGHPUT = Gauge("embedding_profiles_per_second", "Encode-and-upsert throughput of the last pipeline run that embedded anything")
+
+# --- Chat gateway ---
+
+CHAT_CONNECTIONS = Gauge("chat_connections", "Open chat sockets on this worker")
+CHAT_MESSAGES_RECEIVED = Counter("chat_messages_received_total", "Chat messages accepted from clients")
+CHAT_FRAMES_DELIVERED = Counter("chat_frames_delivered_total", "Frames queued to a socket")
+CHAT_FRAMES_DROPPED = Counter("chat_frames_dropped_total", "Frames dropped from full send queues ('drop' policy)")
+CHAT_SLOW_CONSUMER_DISCONNECTS = Counter("chat_slow_consumer_disconnects_total", "Sockets closed because their send queue was full")
+CHAT_PERSIST_PENDING = Gauge("chat_persist_pending", "Delivered messages waiting for their batched insert")
+CHAT_MESSAGES_PERSISTED = Counter("chat_messages_persisted_total", "Chat messages inserted")
+CHAT_PERSIST_FAILED = Counter("chat_persist_failed_total", "Chat messages dropped after repeated insert failures")
+
+# --- Notifications ---
+
+NOTIFICATION_EVENTS = Counter("notification_events_total", "Notification events fanned out")
+NOTIFICATIONS_CREATED = Counter("notifications_created_total", "Notification rows inserted")
+NOTIFICATIONS_COALESCED = Counter("notifications_coalesced_total", "Per-recipient events folded into an existing or batched unread notification")
+NOTIFICATION_PENDING = Gauge("notification_pending", "Published events waiting for the next dispatcher flush")
+NOTIFICATION_EVENTS_DROPPED = Counter("notification_events_dropped_total", "Events dropped because the dispatcher buffer was full or the write failed")
+
+# --- Audit log ---
+
+AUDIT_EVENTS_RECORDED = Counter("audit_events_recorded_total", "Audit events accepted into the buffer")
+AUDIT_EVENTS_WRITTEN = Counter("audit_events_written_total", "Audit events inserted")
+AUDIT_EVENTS_DROPPED = Counter("audit_events_dropped_total", "Audit events dropped because the buffer stayed full")
+AUDIT_BACKPRESSURE_WAITS = Counter("audit_backpressure_waits_total", "Recorders that found the buffer full and had to wait")
+AUDIT_WRITE_FAILURES = Counter("audit_write_failures_total", "Failed batch inserts (the batch is kept and retried)")
+AUDIT_BUFFERED = Gauge("audit_buffered", "Audit events waiting to be written")
+
+# --- Waitlist ---
+
+WAITLIST_PROMOTED = Counter("waitlist_promoted_total", "Waitlisted users promoted into a free workstation by the scheduler or an admin")
@@ -0,0 +1,295 @@
+"""In-app notifications: event fan-out, coalescing, batched writes and the inbox.
+
+A NotificationEvent names its recipients explicitly, or as a role (every user
+with that role who isn't inactive, e.g. all SYS admins). write_notifications
+fans events out into one row per recipient and writes them:
+
+- Coalescing: types with a coalesce rule (NOTIFICATION_TYPES) keep a single
+  unread row per recipient and key. Repeats within one write are summed in
+  memory. Repeats of a row already in the inbox hit the partial unique index
+  (recipient_id, coalesce_key) WHERE read_at IS NULL and bump its
+  event_count. Once the row is read, the next event starts a new one.
+- Batching: rows are inserted NOTIFICATION_BATCH_SIZE at a time, as
+  multi-row INSERTs.
+- Unread counts: notification_counters has one row per user. It is adjusted
+  in the same transaction as the inserts and read marks, so the badge is a
+  primary-key lookup instead of a COUNT(*) over the inbox.
+
+Request handlers don't write notifications themselves. After their own
+commit they publish() to the NotificationDispatcher, which buffers events
+and writes them every NOTIFICATION_FLUSH_MS. A burst (200 registrations,
+each notifying every admin) becomes one upsert per admin instead of 200
+updates contending for the same rows. A crash loses at most the unflushed
+buffer. Code that already runs its own batch transaction (bulk admin
+transitions) calls write_notifications directly, so the notifications
+commit together with the change.
+"""
+import asyncio
+import logging
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Sequence, Set
+
+from sqlalchemy import case, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import settings
+from core.enums import UserRole, UserStatus
+from core.metrics import (
+    NOTIFICATION_EVENTS, NOTIFICATION_EVENTS_DROPPED, NOTIFICATION_PENDING, NOTIFICATION_WRITE_SPAN,
+    NOTIFICATIONS_COALESCED, NOTIFICATIONS_CREATED,
+)
+from database import AsyncSessionLocal
+from models.notification import Notification, NotificationCounter
+from models.user import User
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class NotificationType:
+    coalesce_by: Optional[str] = None # None, 'type' (one unread row per recipient) or 'actor' (per recipient and actor)
+
+
+NOTIFICATION_TYPES = {
+    "user_registered": NotificationType(coalesce_by="type"), # To SYS admins, shown as "N new registrations"
+    "email_verified": NotificationType(),
+    "waitlist_promoted": NotificationType(),
+    "account_deactivated": NotificationType(),
+    "role_changed": NotificationType(),
+    "connection_request": NotificationType(coalesce_by="actor"), # Phase 3 connections; repeats from one sender fold
+}
+
+
+@dataclass(frozen=True)
+class NotificationEvent:
+    type: str
+    recipient_ids: Sequence[int] = ()
+    recipient_role: Optional[UserRole] = None # Also fan out to every non-inactive user with this role
+    actor_id: Optional[int] = None # Never notified of their own event
+    data: Optional[dict] = None
+    occurred_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+
+    def __post_init__(self):
+        if self.type not in NOTIFICATION_TYPES:
+            raise ValueError(f"Unknown notification type '{self.type}'")
+
+    @property
+    def coalesce_key(self) -> Optional[str]:
+        rule = NOTIFICATION_TYPES[self.type].coalesce_by
+        if rule == "type":
+            return self.type
+        if rule == "actor":
+            return f"{self.type}:{self.actor_id}"
+        return None
+
+
+# --- Writing ---
+
+def _insert_function(db: AsyncSession):
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert
+
+
+def _chunks(rows: list, size: int) -> Iterable[list]:
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+async def _role_members(db: AsyncSession, roles: Set[UserRole]) -> Dict[UserRole, List[int]]:
+    members = {role: [] for role in roles}
+    if roles:
+        rows = await db.execute(select(User.id, User.role).where(User.role.in_(roles), User.status != UserStatus.INACTIVE))
+        for user_id, role in rows:
+            members[role].append(user_id)
+    return members
+
+
+async def write_notifications(db: AsyncSession, events: Sequence[NotificationEvent], batch_size: Optional[int] = None) -> int:
+    """Fans out, coalesces and inserts the events' notifications in db's transaction (the caller commits).
+
+    Returns the number of new notification rows.
+    """
+    batch_size = batch_size or settings.NOTIFICATION_BATCH_SIZE
+    with NOTIFICATION_WRITE_SPAN.time():
+        members = await _role_members(db, {event.recipient_role for event in events if event.recipient_role is not None})
+
+        plain: List[dict] = []
+        coalesced: Dict[tuple, dict] = {} # (recipient_id, coalesce_key) -> row
+        folded = 0
+        for event in events:
+            recipients = set(event.recipient_ids)
+            if event.recipient_role is not None:
+                recipients.update(members[event.recipient_role])
+            recipients.discard(event.actor_id)
+            key = event.coalesce_key
+            for recipient_id in recipients:
+                row = coalesced.get((recipient_id, key)) if key is not None else None
+                if row is not None:
+                    row.update(event_count=row["event_count"] + 1, actor_id=event.actor_id, data=event.data, updated_at=event.occurred_at)
+                    folded += 1
+                    continue
+                row = {
+                    "recipient_id": recipient_id, "type": event.type, "coalesce_key": key, "event_count": 1,
+                    "actor_id": event.actor_id, "data": event.data, "created_at": event.occurred_at, "updated_at": event.occurred_at,
+                }
+                if key is None:
+                    plain.append(row)
+                else:
+                    coalesced[(recipient_id, key)] = row
+        NOTIFICATION_EVENTS.inc(len(events))
+
+        new_unread: Counter = Counter()
+        for chunk in _chunks(plain, batch_size):
+            await db.execute(Notification.__table__.insert(), chunk)
+            new_unread.update(row["recipient_id"] for row in chunk)
+
+        insert = _insert_function(db)
+        for chunk in _chunks(list(coalesced.values()), batch_size):
+            statement = insert(Notification)
+            statement = statement.on_conflict_do_update(
+                index_elements=[Notification.recipient_id, Notification.coalesce_key],
+                index_where=Notification.read_at.is_(None),
+                set_={
+                    "event_count": Notification.event_count + statement.excluded.event_count,
+                    "actor_id": statement.excluded.actor_id,
+                    "data": statement.excluded.data,
+                    "updated_at": statement.excluded.updated_at,
+                },
+            ).returning(Notification.recipient_id, Notification.coalesce_key, Notification.event_count)
+            for recipient_id, key, event_count in await db.execute(statement, chunk):
+                # The count only exceeds what we sent if an unread row absorbed it
+                if event_count == coalesced[(recipient_id, key)]["event_count"]:
+                    new_unread[recipient_id] += 1
+                else:
+                    folded += 1
+
+        counters = [{"user_id": user_id, "unread": count} for user_id, count in sorted(new_unread.items())] # Fixed lock order
+        for chunk in _chunks(counters, batch_size):
+            statement = insert(NotificationCounter)
+            await db.execute(statement.on_conflict_do_update(
+                index_elements=[NotificationCounter.user_id],
+                set_={"unread": NotificationCounter.unread + statement.excluded.unread},
+            ), chunk)
+
+    created = sum(new_unread.values())
+    NOTIFICATIONS_CREATED.inc(created)
+    NOTIFICATIONS_COALESCED.inc(folded)
+    return created
+
+
+# --- Inbox ---
+
+async def list_notifications(
+    db: AsyncSession, user_id: int, before: Optional[int] = None, limit: int = 50, unread_only: bool = False
+) -> Sequence[Notification]:
+    """One inbox page, newest first, starting below the `before` id (keyset, no OFFSET)."""
+    conditions = [Notification.recipient_id == user_id]
+    if before is not None:
+        conditions.append(Notification.id < before)
+    if unread_only:
+        conditions.append(Notification.read_at.is_(None))
+    return (await db.scalars(
+        select(Notification).where(*conditions).order_by(Notification.id.desc()).limit(limit)
+    )).all()
+
+
+async def unread_count(db: AsyncSession, user_id: int) -> int:
+    return await db.scalar(select(NotificationCounter.unread).where(NotificationCounter.user_id == user_id)) or 0
+
+
+async def mark_read(
+    db: AsyncSession, user_id: int, notification_ids: Optional[Sequence[int]] = None, up_to: Optional[int] = None
+) -> int:
+    """Marks the given (or all, or all up to an id) unread notifications read; the caller commits. Returns how many."""
+    conditions = [Notification.recipient_id == user_id, Notification.read_at.is_(None)]
+    if notification_ids is not None:
+        conditions.append(Notification.id.in_(notification_ids))
+    if up_to is not None:
+        conditions.append(Notification.id <= up_to)
+    marked = (await db.execute(
+        update(Notification).where(*conditions).values(read_at=datetime.now(timezone.utc))
+        .execution_options(synchronize_session=False)
+    )).rowcount
+    if marked:
+        await db.execute(
+            update(NotificationCounter).where(NotificationCounter.user_id == user_id)
+            .values(unread=case((NotificationCounter.unread > marked, NotificationCounter.unread - marked), else_=0))
+        )
+    return marked
+
+
+# --- Dispatcher ---
+
+class NotificationDispatcher:
+    """Buffers published events and writes them every flush interval, one transaction per flush."""
+
+    def __init__(self, flush_seconds: float, max_pending: int):
+        self.flush_seconds = flush_seconds
+        self.max_pending = max_pending
+        self._pending: List[NotificationEvent] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def publish(self, event: NotificationEvent) -> bool:
+        """Buffers an event; False (and dropped) if the buffer is full."""
+        if len(self._pending) >= self.max_pending:
+            NOTIFICATION_EVENTS_DROPPED.inc()
+            return False
+        self._pending.append(event)
+        NOTIFICATION_PENDING.set(len(self._pending))
+        return True
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run(), name="notification-dispatcher")
+
+    async def stop(self) -> None:
+        """Stops the flush loop and writes everything still buffered."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        await self.flush()
+
+    async def flush(self) -> int:
+        if not self._pending:
+            return 0
+        events, self._pending = self._pending, []
+        NOTIFICATION_PENDING.set(0)
+        try:
+            async with AsyncSessionLocal() as db:
+                created = await write_notifications(db, events)
+                await db.commit()
+            return created
+        except asyncio.CancelledError:
+            self._pending[:0] = events # stop() writes them
+            raise
+        except Exception:
+            NOTIFICATION_EVENTS_DROPPED.inc(len(events))
+            logger.exception("Dropping %s notification events after a failed write", len(events))
+            return 0
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_seconds)
+            await self.flush()
+
+
+_dispatcher: Optional[NotificationDispatcher] = None
+
+
+def get_notification_dispatcher() -> NotificationDispatcher:
+    global _dispatcher
+    if _dispatcher is None:
+        _dispatcher = NotificationDispatcher(settings.NOTIFICATION_FLUSH_MS / 1000, settings.NOTIFICATION_MAX_PENDING)
+    return _dispatcher
+
+
+def set_notification_dispatcher(dispatcher: Optional[NotificationDispatcher]) -> None:
+    global _dispatcher
+    _dispatcher = dispatcher
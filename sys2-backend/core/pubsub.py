@@ -0,0 +1,76 @@
+"""Pub/sub backends for the chat gateway.
+
+The hub (core.chat) subscribes to one channel per user with a local socket
+and publishes each event to the channels of its recipients. The backend
+decides how a published event reaches the subscribed workers.
+
+CHAT_PUBSUB_BACKEND picks the backend:
+- 'local': LocalPubSub, in-process only. Enough for a single worker; also a
+  stand-in for tests and benchmarks.
+- 'package.module:factory': any PubSubBackend (e.g. on Redis or PostgreSQL
+  LISTEN/NOTIFY) for several workers or hosts.
+
+Payloads are JSON text, serialized once per event no matter how many
+sockets receive it.
+"""
+import abc
+import importlib
+from typing import Callable, Optional, Set
+
+from config import settings
+
+Handler = Callable[[str, str], None] # (channel, payload); called on the event loop, must not block
+
+
+class PubSubBackend(abc.ABC):
+    @abc.abstractmethod
+    async def start(self, handler: Handler) -> None:
+        """Begins delivering messages on subscribed channels to handler."""
+
+    async def stop(self) -> None:
+        pass
+
+    @abc.abstractmethod
+    async def subscribe(self, channel: str) -> None:
+        ...
+
+    @abc.abstractmethod
+    async def unsubscribe(self, channel: str) -> None:
+        ...
+
+    @abc.abstractmethod
+    async def publish(self, channel: str, payload: str) -> None:
+        ...
+
+
+class LocalPubSub(PubSubBackend):
+    def __init__(self):
+        self._handler: Optional[Handler] = None
+        self._channels: Set[str] = set()
+
+    async def start(self, handler):
+        self._handler = handler
+
+    async def stop(self):
+        self._handler = None
+        self._channels.clear()
+
+    async def subscribe(self, channel):
+        self._channels.add(channel)
+
+    async def unsubscribe(self, channel):
+        self._channels.discard(channel)
+
+    async def publish(self, channel, payload):
+        if self._handler is not None and channel in self._channels:
+            self._handler(channel, payload)
+
+
+def build_pubsub(spec: Optional[str] = None) -> PubSubBackend:
+    spec = spec or settings.CHAT_PUBSUB_BACKEND
+    if spec == "local":
+        return LocalPubSub()
+    if ":" in spec:
+        module_name, factory_name = spec.split(":", 1)
+        return getattr(importlib.import_module(module_name), factory_name)()
+    raise ValueError(f"Unknown CHAT_PUBSUB_BACKEND '{spec}'. Use 'local' or 'package.module:factory'.")
@@ -0,0 +1,236 @@
+"""Rate limiting for auth endpoints.
+
+Limits are checked by a route-level dependency (see rate_limit), which
+FastAPI resolves before the endpoint's own parameters, so a rejected request
+never reaches a DB query or a password hash. Keys combine the rule name
+(which includes the endpoint) with the client IP or the submitted email.
+
+Both algorithms keep the same 3-float state per key, (level, stamp,
+previous_level), so any backend can store either of them:
+- token bucket: (tokens left, last refill time, unused)
+- sliding window counter: (count in window, window start, count in previous window)
+"""
+import abc
+import math
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException, Request, status
+from sqlalchemy import delete, select, update
+
+from config import settings
+
+State = Tuple[float, float, float]
+
+
+class RateLimit:
+    """One rule: `limit` requests per `period` seconds for each key."""
+
+    def __init__(self, name: str, limit: int, period: float, algorithm: str = "sliding_window", key: str = "ip"):
+        if algorithm not in ("token_bucket", "sliding_window"):
+            raise ValueError(f"Unknown rate limit algorithm '{algorithm}'")
+        if key not in ("ip", "email"):
+            raise ValueError(f"Unknown rate limit key '{key}'")
+        self.name = name
+        self.limit = limit
+        self.period = period
+        self.algorithm = algorithm
+        self.key = key
+
+    def apply(self, state: Optional[State], now: float) -> Tuple[float, State]:
+        """Returns (retry_after, new_state); retry_after is 0 when the request is allowed."""
+        if self.algorithm == "token_bucket":
+            return self._token_bucket(state, now)
+        return self._sliding_window(state, now)
+
+    def _token_bucket(self, state, now):
+        refill_per_second = self.limit / self.period
+        tokens, last, _ = state or (float(self.limit), now, 0.0)
+        tokens = min(float(self.limit), tokens + (now - last) * refill_per_second)
+        if tokens >= 1:
+            return 0.0, (tokens - 1, now, 0.0)
+        return (1 - tokens) / refill_per_second, (tokens, now, 0.0)
+
+    def _sliding_window(self, state, now):
+        window_start = math.floor(now / self.period) * self.period
+        count, start, previous = state or (0.0, window_start, 0.0)
+        if start != window_start:
+            previous = count if window_start - start == self.period else 0.0
+            count = 0.0
+            start = window_start
+
+        # Weight the previous window by how much of it still overlaps the sliding window
+        elapsed_fraction = (now - start) / self.period
+        if previous * (1 - elapsed_fraction) + count + 1 <= self.limit:
+            return 0.0, (count + 1, start, previous)
+
+        if count + 1 > self.limit or previous <= 0:
+            retry_after = start + self.period - now
+        else:
+            retry_after = start + self.period * (1 - (self.limit - count - 1) / previous) - now
+        return max(retry_after, 0.001), (count, start, previous)
+
+
+# --- Backends ---
+
+class RateLimitBackend(abc.ABC):
+    @abc.abstractmethod
+    async def hit(self, key: str, rule: RateLimit, now: float) -> float:
+        """Records a request for key under rule; returns retry-after seconds (0 = allowed)."""
+
+
+class MemoryRateLimitBackend(RateLimitBackend):
+    """Per-process backend: keys are spread over shards, each an LRU capped at max_keys / shards.
+
+    Evicting a key only forgets its history (it starts with a full allowance),
+    which keeps memory bounded under a flood of distinct IPs or emails.
+    """
+
+    def __init__(self, shards: int = 16, max_keys: int = 100_000):
+        self._shards: List["OrderedDict[str, State]"] = [OrderedDict() for _ in range(shards)]
+        self._locks = [threading.Lock() for _ in range(shards)]
+        self._max_keys_per_shard = max(1, max_keys // shards)
+
+    def __len__(self) -> int:
+        return sum(len(shard) for shard in self._shards)
+
+    async def hit(self, key, rule, now):
+        index = hash(key) % len(self._shards)
+        shard = self._shards[index]
+        with self._locks[index]:
+            retry_after, shard[key] = rule.apply(shard.get(key), now)
+            shard.move_to_end(key)
+            if len(shard) > self._max_keys_per_shard:
+                shard.popitem(last=False)
+        return retry_after
+
+
+class DatabaseRateLimitBackend(RateLimitBackend):
+    """Shared backend on the rate_limit_states table, for limits enforced across workers.
+
+    Each hit runs in its own short transaction on a separate session, so it
+    doesn't touch the request's session. Rows idle for longer than
+    stale_after_seconds are deleted at most once per prune_interval_seconds.
+    """
+
+    def __init__(self, stale_after_seconds: int = 86400, prune_interval_seconds: int = 600):
+        self.stale_after_seconds = stale_after_seconds
+        self.prune_interval_seconds = prune_interval_seconds
+        self._last_prune = 0.0
+
+    async def hit(self, key, rule, now):
+        from database import AsyncSessionLocal
+        from models.rate_limit_state import RateLimitState
+
+        async with AsyncSessionLocal() as db:
+            dialect = db.get_bind().dialect.name
+            if dialect == "postgresql":
+                from sqlalchemy.dialects.postgresql import insert
+            else:
+                from sqlalchemy.dialects.sqlite import insert
+            # Make sure the row exists so it can be locked, then update it under the lock
+            await db.execute(insert(RateLimitState).values(
+                key=key, level=0.0, stamp=0.0, previous_level=0.0, updated_at=datetime.now(timezone.utc)
+            ).on_conflict_do_nothing(index_elements=["key"]))
+            row = (await db.execute(
+                select(RateLimitState.level, RateLimitState.stamp, RateLimitState.previous_level)
+                .where(RateLimitState.key == key)
+                .with_for_update()
+            )).one()
+            state = None if row.stamp == 0.0 else (row.level, row.stamp, row.previous_level) # stamp 0 = new row
+
+            retry_after, new_state = rule.apply(state, now)
+            await db.execute(update(RateLimitState).where(RateLimitState.key == key).values(
+                level=new_state[0], stamp=new_state[1], previous_level=new_state[2],
+                updated_at=datetime.now(timezone.utc),
+            ))
+
+            if now - self._last_prune >= self.prune_interval_seconds:
+                self._last_prune = now
+                cutoff = datetime.fromtimestamp(now - self.stale_after_seconds, timezone.utc)
+                await db.execute(delete(RateLimitState).where(RateLimitState.updated_at < cutoff))
+            await db.commit()
+        return retry_after
+
+
+_backend: Optional[RateLimitBackend] = None
+
+
+def get_rate_limit_backend() -> RateLimitBackend:
+    global _backend
+    if _backend is None:
+        if settings.RATE_LIMIT_BACKEND == "memory":
+            _backend = MemoryRateLimitBackend(settings.RATE_LIMIT_SHARDS, settings.RATE_LIMIT_MAX_KEYS)
+        elif settings.RATE_LIMIT_BACKEND == "database":
+            _backend = DatabaseRateLimitBackend()
+        else:
+            raise ValueError(f"Unknown RATE_LIMIT_BACKEND '{settings.RATE_LIMIT_BACKEND}'. Valid options are 'memory', 'database'.")
+    return _backend
+
+
+def set_rate_limit_backend(backend: Optional[RateLimitBackend]) -> None:
+    global _backend
+    _backend = backend
+
+
+# --- Dependency ---
+
+def client_ip(request: Request) -> str:
+    if settings.RATE_LIMIT_TRUST_FORWARDED_FOR:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+
+async def _submitted_email(request: Request, field: str) -> Optional[str]:
+    # FastAPI has already read and cached the body, so this doesn't consume it
+    content_type = request.headers.get("content-type", "")
+    try:
+        if content_type.startswith("application/json"):
+            body = await request.json()
+            value = body.get(field) if isinstance(body, dict) else None
+        elif content_type.startswith(("application/x-www-form-urlencoded", "multipart/form-data")):
+            value = (await request.form()).get(field)
+        else:
+            value = None
+    except Exception: # Malformed bodies are rejected by FastAPI's own validation
+        return None
+    return value.strip().lower() if isinstance(value, str) and value else None
+
+
+def rate_limit(*rules: RateLimit, email_field: str = "email"):
+    """Builds a dependency enforcing rules; use it in the route's `dependencies=[...]`."""
+    needs_email = any(rule.key == "email" for rule in rules)
+
+    async def check_rate_limit(request: Request) -> None:
+        if not settings.RATE_LIMIT_ENABLED:
+            return
+        backend = get_rate_limit_backend()
+        now = time.time()
+        ip = client_ip(request)
+        email = await _submitted_email(request, email_field) if needs_email else None
+
+        retry_after = 0.0
+        exceeded = []
+        for rule in rules:
+            subject = ip if rule.key == "ip" else email
+            if subject is None:
+                continue
+            rule_retry_after = await backend.hit(f"{rule.name}:{subject}", rule, now)
+            if rule_retry_after > 0:
+                exceeded.append(rule.name)
+                retry_after = max(retry_after, rule_retry_after)
+        if retry_after > 0:
+            from core.audit import get_audit_log
+            await get_audit_log().record("rate_limited", email=email, ip=ip, data={"rules": exceeded})
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many requests. Please try again later.",
+                headers={"Retry-After": str(math.ceil(retry_after))},
+            )
+
+    return check_rate_limit
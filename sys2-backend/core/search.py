@@ -0,0 +1,274 @@
+"""Profile search: users by name, company and skills.
+
+Both backends answer the same query. It is split into words (runs of
+letters and digits, see core.text_index), and every word must match the
+user's name, tags (skills, tools, industry) or company name, as a whole
+word or, from MIN_PREFIX_LENGTH characters on, as a prefix. Name matches
+rank above company matches, and those above tags. A query that matches
+nothing this way is retried with each word also matching names with a
+trigram similarity of at least FUZZY_THRESHOLD, for typos. Scores are only
+comparable within one backend.
+
+- PostgresSearchBackend runs the query in SQL over GIN indexes: the
+  weighted tsvector of ix_users_search_document, company names through
+  ix_companies_search_document and ix_users_company_id, and pg_trgm
+  trigrams of lower(full_name) (ix_users_full_name_trgm). Every word is its
+  own tsquery, so the words AND together as bitmap index scans.
+- InMemorySearchBackend keeps one TextIndex (core.text_index) per worker,
+  for SQLite and tests. It is built on first use, then kept current
+  incrementally. Users changed through this worker's ORM are applied as
+  their transaction commits. Every SEARCH_REFRESH_SECONDS the users changed
+  since the last refresh are read over ix_users_updated_at_id, which also
+  catches bulk updates and other workers, and company names are re-read.
+  Filters (status, space, ...) stay in SQL: the ranked hits are checked
+  against them in one query, over-fetching until enough pass.
+"""
+import abc
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import case, event, func, inspect, literal, or_, select, tuple_
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from config import settings
+from core.metrics import PROFILE_SEARCH_SPAN
+from core.text_index import COMPANY_WEIGHT, FUZZY_THRESHOLD, MIN_PREFIX_LENGTH, Hit, TextIndex, tokenize
+from models.company import COMPANY_SEARCH_DOCUMENT, Company
+from models.user import SEARCH_CONFIG, SEARCH_TAG_FIELDS, USER_NAME_LOWER, USER_SEARCH_DOCUMENT, User
+
+OVERFETCH = 4 # In-process hits fetched per result wanted, before the SQL filters drop some
+
+PROFILE_ATTRIBUTES = ("full_name", "company_id", *SEARCH_TAG_FIELDS)
+PROFILE_COLUMNS = (User.id, User.updated_at, *(getattr(User, name) for name in PROFILE_ATTRIBUTES))
+
+Profile = Tuple[Optional[str], List[str], Optional[int]] # (full_name, tags, company_id)
+
+
+def profile_tags(profile) -> List[str]:
+    """The tags of a user row or mapping, from the JSON list columns."""
+    tags = []
+    for name in SEARCH_TAG_FIELDS:
+        value = profile.get(name) if isinstance(profile, dict) else getattr(profile, name)
+        if isinstance(value, list):
+            tags.extend(str(tag) for tag in value)
+    return tags
+
+
+class SearchBackend(abc.ABC):
+    @abc.abstractmethod
+    async def search(self, db: AsyncSession, query: str, limit: int, conditions: Sequence = ()) -> List[Hit]:
+        """Up to limit (user_id, score) for query, best first, among the users matching the SQL conditions."""
+
+
+# --- PostgreSQL (tsvector + pg_trgm) ---
+
+def _tsquery(terms: Sequence[str], operator: str = "&"):
+    # Terms are runs of letters and digits, so they can't carry tsquery syntax of their own
+    return func.to_tsquery(SEARCH_CONFIG, f" {operator} ".join(
+        f"{term}:*" if len(term) >= MIN_PREFIX_LENGTH else term for term in terms
+    ))
+
+
+class PostgresSearchBackend(SearchBackend):
+    async def search(self, db, query, limit, conditions=()):
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+        with PROFILE_SEARCH_SPAN.time():
+            rows = await self._search(db, terms, limit, conditions, fuzzy=False)
+            if not rows:
+                # Transaction-local, and a SELECT, so it runs on the same connection (replica or not) as the search
+                await db.execute(select(func.set_config("pg_trgm.strict_word_similarity_threshold", str(FUZZY_THRESHOLD), True)))
+                rows = await self._search(db, terms, limit, conditions, fuzzy=True)
+        return [(row.id, row.score) for row in rows]
+
+    async def _search(self, db: AsyncSession, terms: List[str], limit: int, conditions: Sequence, fuzzy: bool) -> list:
+        matches = []
+        for term in terms:
+            tsquery = _tsquery([term])
+            term_matches = [
+                USER_SEARCH_DOCUMENT.bool_op("@@")(tsquery),
+                User.company_id.in_(select(Company.id).where(COMPANY_SEARCH_DOCUMENT.bool_op("@@")(tsquery))),
+            ]
+            if fuzzy:
+                # strict_word_similarity(term, name) >= the threshold set above, per word of the name
+                term_matches.append(literal(term).bool_op("<<%")(USER_NAME_LOWER))
+            matches.append(or_(*term_matches))
+
+        any_term = _tsquery(terms, "|")
+        in_company = User.company_id.in_(select(Company.id).where(COMPANY_SEARCH_DOCUMENT.bool_op("@@")(any_term)))
+        score = func.ts_rank(USER_SEARCH_DOCUMENT, any_term) + case((in_company, COMPANY_WEIGHT), else_=0.0)
+        if fuzzy:
+            for term in terms:
+                score = score + func.strict_word_similarity(term, USER_NAME_LOWER)
+        score = score.label("score")
+        return (await db.execute(
+            select(User.id, score).where(*matches, *conditions).order_by(score.desc(), User.id).limit(limit)
+        )).all()
+
+
+# --- In-process (TextIndex) ---
+
+def _timestamp(db: AsyncSession, value: datetime):
+    # SQLite compares timestamps as text (see EmbeddingPipeline._timestamp)
+    if db.get_bind().dialect.name == "sqlite":
+        return func.datetime(value)
+    return value
+
+
+def _add_rows(index: TextIndex, rows) -> None:
+    for row in rows:
+        index.add(row.id, row.full_name, profile_tags(row), row.company_id)
+
+
+class InMemorySearchBackend(SearchBackend):
+    def __init__(self, refresh_seconds: float = 5, settle_seconds: float = 5, scan_size: int = 5000):
+        self.refresh_seconds = refresh_seconds
+        self.settle = timedelta(seconds=settle_seconds)
+        self.scan_size = scan_size
+        self._index: Optional[TextIndex] = None
+        self._watermark: Optional[datetime] = None # The next refresh re-reads users updated after this
+        self._refreshed_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def search(self, db, query, limit, conditions=()):
+        index = await self.get_index(db)
+        with PROFILE_SEARCH_SPAN.time():
+            fetch = limit * OVERFETCH if conditions else limit
+            while True:
+                hits = index.search(query, fetch)
+                if not conditions or not hits:
+                    return hits[:limit]
+                allowed = set((await db.scalars(
+                    select(User.id).where(User.id.in_([user_id for user_id, _ in hits]), *conditions)
+                )).all())
+                kept = [hit for hit in hits if hit[0] in allowed]
+                if len(kept) >= limit or len(hits) < fetch: # Enough, or every match was checked
+                    return kept[:limit]
+                fetch *= OVERFETCH
+
+    async def get_index(self, db: AsyncSession) -> TextIndex:
+        if self._index is not None and (time.monotonic() - self._refreshed_at < self.refresh_seconds or self._lock.locked()):
+            return self._index # Fresh, or another request is refreshing it: don't wait
+        async with self._lock:
+            if self._index is None:
+                await self._build(db)
+            elif time.monotonic() - self._refreshed_at >= self.refresh_seconds:
+                await self._refresh(db)
+        return self._index
+
+    async def _build(self, db: AsyncSession) -> None:
+        started = datetime.now(timezone.utc)
+        index = TextIndex()
+        for company in (await db.execute(select(Company.id, Company.name))).all():
+            index.set_company(company.id, company.name)
+        last_id = 0
+        while True:
+            rows = (await db.execute(
+                select(*PROFILE_COLUMNS).where(User.id > last_id).order_by(User.id).limit(self.scan_size)
+            )).all()
+            if not rows:
+                break
+            await run_in_threadpool(_add_rows, index, rows) # Not published yet, so nothing reads it meanwhile
+            last_id = rows[-1].id
+        self._index = index
+        self._watermark = started - self.settle
+        self._refreshed_at = time.monotonic()
+
+    async def _refresh(self, db: AsyncSession) -> None:
+        started = datetime.now(timezone.utc)
+        for company in (await db.execute(select(Company.id, Company.name))).all(): # No change feed; the table is small
+            self._index.set_company(company.id, company.name)
+        after = (self._watermark, 0)
+        while True:
+            rows = (await db.execute(
+                select(*PROFILE_COLUMNS)
+                .where(tuple_(User.updated_at, User.id) > tuple_(_timestamp(db, after[0]), after[1]))
+                .order_by(User.updated_at, User.id)
+                .limit(self.scan_size)
+            )).all()
+            _add_rows(self._index, rows) # On the event loop, between page reads: searches never see a half-applied row
+            if len(rows) < self.scan_size:
+                break
+            after = (rows[-1].updated_at, rows[-1].id)
+        # Re-read the last SEARCH_SETTLE_SECONDS next time: a transaction open now can commit an older updated_at later
+        self._watermark = started - self.settle
+        self._refreshed_at = time.monotonic()
+
+    def apply(self, changes: Dict[int, Optional[Profile]]) -> None:
+        """Applies committed profile changes (None = deleted) to the index, if it is built."""
+        if self._index is None:
+            return
+        for user_id, profile in changes.items():
+            if profile is None:
+                self._index.remove(user_id)
+            else:
+                self._index.add(user_id, *profile)
+
+
+# This worker's own changes reach the in-process index when they commit, without waiting for the
+# next refresh. Values are taken at flush time, from what the session has loaded; a user with
+# unloaded profile attributes is left to the refresh.
+
+@event.listens_for(Session, "after_flush")
+def _collect_profile_changes(session, flush_context):
+    if not isinstance(_backend, InMemorySearchBackend):
+        return
+    changes = session.info.setdefault("search_changes", {})
+    for user in session.deleted:
+        if isinstance(user, User):
+            changes[user.id] = None
+    for user in session.new:
+        if isinstance(user, User):
+            values = inspect(user).dict # Attributes never set are None
+            changes[user.id] = (values.get("full_name"), profile_tags(values), values.get("company_id"))
+    for user in session.dirty:
+        if not isinstance(user, User):
+            continue
+        state = inspect(user)
+        if any(state.attrs[name].history.has_changes() for name in PROFILE_ATTRIBUTES) and all(name in state.dict for name in PROFILE_ATTRIBUTES):
+            changes[user.id] = (state.dict["full_name"], profile_tags(state.dict), state.dict["company_id"])
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_profile_changes(session):
+    changes = session.info.pop("search_changes", None)
+    if changes and isinstance(_backend, InMemorySearchBackend):
+        _backend.apply(changes)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_profile_changes(session):
+    session.info.pop("search_changes", None)
+
+
+_backend: Optional[SearchBackend] = None
+
+
+def get_search_backend() -> SearchBackend:
+    global _backend
+    if _backend is None:
+        name = settings.SEARCH_BACKEND
+        if name == "auto":
+            name = "postgres" if make_url(settings.DATABASE_URL).get_backend_name() == "postgresql" else "memory"
+        if name == "postgres":
+            _backend = PostgresSearchBackend()
+        elif name == "memory":
+            _backend = InMemorySearchBackend(
+                refresh_seconds=settings.SEARCH_REFRESH_SECONDS,
+                settle_seconds=settings.SEARCH_SETTLE_SECONDS,
+                scan_size=settings.SEARCH_SCAN_SIZE,
+            )
+        else:
+            raise ValueError(f"Unknown SEARCH_BACKEND '{settings.SEARCH_BACKEND}'. Valid options are 'auto', 'postgres', 'memory'.")
+    return _backend
+
+
+def set_search_backend(backend: Optional[SearchBackend]) -> None:
+    global _backend
+    _backend = backend
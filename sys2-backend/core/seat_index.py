@@ -0,0 +1,123 @@
+"""Seats in use over time for one space, as a segment tree over time slots.
+
+Time from `origin` is cut into fixed slots of `slot_seconds`. An allocation
+of k seats over [starts_at, ends_at) adds k to every slot it touches. A
+query over [start, end) is the largest sum in its slots, so "free seats
+over R" is the capacity minus that maximum, and a point in time is a
+one-slot range. Both operations are O(log slots): a range add and a range
+max over a lazy segment tree.
+
+Allocations without an end (a member's seat) run to the last slot. So does
+a range query without an end, which answers "can k more members be
+seated from now on". Releasing a member's seat removes it whole (add()
+with negative seats), which frees it at once rather than at the end of
+the current slot (core.workstations). Times before the origin clamp to the first slot and
+times past the horizon to the last. Callers keep bookings within the
+horizon (see core.workstations).
+"""
+from datetime import datetime, timezone
+from typing import Optional
+
+
+def as_utc(moment: datetime) -> datetime:
+    """Aware UTC datetime; naive values (SQLite) are taken as UTC."""
+    return moment.replace(tzinfo=timezone.utc) if moment.tzinfo is None else moment.astimezone(timezone.utc)
+
+
+class SeatIndex:
+    def __init__(self, capacity: int, origin: datetime, slot_seconds: int, slots: int, version: int = 0):
+        self.capacity = capacity
+        self.origin = as_utc(origin)
+        self.slot_seconds = slot_seconds
+        self.slots = slots
+        self.version = version # spaces.allocation_version this index reflects
+        self._height = slots.bit_length()
+        self._max = [0] * (2 * slots) # Max seats in use over the node's slots, including its own pending add
+        self._pending = [0] * slots # Adds not yet pushed down to the node's children
+
+    @property
+    def horizon_end(self) -> datetime:
+        return datetime.fromtimestamp(self.origin.timestamp() + self.slots * self.slot_seconds, timezone.utc)
+
+    def _slot_range(self, starts_at: datetime, ends_at: Optional[datetime]) -> tuple:
+        """Slots [first, last) touched by [starts_at, ends_at); at least one slot."""
+        first = int((as_utc(starts_at) - self.origin).total_seconds() // self.slot_seconds)
+        first = min(max(first, 0), self.slots - 1)
+        if ends_at is None:
+            return first, self.slots
+        last = -int(-(as_utc(ends_at) - self.origin).total_seconds() // self.slot_seconds) # Ceiling
+        return first, min(max(last, first + 1), self.slots)
+
+    # --- Segment tree ---
+
+    def _apply(self, node: int, seats: int) -> None:
+        self._max[node] += seats
+        if node < self.slots:
+            self._pending[node] += seats
+
+    def _pull(self, node: int) -> None:
+        while node > 1:
+            node >>= 1
+            self._max[node] = max(self._max[2 * node], self._max[2 * node + 1]) + self._pending[node]
+
+    def _push(self, node: int) -> None:
+        for shift in range(self._height, 0, -1):
+            parent = node >> shift
+            if parent and self._pending[parent]:
+                self._apply(2 * parent, self._pending[parent])
+                self._apply(2 * parent + 1, self._pending[parent])
+                self._pending[parent] = 0
+
+    def _add_slots(self, first: int, last: int, seats: int) -> None:
+        low, high = first + self.slots, last + self.slots
+        while low < high:
+            if low & 1:
+                self._apply(low, seats)
+                low += 1
+            if high & 1:
+                high -= 1
+                self._apply(high, seats)
+            low >>= 1
+            high >>= 1
+        self._pull(first + self.slots)
+        self._pull(last - 1 + self.slots)
+
+    def _max_slots(self, first: int, last: int) -> int:
+        low, high = first + self.slots, last + self.slots
+        self._push(low)
+        self._push(high - 1)
+        used = 0
+        while low < high:
+            if low & 1:
+                used = max(used, self._max[low])
+                low += 1
+            if high & 1:
+                high -= 1
+                used = max(used, self._max[high])
+            low >>= 1
+            high >>= 1
+        return used
+
+    # --- Allocations and queries ---
+
+    def add(self, seats: int, starts_at: datetime, ends_at: Optional[datetime] = None) -> None:
+        """Records an allocation (negative seats release one)."""
+        self._add_slots(*self._slot_range(starts_at, ends_at), seats)
+
+    def truncate(self, seats: int, starts_at: datetime, ends_at: Optional[datetime], new_ends_at: datetime) -> None:
+        """Moves an allocation's end earlier, leaving the slots a rebuild from the shortened row would count."""
+        first, last = self._slot_range(starts_at, ends_at)
+        cut = first if new_ends_at <= starts_at else self._slot_range(starts_at, new_ends_at)[1]
+        if cut < last:
+            self._add_slots(cut, last, -seats)
+
+    def used(self, starts_at: datetime, ends_at: Optional[datetime] = None) -> int:
+        """Most seats in use at any moment of [starts_at, ends_at); no end = from starts_at on."""
+        return self._max_slots(*self._slot_range(starts_at, ends_at))
+
+    def free(self, starts_at: datetime, ends_at: Optional[datetime] = None) -> int:
+        """Seats free during all of [starts_at, ends_at): what a new allocation over that range can take."""
+        return max(self.capacity - self.used(starts_at, ends_at), 0)
+
+    def free_at(self, moment: datetime) -> int:
+        return self.free(moment, moment)
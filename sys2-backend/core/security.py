@@ -1,9 +1,25 @@
-from passlib.context import CryptContext
+import asyncio
+import hashlib
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime, timedelta, timezone
-from typing import Optional
-from jose import JWTError, jwt
+from typing import TYPE_CHECKING, Optional, Tuple
+from jose import JWTError # Just the exceptions; jose.jwt and its crypto backends load on first use (_jwt)
 from config import settings
+from core.cache import TTLCache
+from core.metrics import JWT_SIGN_SPAN, JWT_VERIFY_SPAN, PASSWORD_HASH_SPAN
 from fastapi import Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+
+if TYPE_CHECKING:
+    from passlib.context import CryptContext
+
+logger = logging.getLogger(__name__)
 
 # Constants for JWT
 ALGORITHM = "HS256"
@@ -12,15 +28,155 @@ REFRESH_TOKEN_EXPIRE_DAYS = 7  # Refresh token expiry
 EMAIL_VERIFICATION_TOKEN_EXPIRE_MINUTES = 5 # Short expiry for verification
 PASSWORD_RESET_TOKEN_EXPIRE_MINUTES = 15 # Expiry for password reset tokens
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+def _jwt():
+    from jose import jwt
+
+    return jwt
+
+
+def build_password_context(
+    schemes=None,
+    bcrypt_rounds: Optional[int] = None,
+    argon2_time_cost: Optional[int] = None,
+    argon2_memory_cost: Optional[int] = None,
+    argon2_parallelism: Optional[int] = None,
+) -> "CryptContext":
+    """Builds the CryptContext from the hashing policy in Settings, with optional overrides."""
+    from passlib.context import CryptContext
+
+    return CryptContext(
+        schemes=list(schemes or settings.PASSWORD_HASH_SCHEMES),
+        deprecated="auto", # Every scheme but the first is upgraded on login
+        bcrypt__rounds=bcrypt_rounds or settings.PASSWORD_BCRYPT_ROUNDS,
+        argon2__type="ID",
+        argon2__time_cost=argon2_time_cost or settings.PASSWORD_ARGON2_TIME_COST,
+        argon2__memory_cost=argon2_memory_cost or settings.PASSWORD_ARGON2_MEMORY_COST,
+        argon2__parallelism=argon2_parallelism or settings.PASSWORD_ARGON2_PARALLELISM,
+    )
+
+
+_pwd_context: Optional["CryptContext"] = None
+
+
+def get_password_context() -> "CryptContext":
+    """The policy's CryptContext, built on first use (in each hashing worker process, not at import)."""
+    global _pwd_context
+    if _pwd_context is None:
+        _pwd_context = build_password_context()
+    return _pwd_context
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return get_password_context().verify(plain_password, hashed_password)
+
+
+def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Verifies the password and, if the stored hash is outdated per the policy, returns a fresh hash."""
+    return get_password_context().verify_and_update(plain_password, hashed_password)
 
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    return get_password_context().hash(password)
+
+
+# --- Password Hashing Executor ---
+# bcrypt is CPU-bound and holds the GIL, so it runs in a process pool sized to
+# the machine instead of on the event loop. The number of queued + running jobs
+# is bounded; past that we shed load with a 503 rather than queueing forever.
+
+_hash_executor: Optional[ProcessPoolExecutor] = None
+_hash_workers = 0
+_hash_initialized = False
+_hash_executor_lock = threading.Lock() # Guards replacing a broken pool
+_hash_max_pending = settings.PASSWORD_HASH_MAX_PENDING
+_hash_pending = 0
+
+
+def init_password_hasher(max_workers: Optional[int] = None, max_pending: Optional[int] = None) -> None:
+    """(Re)creates the hashing pool. Defaults come from Settings; max_workers=0 hashes in the threadpool."""
+    global _hash_executor, _hash_workers, _hash_initialized, _hash_max_pending
+    shutdown_password_hasher()
+    workers = settings.PASSWORD_HASH_WORKERS if max_workers is None else max_workers
+    if workers is None:
+        workers = os.cpu_count() or 1
+    _hash_executor = ProcessPoolExecutor(max_workers=workers) if workers > 0 else None
+    _hash_workers = workers
+    _hash_max_pending = settings.PASSWORD_HASH_MAX_PENDING if max_pending is None else max_pending
+    _hash_initialized = True
+
+
+def shutdown_password_hasher() -> None:
+    global _hash_executor, _hash_initialized
+    if _hash_executor is not None:
+        _hash_executor.shutdown(wait=True, cancel_futures=True)
+    _hash_executor = None
+    _hash_initialized = False
+
+
+def _replace_broken_hash_executor(broken: ProcessPoolExecutor) -> Optional[ProcessPoolExecutor]:
+    """
+    Swaps in a new pool for a broken one and returns the pool to use now. Only the first caller per
+    broken pool replaces it; the others get its replacement, so jobs already sent there keep running.
+    """
+    global _hash_executor
+    with _hash_executor_lock:
+        if _hash_executor is not broken:
+            return _hash_executor # Already replaced (or shut down: None)
+        _hash_executor = ProcessPoolExecutor(max_workers=_hash_workers)
+    logger.warning("Password hashing pool broke (a worker died); replaced it")
+    broken.shutdown(wait=False, cancel_futures=True) # Its futures have all failed already; don't block the event loop
+    return _hash_executor
+
+
+def _hasher_busy_exception() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Server is busy, please try again shortly.",
+        headers={"Retry-After": str(settings.PASSWORD_HASH_RETRY_AFTER_SECONDS)},
+    )
+
+
+async def _run_hash_job(func, *args):
+    global _hash_pending
+    if not _hash_initialized:
+        init_password_hasher()
+    if _hash_pending >= _hash_max_pending:
+        raise _hasher_busy_exception()
+
+    _hash_pending += 1
+    try:
+        with PASSWORD_HASH_SPAN.time(): # Includes time queued behind other hash jobs
+            executor = _hash_executor
+            if executor is None:
+                return await run_in_threadpool(func, *args)
+            loop = asyncio.get_running_loop()
+            try:
+                return await loop.run_in_executor(executor, func, *args)
+            except BrokenProcessPool:
+                # A worker died (e.g. OOM-killed): retry this job once on the replacement pool
+                executor = _replace_broken_hash_executor(executor)
+                if executor is None:
+                    raise _hasher_busy_exception()
+                try:
+                    return await loop.run_in_executor(executor, func, *args)
+                except BrokenProcessPool:
+                    _replace_broken_hash_executor(executor)
+                    raise _hasher_busy_exception() # Let the client retry
+    finally:
+        _hash_pending -= 1
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await _run_hash_job(verify_password, plain_password, hashed_password)
+
+
+async def verify_and_update_password_async(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    return await _run_hash_job(verify_and_update_password, plain_password, hashed_password)
+
+
+async def hash_password_async(password: str) -> str:
+    return await _run_hash_job(get_password_hash, password)
 
 
 def create_verification_token(email: str) -> str:
@@ -30,7 +186,8 @@ def create_verification_token(email: str) -> str:
         "exp": expire,
         "purpose": "email_verification" # Specific purpose claim
     }
-    encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=ALGORITHM)
+    with JWT_SIGN_SPAN.time():
+        encoded_jwt = _jwt().encode(to_encode, settings.SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
 
@@ -41,37 +198,39 @@ def create_password_reset_token(email: str) -> str:
         "exp": expire,
         "purpose": "password_reset" # Specific purpose claim
     }
-    encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=ALGORITHM)
+    with JWT_SIGN_SPAN.time():
+        encoded_jwt = _jwt().encode(to_encode, settings.SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
 
 def verify_verification_token(token: str) -> Optional[str]:
     """Verifies the token and returns the email if valid, otherwise None."""
     try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[ALGORITHM], options={"verify_aud": False}) # No specific audience needed here yet
+        with JWT_VERIFY_SPAN.time():
+            payload = _jwt().decode(token, settings.SECRET_KEY, algorithms=[ALGORITHM], options={"verify_aud": False}) # No specific audience needed here yet
         
         # Check if the purpose is correct
         if payload.get("purpose") != "email_verification":
-            print("Token purpose mismatch.") # Add proper logging
+            logger.info("Verification token purpose mismatch")
             return None
             
         email: Optional[str] = payload.get("sub")
         if email is None:
-            print("Token subject (email) missing.") # Add proper logging
+            logger.info("Verification token subject (email) missing")
             return None
         
         # Optional: Check expiration manually if needed, though decode handles it
         # exp = payload.get("exp")
         # if exp is None or datetime.fromtimestamp(exp, timezone.utc) < datetime.now(timezone.utc):
-        #     print("Token expired.") # Add proper logging
+        #     logger.info("Token expired")
         #     return None
 
         return email
     except JWTError as e:
-        print(f"JWT Error: {e}") # Add proper logging
+        logger.info("Invalid verification token: %s", e)
         return None
-    except Exception as e: # Catch other potential errors
-        print(f"Token verification error: {e}") # Add proper logging
+    except Exception: # Catch other potential errors
+        logger.exception("Verification token check failed")
         return None
 
 
@@ -84,23 +243,44 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     else:
         expire = datetime.now(timezone.utc) + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp": expire, "token_type": "access"}) # Add token type claim
-    encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=ALGORITHM)
+    with JWT_SIGN_SPAN.time():
+        encoded_jwt = _jwt().encode(to_encode, settings.SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def create_refresh_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
+def create_refresh_token(data: dict, expires_delta: Optional[timedelta] = None, family_id: Optional[str] = None) -> str:
+    """Creates a single-use refresh token. Pass the family_id of the token being rotated, or None for a new login."""
     to_encode = data.copy()
     if expires_delta:
         expire = datetime.now(timezone.utc) + expires_delta
     else:
         expire = datetime.now(timezone.utc) + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
-    to_encode.update({"exp": expire, "token_type": "refresh"}) # Add token type claim
-    encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=ALGORITHM)
+    to_encode.update({
+        "exp": expire,
+        "token_type": "refresh", # Add token type claim
+        "jti": uuid.uuid4().hex, # Unique per token, consumed on rotation
+        "fid": family_id or uuid.uuid4().hex, # Shared by all tokens rotated from one login
+        "iat": time.time(), # Sub-second, so a login right after users.refresh_tokens_revoked_at isn't caught by it
+    })
+    with JWT_SIGN_SPAN.time():
+        encoded_jwt = _jwt().encode(to_encode, settings.SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+def decode_refresh_token(token: str) -> Optional[dict]:
+    """Returns the claims of a valid refresh token, otherwise None."""
+    try:
+        with JWT_VERIFY_SPAN.time():
+            claims = _jwt().decode(token, settings.SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
+    if claims.get("token_type") != "refresh" or not all(claims.get(key) for key in ("sub", "jti", "fid", "exp")):
+        return None
+    return claims
+
 def verify_token(token: str, credentials_exception: HTTPException) -> dict:
     """Verifies any JWT token (access, refresh, verification) and returns the payload."""
     try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[ALGORITHM])
+        with JWT_VERIFY_SPAN.time():
+            payload = _jwt().decode(token, settings.SECRET_KEY, algorithms=[ALGORITHM])
         # Optional: Add checks for specific claims like 'token_type' if needed outside this func
         # Optional: Check expiration manually if needed, though decode handles it
         # exp = payload.get("exp")
@@ -109,6 +289,32 @@ def verify_token(token: str, credentials_exception: HTTPException) -> dict:
         return payload
     except JWTError:
         raise credentials_exception
-    except Exception as e: # Catch other potential errors during decoding
-        print(f"Token verification error: {e}") # Add proper logging
+    except Exception: # Catch other potential errors during decoding
+        logger.exception("Token verification failed")
         raise credentials_exception
+
+
+# --- Access Token Fast Path ---
+# Verified access token claims are cached by token digest until the token's own
+# exp, so repeat requests with the same cookie skip the HMAC check and decode.
+
+access_token_cache = TTLCache(maxsize=settings.TOKEN_CACHE_MAX_ENTRIES)
+
+
+def decode_access_token(token: str) -> Optional[dict]:
+    """Returns the claims of a valid access token, otherwise None."""
+    key = hashlib.sha256(token.encode()).digest()
+    claims = access_token_cache.get(key)
+    if claims is not None:
+        return claims
+
+    try:
+        with JWT_VERIFY_SPAN.time():
+            claims = _jwt().decode(token, settings.SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
+    if claims.get("token_type") != "access" or claims.get("sub") is None or claims.get("exp") is None:
+        return None
+
+    access_token_cache.set(key, claims, expires_at=claims["exp"])
+    return claims
@@ -0,0 +1,38 @@
+"""Fast JSON responses.
+
+The app's default response class is FastAPI's ORJSONResponse. Endpoints with
+a response_model still validate their return value against the schema,
+but orjson encodes the result instead of json.dumps.
+
+List endpoints can skip the schema layer altogether. They select only the
+schema's columns (schema_columns) and return a RowsResponse, which encodes
+the result rows with orjson. Compared with returning ORM objects, this
+skips ORM identity-map loading, one pydantic model per row,
+jsonable_encoder's copy of the output and json.dumps. The one intermediate
+object per row is a dict handed to orjson. The endpoint keeps its
+response_model, so the OpenAPI schema still describes the payload; FastAPI
+doesn't re-validate a Response that is returned directly.
+"""
+from typing import Any, Dict, Optional, Sequence, Type
+
+import orjson
+from fastapi import Response
+from pydantic import BaseModel
+from sqlalchemy.engine import Row
+
+
+def schema_columns(schema: Type[BaseModel], entity, **overrides) -> list:
+    """entity's column for each field of schema, in field order; overrides maps field -> column expression."""
+    return [
+        overrides[name].label(name) if name in overrides else getattr(entity, name)
+        for name in schema.model_fields
+    ]
+
+
+class RowsResponse(Response):
+    """{key: [row, ...], **extra} encoded straight from result rows (keys are the selected column labels)."""
+    media_type = "application/json"
+
+    def __init__(self, rows: Sequence[Row], key: str, extra: Optional[Dict[str, Any]] = None, status_code: int = 200, headers=None):
+        content = orjson.dumps({key: [row._asdict() for row in rows], **(extra or {})})
+        super().__init__(content=content, status_code=status_code, headers=headers, media_type=self.media_type)
@@ -0,0 +1,305 @@
+"""In-process full-text and fuzzy search over user profiles.
+
+A profile is the words of three weighted fields: the name (NAME_WEIGHT),
+its tags (TAG_WEIGHT) and, through its company, the company name
+(COMPANY_WEIGHT). Words are runs of letters and digits, lowercased. That is
+how PostgreSQL's 'simple' text search configuration splits them, so this
+index and the SQL backend in core.search match the same words.
+
+- Whole words: postings map each word to the set of profiles with it in
+  their name, and to those with it in a tag; company names map to
+  companies, and companies to their members.
+- Prefixes: the vocabulary is kept sorted, so the words starting with a
+  term are one bisect range. Terms of MIN_PREFIX_LENGTH or more characters
+  match as prefixes; the larger the share of the word a prefix covers, the
+  higher it ranks.
+- Typos: name words are also indexed by their trigrams, padded the way
+  pg_trgm pads them. A fuzzy search also matches terms to name words with
+  a trigram similarity of at least FUZZY_THRESHOLD.
+
+Every term must match (AND). A profile scores the sum over the terms of its
+best field weight x match quality. A term's matches come in groups of equal
+score (one field of one matched word), so a one-term query walks the
+groups best first and stops once it has enough hits: a broad term ("py")
+doesn't score all its matches. Longer queries are intersected rarest term
+first; once the candidates are fewer than a term's matches, the term is
+checked against the candidates' own words instead.
+
+Updates are incremental: add() replaces a profile's words, remove() drops
+them and set_company() renames a company for all its members at once.
+"""
+import heapq
+import re
+from bisect import bisect_left
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+NAME_WEIGHT = 1.0
+COMPANY_WEIGHT = 0.6
+TAG_WEIGHT = 0.4
+MIN_PREFIX_LENGTH = 2 # Shorter terms only match whole words; a one-letter prefix matches most profiles
+PREFIX_QUALITY = 0.5 # A prefix covering none of the word; a whole word is 1.0
+FUZZY_THRESHOLD = 0.3 # pg_trgm's default similarity_threshold
+MAX_PENDING_WORDS = 64 # New words inserted into the sorted vocabulary one by one; more re-sort it once
+
+WORD = re.compile(r"[^\W_]+")
+
+Hit = Tuple[int, float] # (user_id, score)
+Group = Tuple[float, Set[int]] # (score, user_ids): the matches in one field of one word
+Expansion = Dict[str, Tuple[float, float]] # word -> (match quality, in names: with typos too)
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    return WORD.findall(text.lower()) if text else []
+
+
+def trigrams(word: str) -> Set[str]:
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _ranked(scores: Dict[int, float], limit: int) -> List[Hit]:
+    """The limit best (user_id, score), ties by id; counts scores to find the cut-off instead of ordering every hit."""
+    if len(scores) <= limit:
+        return sorted(scores.items(), key=lambda hit: (-hit[1], hit[0]))
+    counts = Counter(scores.values())
+    above = 0
+    for cut in sorted(counts, reverse=True):
+        if above + counts[cut] >= limit:
+            break
+        above += counts[cut]
+    hits = sorted(((user_id, score) for user_id, score in scores.items() if score > cut), key=lambda hit: (-hit[1], hit[0]))
+    hits.extend((user_id, cut) for user_id in sorted([user_id for user_id, score in scores.items() if score == cut])[:limit - above])
+    return hits
+
+
+class TextIndex:
+    def __init__(self):
+        self._names: Dict[str, Set[int]] = {} # word -> user_ids with it in their name
+        self._tags: Dict[str, Set[int]] = {} # word -> user_ids with it in a tag (and not in their name)
+        self._words: Dict[int, Tuple[str, ...]] = {} # user_id -> its words, to remove or re-check them
+        self._company_of: Dict[int, int] = {}
+        self._members: Dict[int, Set[int]] = {} # company_id -> user_ids
+        self._company_words: Dict[int, Tuple[str, ...]] = {}
+        self._companies: Dict[str, Set[int]] = {} # word -> company_ids
+
+        # Sorted vocabulary for prefix ranges. New words wait in _pending until the next prefix
+        # lookup; removed words stay until the next re-sort and are skipped when read
+        self._vocabulary: List[str] = []
+        self._pending: List[str] = []
+        self._dead = 0
+
+        self._trigrams: Dict[str, Set[str]] = {} # trigram -> name words containing it
+        self._trigram_counts: Dict[str, int] = {} # name word -> its number of distinct trigrams
+
+    def __len__(self) -> int:
+        return len(self._words)
+
+    # --- Updates ---
+
+    def add(self, user_id: int, full_name: Optional[str], tags: Iterable[str] = (), company_id: Optional[int] = None) -> None:
+        """Indexes a profile, replacing what was indexed for user_id before."""
+        self.remove(user_id)
+        name_words = dict.fromkeys(tokenize(full_name))
+        tag_words = dict.fromkeys(word for tag in tags for word in tokenize(tag) if word not in name_words)
+        for word in name_words:
+            self._post(self._names, word, user_id)
+        for word in tag_words:
+            self._post(self._tags, word, user_id)
+        if name_words or tag_words:
+            self._words[user_id] = (*name_words, *tag_words)
+        if company_id is not None:
+            self._company_of[user_id] = company_id
+            self._members.setdefault(company_id, set()).add(user_id)
+
+    def remove(self, user_id: int) -> None:
+        for word in self._words.pop(user_id, ()):
+            self._unpost(self._names if user_id in self._names.get(word, ()) else self._tags, word, user_id)
+        company_id = self._company_of.pop(user_id, None)
+        if company_id is not None:
+            members = self._members[company_id]
+            members.discard(user_id)
+            if not members:
+                del self._members[company_id]
+
+    def set_company(self, company_id: int, name: Optional[str]) -> None:
+        """Indexes a company's name (None drops it); its members match it without being re-added."""
+        words = tuple(dict.fromkeys(tokenize(name)))
+        old = self._company_words.get(company_id, ())
+        if words == old:
+            return
+        for word in old:
+            self._unpost(self._companies, word, company_id)
+        for word in words:
+            self._post(self._companies, word, company_id)
+        if words:
+            self._company_words[company_id] = words
+        else:
+            self._company_words.pop(company_id, None)
+
+    def _post(self, postings: Dict[str, Set[int]], word: str, key: int) -> None:
+        keys = postings.get(word)
+        if keys is None:
+            if not self._is_word(word):
+                self._pending.append(word)
+            keys = postings[word] = set()
+            if postings is self._names:
+                word_trigrams = trigrams(word)
+                self._trigram_counts[word] = len(word_trigrams)
+                for trigram in word_trigrams:
+                    self._trigrams.setdefault(trigram, set()).add(word)
+        keys.add(key)
+
+    def _unpost(self, postings: Dict[str, Set[int]], word: str, key: int) -> None:
+        keys = postings[word]
+        keys.discard(key)
+        if keys:
+            return
+        del postings[word]
+        if postings is self._names:
+            del self._trigram_counts[word]
+            for trigram in trigrams(word):
+                words = self._trigrams[trigram]
+                words.discard(word)
+                if not words:
+                    del self._trigrams[trigram]
+        if not self._is_word(word):
+            self._dead += 1
+
+    def _is_word(self, word: str) -> bool:
+        return word in self._names or word in self._tags or word in self._companies
+
+    def _sorted_vocabulary(self) -> List[str]:
+        if len(self._pending) <= MAX_PENDING_WORDS and self._dead <= len(self._vocabulary) // 4:
+            for word in self._pending:
+                at = bisect_left(self._vocabulary, word)
+                if at == len(self._vocabulary) or self._vocabulary[at] != word:
+                    self._vocabulary.insert(at, word)
+        else:
+            self._vocabulary = sorted({word for word in (*self._vocabulary, *self._pending) if self._is_word(word)})
+            self._dead = 0
+        self._pending.clear()
+        return self._vocabulary
+
+    # --- Queries ---
+
+    def search(self, query: str, limit: int, fuzzy: bool = True) -> List[Hit]:
+        """
+        The top limit (user_id, score) for query, best first, ties by id.
+        With fuzzy, a query that matches nothing is retried with typo-tolerant name matching.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        for fuzzy_pass in (False, True) if fuzzy else (False,):
+            expansions = [self._expand(term, fuzzy_pass) for term in terms]
+            if not expansions or not all(expansions):
+                continue
+            if len(expansions) == 1:
+                hits = self._best_groups(self._groups(expansions[0]), limit)
+            else:
+                hits = _ranked(self._intersect(expansions), limit)
+            if hits:
+                return hits
+        return []
+
+    def _expand(self, term: str, fuzzy: bool) -> Expansion:
+        """The words term matches, with the match quality (1.0 = the whole word); typos only match names."""
+        if len(term) >= MIN_PREFIX_LENGTH:
+            vocabulary = self._sorted_vocabulary()
+            words = vocabulary[bisect_left(vocabulary, term):bisect_left(vocabulary, term + "\U0010ffff")]
+            expansion = {}
+            for word in words:
+                if self._is_word(word):
+                    quality = PREFIX_QUALITY + (1 - PREFIX_QUALITY) * len(term) / len(word)
+                    expansion[word] = (quality, quality)
+        else:
+            expansion = {term: (1.0, 1.0)} if self._is_word(term) else {}
+        if fuzzy:
+            term_trigrams = trigrams(term)
+            shared = Counter(word for trigram in term_trigrams for word in self._trigrams.get(trigram, ()))
+            for word, common in shared.items():
+                similarity = common / (len(term_trigrams) + self._trigram_counts[word] - common)
+                quality, name_quality = expansion.get(word, (0.0, 0.0))
+                if similarity >= FUZZY_THRESHOLD and similarity > name_quality:
+                    expansion[word] = (quality, similarity)
+        return expansion
+
+    def _groups(self, expansion: Expansion) -> List[Group]:
+        """A term's matches as (score, user_ids) groups, best first."""
+        groups = []
+        for word, (quality, name_quality) in expansion.items():
+            if word in self._names:
+                groups.append((NAME_WEIGHT * name_quality, self._names[word]))
+            if not quality:
+                continue
+            if word in self._tags:
+                groups.append((TAG_WEIGHT * quality, self._tags[word]))
+            for company_id in self._companies.get(word, ()):
+                if company_id in self._members:
+                    groups.append((COMPANY_WEIGHT * quality, self._members[company_id]))
+        groups.sort(key=lambda group: -group[0])
+        return groups
+
+    def _best_groups(self, groups: List[Group], limit: int) -> List[Hit]:
+        """The top hits of one term: a profile scores its best group, so take the groups best first until limit are found."""
+        hits: List[Hit] = []
+        seen: Set[int] = set()
+        i = 0
+        while i < len(groups):
+            score = groups[i][0]
+            j = i + 1
+            while j < len(groups) and groups[j][0] == score:
+                j += 1
+            # A broad word's group can hold a large share of all profiles: don't copy or sort it whole
+            tied = groups[i][1] if j == i + 1 else set().union(*(user_ids for _, user_ids in groups[i:j]))
+            if seen:
+                tied = tied - seen
+            wanted = limit - len(hits)
+            if len(tied) >= wanted:
+                hits.extend((user_id, score) for user_id in heapq.nsmallest(wanted, tied))
+                break
+            hits.extend((user_id, score) for user_id in sorted(tied))
+            seen |= tied
+            i = j
+        return hits
+
+    def _term_scores(self, groups: List[Group]) -> Dict[int, float]:
+        scores: Dict[int, float] = {}
+        for score, user_ids in groups: # Best first, so a profile keeps the score of its first group
+            scores.update(dict.fromkeys(user_ids - scores.keys(), score))
+        return scores
+
+    def _profile_score(self, user_id: int, expansion: Expansion) -> float:
+        best = 0.0
+        for word in self._words.get(user_id, ()):
+            if word in expansion:
+                quality, name_quality = expansion[word]
+                if user_id in self._names.get(word, ()):
+                    best = max(best, NAME_WEIGHT * name_quality)
+                else:
+                    best = max(best, TAG_WEIGHT * quality)
+        for word in self._company_words.get(self._company_of.get(user_id), ()):
+            if word in expansion:
+                best = max(best, COMPANY_WEIGHT * expansion[word][0])
+        return best
+
+    def _intersect(self, expansions: List[Expansion]) -> Dict[int, float]:
+        terms = []
+        for expansion in expansions:
+            groups = self._groups(expansion)
+            terms.append((sum(len(user_ids) for _, user_ids in groups), expansion, groups))
+        terms.sort(key=lambda term: term[0])
+        scores: Optional[Dict[int, float]] = None
+        for size, expansion, groups in terms:
+            if scores is None:
+                scores = self._term_scores(groups)
+            elif len(scores) < size:
+                scores = {
+                    user_id: score + best for user_id, score in scores.items()
+                    if (best := self._profile_score(user_id, expansion))
+                }
+            else:
+                term_scores = self._term_scores(groups)
+                scores = {user_id: score + term_scores[user_id] for user_id, score in scores.items() if user_id in term_scores}
+            if not scores:
+                return {}
+        return scores
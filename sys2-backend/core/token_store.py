@@ -0,0 +1,172 @@
+"""Refresh token rotation state.
+
+Every refresh token carries a `jti` (unique per token) and a `fid` (family id,
+shared by all tokens rotated from one login). A token can be exchanged once:
+consume() records its jti until the token would have expired anyway. Seeing
+the same jti again means the token was copied, so the whole family is
+revoked. Entries only live until their expiry, which keeps both stores
+bounded by the number of live tokens.
+"""
+import abc
+import heapq
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Set
+
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import settings
+from models.refresh_token_revocation import RefreshTokenRevocation
+
+
+class RefreshTokenStoreFull(Exception):
+    """The store cannot record another id before some entries expire."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Refresh token store is full; space frees up in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class RefreshTokenStore(abc.ABC):
+    @abc.abstractmethod
+    async def consume(self, db: AsyncSession, jti: str, expires_at: float) -> bool:
+        """Marks a refresh token as used. Returns False if it had already been used."""
+
+    @abc.abstractmethod
+    async def revoke_family(self, db: AsyncSession, family_id: str, expires_at: float) -> None:
+        ...
+
+    @abc.abstractmethod
+    async def is_family_revoked(self, db: AsyncSession, family_id: str) -> bool:
+        ...
+
+
+def _compact_id(token_id: str) -> bytes:
+    try:
+        return bytes.fromhex(token_id) # uuid4 hex -> 16 bytes
+    except ValueError:
+        return token_id.encode()
+
+
+class MemoryRefreshTokenStore(RefreshTokenStore):
+    """In-process store using expiry-bucketed sets.
+
+    Ids live in one dict for O(1) checks and are grouped by expiry bucket, so
+    pruning drops whole expired buckets without touching live entries. Live
+    entries are never evicted: forgetting one would let a used token or a
+    revoked family through again. Once max_entries are live, consume() and
+    revoke_family() raise RefreshTokenStoreFull until the oldest bucket expires.
+    State is per process; use the database store with several workers.
+    """
+
+    def __init__(self, bucket_seconds: int = 3600, max_entries: int = 1_000_000):
+        self.bucket_seconds = bucket_seconds
+        self.max_entries = max_entries
+        self._bucket_of: Dict[bytes, int] = {}
+        self._buckets: Dict[int, Set[bytes]] = {}
+        self._bucket_heap: List[int] = []
+
+    def __len__(self) -> int:
+        return len(self._bucket_of)
+
+    def _drop_bucket(self, bucket: int) -> None:
+        for key in self._buckets.pop(bucket, ()):
+            del self._bucket_of[key]
+
+    def prune(self, now: Optional[float] = None) -> None:
+        # A bucket only holds ids expiring before its end, so it can go once that has passed
+        now = time.time() if now is None else now
+        while self._bucket_heap and (self._bucket_heap[0] + 1) * self.bucket_seconds <= now:
+            self._drop_bucket(heapq.heappop(self._bucket_heap))
+
+    def _add(self, token_id: str, expires_at: float) -> bool:
+        key = _compact_id(token_id)
+        if key in self._bucket_of:
+            return False
+        now = time.time()
+        self.prune(now)
+        if len(self._bucket_of) >= self.max_entries:
+            frees_at = (self._bucket_heap[0] + 1) * self.bucket_seconds if self._bucket_heap else now
+            raise RefreshTokenStoreFull(max(1, int(frees_at - now) + 1))
+
+        bucket = int(expires_at // self.bucket_seconds)
+        if bucket not in self._buckets:
+            self._buckets[bucket] = set()
+            heapq.heappush(self._bucket_heap, bucket)
+        self._buckets[bucket].add(key)
+        self._bucket_of[key] = bucket
+        return True
+
+    async def consume(self, db, jti, expires_at):
+        return self._add(jti, expires_at)
+
+    async def revoke_family(self, db, family_id, expires_at):
+        self._add(family_id, expires_at)
+
+    async def is_family_revoked(self, db, family_id):
+        return _compact_id(family_id) in self._bucket_of
+
+
+class DatabaseRefreshTokenStore(RefreshTokenStore):
+    """Shared store on the refresh_token_revocations table (primary key lookups only).
+
+    Writes join the caller's transaction; the caller commits. Expired rows are
+    deleted at most once per prune_interval_seconds.
+    """
+
+    def __init__(self, prune_interval_seconds: int = 600):
+        self.prune_interval_seconds = prune_interval_seconds
+        self._last_prune = 0.0
+
+    @staticmethod
+    def _insert_ignore(db: AsyncSession, token_id: str, kind: str, expires_at: float):
+        dialect = db.get_bind().dialect.name
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        elif dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            raise NotImplementedError(f"Refresh token store does not support the '{dialect}' dialect")
+        return insert(RefreshTokenRevocation).values(
+            token_id=token_id,
+            kind=kind,
+            expires_at=datetime.fromtimestamp(expires_at, timezone.utc),
+        ).on_conflict_do_nothing(index_elements=["token_id"]).returning(RefreshTokenRevocation.token_id)
+
+    async def _maybe_prune(self, db: AsyncSession) -> None:
+        now = time.time()
+        if now - self._last_prune < self.prune_interval_seconds:
+            return
+        self._last_prune = now
+        await db.execute(delete(RefreshTokenRevocation).where(
+            RefreshTokenRevocation.expires_at < datetime.fromtimestamp(now, timezone.utc)
+        ))
+
+    async def consume(self, db, jti, expires_at):
+        inserted = await db.scalar(self._insert_ignore(db, jti, "jti", expires_at))
+        await self._maybe_prune(db)
+        return inserted is not None
+
+    async def revoke_family(self, db, family_id, expires_at):
+        await db.execute(self._insert_ignore(db, family_id, "family", expires_at))
+
+    async def is_family_revoked(self, db, family_id):
+        return await db.scalar(
+            select(RefreshTokenRevocation.token_id).where(RefreshTokenRevocation.token_id == family_id)
+        ) is not None
+
+
+_store: Optional[RefreshTokenStore] = None
+
+
+def get_refresh_token_store() -> RefreshTokenStore:
+    global _store
+    if _store is None:
+        if settings.REFRESH_TOKEN_STORE == "memory":
+            _store = MemoryRefreshTokenStore(max_entries=settings.REFRESH_TOKEN_MEMORY_STORE_MAX_ENTRIES)
+        elif settings.REFRESH_TOKEN_STORE == "database":
+            _store = DatabaseRefreshTokenStore()
+        else:
+            raise ValueError(f"Unknown REFRESH_TOKEN_STORE '{settings.REFRESH_TOKEN_STORE}'. Valid options are 'database', 'memory'.")
+    return _store
@@ -0,0 +1,158 @@
+"""Bulk status/role transitions for SYS admins.
+
+Promotion is the exception: promoted users need a workstation, so it is
+delegated to core.waitlist.promote_next(), which promotes the matching
+users in queue order into the target space's free member seats, in one
+transaction.
+
+A transition is applied to every user matching a filter with set-based
+`UPDATE ... WHERE id IN (<chunk>) AND <guard> RETURNING`, one chunk of ids
+(in id order) per transaction so row locks are short and a 50k-user run
+doesn't build one giant transaction. The guard is repeated in the UPDATE,
+so rows changed by someone else since the id scan are skipped, not
+clobbered. Notification emails and in-app notifications for each chunk are
+written in the same transaction as the status change, as are the release of
+deactivated users' workstations and the revocation of their refresh tokens.
+Once a chunk commits, the deactivated users' chat sockets are closed.
+"""
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Optional, Sequence
+
+from sqlalchemy import update, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.chat import get_chat_gateway
+from core.dependencies import invalidate_cached_user
+from core.enums import SELF_SERVICE_ROLES, UserRole, UserStatus
+from core.notifications import NotificationEvent, write_notifications
+from core.waitlist import promote_next
+from core.workstations import release_user_seats
+from database import read_from_primary
+from models.user import User
+from utils.email_queue import enqueue_bulk
+from utils.email_templates import render_bulk
+
+ASSIGNABLE_ROLES = SELF_SERVICE_ROLES
+PROTECTED_ROLES = (UserRole.SYS_ADMIN,) # Never touched by bulk transitions
+
+
+@dataclass(frozen=True)
+class Transition:
+    from_statuses: Optional[Sequence[UserStatus]] # None = any status other than to_status
+    to_status: Optional[UserStatus] # None = status unchanged (role reassignment)
+    email_template: Optional[str] = None
+    notification_type: Optional[str] = None
+
+
+TRANSITIONS = {
+    "promote": Transition(from_statuses=(UserStatus.ACTIVE_WAITLIST,), to_status=UserStatus.ACTIVE), # Applied by promote_next
+    "deactivate": Transition(from_statuses=None, to_status=UserStatus.INACTIVE, email_template="account_deactivated", notification_type="account_deactivated"),
+    "reassign": Transition(from_statuses=None, to_status=None, notification_type="role_changed"),
+}
+
+
+def _conditions(transition: Transition, user_ids, roles, statuses, created_before, target_role) -> list:
+    conditions = [User.role.not_in(PROTECTED_ROLES)]
+    if user_ids is not None:
+        conditions.append(User.id.in_(user_ids))
+    if roles:
+        conditions.append(User.role.in_(roles))
+    if statuses:
+        conditions.append(User.status.in_(statuses))
+    if created_before is not None:
+        conditions.append(User.created_at < created_before)
+    # Guard: only rows the transition actually changes
+    if transition.from_statuses is not None:
+        conditions.append(User.status.in_(transition.from_statuses))
+    elif transition.to_status is not None:
+        conditions.append(User.status != transition.to_status)
+    if target_role is not None:
+        conditions.append(User.role != target_role)
+    return conditions
+
+
+async def apply_bulk_transition(
+    db: AsyncSession,
+    action: str,
+    *,
+    user_ids: Optional[Sequence[int]] = None,
+    roles: Optional[Sequence[UserRole]] = None,
+    statuses: Optional[Sequence[UserStatus]] = None,
+    created_before: Optional[datetime] = None,
+    target_role: Optional[UserRole] = None,
+    space_id: Optional[int] = None,
+    notify: bool = True,
+    chunk_size: int = 1000,
+) -> dict:
+    """
+    Applies TRANSITIONS[action] to the matching users; commits once per chunk.
+    'promote' needs space_id and promotes only as many as it has free workstations;
+    raises LookupError for an unknown space.
+    """
+    transition = TRANSITIONS[action]
+    read_from_primary(db) # A keyset scan on a lagging replica would pass over missing rows for good
+    if action == "reassign" and target_role not in ASSIGNABLE_ROLES:
+        raise ValueError(f"target_role must be one of {', '.join(role.value for role in ASSIGNABLE_ROLES)}")
+    if action != "reassign":
+        target_role = None
+    if action == "promote":
+        if space_id is None:
+            raise ValueError("space_id is required to promote: promoted users get a workstation there")
+        result = await promote_next(
+            db, space_id, notify=notify, conditions=_conditions(transition, user_ids, roles, statuses, created_before, None),
+        )
+        return {
+            "action": action, "updated": result["promoted"],
+            "emails_queued": result["emails_queued"], "notifications_created": result["notifications_created"],
+        }
+
+    values = {}
+    if transition.to_status is not None:
+        values["status"] = transition.to_status
+    if transition.to_status == UserStatus.INACTIVE:
+        values["refresh_tokens_revoked_at"] = datetime.now(timezone.utc) # Ends every refresh token family (see /auth/refresh)
+    if target_role is not None:
+        values["role"] = target_role
+    conditions = _conditions(transition, user_ids, roles, statuses, created_before, target_role)
+    template = transition.email_template if notify else None
+    notification_type = transition.notification_type if notify else None
+    notification_data = {"role": target_role.value} if target_role is not None else None
+
+    updated = emails_queued = notifications_created = 0
+    last_id = 0
+    while True:
+        ids = (await db.scalars(
+            select(User.id).where(*conditions, User.id > last_id).order_by(User.id).limit(chunk_size)
+        )).all()
+        if not ids:
+            break
+        last_id = ids[-1]
+
+        rows = (await db.execute(
+            update(User)
+            .where(User.id.in_(ids), *conditions)
+            .values(**values)
+            .returning(User.id, User.email, User.full_name)
+            .execution_options(synchronize_session=False) # Nothing to sync; keeps the identity map untouched
+        )).all()
+        if template is not None and rows:
+            emails_queued += await enqueue_bulk(db, render_bulk(
+                template, ({"to_email": row.email, "full_name": row.full_name} for row in rows)
+            ))
+        if transition.to_status == UserStatus.INACTIVE and rows:
+            await release_user_seats(db, [row.id for row in rows]) # Frees their workstations for the waitlist
+        if notification_type is not None and rows:
+            notifications_created += await write_notifications(db, [NotificationEvent(
+                notification_type, recipient_ids=[row.id for row in rows], data=notification_data
+            )])
+        await db.commit()
+
+        # Bulk UPDATEs bypass the mapper events that normally invalidate the cache
+        for row in rows:
+            invalidate_cached_user(row.email)
+        if transition.to_status == UserStatus.INACTIVE:
+            await get_chat_gateway().disconnect_users((row.id, row.email) for row in rows) # On every worker
+        updated += len(rows)
+
+    return {"action": action, "updated": updated, "emails_queued": emails_queued, "notifications_created": notifications_created}
@@ -0,0 +1,184 @@
+"""In-process top-k cosine similarity over one space's profile embeddings.
+
+A SpaceIndex holds the space's embeddings as one contiguous, L2-normalized
+float32 matrix, so cosine similarity is a plain matmul. Queries are batched
+(one (batch x n) score matrix per matmul, capped at MAX_SCORE_ELEMENTS) and
+the top k is picked with argpartition instead of a full sort.
+
+Exclusions (the user themselves, their own company, blocks in either
+direction) are precomputed as arrays of row numbers per company and per
+user. Applying them costs O(excluded rows) per query instead of a
+comparison against every row.
+
+Above `ann_threshold` rows an HNSW graph (hnswlib, optional dependency) is
+built as well. Approximate queries over-fetch by the number of excluded
+rows, so filtering can't leave fewer than k results. Without hnswlib every
+query is exact.
+
+Indexes can be saved to a directory and loaded back memory-mapped, so all
+workers on a host share one copy through the page cache.
+"""
+import os
+import threading
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+try:
+    import hnswlib
+except ImportError: # Optional: approximate search for large spaces
+    hnswlib = None
+
+MAX_SCORE_ELEMENTS = 16_000_000 # Floats per score matrix (64 MB); bounds memory for big batches
+NO_COMPANY = -1
+
+Match = Tuple[int, float] # (user_id, cosine similarity)
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0 # All-zero embeddings score 0 against everything
+    return vectors / norms
+
+
+class SpaceIndex:
+    def __init__(
+        self,
+        user_ids: Sequence[int],
+        vectors: np.ndarray,
+        company_ids: Sequence[Optional[int]], # Or an int array using NO_COMPANY
+        blocked_pairs: Iterable[Tuple[int, int]] = (),
+        ann_threshold: Optional[int] = None,
+        hnsw_m: int = 16,
+        hnsw_ef_construction: int = 200,
+        hnsw_ef_search: int = 100,
+        normalized: bool = False,
+    ):
+        self.user_ids = np.asarray(user_ids, dtype=np.int64)
+        self.vectors = vectors if normalized else normalize_rows(vectors)
+        if self.vectors.shape[0] != len(self.user_ids):
+            raise ValueError("user_ids and vectors must have the same number of rows")
+        if isinstance(company_ids, np.ndarray) and company_ids.dtype.kind == "i":
+            self.companies = company_ids.astype(np.int64, copy=False) # Already coded with NO_COMPANY
+        else:
+            self.companies = np.asarray([NO_COMPANY if c is None else c for c in company_ids], dtype=np.int64)
+        self.row_of: Dict[int, int] = {int(user_id): row for row, user_id in enumerate(self.user_ids)}
+
+        # Precomputed exclusion lists (row numbers)
+        self._company_rows: Dict[int, np.ndarray] = {}
+        order = np.argsort(self.companies, kind="stable")
+        codes, starts = np.unique(self.companies[order], return_index=True)
+        for code, group in zip(codes, np.split(order, starts[1:])):
+            if code != NO_COMPANY:
+                self._company_rows[int(code)] = group
+        blocked: Dict[int, List[int]] = {}
+        for blocker, blocked_user in blocked_pairs:
+            a, b = self.row_of.get(blocker), self.row_of.get(blocked_user)
+            if a is not None and b is not None:
+                blocked.setdefault(a, []).append(b)
+                blocked.setdefault(b, []).append(a) # Blocks hide both directions
+        self._blocked_rows = {row: np.asarray(rows, dtype=np.int64) for row, rows in blocked.items()}
+
+        self._hnsw = None
+        self._hnsw_ef_search = hnsw_ef_search
+        self._hnsw_lock = threading.Lock()
+        if hnswlib is not None and ann_threshold is not None and len(self) >= ann_threshold:
+            self._hnsw = hnswlib.Index(space="ip", dim=self.dim)
+            self._hnsw.init_index(max_elements=len(self), M=hnsw_m, ef_construction=hnsw_ef_construction)
+            self._hnsw.add_items(self.vectors, np.arange(len(self)))
+            self._hnsw.set_ef(hnsw_ef_search)
+
+    def __len__(self) -> int:
+        return len(self.user_ids)
+
+    @property
+    def dim(self) -> int:
+        return self.vectors.shape[1]
+
+    @property
+    def approximate(self) -> bool:
+        return self._hnsw is not None
+
+    def excluded_rows(self, row: int) -> np.ndarray:
+        parts = [np.asarray([row], dtype=np.int64)]
+        company = self.companies[row]
+        if company != NO_COMPANY:
+            parts.append(self._company_rows[int(company)])
+        if row in self._blocked_rows:
+            parts.append(self._blocked_rows[row])
+        return np.concatenate(parts) if len(parts) > 1 else parts[0]
+
+    # --- Queries ---
+
+    def query(self, user_id: int, k: int, exact: bool = False) -> List[Match]:
+        return self.query_batch([user_id], k, exact=exact)[0]
+
+    def query_batch(self, user_ids: Sequence[int], k: int, exact: bool = False) -> List[List[Match]]:
+        """Top-k most similar users for each of user_ids (unknown ids get an empty list)."""
+        results: List[List[Match]] = [[] for _ in user_ids]
+        known = [(i, self.row_of[user_id]) for i, user_id in enumerate(user_ids) if user_id in self.row_of]
+        if not known or k <= 0:
+            return results
+        positions, rows = zip(*known)
+        search = self._search_exact if exact or self._hnsw is None else self._search_approximate
+        for position, matches in zip(positions, search(np.asarray(rows), k)):
+            results[position] = matches
+        return results
+
+    def _search_exact(self, rows: np.ndarray, k: int) -> List[List[Match]]:
+        n = len(self)
+        k = min(k, n)
+        batch_size = max(1, MAX_SCORE_ELEMENTS // n)
+        results = []
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            scores = self.vectors[batch] @ self.vectors.T # (batch, n) cosine similarities
+            for i, row in enumerate(batch):
+                scores[i, self.excluded_rows(row)] = -np.inf
+            top = np.argpartition(scores, n - k, axis=1)[:, n - k:] # Unordered top k per row
+            top_scores = np.take_along_axis(scores, top, axis=1)
+            order = np.argsort(-top_scores, axis=1)
+            top = np.take_along_axis(top, order, axis=1)
+            top_scores = np.take_along_axis(top_scores, order, axis=1)
+            for candidates, candidate_scores in zip(top, top_scores):
+                keep = np.isfinite(candidate_scores)
+                results.append(list(zip(self.user_ids[candidates[keep]].tolist(), candidate_scores[keep].tolist())))
+        return results
+
+    def _search_approximate(self, rows: np.ndarray, k: int) -> List[List[Match]]:
+        exclusions = [self.excluded_rows(row) for row in rows]
+        fetch = min(len(self), k + max(len(excluded) for excluded in exclusions))
+        with self._hnsw_lock: # ef is index-wide state
+            self._hnsw.set_ef(max(self._hnsw_ef_search, fetch))
+            labels, distances = self._hnsw.knn_query(self.vectors[rows], k=fetch)
+        results = []
+        for candidates, candidate_distances, excluded in zip(labels, distances, exclusions):
+            keep = ~np.isin(candidates, excluded)
+            candidates, similarities = candidates[keep][:k], 1.0 - candidate_distances[keep][:k] # ip distance = 1 - dot
+            results.append(list(zip(self.user_ids[candidates].tolist(), similarities.tolist())))
+        return results
+
+    # --- Persistence ---
+
+    def save(self, directory: str) -> None:
+        """Writes the normalized matrix, metadata and HNSW graph (if any); blocks are not saved."""
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, "vectors.npy"), self.vectors)
+        np.save(os.path.join(directory, "user_ids.npy"), self.user_ids)
+        np.save(os.path.join(directory, "companies.npy"), self.companies)
+        if self._hnsw is not None:
+            self._hnsw.save_index(os.path.join(directory, "hnsw.bin"))
+
+    @classmethod
+    def load(cls, directory: str, blocked_pairs: Iterable[Tuple[int, int]] = (), mmap: bool = True, hnsw_ef_search: int = 100) -> "SpaceIndex":
+        vectors = np.load(os.path.join(directory, "vectors.npy"), mmap_mode="r" if mmap else None)
+        user_ids = np.load(os.path.join(directory, "user_ids.npy"))
+        companies = np.load(os.path.join(directory, "companies.npy"))
+        index = cls(user_ids, vectors, companies, blocked_pairs, normalized=True, hnsw_ef_search=hnsw_ef_search)
+        hnsw_path = os.path.join(directory, "hnsw.bin")
+        if hnswlib is not None and os.path.exists(hnsw_path):
+            index._hnsw = hnswlib.Index(space="ip", dim=index.dim)
+            index._hnsw.load_index(hnsw_path, max_elements=len(index))
+            index._hnsw.set_ef(hnsw_ef_search)
+        return index
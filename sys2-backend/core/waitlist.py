@@ -0,0 +1,250 @@
+"""Waitlist queue and promotion scheduler.
+
+    python -m core.waitlist [--rescore] [--promote SPACE_ID] [--status]
+
+Queue order: every user carries `waitlist_queued_at`, their signup time
+moved earlier by bonuses, all given in days of waiting:
+
+- WAITLIST_VERIFIED_BONUS_DAYS once the email is verified
+- WAITLIST_REFERRAL_BONUS_DAYS per referred user who verified their email,
+  up to WAITLIST_MAX_REFERRAL_BONUSES of them
+- WAITLIST_PROFILE_BONUS_DAYS for a complete profile, pro rata
+
+Waiting longer moves everyone forward alike, so the order, and the stored
+key, only change when a user's own inputs change. ORM flushes recompute the
+key then (the mapper events in models.user). Registration computes it for
+the new row, and verification credits the referrer through the ORM. The partial index
+ix_users_waitlist_queue over (waitlist_queued_at, id) makes the queue an
+ordered index: a ranked page is a keyset range scan, O(log n) to find plus
+the page itself. After changing the bonus settings, run `--rescore`.
+
+Promotion: promote_next() locks the space for allocation changes
+(core.workstations), so promotions into one space are serialized without
+a global lock. It counts the seats free from now on and promotes the first
+verified users in the queue into them, each with a member seat. Their
+emails and in-app notifications are queued in the same transaction.
+WaitlistScheduler runs it for every such space every
+WAITLIST_SCHEDULER_INTERVAL_SECONDS, and at once when this process frees a
+workstation (wake()). Admin bulk promotion (core.user_admin) goes through
+it too, with the admin's filter as extra conditions, so nobody becomes
+Active without a seat.
+"""
+import argparse
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Optional, Sequence
+
+from sqlalchemy import bindparam, func, select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import settings
+from core.dependencies import invalidate_cached_user
+from core.enums import UserStatus
+from core.logging_config import configure_logging
+from core.metrics import WAITLIST_PROMOTED, WAITLIST_PROMOTION_SPAN
+from core.notifications import NotificationEvent, write_notifications
+from core.workstations import get_seat_availability
+from database import AsyncSessionLocal
+from models.space import Space
+from models.user import IS_VERIFIED_WAITLIST, IS_WAITLISTED, WAITLIST_PROFILE_FIELDS, User, waitlist_queue_key
+from utils.email_queue import enqueue_bulk
+from utils.email_templates import render_bulk
+
+logger = logging.getLogger(__name__)
+
+RESCORE_CHUNK_SIZE = 5000
+PROMOTED_EMAIL_TEMPLATE = "waitlist_promoted"
+PROMOTED_NOTIFICATION = "waitlist_promoted"
+
+
+# --- Queue order ---
+
+async def rescore(db: AsyncSession, chunk_size: int = RESCORE_CHUNK_SIZE) -> int:
+    """Recomputes waitlist_queued_at for every waitlisted user (after the bonus settings changed); commits per chunk."""
+    columns = [User.id, User.status, User.created_at, User.referral_count, *(getattr(User, name) for name in WAITLIST_PROFILE_FIELDS)]
+    statement = (
+        update(User).where(User.id == bindparam("user_id")).values(waitlist_queued_at=bindparam("queued_at"))
+        .execution_options(synchronize_session=False, dml_strategy="core_only") # executemany by the WHERE bindparam, not ORM bulk-by-primary-key
+    )
+    rescored = 0
+    last_id = 0
+    while True:
+        rows = (await db.execute(
+            select(*columns).where(IS_WAITLISTED, User.id > last_id).order_by(User.id).limit(chunk_size)
+        )).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        await db.execute(statement, [
+            {"user_id": row.id, "queued_at": waitlist_queue_key(row.created_at, row.status, row.referral_count, row._mapping)}
+            for row in rows
+        ])
+        await db.commit()
+        rescored += len(rows)
+    return rescored
+
+
+# --- Ranked pages ---
+
+async def list_waitlist(
+    db: AsyncSession, after: Optional[tuple] = None, limit: int = 100, verified_only: bool = False, columns=None,
+) -> list:
+    """One page of the waitlist in queue order, starting after the (waitlist_queued_at, id) cursor."""
+    conditions = [IS_WAITLISTED]
+    if verified_only:
+        conditions.append(IS_VERIFIED_WAITLIST)
+    if after is not None:
+        conditions.append(tuple_(User.waitlist_queued_at, User.id) > tuple_(*after))
+    return (await db.execute(
+        select(*(columns or [User])).where(*conditions).order_by(User.waitlist_queued_at, User.id).limit(limit)
+    )).all()
+
+
+# --- Promotion ---
+
+async def promote_next(
+    db: AsyncSession, space_id: int, limit: Optional[int] = None, notify: bool = True, conditions: Sequence = (),
+) -> dict:
+    """
+    Promotes the first verified users in the queue (among those matching conditions) into the space's free
+    member seats, at most limit; one transaction.
+    Raises LookupError for an unknown space and ValueError if it has no workstation capacity set.
+    """
+    async with get_seat_availability().allocating(db, space_id) as seats:
+        with WAITLIST_PROMOTION_SPAN.time():
+            free = seats.free_for_members()
+            count = free if limit is None else min(free, limit)
+            rows = []
+            if count:
+                ids = (await db.scalars(
+                    select(User.id).where(IS_WAITLISTED, IS_VERIFIED_WAITLIST, *conditions)
+                    .order_by(User.waitlist_queued_at, User.id).limit(count)
+                    .with_for_update(skip_locked=True) # Rows an admin is changing right now wait for the next run
+                )).all()
+                if ids:
+                    rows = (await db.execute(
+                        update(User)
+                        .where(User.id.in_(ids), IS_VERIFIED_WAITLIST)
+                        .values(status=UserStatus.ACTIVE, space_id=space_id)
+                        .returning(User.id, User.email, User.full_name)
+                        .execution_options(synchronize_session=False)
+                    )).all()
+                    await seats.allocate_members([row.id for row in rows])
+
+            emails_queued = notifications_created = 0
+            if notify and rows:
+                emails_queued = await enqueue_bulk(db, render_bulk(
+                    PROMOTED_EMAIL_TEMPLATE, ({"to_email": row.email, "full_name": row.full_name} for row in rows)
+                ))
+                notifications_created = await write_notifications(db, [NotificationEvent(
+                    PROMOTED_NOTIFICATION, recipient_ids=[row.id for row in rows], data={"space_id": space_id}
+                )])
+        # Leaving the block commits, which also releases the space lock when nothing was promoted
+
+    for row in rows:
+        invalidate_cached_user(row.email)
+    WAITLIST_PROMOTED.inc(len(rows))
+    return {
+        "space_id": space_id, "promoted": len(rows), "free_workstations": free - len(rows),
+        "emails_queued": emails_queued, "notifications_created": notifications_created,
+    }
+
+
+class WaitlistScheduler:
+    """Fills free workstations from the waitlist, space by space, on a timer or when woken."""
+
+    def __init__(self, interval_seconds: float):
+        self.interval_seconds = interval_seconds
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def start(self) -> None:
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run(), name="waitlist-scheduler")
+
+    def wake(self) -> None:
+        """Runs the scheduler now, e.g. after users were deactivated or a capacity was raised."""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel() # A promotion cut short rolls back as a whole
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def run_once(self) -> int:
+        """Promotes into every space with a capacity set; returns how many users were promoted."""
+        async with AsyncSessionLocal() as db:
+            space_ids = (await db.scalars(
+                select(Space.id).where(Space.workstation_capacity.is_not(None)).order_by(Space.id)
+            )).all()
+        promoted = 0
+        for space_id in space_ids:
+            async with AsyncSessionLocal() as db:
+                result = await promote_next(db, space_id)
+            if result["promoted"]:
+                logger.info("Promoted %s waitlisted users into space %s", result["promoted"], space_id)
+            promoted += result["promoted"]
+        return promoted
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.interval_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.run_once()
+            except Exception:
+                logger.exception("Waitlist promotion run failed")
+
+
+_scheduler: Optional[WaitlistScheduler] = None
+
+
+def get_waitlist_scheduler() -> WaitlistScheduler:
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = WaitlistScheduler(settings.WAITLIST_SCHEDULER_INTERVAL_SECONDS)
+    return _scheduler
+
+
+def set_waitlist_scheduler(scheduler: Optional[WaitlistScheduler]) -> None:
+    global _scheduler
+    _scheduler = scheduler
+
+
+async def _main(args) -> None:
+    from database import async_engine
+
+    try:
+        async with AsyncSessionLocal() as db:
+            if args.rescore:
+                print(f"rescored {await rescore(db)} waitlisted users")
+            if args.promote is not None:
+                print(await promote_next(db, args.promote))
+            if args.status:
+                waiting = await db.scalar(select(func.count(User.id)).where(IS_WAITLISTED))
+                verified = await db.scalar(select(func.count(User.id)).where(IS_WAITLISTED, IS_VERIFIED_WAITLIST))
+                print(f"waitlisted {waiting}, verified {verified}")
+                for space in (await db.scalars(select(Space).where(Space.workstation_capacity.is_not(None)).order_by(Space.id))).all():
+                    index = await get_seat_availability().get_index(db, space.id)
+                    print(f"space {space.id} ({space.name}): {index.free(datetime.now(timezone.utc))} of {space.workstation_capacity} member seats free")
+    finally:
+        await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the waitlist queue and promote from it.")
+    parser.add_argument("--rescore", action="store_true", help="Recompute every waitlisted user's queue position")
+    parser.add_argument("--promote", type=int, metavar="SPACE_ID", help="Fill the free workstations of a space now")
+    parser.add_argument("--status", action="store_true", help="Print queue sizes and free workstations")
+    args = parser.parse_args()
+    configure_logging(settings.LOG_LEVEL, settings.LOG_FORMAT)
+    asyncio.run(_main(args))
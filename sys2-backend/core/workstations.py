@@ -0,0 +1,343 @@
+"""Workstation allocations per space, checked against an in-process seat index.
+
+A space with `workstation_capacity` set has that many seats. An allocation
+holds some of them over [starts_at, ends_at). A member's seat has no end
+and runs until released. A booking ends at most
+WORKSTATION_BOOKING_HORIZON_DAYS ahead. Each worker keeps one SeatIndex
+(core.seat_index) per space, over WORKSTATION_SLOT_MINUTES slots from now
+to the horizon. So "free seats at T / over R" and "can k more members be
+seated" are O(log slots) and need no database query. Bookings are rounded
+out to whole slots. Member seats are counted exactly: releasing one removes
+it from the index, and indexes are built from the allocations current at
+build time, so the seat is free again at once, not when the slot ends.
+
+Writes go through SeatAvailability.allocating(db, space_id). It takes a
+per-space asyncio lock in this process and the space's row lock in the
+database. Allocations into different spaces never wait for each other,
+and there is no global lock. Under the row lock, the cached index is
+checked against spaces.allocation_version, which every change bumps. When
+another worker has changed the space, the index is rebuilt from the
+space's rows first. Capacity checks therefore always see every committed
+allocation. Reads outside the lock use the cached index and rebuild it
+after WORKSTATION_INDEX_TTL_SECONDS, so they can miss another worker's
+change for that long.
+
+At startup, preload() streams all current allocations in (space_id, id)
+order and publishes each space's index as soon as its rows are in. A
+request for a space that isn't built yet builds that one on demand.
+"""
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, Dict, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import case, insert, or_, select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import settings
+from core.seat_index import SeatIndex, as_utc
+from database import AsyncSessionLocal, read_from_primary
+from models.space import Space
+from models.workstation_allocation import WorkstationAllocation
+
+logger = logging.getLogger(__name__)
+
+PRELOAD_PAGE_SIZE = 10000
+INDEX_MARGIN_SECONDS = 24 * 3600 # Slots past the booking horizon, so a cached index stays usable for a day
+
+
+class SeatsUnavailable(Exception):
+    """Not enough free seats for the requested allocation."""
+
+
+def _current(now: datetime) -> list:
+    """Allocations that still hold seats at or after now (zero-length ones never do)."""
+    return [
+        or_(WorkstationAllocation.ends_at.is_(None), WorkstationAllocation.ends_at > now),
+        or_(WorkstationAllocation.ends_at.is_(None), WorkstationAllocation.ends_at > WorkstationAllocation.starts_at),
+    ]
+
+
+class SpaceAllocation:
+    """One space, locked for allocation changes. Changes hit the index at once and are committed on exit."""
+
+    def __init__(self, db: AsyncSession, space: Space, index: SeatIndex, now: datetime, horizon_days: int):
+        self.db = db
+        self.space = space
+        self.index = index
+        self.now = now
+        self.horizon_end = now + timedelta(days=horizon_days)
+        self.changed = False
+
+    def free(self, starts_at: Optional[datetime] = None, ends_at: Optional[datetime] = None) -> int:
+        return self.index.free(starts_at or self.now, ends_at)
+
+    def free_for_members(self) -> int:
+        """Members that can still be seated from now on."""
+        return self.index.free(self.now)
+
+    def _check(self, seats: int, starts_at: datetime, ends_at: Optional[datetime]) -> None:
+        if seats < 1:
+            raise ValueError("seats must be at least 1")
+        if ends_at is not None and ends_at <= starts_at:
+            raise ValueError("ends_at must be after starts_at")
+        if ends_at is not None and ends_at > self.horizon_end:
+            raise ValueError(f"Bookings can end at most {settings.WORKSTATION_BOOKING_HORIZON_DAYS} days ahead")
+        free = self.index.free(starts_at, ends_at)
+        if free < seats:
+            raise SeatsUnavailable(f"Only {free} of the requested {seats} seats are free in space {self.space.id}")
+
+    async def allocate(
+        self, seats: int, starts_at: Optional[datetime] = None, ends_at: Optional[datetime] = None, user_id: Optional[int] = None,
+    ) -> WorkstationAllocation:
+        """Holds seats over [starts_at, ends_at) (no end = a member's seat); raises SeatsUnavailable if they aren't free."""
+        starts_at = max(as_utc(starts_at), self.now) if starts_at is not None else self.now # Nothing is allocated in the past
+        ends_at = as_utc(ends_at) if ends_at is not None else None
+        self._check(seats, starts_at, ends_at)
+        allocation = WorkstationAllocation(
+            space_id=self.space.id, user_id=user_id, seats=seats, starts_at=starts_at, ends_at=ends_at, created_at=self.now,
+        )
+        self.db.add(allocation)
+        self.index.add(seats, starts_at, ends_at)
+        self.changed = True
+        return allocation
+
+    async def allocate_members(self, user_ids: Sequence[int]) -> int:
+        """One member seat per user from now on, in one INSERT; raises SeatsUnavailable unless all fit."""
+        if not user_ids:
+            return 0
+        self._check(len(user_ids), self.now, None)
+        await self.db.execute(insert(WorkstationAllocation), [
+            {"space_id": self.space.id, "user_id": user_id, "seats": 1, "starts_at": self.now, "ends_at": None, "created_at": self.now}
+            for user_id in user_ids
+        ])
+        self.index.add(len(user_ids), self.now)
+        self.changed = True
+        return len(user_ids)
+
+    async def release(self, allocation: WorkstationAllocation) -> bool:
+        """Ends an allocation now (a future one never starts); False if it had ended already."""
+        starts_at = as_utc(allocation.starts_at)
+        ends_at = as_utc(allocation.ends_at) if allocation.ends_at is not None else None
+        if ends_at is not None and (ends_at <= self.now or ends_at <= starts_at):
+            return False
+        new_end = max(self.now, starts_at)
+        if ends_at is None:
+            # A member's seat: drop it whole, so it is free from now, not from the end of the current slot.
+            # Only its past part goes with it, and queries never look back
+            self.index.add(-allocation.seats, starts_at)
+        else:
+            self.index.truncate(allocation.seats, starts_at, ends_at, new_end)
+        allocation.ends_at = new_end
+        self.changed = True
+        return True
+
+
+class SeatAvailability:
+    """The seat index of every space in this process, built from the database and kept current by allocating()."""
+
+    def __init__(self, slot_seconds: int, horizon_days: int, ttl_seconds: float):
+        self.slot_seconds = slot_seconds
+        self.horizon_days = horizon_days
+        self.ttl_seconds = ttl_seconds
+        self._indexes: Dict[int, Tuple[float, SeatIndex]] = {} # space_id -> (built at, index)
+        self._locks: Dict[int, asyncio.Lock] = {}
+
+    def _lock(self, space_id: int) -> asyncio.Lock:
+        return self._locks.setdefault(space_id, asyncio.Lock())
+
+    def invalidate(self, space_id: Optional[int] = None) -> None:
+        if space_id is None:
+            self._indexes.clear()
+        else:
+            self._indexes.pop(space_id, None)
+
+    def _new_index(self, space: Space, now: datetime) -> SeatIndex:
+        origin = datetime.fromtimestamp(now.timestamp() // self.slot_seconds * self.slot_seconds, timezone.utc)
+        slots = -(-(self.horizon_days * 86400 + INDEX_MARGIN_SECONDS) // self.slot_seconds)
+        return SeatIndex(space.workstation_capacity, origin, self.slot_seconds, slots, version=space.allocation_version)
+
+    def _covers(self, index: SeatIndex, now: datetime) -> bool:
+        return index.horizon_end >= now + timedelta(days=self.horizon_days)
+
+    async def _build(self, db: AsyncSession, space: Space) -> SeatIndex:
+        # The version is read before the rows, so the index is never older than its version says
+        now = datetime.now(timezone.utc)
+        index = self._new_index(space, now)
+        rows = (await db.execute(
+            select(WorkstationAllocation.seats, WorkstationAllocation.starts_at, WorkstationAllocation.ends_at)
+            .where(WorkstationAllocation.space_id == space.id, *_current(now)) # Not the slot start: seats released since are free
+        )).all()
+        for row in rows:
+            index.add(row.seats, row.starts_at, row.ends_at)
+        self._indexes[space.id] = (time.time(), index)
+        return index
+
+    async def _space(self, db: AsyncSession, space_id: int, for_update: bool = False) -> Space:
+        statement = select(Space).where(Space.id == space_id)
+        space = await db.scalar(statement.with_for_update() if for_update else statement)
+        if space is None:
+            raise LookupError(f"Space {space_id} not found")
+        if space.workstation_capacity is None:
+            raise ValueError(f"Space {space_id} has no workstation capacity set")
+        return space
+
+    async def get_index(self, db: AsyncSession, space_id: int) -> SeatIndex:
+        """The space's index for availability reads (rebuilt after the TTL); raises LookupError/ValueError like _space."""
+        cached = self._indexes.get(space_id)
+        if cached is not None and time.time() - cached[0] < self.ttl_seconds and self._covers(cached[1], datetime.now(timezone.utc)):
+            return cached[1]
+        async with self._lock(space_id): # One build per space at a time; never alongside an allocation in this process
+            cached = self._indexes.get(space_id)
+            if cached is not None and time.time() - cached[0] < self.ttl_seconds and self._covers(cached[1], datetime.now(timezone.utc)):
+                return cached[1]
+            return await self._build(db, await self._space(db, space_id))
+
+    @asynccontextmanager
+    async def allocating(self, db: AsyncSession, space_id: int) -> AsyncIterator[SpaceAllocation]:
+        """Locks the space, yields it for allocation changes, then commits them (or rolls back on error)."""
+        async with self._lock(space_id):
+            read_from_primary(db) # Rows read under the lock must be current
+            try:
+                space = await self._space(db, space_id, for_update=True)
+            except (LookupError, ValueError):
+                await db.rollback()
+                raise
+            now = datetime.now(timezone.utc)
+            cached = self._indexes.get(space_id)
+            if cached is not None and cached[1].version == space.allocation_version and self._covers(cached[1], now):
+                index = cached[1]
+                index.capacity = space.workstation_capacity
+            else:
+                index = await self._build(db, space) # Another worker changed the space (or first use)
+            allocation = SpaceAllocation(db, space, index, now, self.horizon_days)
+            try:
+                yield allocation
+                if allocation.changed:
+                    space.allocation_version += 1
+                await db.commit() # Also releases the row lock when nothing changed
+            except BaseException:
+                if allocation.changed:
+                    self.invalidate(space_id) # The index already holds the rolled-back changes
+                await db.rollback()
+                raise
+            index.version = space.allocation_version
+
+    async def preload(self, page_size: int = PRELOAD_PAGE_SIZE) -> int:
+        """Builds the index of every space with a capacity, streaming allocations space by space. Returns spaces built."""
+        async with AsyncSessionLocal() as db:
+            now = datetime.now(timezone.utc)
+            spaces = (await db.scalars(select(Space).where(Space.workstation_capacity.is_not(None)))).all()
+            indexes = {space.id: self._new_index(space, now) for space in spaces}
+            built = 0
+
+            def publish(space_id):
+                nonlocal built
+                if space_id not in self._indexes: # Built on demand meanwhile; that one is at least as current
+                    self._indexes[space_id] = (time.time(), indexes[space_id])
+                    built += 1
+
+            done: Set[int] = set()
+            last: Optional[Tuple[int, int]] = None
+            while True:
+                conditions = [WorkstationAllocation.space_id.in_(list(indexes)), *_current(now)]
+                if last is not None:
+                    conditions.append(tuple_(WorkstationAllocation.space_id, WorkstationAllocation.id) > tuple_(*last))
+                rows = (await db.execute(
+                    select(
+                        WorkstationAllocation.space_id, WorkstationAllocation.id, WorkstationAllocation.seats,
+                        WorkstationAllocation.starts_at, WorkstationAllocation.ends_at,
+                    ).where(*conditions).order_by(WorkstationAllocation.space_id, WorkstationAllocation.id).limit(page_size)
+                )).all()
+                if not rows:
+                    break
+                for row in rows:
+                    if last is not None and row.space_id != last[0]:
+                        publish(last[0]) # Rows come in space order: the previous space is complete
+                        done.add(last[0])
+                    indexes[row.space_id].add(row.seats, row.starts_at, row.ends_at)
+                    last = (row.space_id, row.id)
+            for space_id in indexes.keys() - done:
+                publish(space_id)
+        return built
+
+
+async def release_user_seats(db: AsyncSession, user_ids: Sequence[int]) -> Set[int]:
+    """
+    Ends the users' allocations now, e.g. when they are deactivated; the caller commits.
+    Doesn't wait for the per-space locks: it only frees seats, and bumping the versions
+    (which waits for any allocation holding a space's row lock) makes the indexes rebuild.
+    Returns the affected space ids.
+    """
+    if not user_ids:
+        return set()
+    now = datetime.now(timezone.utc)
+    space_ids = set((await db.scalars(
+        update(WorkstationAllocation)
+        .where(WorkstationAllocation.user_id.in_(user_ids), *_current(now))
+        .values(ends_at=case((WorkstationAllocation.starts_at > now, WorkstationAllocation.starts_at), else_=now))
+        .returning(WorkstationAllocation.space_id)
+        .execution_options(synchronize_session=False)
+    )).all())
+    if space_ids:
+        await db.execute(
+            update(Space).where(Space.id.in_(space_ids)).values(allocation_version=Space.allocation_version + 1)
+            .execution_options(synchronize_session=False)
+        )
+    availability = get_seat_availability()
+    for space_id in space_ids:
+        availability.invalidate(space_id)
+    return space_ids
+
+
+async def user_allocations(db: AsyncSession, space_id: int, user_id: int) -> List[WorkstationAllocation]:
+    """A user's current and upcoming allocations in a space, soonest first."""
+    return (await db.scalars(
+        select(WorkstationAllocation)
+        .where(WorkstationAllocation.space_id == space_id, WorkstationAllocation.user_id == user_id, *_current(datetime.now(timezone.utc)))
+        .order_by(WorkstationAllocation.starts_at, WorkstationAllocation.id)
+    )).all()
+
+
+# --- Startup preload ---
+
+async def _preload() -> None:
+    started = time.perf_counter()
+    try:
+        built = await get_seat_availability().preload()
+        logger.info("Built %s workstation indexes in %.2f s", built, time.perf_counter() - started)
+    except Exception:
+        logger.exception("Workstation index preload failed; indexes are built on first use")
+
+
+def start_seat_index_preload() -> asyncio.Task:
+    return asyncio.create_task(_preload(), name="workstation-index-preload")
+
+
+async def stop_seat_index_preload(task: Optional[asyncio.Task]) -> None:
+    if task is None:
+        return
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+
+
+_availability: Optional[SeatAvailability] = None
+
+
+def get_seat_availability() -> SeatAvailability:
+    global _availability
+    if _availability is None:
+        _availability = SeatAvailability(
+            settings.WORKSTATION_SLOT_MINUTES * 60, settings.WORKSTATION_BOOKING_HORIZON_DAYS, settings.WORKSTATION_INDEX_TTL_SECONDS,
+        )
+    return _availability
+
+
+def set_seat_availability(availability: Optional[SeatAvailability]) -> None:
+    global _availability
+    _availability = availability
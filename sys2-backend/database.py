@@ -1,14 +1,310 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+import asyncio
+import itertools
+import logging
+import time
+from typing import Dict, List, Optional, Sequence
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy import exc as sa_exc
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine, async_sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 
 from config import settings
+from core.db_routing import note_write, prefers_primary
+from core.metrics import (
+    DB_POOL_CHECKED_OUT, DB_POOL_OVERFLOW, DB_POOL_SIZE, DB_POOL_TIMEOUTS, DB_POOL_WAIT_SECONDS, DB_QUERY_SECONDS,
+    DB_READ_SESSIONS, DB_REPLICA_HEALTHY, DB_REPLICA_LAG_SECONDS,
+)
+
+logger = logging.getLogger(__name__)
 
 SQLALCHEMY_DATABASE_URL = settings.DATABASE_URL
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+# Async drivers for the sync URLs we accept in DATABASE_URL
+ASYNC_DRIVERS = {
+    "postgresql": "asyncpg",
+    "sqlite": "aiosqlite",
+}
+
+
+def to_async_url(url: str) -> str:
+    """Maps a sync DATABASE_URL (e.g. postgresql://, sqlite://) onto its async driver."""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if parsed.get_driver_name() == ASYNC_DRIVERS.get(backend):
+        return url
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for database backend '{backend}'")
+    return parsed.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}").render_as_string(hide_password=False)
+
+
+# --- Pool Instrumentation ---
+
+class _TimedCheckoutMixin:
+    """Times every checkout (including waits on an exhausted pool) and counts timeouts."""
+
+    def _do_get(self):
+        label = self.logging_name or "default"
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except sa_exc.TimeoutError:
+            DB_POOL_TIMEOUTS.labels(label).inc()
+            raise
+        finally:
+            DB_POOL_WAIT_SECONDS.labels(label).observe(time.perf_counter() - started)
+
+
+class InstrumentedQueuePool(_TimedCheckoutMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(_TimedCheckoutMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def engine_options(url: str, name: str, is_async: bool = False, **overrides) -> dict:
+    """Pool settings from Settings for create_engine/create_async_engine; overrides win."""
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:"):
+        return {} # In-memory SQLite shares one connection; there is no pool to size
+    options = {
+        "poolclass": InstrumentedAsyncQueuePool if is_async else InstrumentedQueuePool,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT_SECONDS,
+        "pool_recycle": settings.DB_POOL_RECYCLE_SECONDS, # Replace connections before server/proxy idle timeouts kill them
+        "pool_pre_ping": settings.DB_POOL_PRE_PING, # Detect connections killed by a failover before handing them out
+        "pool_logging_name": name, # Also the 'engine' label on pool metrics
+    }
+    options.update(overrides)
+    return options
+
+
+def pool_status(sync_engine: Engine) -> dict:
+    pool = sync_engine.pool
+    if not isinstance(pool, QueuePool):
+        return {"pool": type(pool).__name__}
+    return {
+        "pool": type(pool).__name__,
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+        "max_overflow": pool._max_overflow,
+        "timeout_seconds": pool.timeout(),
+    }
+
+
+def instrument_engine(sync_engine: Engine, name: str) -> None:
+    """Registers pool gauges and per-statement latency timing for an engine (use .sync_engine for async ones)."""
+    if isinstance(sync_engine.pool, QueuePool):
+        # Read sync_engine.pool at scrape time; dispose() swaps in a new pool object
+        DB_POOL_SIZE.labels(name).set_function(lambda: sync_engine.pool.size())
+        DB_POOL_CHECKED_OUT.labels(name).set_function(lambda: sync_engine.pool.checkedout())
+        DB_POOL_OVERFLOW.labels(name).set_function(lambda: max(sync_engine.pool.overflow(), 0))
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _start_query_timer(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started_at", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _record_query_time(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_started_at"].pop()
+        verb = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "UNKNOWN"
+        DB_QUERY_SECONDS.labels(name, verb).observe(time.perf_counter() - started)
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _drop_query_timer(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_started_at"):
+            conn.info["query_started_at"].pop()
+
+
+# --- Sync engine (kept during the migration to async handlers) ---
+engine = create_engine(SQLALCHEMY_DATABASE_URL, **engine_options(SQLALCHEMY_DATABASE_URL, "primary_sync"))
+instrument_engine(engine, "primary_sync")
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# --- Async engine ---
+ASYNC_SQLALCHEMY_DATABASE_URL = to_async_url(SQLALCHEMY_DATABASE_URL)
+
+async_engine = create_async_engine(
+    ASYNC_SQLALCHEMY_DATABASE_URL,
+    **engine_options(ASYNC_SQLALCHEMY_DATABASE_URL, "primary", is_async=True)
+)
+instrument_engine(async_engine.sync_engine, "primary")
+# expire_on_commit=False so attributes stay readable after commit without a lazy reload
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+# --- Read replicas ---
+
+# A Postgres standby's lag; 0 once it has replayed all WAL it received (otherwise an
+# idle primary would make it look like it is falling behind), NULL on a non-standby
+POSTGRES_REPLICA_LAG = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+)
+
+
+class ReplicaSet:
+    """Replica engines, and the ones currently in the read rotation (reachable and within max lag)."""
+
+    def __init__(self, engines: Dict[str, AsyncEngine], max_lag_seconds: float):
+        self.engines = engines
+        self.max_lag_seconds = max_lag_seconds
+        self.in_rotation: List[AsyncEngine] = list(engines.values()) # Until the first check says otherwise
+        self.lag_seconds: Dict[str, Optional[float]] = {name: None for name in engines} # None = unreachable or unchecked
+        self._turn = itertools.count()
+
+    def choose(self) -> Optional[AsyncEngine]:
+        """The next replica in the rotation, round-robin; None if none is usable."""
+        in_rotation = self.in_rotation
+        if not in_rotation:
+            return None
+        return in_rotation[next(self._turn) % len(in_rotation)]
+
+    async def _probe(self, replica: AsyncEngine) -> float:
+        async with replica.connect() as connection:
+            if replica.dialect.name == "postgresql":
+                return float(await connection.scalar(POSTGRES_REPLICA_LAG) or 0)
+            await connection.execute(text("SELECT 1")) # No lag to measure on other backends
+            return 0.0
+
+    async def check(self, timeout_seconds: float) -> None:
+        """Probes every replica and rebuilds the rotation from the results."""
+        names = list(self.engines)
+        results = await asyncio.gather(
+            *(asyncio.wait_for(self._probe(self.engines[name]), timeout_seconds) for name in names),
+            return_exceptions=True,
+        )
+        in_rotation = []
+        for name, result in zip(names, results):
+            if isinstance(result, BaseException):
+                logger.warning("Replica %s failed its health check: %s: %s", name, type(result).__name__, result)
+                self.lag_seconds[name] = None
+            else:
+                self.lag_seconds[name] = result
+                DB_REPLICA_LAG_SECONDS.labels(name).set(result)
+            usable = self.lag_seconds[name] is not None and self.lag_seconds[name] <= self.max_lag_seconds
+            DB_REPLICA_HEALTHY.labels(name).set(1 if usable else 0)
+            if usable:
+                in_rotation.append(self.engines[name])
+        if len(in_rotation) != len(self.in_rotation):
+            logger.info("Read rotation now has %s of %s replicas", len(in_rotation), len(names))
+        self.in_rotation = in_rotation
+
+    async def dispose(self) -> None:
+        for replica in self.engines.values():
+            await replica.dispose()
+
+
+def create_replica_set(urls: Sequence[str], max_lag_seconds: float) -> ReplicaSet:
+    engines = {}
+    for number, url in enumerate(urls, 1):
+        name = f"replica{number}" # Also the 'engine' label on pool and query metrics
+        async_url = to_async_url(url)
+        engines[name] = create_async_engine(async_url, **engine_options(async_url, name, is_async=True))
+        instrument_engine(engines[name].sync_engine, name)
+    return ReplicaSet(engines, max_lag_seconds)
+
+
+_replica_set = create_replica_set(settings.DATABASE_REPLICA_URLS, settings.DB_REPLICA_MAX_LAG_SECONDS)
+
+
+def get_replica_set() -> ReplicaSet:
+    return _replica_set
+
+
+def set_replica_set(replica_set: ReplicaSet) -> None:
+    """Replaces the process-wide replica set (e.g. with local stand-ins in benchmarks)."""
+    global _replica_set
+    _replica_set = replica_set
+
+
+async def _monitor_replicas(interval_seconds: float, timeout_seconds: float) -> None:
+    while True:
+        try:
+            await get_replica_set().check(timeout_seconds)
+        except Exception:
+            logger.exception("Replica health check failed")
+        await asyncio.sleep(interval_seconds)
+
+
+def start_replica_monitor() -> Optional[asyncio.Task]:
+    """Re-checks replica health and lag every DB_REPLICA_CHECK_SECONDS; None if there are no replicas."""
+    if not get_replica_set().engines:
+        return None
+    return asyncio.create_task(
+        _monitor_replicas(settings.DB_REPLICA_CHECK_SECONDS, settings.DB_HEALTH_TIMEOUT_SECONDS), name="replica-monitor"
+    )
+
+
+async def stop_replica_monitor(task: Optional[asyncio.Task]) -> None:
+    if task is None:
+        return
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+
+
+# --- Routing session ---
+
+READ_SESSIONS_REPLICA = DB_READ_SESSIONS.labels("replica")
+READ_SESSIONS_PRIMARY = DB_READ_SESSIONS.labels("primary")
+
+
+class RoutingSession(Session):
+    """
+    Sends read-only statements to a replica and everything else to the session's bind (the primary).
+
+    The replica is picked round-robin on the session's first read and kept for
+    the session, so a request sees one consistent snapshot. Once the session
+    flushes or executes DML, all its later statements go to the primary, so it
+    reads its own writes. A committed write also makes the client sticky to the
+    primary for DB_READ_YOUR_WRITES_SECONDS (core.db_routing). Reads use the
+    primary as well when the client is sticky, the session is pinned with
+    read_from_primary(), or no replica is in the rotation.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        primary = super().get_bind(mapper=mapper, clause=clause, **kw)
+        if self._flushing or getattr(clause, "is_dml", False):
+            self.info["wrote"] = True
+            return primary
+        if not getattr(clause, "is_select", False) or getattr(clause, "_for_update_arg", None) is not None:
+            return primary # Text, DDL, SELECT ... FOR UPDATE, or a bare get_bind() for the dialect
+        if self.info.get("wrote") or self.info.get("primary"):
+            return primary
+        if "replica" not in self.info:
+            self.info["replica"] = None if prefers_primary() else get_replica_set().choose()
+            (READ_SESSIONS_PRIMARY if self.info["replica"] is None else READ_SESSIONS_REPLICA).inc()
+        replica = self.info["replica"]
+        return primary if replica is None else replica.sync_engine
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _stick_to_primary_after_write(session):
+    if session.info.get("wrote"):
+        note_write()
+
+
+def read_from_primary(db: AsyncSession) -> None:
+    """Pins a session's reads to the primary, for reads that must not lag (e.g. revocation checks)."""
+    db.info["primary"] = True
+
+
+# Request handlers get routing sessions; background workers keep using AsyncSessionLocal (primary only),
+# since they read rows and then update them on the strength of what they read
+RoutingSessionLocal = async_sessionmaker(
+    bind=async_engine, sync_session_class=RoutingSession, autoflush=False, expire_on_commit=False
+)
+
 Base = declarative_base()
 
 # Dependency to get DB session
@@ -18,3 +314,9 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+# Dependency to get an async DB session (reads may be served by a replica, see RoutingSession)
+async def get_async_db():
+    async with RoutingSessionLocal() as db:
+        yield db
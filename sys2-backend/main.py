@@ -1,88 +1,169 @@
 # main.py
 
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 
 # --- Configuration & Routers ---
-# Only import routers that actually exist right now
-from routers import auth
-# from routers import profiles # Commented out - Phase 2
-# from routers import admin # Commented out - Phase 2/5
-# from routers import companies # Commented out - Phase 2
-# from routers import matching # Commented out - Phase 3
-# from routers import connections # Commented out - Phase 3
-# from routers import chat # Commented out - Phase 4
-# from routers import safety # Commented out - Phase 8
-# from routers import notifications # Commented out - Phase 4
-# from routers import corporate_admin # Commented out - Phase 5
-# from routers import invites # Commented out - Phase 6
-# from routers import billing # Commented out - Phase 7
-# from routers import referrals # Commented out - Phase 7
-# from routers import feedback # Commented out - Phase 7
-
-# --- FastAPI App Initialization ---
-app = FastAPI(
-    title="ShareYourSpace 2.0 MVP API",
-    description="API endpoints for the ShareYourSpace platform.",
-    version="1.0.0"
-)
-
-# --- CORS Middleware Configuration ---
-origins = [
-    "http://localhost:3000",
-    "http://127.0.0.1:3000",
+# Health and metrics are imported eagerly (probes and scrapes hit them first);
+# every other router is listed in ROUTERS and imported on first use (core.lazy_routers)
+from routers import health
+from routers import observability
+
+from config import settings
+from core.db_routing import ReadYourWritesMiddleware
+from core.instrumentation import MetricsMiddleware, get_profiler
+from core.lazy_routers import include_lazy_router, load_lazy_routers, start_router_preload, stop_router_preload
+from core.logging_config import configure_logging
+
+# (module, prefix, tags); uncomment as the phases land
+ROUTERS = [
+    # Phase 1: Auth
+    ("routers.auth", "/auth", ["Authentication"]),
+
+    # Phase 2: User Profiles, Spaces, Companies (Add as you create them)
+    # ("routers.profiles", "/users", ["User Profiles"]),
+    # ("routers.companies", "/companies", ["Companies"]),
+    ("routers.spaces", "/spaces", ["Spaces"]), # Workstation availability and allocations
+    ("routers.admin", "/admin", ["Admin"]), # Bulk user administration (spaces/companies to follow)
+
+    # Phase 3: Matching, Connections
+    ("routers.matching", "/matching", ["Matching"]),
+    # ("routers.connections", "/connections", ["Connections"]),
+
+    # Phase 4: Chat, Notifications
+    ("routers.chat", "/chat", ["Chat"]), # WebSocket gateway at /chat/ws
+    ("routers.notifications", "/notifications", ["Notifications"]),
+
+    # Phase 5: Dashboards (Admin endpoints)
+    # ("routers.corporate_admin", "/corporate-admin", ["Corporate Admin"]),
+
+    # Phase 6: Agentic Features (Invites)
+    # ("routers.invites", "/invite", ["Invites"]),
+
+    # Phase 7: Monetization, Referrals, Feedback
+    # ("routers.billing", "/billing", ["Billing"]),
+    # ("routers.referrals", "/referrals", ["Referrals"]),
+    # ("routers.feedback", "/feedback", ["Feedback"]),
+
+    # Phase 8: Security (Blocking/Reporting)
+    # ("routers.safety", "/safety", ["Safety"]),
 ]
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=origins,
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# --- Include API Routers ---
-# Only include routers that have been imported
-
-# Phase 1: Auth
-app.include_router(auth.router, prefix="/auth", tags=["Authentication"])
-
-# Phase 2: User Profiles, Spaces, Companies (Add as you create them)
-# app.include_router(profiles.router, prefix="/users", tags=["User Profiles"]) # Commented out
-# app.include_router(companies.router, prefix="/companies", tags=["Companies"]) # Commented out
-# app.include_router(admin.router, prefix="/admin", tags=["Admin (Spaces/Companies)"]) # Commented out
-
-# Phase 3: Matching, Connections
-# app.include_router(matching.router, prefix="/matching", tags=["Matching"]) # Commented out
-# app.include_router(connections.router, prefix="/connections", tags=["Connections"]) # Commented out
-
-# Phase 4: Chat, Notifications
-# app.include_router(chat.router, prefix="/chat", tags=["Chat"]) # Commented out
-# app.include_router(notifications.router, prefix="/notifications", tags=["Notifications"]) # Commented out
-
-# Phase 5: Dashboards (Admin endpoints)
-# app.include_router(corporate_admin.router, prefix="/corporate-admin", tags=["Corporate Admin"]) # Commented out
-
-# Phase 6: Agentic Features (Invites)
-# app.include_router(invites.router, prefix="/invite", tags=["Invites"]) # Commented out
-
-# Phase 7: Monetization, Referrals, Feedback
-# app.include_router(billing.router, prefix="/billing", tags=["Billing"]) # Commented out
-# app.include_router(referrals.router, prefix="/referrals", tags=["Referrals"]) # Commented out
-# app.include_router(feedback.router, prefix="/feedback", tags=["Feedback"]) # Commented out
-
-# Phase 8: Security (Blocking/Reporting)
-# app.include_router(safety.router, prefix="/safety", tags=["Safety"]) # Commented out
-
-
-# --- Root Endpoint ---
-@app.get("/", tags=["Root"])
-def read_root():
-    """ Basic API health check endpoint. """
-    return {'message': 'ShareYourSpace 2.0 Backend is running!'}
-
-# --- Optional: Mount Socket.IO (If doing Phase 4) ---
-# import socketio
-# from socket_handlers import setup_socketio
-# sio = setup_socketio()
-# app.mount('/ws', socketio.ASGIApp(sio))
\ No newline at end of file
+# --- Application Lifespan ---
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Imported here rather than at module level: these pull in the database layer,
+    # models and jinja2, which `import main` (tooling, workers) doesn't need
+    from core.audit import get_audit_log
+    from core.chat import get_chat_gateway
+    from core.notifications import get_notification_dispatcher
+    from core.security import init_password_hasher, shutdown_password_hasher
+    from database import async_engine, get_replica_set, start_replica_monitor, stop_replica_monitor
+    from utils.email_queue import start_email_worker, stop_email_worker
+    from utils.email_templates import load_email_templates
+
+    replica_monitor = start_replica_monitor() # Keeps lagging or unreachable replicas out of the read rotation
+    init_password_hasher() # Start the bcrypt worker pool before the first login arrives
+    load_email_templates() # Compile email templates once, up front
+    email_worker = start_email_worker() # Drains the email outbox in the background
+    embedding_worker = None
+    if settings.EMBEDDING_WORKER_ENABLED:
+        from core.embedding_pipeline import start_embedding_worker # NumPy and the encoder pool only when enabled
+        embedding_worker = start_embedding_worker()
+    await get_chat_gateway().start() # Chat pub/sub subscription and batched message writer
+    get_notification_dispatcher().start() # Coalesces and writes published notification events
+    get_audit_log().start() # Batched writer for the security audit log
+    if settings.WAITLIST_SCHEDULER_ENABLED:
+        from core.waitlist import get_waitlist_scheduler
+        get_waitlist_scheduler().start() # Promotes from the waitlist into free workstations
+    seat_index_preload = None
+    if settings.WORKSTATION_INDEX_PRELOAD:
+        from core.workstations import start_seat_index_preload
+        seat_index_preload = start_seat_index_preload() # Seat indexes space by space; requests build missing ones on demand
+    router_preload = start_router_preload(app, settings.LAZY_ROUTERS_PRELOAD_SECONDS)
+    yield
+    await stop_router_preload(router_preload)
+    if seat_index_preload is not None:
+        from core.workstations import stop_seat_index_preload
+        await stop_seat_index_preload(seat_index_preload)
+    if settings.WAITLIST_SCHEDULER_ENABLED:
+        await get_waitlist_scheduler().stop()
+    await get_chat_gateway().stop() # Closes sockets, then flushes buffered messages
+    await get_notification_dispatcher().stop() # Writes the events still buffered
+    await get_audit_log().stop() # Writes the audit events still buffered
+    if embedding_worker is not None:
+        from core.embedding_pipeline import stop_embedding_worker
+        await stop_embedding_worker(embedding_worker)
+    await stop_email_worker(email_worker)
+    shutdown_password_hasher()
+    await stop_replica_monitor(replica_monitor)
+    await get_replica_set().dispose()
+    await async_engine.dispose() # Closes pooled connections (aiosqlite's connection threads would block exit)
+
+
+# --- FastAPI App Factory ---
+def create_app() -> FastAPI:
+    configure_logging(settings.LOG_LEVEL, settings.LOG_FORMAT)
+
+    app = FastAPI(
+        title="ShareYourSpace 2.0 MVP API",
+        description="API endpoints for the ShareYourSpace platform.",
+        version="1.0.0",
+        lifespan=lifespan,
+        default_response_class=ORJSONResponse, # orjson encodes responses (see core.serialization for list endpoints)
+    )
+
+    # --- CORS Middleware Configuration ---
+    origins = [
+        "http://localhost:3000",
+        "http://127.0.0.1:3000",
+    ]
+
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=origins,
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+    if settings.DATABASE_REPLICA_URLS:
+        # Keeps a client's reads on the primary for a while after it wrote (cookie-based)
+        app.add_middleware(ReadYourWritesMiddleware, window_seconds=settings.DB_READ_YOUR_WRITES_SECONDS)
+
+    # Added last so it is outermost and also times CORS handling
+    app.add_middleware(MetricsMiddleware, profiler=get_profiler())
+
+    # --- Include API Routers ---
+    # Operations: Health checks
+    app.include_router(health.router, prefix="/health", tags=["Health"])
+    # Operations: Prometheus metrics, request profiles (/debug, only with PROFILING_ENABLED)
+    app.include_router(observability.router, tags=["Observability"])
+
+    for module_name, prefix, tags in ROUTERS:
+        include_lazy_router(app, module_name, prefix, lazy=settings.LAZY_ROUTERS, tags=tags)
+
+    # The schema has to list every route, so build it with all routers loaded
+    default_openapi = app.openapi
+
+    def openapi():
+        load_lazy_routers(app)
+        return default_openapi()
+
+    app.openapi = openapi
+
+    # --- Root Endpoint ---
+    @app.get("/", tags=["Root"])
+    def read_root():
+        """ Basic API health check endpoint. """
+        return {'message': 'ShareYourSpace 2.0 Backend is running!'}
+
+    return app
+
+
+app = create_app()
+
+# Phase 4 chat runs on the native WebSocket gateway in routers/chat.py instead of a Socket.IO mount
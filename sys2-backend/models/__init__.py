@@ -1,2 +1,14 @@
 from .user import User
-# Import other models here as they are created 
\ No newline at end of file
+from .email_outbox import EmailOutbox
+from .refresh_token_revocation import RefreshTokenRevocation
+from .rate_limit_state import RateLimitState
+from .space import Space
+from .company import Company
+from .block import Block
+from .profile_embedding import ProfileEmbedding
+from .embedding_pipeline_state import EmbeddingPipelineState
+from .message import Message
+from .notification import Notification, NotificationCounter
+from .audit_event import AuditEvent
+from .workstation_allocation import WorkstationAllocation
+# Import other models here as they are created 
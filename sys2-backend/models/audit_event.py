@@ -0,0 +1,31 @@
+from sqlalchemy import JSON, BigInteger, Column, DateTime, Index, Integer, String
+from database import Base
+
+class AuditEvent(Base):
+    """
+    A security-relevant auth event (login success/failure, reset, verification, ...),
+    written in batches by core.audit. Append-only: nothing updates or deletes rows;
+    old months are dropped as whole partitions.
+
+    On Postgres the migration creates the table partitioned by month on occurred_at,
+    with (id, occurred_at) as the primary key (a partitioned table's keys must
+    include the partition column) and a trigger rejecting UPDATE/DELETE. Monthly
+    partitions are created ahead of time by core.audit. This model describes the
+    logical table, which is what create_all builds on SQLite.
+    """
+    __tablename__ = "audit_events"
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True) # SQLite only auto-increments INTEGER keys
+    occurred_at = Column(DateTime(timezone=True), nullable=False)
+    type = Column(String(50), nullable=False)
+    user_id = Column(Integer, nullable=True) # No foreign key: the trail outlives deleted accounts
+    email = Column(String(255), nullable=True) # As submitted (lowercased), also for unknown accounts
+    ip = Column(String(45), nullable=True)
+    data = Column(JSON(none_as_null=True), nullable=True) # SQL NULL rather than JSON null when there is nothing to add
+
+    __table_args__ = (
+        # "What happened to this account / from this address lately?"
+        Index("ix_audit_events_user_id_occurred_at", user_id, occurred_at),
+        Index("ix_audit_events_email_occurred_at", email, occurred_at),
+        Index("ix_audit_events_ip_occurred_at", ip, occurred_at),
+    )
@@ -0,0 +1,15 @@
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, UniqueConstraint, func
+from database import Base
+
+class Block(Base):
+    """blocker_id no longer sees blocked_id (and vice versa) in matching, chat, ..."""
+    __tablename__ = "blocks"
+
+    id = Column(Integer, primary_key=True)
+    blocker_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    blocked_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        UniqueConstraint("blocker_id", "blocked_id", name="uq_blocks_blocker_blocked"), # Also serves lookups by blocker
+    )
@@ -0,0 +1,21 @@
+from sqlalchemy import Column, Index, Integer, String, Text, func
+from database import Base
+from models.user import SEARCH_CONFIG
+
+class Company(Base):
+    __tablename__ = "companies"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, unique=True, nullable=False)
+    logo_url = Column(String, nullable=True)
+    industry_focus = Column(String, nullable=True)
+    description = Column(Text, nullable=True)
+    website_link = Column(String, nullable=True)
+
+    __table_args__ = (
+        # Company names in profile search on PostgreSQL (core.search)
+        Index("ix_companies_search_document", func.to_tsvector(SEARCH_CONFIG, name), postgresql_using="gin").ddl_if(dialect="postgresql"),
+    )
+
+
+COMPANY_SEARCH_DOCUMENT = func.to_tsvector(SEARCH_CONFIG, Company.name) # The expression of ix_companies_search_document
@@ -0,0 +1,26 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, Index, func, text
+from database import Base
+
+class EmailOutbox(Base):
+    __tablename__ = "email_outbox"
+
+    id = Column(Integer, primary_key=True, index=True)
+    to_email = Column(String, nullable=False)
+    subject = Column(String, nullable=False)
+    html_content = Column(Text, nullable=False)
+    text_content = Column(Text, nullable=True) # Plain-text alternative part
+    status = Column(String, nullable=False, default="Pending") # 'Pending', 'Sent', 'Dead'
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(Text, nullable=True)
+    next_attempt_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    sent_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        # The worker only ever scans due, pending rows
+        Index(
+            "ix_email_outbox_pending_due", "next_attempt_at",
+            postgresql_where=text("status = 'Pending'"),
+            sqlite_where=text("status = 'Pending'"),
+        ),
+    )
@@ -0,0 +1,12 @@
+from sqlalchemy import Column, DateTime, Integer, String, func
+from database import Base
+
+class EmbeddingPipelineState(Base):
+    """Resume point of an embedding pipeline: the last (users.updated_at, users.id) it has committed."""
+    __tablename__ = "embedding_pipeline_states"
+
+    name = Column(String, primary_key=True)
+    encoder = Column(String, nullable=False) # A different encoder restarts the pipeline from scratch
+    watermark_at = Column(DateTime(timezone=True), nullable=True)
+    watermark_id = Column(Integer, nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
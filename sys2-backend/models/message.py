@@ -0,0 +1,24 @@
+from sqlalchemy import BigInteger, Column, DateTime, ForeignKey, Index, Integer, String, Text
+from database import Base
+
+class Message(Base):
+    """
+    A direct message. Rows are written in batches by the chat gateway
+    (core.chat), after the message was delivered, so created_at is the
+    gateway's timestamp and the row can trail delivery by a flush interval.
+    """
+    __tablename__ = "messages"
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True) # SQLite only auto-increments INTEGER keys
+    uid = Column(String(32), nullable=False, unique=True) # Assigned at delivery; makes batch retries idempotent
+    sender_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    recipient_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    content = Column(Text, nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False)
+    read_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        # One index per direction; a conversation's history reads both
+        Index("ix_messages_sender_recipient_created", "sender_id", "recipient_id", "created_at"),
+        Index("ix_messages_recipient_sender_created", "recipient_id", "sender_id", "created_at"),
+    )
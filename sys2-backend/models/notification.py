@@ -0,0 +1,45 @@
+from sqlalchemy import JSON, BigInteger, Column, DateTime, ForeignKey, Index, Integer, String
+from database import Base
+
+class Notification(Base):
+    """
+    An inbox entry. Written in batches by core.notifications; repeated events
+    with the same coalesce_key fold into the recipient's unread row (event_count
+    goes up, actor/data/updated_at follow the latest event) instead of adding rows.
+    """
+    __tablename__ = "notifications"
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True) # SQLite only auto-increments INTEGER keys
+    recipient_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    type = Column(String(50), nullable=False)
+    coalesce_key = Column(String(100), nullable=True) # None = never coalesced
+    event_count = Column(Integer, nullable=False, default=1)
+    actor_id = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
+    data = Column(JSON, nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=False)
+    updated_at = Column(DateTime(timezone=True), nullable=False)
+    read_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        # Inbox pages: keyset on id, newest first
+        Index("ix_notifications_recipient_id", recipient_id, id),
+        Index(
+            "ix_notifications_unread_recipient_id", recipient_id, id,
+            postgresql_where=read_at.is_(None),
+            sqlite_where=read_at.is_(None),
+        ),
+        # At most one unread row per coalesce key; the conflict target of the coalescing upsert
+        Index(
+            "uq_notifications_unread_coalesce", recipient_id, coalesce_key, unique=True,
+            postgresql_where=read_at.is_(None),
+            sqlite_where=read_at.is_(None),
+        ),
+    )
+
+
+class NotificationCounter(Base):
+    """Unread notifications per user, kept in step with the inbox by core.notifications."""
+    __tablename__ = "notification_counters"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    unread = Column(Integer, nullable=False, default=0)
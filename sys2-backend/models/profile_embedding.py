@@ -0,0 +1,60 @@
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, LargeBinary, String, func
+from sqlalchemy.types import TypeDecorator
+
+from config import settings
+from database import Base
+
+
+def _use_pgvector(dialect) -> bool:
+    return dialect.name == "postgresql" and settings.EMBEDDING_STORAGE == "pgvector"
+
+
+class Embedding(TypeDecorator):
+    """
+    A float32 vector, read back as a NumPy array. Stored as a raw float32 blob
+    (4 bytes per dimension, no parsing on load), or as a pgvector `vector`
+    column when EMBEDDING_STORAGE is 'pgvector'. NumPy is imported on first
+    use, so loading the models doesn't pull it in.
+    """
+    impl = LargeBinary
+    cache_ok = True
+
+    def __init__(self, dim: int):
+        super().__init__()
+        self.dim = dim
+
+    def load_dialect_impl(self, dialect):
+        if _use_pgvector(dialect):
+            from pgvector.sqlalchemy import Vector
+            return dialect.type_descriptor(Vector(self.dim))
+        return dialect.type_descriptor(LargeBinary())
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        import numpy as np
+
+        vector = np.asarray(value, dtype=np.float32)
+        if vector.shape != (self.dim,):
+            raise ValueError(f"Expected an embedding of shape ({self.dim},), got {vector.shape}")
+        return vector if _use_pgvector(dialect) else vector.tobytes()
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        import numpy as np
+
+        if isinstance(value, (bytes, memoryview)):
+            return np.frombuffer(value, dtype=np.float32)
+        return np.asarray(value, dtype=np.float32)
+
+
+class ProfileEmbedding(Base):
+    """One embedding per user profile, kept out of `users` so auth lookups don't load it."""
+    __tablename__ = "profile_embeddings"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    embedding = Column(Embedding(settings.EMBEDDING_DIM), nullable=False)
+    content_hash = Column(String(64), nullable=True) # sha256 of encoder name + profile text; unchanged hash = no re-encode
+    source_updated_at = Column(DateTime(timezone=True), nullable=True) # users.updated_at of the profile that was encoded
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
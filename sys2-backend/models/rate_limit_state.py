@@ -0,0 +1,12 @@
+from sqlalchemy import Column, String, Float, DateTime
+from database import Base
+
+class RateLimitState(Base):
+    """Per-key rate limiter state for the shared (database) rate limit backend."""
+    __tablename__ = "rate_limit_states"
+
+    key = Column(String, primary_key=True) # '<rule name>:<ip or email>'
+    level = Column(Float, nullable=False) # Tokens left / requests in the current window
+    stamp = Column(Float, nullable=False) # Last refill time / current window start (epoch seconds)
+    previous_level = Column(Float, nullable=False) # Requests in the previous window (sliding window only)
+    updated_at = Column(DateTime(timezone=True), nullable=False, index=True)
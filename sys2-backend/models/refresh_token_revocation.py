@@ -0,0 +1,10 @@
+from sqlalchemy import Column, String, DateTime
+from database import Base
+
+class RefreshTokenRevocation(Base):
+    """Used refresh token jtis and revoked token families, kept until they expire."""
+    __tablename__ = "refresh_token_revocations"
+
+    token_id = Column(String(32), primary_key=True) # jti or family id (uuid4 hex)
+    kind = Column(String(8), nullable=False) # 'jti' or 'family'
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
@@ -0,0 +1,12 @@
+from sqlalchemy import Column, Integer, String, Text
+from database import Base
+
+class Space(Base):
+    __tablename__ = "spaces"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, unique=True, nullable=False)
+    location = Column(String, nullable=True)
+    description = Column(Text, nullable=True)
+    workstation_capacity = Column(Integer, nullable=True) # Seats; None = allocations aren't tracked for this space
+    allocation_version = Column(Integer, nullable=False, server_default="0", default=0) # Bumped by every allocation change (core.workstations)
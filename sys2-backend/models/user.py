@@ -1,15 +1,155 @@
-from sqlalchemy import Column, Integer, String, DateTime, func
+from datetime import datetime, timedelta, timezone
+from typing import Mapping, Optional
+
+from sqlalchemy import JSON, Column, Enum, ForeignKey, Integer, String, Text, DateTime, Index, bindparam, cast, event, func, inspect, literal, literal_column
 from sqlalchemy.sql import expression
+from config import settings
+from core.enums import WAITLIST_STATUSES, UserRole, UserStatus, enum_values
 from database import Base
 
+# Full-text search (core.search). Constants are inlined rather than bound: PostgreSQL only uses an
+# expression index for a query expression that matches it exactly
+SEARCH_CONFIG = literal_column("'simple'::regconfig") # No stemming or stop words: names and tags match as written
+SEARCH_TAG_FIELDS = ("skills_tags", "tools_technologies_tags", "industry_focus_tags")
+
+
+def search_document(full_name, *tag_columns):
+    """Weighted tsvector of a user: the name (weight A) and the tags, as JSON text (weight B)."""
+    empty = literal_column("''")
+    tags = [func.coalesce(cast(column, Text), empty) for column in tag_columns]
+    text = tags[0]
+    for tag in tags[1:]:
+        text = text + literal_column("' '") + tag
+    return func.setweight(func.to_tsvector(SEARCH_CONFIG, func.coalesce(full_name, empty)), literal_column("'A'")).op("||")(
+        func.setweight(func.to_tsvector(SEARCH_CONFIG, text), literal_column("'B'"))
+    )
+
+
 class User(Base):
     __tablename__ = "users"
 
     id = Column(Integer, primary_key=True, index=True)
-    email = Column(String, unique=True, index=True, nullable=False)
+    email = Column(String, nullable=False) # Stored as entered; unique case-insensitively, see ix_users_email_lower
     hashed_password = Column(String, nullable=False)
     full_name = Column(String, nullable=True)
-    role = Column(String, nullable=False) # E.g., 'CorporateAdmin', 'StartupAdmin', 'StartupMember', 'Freelancer', 'SysAdmin'
-    status = Column(String, nullable=False) # E.g., 'Waitlisted', 'PendingOnboarding', 'Active', 'Inactive'
+    # Native enum types on PostgreSQL (4 bytes per value), plain strings elsewhere
+    role = Column(Enum(UserRole, name="user_role", values_callable=enum_values), nullable=False)
+    status = Column(Enum(UserStatus, name="user_status", values_callable=enum_values), nullable=False)
+    space_id = Column(Integer, ForeignKey("spaces.id"), nullable=True, index=True)
+    company_id = Column(Integer, ForeignKey("companies.id"), nullable=True, index=True)
+    # Profile (text fields feed the profile embeddings, see core.embedding_pipeline)
+    short_bio = Column(Text, nullable=True)
+    project_interests_goals = Column(Text, nullable=True)
+    skills_tags = Column(JSON, nullable=True)
+    industry_focus_tags = Column(JSON, nullable=True)
+    tools_technologies_tags = Column(JSON, nullable=True)
+    collaboration_preferences_tags = Column(JSON, nullable=True)
+    # Referrals: who brought this user in, and how many of the users they brought in verified their email
+    referred_by_id = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
+    referral_count = Column(Integer, nullable=False, server_default="0", default=0)
+    # Position in the waitlist: signup time moved earlier by the bonuses (waitlist_queue_key below).
+    # Only changes when its inputs do, since waiting time moves everyone alike
+    waitlist_queued_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    # Refresh tokens issued before this are rejected (password reset, deactivation), see /auth/refresh
+    refresh_tokens_revoked_at = Column(DateTime(timezone=True), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        Index("ix_users_email_lower", func.lower(email), unique=True),
+        # Waitlist queue per role, oldest signup first
+        Index(
+            "ix_users_waitlist_role_created", role, created_at,
+            postgresql_where=status.in_(WAITLIST_STATUSES),
+            sqlite_where=status.in_(WAITLIST_STATUSES),
+        ),
+        # Active users per role (counts are index-only scans)
+        Index(
+            "ix_users_active_role", role,
+            postgresql_where=status == UserStatus.ACTIVE,
+            sqlite_where=status == UserStatus.ACTIVE,
+        ),
+        Index("ix_users_status_role", status, role),
+        # The waitlist in queue order; ranked pages are keyset range scans
+        Index(
+            "ix_users_waitlist_queue", waitlist_queued_at, id,
+            postgresql_where=status.in_(WAITLIST_STATUSES),
+            sqlite_where=status.in_(WAITLIST_STATUSES),
+        ),
+        # Change feed for the embedding pipeline and the in-process search index: keyset scans over (updated_at, id)
+        Index("ix_users_updated_at_id", updated_at, id),
+        # Profile search on PostgreSQL: words and prefixes, and typo-tolerant names (pg_trgm)
+        Index(
+            "ix_users_search_document",
+            search_document(full_name, skills_tags, tools_technologies_tags, industry_focus_tags),
+            postgresql_using="gin",
+        ).ddl_if(dialect="postgresql"),
+        Index(
+            "ix_users_full_name_trgm", func.lower(full_name).label("full_name_lower"),
+            postgresql_using="gin", postgresql_ops={"full_name_lower": "gin_trgm_ops"},
+        ).ddl_if(dialect="postgresql"),
+    )
+
+
+# Status predicates matching the partial indexes above. Values are rendered inline: with a bound
+# parameter (or a generic prepared plan) the planner can't prove the index's WHERE clause holds.
+IS_WAITLISTED = User.status.in_(bindparam(
+    "waitlist_statuses", list(WAITLIST_STATUSES), expanding=True, literal_execute=True, type_=User.__table__.c.status.type
+))
+IS_ACTIVE = User.status == literal(UserStatus.ACTIVE, User.__table__.c.status.type, literal_execute=True)
+IS_VERIFIED_WAITLIST = User.status == literal(UserStatus.ACTIVE_WAITLIST, User.__table__.c.status.type, literal_execute=True)
+
+# The expressions of ix_users_search_document and ix_users_full_name_trgm
+USER_SEARCH_DOCUMENT = search_document(User.full_name, *(getattr(User, name) for name in SEARCH_TAG_FIELDS))
+USER_NAME_LOWER = func.lower(User.full_name)
+
+
+def normalize_email(email: str) -> str:
+    return email.strip().lower()
+
+
+def email_matches(email: str):
+    """WHERE clause for an email lookup that can use ix_users_email_lower."""
+    return func.lower(User.email) == normalize_email(email)
+
+
+# --- Waitlist queue order (core.waitlist) ---
+# Kept with the model so the mapper events below are registered wherever User is: every ORM
+# flush that changes an input recomputes waitlist_queued_at. Core INSERTs and UPDATEs bypass
+# them and pass waitlist_queue_key() themselves.
+
+WAITLIST_PROFILE_FIELDS = (
+    "short_bio", "project_interests_goals", "skills_tags",
+    "industry_focus_tags", "tools_technologies_tags", "collaboration_preferences_tags",
+)
+WAITLIST_SCORED_ATTRIBUTES = ("status", "created_at", "referral_count", *WAITLIST_PROFILE_FIELDS)
+
+
+def waitlist_bonus_days(status: UserStatus, referral_count: int, profile: Mapping) -> float:
+    days = settings.WAITLIST_PROFILE_BONUS_DAYS * sum(1 for name in WAITLIST_PROFILE_FIELDS if profile.get(name)) / len(WAITLIST_PROFILE_FIELDS)
+    days += settings.WAITLIST_REFERRAL_BONUS_DAYS * min(referral_count or 0, settings.WAITLIST_MAX_REFERRAL_BONUSES)
+    if status == UserStatus.ACTIVE_WAITLIST:
+        days += settings.WAITLIST_VERIFIED_BONUS_DAYS
+    return days
+
+
+def waitlist_queue_key(created_at: datetime, status: UserStatus, referral_count: int = 0, profile: Optional[Mapping] = None) -> datetime:
+    """The user's waitlist_queued_at: created_at moved earlier by their bonus days."""
+    return created_at - timedelta(days=waitlist_bonus_days(status, referral_count, profile or {}))
+
+
+def _user_queue_key(user: User) -> datetime:
+    profile = {name: getattr(user, name) for name in WAITLIST_PROFILE_FIELDS}
+    return waitlist_queue_key(user.created_at or datetime.now(timezone.utc), user.status, user.referral_count, profile)
+
+
+@event.listens_for(User, "before_insert")
+def _queue_new_user(mapper, connection, target):
+    target.waitlist_queued_at = _user_queue_key(target)
+
+
+@event.listens_for(User, "before_update")
+def _requeue_changed_user(mapper, connection, target):
+    state = inspect(target)
+    if any(state.attrs[name].history.has_changes() for name in WAITLIST_SCORED_ATTRIBUTES):
+        target.waitlist_queued_at = _user_queue_key(target)
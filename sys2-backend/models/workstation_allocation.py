@@ -0,0 +1,25 @@
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer
+from database import Base
+
+class WorkstationAllocation(Base):
+    """
+    Seats of a space held over [starts_at, ends_at): a member's seat (no end, until
+    released) or a booking. Written under the space's row lock by core.workstations,
+    which bumps spaces.allocation_version with every change. Releasing sets ends_at;
+    rows are kept.
+    """
+    __tablename__ = "workstation_allocations"
+
+    id = Column(Integer, primary_key=True)
+    space_id = Column(Integer, ForeignKey("spaces.id", ondelete="CASCADE"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True) # Holder
+    seats = Column(Integer, nullable=False)
+    starts_at = Column(DateTime(timezone=True), nullable=False)
+    ends_at = Column(DateTime(timezone=True), nullable=True) # None = until released
+    created_at = Column(DateTime(timezone=True), nullable=False)
+
+    __table_args__ = (
+        # Index builds load a space's current and future allocations
+        Index("ix_workstation_allocations_space_id_ends_at", space_id, ends_at),
+        Index("ix_workstation_allocations_user_id", user_id),
+    )
@@ -0,0 +1,180 @@
+from datetime import datetime
+from typing import List
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.audit import AUDIT_EVENT_TYPES
+from core.dependencies import get_current_sys_admin
+from core.enums import UserRole, UserStatus
+from core.search import get_search_backend
+from core.serialization import RowsResponse, schema_columns
+from core.user_admin import apply_bulk_transition
+from core.waitlist import get_waitlist_scheduler, list_waitlist, promote_next
+from core.workstations import get_seat_availability
+from database import get_async_db
+from models.audit_event import AuditEvent
+from models.space import Space
+from models.user import User
+from schemas import admin as admin_schemas
+from schemas import user as user_schemas
+
+router = APIRouter(
+    dependencies=[Depends(get_current_sys_admin)],
+    responses={403: {"description": "Not a SYS admin"}},
+)
+
+@router.get("/users", response_model=admin_schemas.UserPage)
+async def list_users(
+    roles: List[UserRole] = Query(None),
+    statuses: List[UserStatus] = Query(None),
+    after_id: int = Query(None, description="Last id of the previous page"),
+    limit: int = Query(1000, ge=1, le=10000),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Users in id order, keyset-paginated. Rows are encoded straight to JSON (core.serialization)."""
+    conditions = []
+    if roles:
+        conditions.append(User.role.in_(roles))
+    if statuses:
+        conditions.append(User.status.in_(statuses))
+    if after_id is not None:
+        conditions.append(User.id > after_id)
+    rows = (await db.execute(
+        select(*schema_columns(user_schemas.User, User)).where(*conditions).order_by(User.id).limit(limit)
+    )).all()
+    return RowsResponse(rows, "users", {"next_after_id": rows[-1].id if len(rows) == limit else None})
+
+@router.get("/users/search", response_model=admin_schemas.UserSearchResult)
+async def search_users(
+    q: str = Query(..., min_length=1, max_length=200, description="Words of the name, company or tags; each may be a prefix"),
+    roles: List[UserRole] = Query(None),
+    statuses: List[UserStatus] = Query(None),
+    space_id: int = Query(None),
+    limit: int = Query(20, ge=1, le=200),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Users whose name, company or tags match every word of q, best match first (core.search). Tolerates typos in names."""
+    conditions = []
+    if roles:
+        conditions.append(User.role.in_(roles))
+    if statuses:
+        conditions.append(User.status.in_(statuses))
+    if space_id is not None:
+        conditions.append(User.space_id == space_id)
+    hits = await get_search_backend().search(db, q, limit, conditions)
+    if not hits:
+        return {"users": []}
+    users = {
+        row.id: row for row in (await db.execute(
+            select(*schema_columns(user_schemas.User, User)).where(User.id.in_([user_id for user_id, _ in hits]))
+        )).all()
+    }
+    return {"users": [
+        admin_schemas.UserSearchHit(**users[user_id]._mapping, score=round(score, 4)) for user_id, score in hits if user_id in users
+    ]}
+
+@router.get("/audit-events", response_model=admin_schemas.AuditEventPage)
+async def list_audit_events(
+    types: List[str] = Query(None),
+    user_id: int = Query(None),
+    email: str = Query(None),
+    ip: str = Query(None),
+    since: datetime = Query(None, description="Only events at or after this time"),
+    before_id: int = Query(None, description="Last id of the previous page"),
+    limit: int = Query(100, ge=1, le=10000),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Security audit events, newest first, keyset-paginated. Buffered events show up within AUDIT_FLUSH_MS."""
+    unknown = set(types or []) - AUDIT_EVENT_TYPES
+    if unknown:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Unknown event types: {', '.join(sorted(unknown))}")
+    conditions = []
+    if types:
+        conditions.append(AuditEvent.type.in_(types))
+    if user_id is not None:
+        conditions.append(AuditEvent.user_id == user_id)
+    if email is not None:
+        conditions.append(AuditEvent.email == email.lower())
+    if ip is not None:
+        conditions.append(AuditEvent.ip == ip)
+    if since is not None:
+        conditions.append(AuditEvent.occurred_at >= since) # Also prunes partitions on Postgres
+    if before_id is not None:
+        conditions.append(AuditEvent.id < before_id)
+    rows = (await db.execute(
+        select(*schema_columns(admin_schemas.AuditEvent, AuditEvent)).where(*conditions).order_by(AuditEvent.id.desc()).limit(limit)
+    )).all()
+    return RowsResponse(rows, "events", {"next_before_id": rows[-1].id if len(rows) == limit else None})
+
+@router.get("/waitlist", response_model=admin_schemas.WaitlistPage)
+async def list_waitlist_page(
+    verified_only: bool = Query(False, description="Only users with a verified email (the ones promotion picks)"),
+    after_queued_at: datetime = Query(None, description="next_after_queued_at of the previous page"),
+    after_id: int = Query(None, description="next_after_id of the previous page"),
+    limit: int = Query(100, ge=1, le=10000),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """The waitlist in queue order, keyset-paginated over ix_users_waitlist_queue (no sort of the whole table)."""
+    if (after_queued_at is None) != (after_id is None):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Pass both after_queued_at and after_id, or neither")
+    after = (after_queued_at, after_id) if after_id is not None else None
+    rows = await list_waitlist(
+        db, after=after, limit=limit, verified_only=verified_only,
+        columns=schema_columns(admin_schemas.WaitlistEntry, User),
+    )
+    last = rows[-1] if len(rows) == limit else None
+    return RowsResponse(rows, "users", {
+        "next_after_queued_at": last.waitlist_queued_at if last else None,
+        "next_after_id": last.id if last else None,
+    })
+
+@router.post("/waitlist/promote", response_model=admin_schemas.WaitlistPromotionResult)
+async def promote_from_waitlist(request: admin_schemas.WaitlistPromoteRequest, db: AsyncSession = Depends(get_async_db)):
+    """Promotes the first verified users in the queue into the space's free workstations now, in one transaction."""
+    try:
+        return await promote_next(db, request.space_id, limit=request.limit, notify=request.notify)
+    except LookupError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+@router.put("/spaces/{space_id}/workstation-capacity", response_model=admin_schemas.WorkstationCapacityUpdate)
+async def set_workstation_capacity(space_id: int, update_in: admin_schemas.WorkstationCapacityUpdate, db: AsyncSession = Depends(get_async_db)):
+    """Sets how many workstations a space has; the waitlist scheduler fills any new room right away."""
+    space = await db.get(Space, space_id)
+    if space is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Space {space_id} not found")
+    space.workstation_capacity = update_in.workstation_capacity
+    await db.commit()
+    get_seat_availability().invalidate(space_id) # Allocations re-read the capacity under the space lock anyway
+    get_waitlist_scheduler().wake()
+    return update_in
+
+@router.post("/users/bulk-transition", response_model=admin_schemas.BulkTransitionResult)
+async def bulk_transition_users(request: admin_schemas.BulkTransitionRequest, db: AsyncSession = Depends(get_async_db)):
+    """
+    Promotes, deactivates or re-assigns the role of every user matching the filter.
+    SysAdmin accounts are never affected. Applied in chunks, each committed with its emails.
+    Promotion seats users in space_id, in queue order, as far as its free workstations go.
+    """
+    try:
+        result = await apply_bulk_transition(
+            db,
+            request.action,
+            user_ids=request.filter.user_ids,
+            roles=request.filter.roles,
+            statuses=request.filter.statuses,
+            created_before=request.filter.created_before,
+            target_role=request.target_role,
+            space_id=request.space_id,
+            notify=request.notify,
+        )
+    except LookupError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if request.action == "deactivate" and result["updated"]:
+        get_waitlist_scheduler().wake() # Deactivated members free their workstations
+    return result
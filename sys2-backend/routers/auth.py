@@ -1,39 +1,56 @@
 import logging
-from fastapi import APIRouter, Depends, HTTPException, status, Response
+import time
+from datetime import datetime, timezone
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Request, status, Response
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel, EmailStr, Field
 
-from database import get_db
+from database import get_async_db, read_from_primary
+from core.audit import get_audit_log
 from models import user as models
 from schemas import user as schemas
 from schemas import auth as auth_schemas
-from core.security import get_password_hash, create_verification_token, verify_verification_token, verify_password, create_access_token, create_refresh_token, create_password_reset_token, verify_token, ACCESS_TOKEN_EXPIRE_MINUTES
-from utils.email import send_email
+from core.dependencies import get_current_user
+from core.enums import SIGN_IN_STATUSES, UserRole, UserStatus
+from core.notifications import NotificationEvent, get_notification_dispatcher
+from core.security import hash_password_async, create_verification_token, verify_verification_token, verify_and_update_password_async, create_access_token, create_refresh_token, decode_refresh_token, create_password_reset_token, verify_token, ACCESS_TOKEN_EXPIRE_MINUTES, REFRESH_TOKEN_EXPIRE_DAYS, PASSWORD_RESET_TOKEN_EXPIRE_MINUTES
+from core.rate_limit import RateLimit, client_ip, rate_limit
+from core.token_store import RefreshTokenStoreFull, get_refresh_token_store
+from utils.email_queue import enqueue_rendered_email
+from utils.email_templates import render_email
 
 router = APIRouter(
     tags=["auth"],
     responses={404: {"description": "Not found"}},
 )
 
-@router.post("/register", response_model=schemas.User)
-def register_user(user_in: schemas.UserCreate, db: Session = Depends(get_db)):
-    # Check if user already exists
-    db_user = db.query(models.User).filter(models.User.email == user_in.email).first()
-    if db_user:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Email already registered"
-        )
+logger = logging.getLogger(__name__)
+
+# --- Rate Limits ---
+# Checked before the handler runs, so throttled requests never hit the DB or bcrypt.
 
-    # Hash the password
-    hashed_password = get_password_hash(user_in.password)
+login_rate_limit = rate_limit(
+    RateLimit("login:ip", limit=30, period=60, algorithm="token_bucket"),
+    RateLimit("login:email", limit=10, period=900, key="email"),
+    email_field="username", # OAuth2 form field carrying the email
+)
+register_rate_limit = rate_limit(RateLimit("register:ip", limit=10, period=3600))
+forgot_password_rate_limit = rate_limit(
+    RateLimit("forgot-password:ip", limit=10, period=900),
+    RateLimit("forgot-password:email", limit=3, period=3600, key="email"),
+)
+reset_password_rate_limit = rate_limit(RateLimit("reset-password:ip", limit=10, period=900))
 
+@router.post("/register", response_model=schemas.User, dependencies=[Depends(register_rate_limit)])
+async def register_user(request: Request, user_in: schemas.UserCreate, db: AsyncSession = Depends(get_async_db)):
     # Determine initial status based on role
-    if user_in.role in ["Startup", "Freelancer"]:
-        initial_status = "Waitlisted"
-    elif user_in.role == "Corporate":
-        initial_status = "PendingOnboarding"
+    if user_in.role in (UserRole.STARTUP, UserRole.FREELANCER):
+        initial_status = UserStatus.WAITLISTED
+    elif user_in.role == UserRole.CORPORATE:
+        initial_status = UserStatus.PENDING_ONBOARDING
     else:
         # Raise error for unhandled roles
         raise HTTPException(
@@ -41,67 +58,83 @@ def register_user(user_in: schemas.UserCreate, db: Session = Depends(get_db)):
             detail=f"Invalid role specified: {user_in.role}. Valid roles are 'Startup', 'Freelancer', 'Corporate'."
         )
 
-    # Create new user instance
-    # Note: Fields like company_name, is_active, is_superuser are in the schema
-    # but not observed in the provided models.User definition, so they are omitted here.
-    new_user = models.User(
-        email=user_in.email,
-        hashed_password=hashed_password,
-        full_name=user_in.full_name,
-        role=user_in.role,
-        status=initial_status
+    # Hash the password (runs in the password hashing process pool)
+    hashed_password = await hash_password_async(user_in.password)
+
+    # Remember the referrer, if any; they are credited once this user verifies their email.
+    # Looked up inside the INSERT; an unknown referrer email gives NULL, so it doesn't reveal which emails are registered
+    referrer_id = None
+    if user_in.referrer_email is not None:
+        referrer_id = select(models.User.id).where(models.email_matches(user_in.referrer_email)).scalar_subquery()
+
+    # Create the user in one round trip, with no SELECT pre-check: the unique lower(email)
+    # index decides, so concurrent registrations can't both succeed.
+    # Note: company_name is accepted by the schema but models.User has no column for it yet.
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    created_at = datetime.now(timezone.utc)
+    new_user = await db.scalar(
+        insert(models.User).values(
+            email=user_in.email,
+            hashed_password=hashed_password,
+            full_name=user_in.full_name,
+            role=user_in.role,
+            status=initial_status,
+            referred_by_id=referrer_id,
+            created_at=created_at,
+            waitlist_queued_at=models.waitlist_queue_key(created_at, initial_status), # Core insert: the ORM hook doesn't run
+        )
+        .on_conflict_do_nothing(index_elements=[func.lower(models.User.email)])
+        .returning(models.User)
     )
+    if new_user is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Email already registered"
+        )
 
-    # Add to DB and commit
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    # Queue the verification email in the same transaction as the new user
+    token = create_verification_token(email=new_user.email)
+    enqueue_rendered_email(db, render_email(
+        "verify_email",
+        to_email=new_user.email,
+        token=token,
+        full_name=new_user.full_name
+    ))
 
-    # Send verification email
-    try:
-        token = create_verification_token(email=new_user.email)
-        # TODO: Replace localhost:3000 with frontend base URL from config
-        verification_url = f"http://localhost:3000/auth/verify/{token}"
-        html_content = f"""
-        <html>
-            <body>
-                <h1>Verify your ShareYourSpace Account</h1>
-                <p>Thank you for registering. Please click the link below to verify your email address:</p>
-                <a href="{verification_url}">Verify Email</a>
-                <p>If you did not create this account, please ignore this email.</p>
-            </body>
-        </html>
-        """
-        send_email(
-            to_email=new_user.email,
-            subject="Verify your ShareYourSpace Account",
-            html_content=html_content
-        )
-    except Exception as e:
-        # TODO: Implement more robust error handling/logging
-        logging.error(f"Error sending verification email to {new_user.email}: {e}")
-        # Decide if the user registration should be rolled back or flagged
-        # For now, we let the registration succeed but log the email error.
+    # Commit user + outbox row; the email worker sends it in the background
+    await db.commit()
+    await get_audit_log().record("registered", user_id=new_user.id, email=new_user.email, ip=client_ip(request))
+
+    # In-app notice for the SYS admins, coalesced into one "N new registrations" entry each
+    get_notification_dispatcher().publish(NotificationEvent(
+        "user_registered", recipient_role=UserRole.SYS_ADMIN, actor_id=new_user.id, data={"role": new_user.role.value}
+    ))
 
     return new_user
 
 @router.get("/verify/{token}")
-def verify_email(token: str, db: Session = Depends(get_db)):
+async def verify_email(request: Request, token: str, db: AsyncSession = Depends(get_async_db)):
     try:
-        payload = verify_verification_token(token)
-        email: str = payload.get("sub") # Assuming email is stored in 'sub' claim
+        email = verify_verification_token(token) # Returns the 'sub' claim, or None if invalid
         if email is None:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Invalid token payload"
             )
+    except HTTPException:
+        raise
     except Exception as e: # Catch specific exceptions from verify_verification_token if possible
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Invalid or expired token: {e}"
         )
 
-    user = db.query(models.User).filter(models.User.email == email).first()
+    read_from_primary(db) # The status update below is decided on this read; a lagging replica could miss the new account
+    user = await db.scalar(select(models.User).where(models.email_matches(email)))
 
     if not user:
         # Should not happen if token is valid, but good to check
@@ -111,11 +144,11 @@ def verify_email(token: str, db: Session = Depends(get_db)):
         )
 
     updated = False
-    if user.status == "Waitlisted":
-        user.status = "ActiveWaitlist"
+    if user.status == UserStatus.WAITLISTED:
+        user.status = UserStatus.ACTIVE_WAITLIST
         updated = True
-    elif user.status == "PendingOnboarding":
-        user.status = "ActivePending"
+    elif user.status == UserStatus.PENDING_ONBOARDING:
+        user.status = UserStatus.ACTIVE_PENDING
         updated = True
     # Optional: Handle cases where the user is already active or has a different status
     # else:
@@ -123,41 +156,69 @@ def verify_email(token: str, db: Session = Depends(get_db)):
 
     if updated:
         db.add(user)
-        db.commit()
-        db.refresh(user)
+        if user.referred_by_id is not None:
+            # Verification happens once, so each referred user counts once; the row lock makes concurrent ones each count
+            referrer = await db.scalar(select(models.User).where(models.User.id == user.referred_by_id).with_for_update())
+            if referrer is not None:
+                referrer.referral_count += 1 # Flushed on commit, which also moves the referrer up the waitlist
+        await db.commit()
+        await get_audit_log().record("email_verified", user_id=user.id, email=user.email, ip=client_ip(request))
+        get_notification_dispatcher().publish(NotificationEvent("email_verified", recipient_ids=[user.id], data={"status": user.status.value}))
         return {"message": "Email verified successfully."}
     else:
         # If no status update was needed (e.g., already active)
         return {"message": "Email already verified or status ineligible for update."}
 
-@router.post("/login")
-def login_for_access_token(response: Response, form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+@router.post("/login", dependencies=[Depends(login_rate_limit)])
+async def login_for_access_token(request: Request, response: Response, form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
     # 1. Authenticate the user
-    user = db.query(models.User).filter(models.User.email == form_data.username).first() # username field from form is email
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    user = await db.scalar(select(models.User).where(models.email_matches(form_data.username))) # username field from form is email
+    verified, new_hash = (False, None)
+    if user:
+        # Verifies and, if the hash policy changed, rehashes in the same pool job
+        verified, new_hash = await verify_and_update_password_async(form_data.password, user.hashed_password)
+    if not verified:
+        await get_audit_log().record(
+            "login_failed", user_id=user.id if user else None, email=form_data.username, ip=client_ip(request),
+            data={"reason": "bad_password" if user else "unknown_email"},
+        )
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"}, # Standard for 401
         )
-    
-    # Optional: Add checks for user status (e.g., is_active, verified)
-    # if not user.is_active:
-    #     raise HTTPException(status_code=400, detail="Inactive user")
-    # if user.status not in ["ActiveWaitlist", "ActivePending", "Active"]: # Check if email is verified
-    #      raise HTTPException(
-    #         status_code=status.HTTP_401_UNAUTHORIZED,
-    #         detail="Email not verified",
-    #     )
-
-
-    # 2. Create tokens
-    access_token_data = {"sub": user.email} # Subject of the token is the email
+
+    # Transparently upgrade outdated password hashes (scheme or cost changed)
+    if new_hash:
+        user.hashed_password = new_hash
+        await db.commit()
+
+    # Only verified, active accounts get a session
+    if user.status not in SIGN_IN_STATUSES:
+        inactive = user.status == UserStatus.INACTIVE
+        await get_audit_log().record(
+            "login_failed", user_id=user.id, email=user.email, ip=client_ip(request),
+            data={"reason": "inactive" if inactive else "unverified"},
+        )
+        if inactive:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Inactive user")
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Email not verified",
+        )
+
+    await get_audit_log().record("login_succeeded", user_id=user.id, email=user.email, ip=client_ip(request))
+
+    # 2. Create tokens (starts a new refresh token family)
+    return _issue_tokens(response, user.email)
+
+def _issue_tokens(response: Response, email: str, family_id: Optional[str] = None) -> dict:
+    access_token_data = {"sub": email} # Subject of the token is the email
     access_token = create_access_token(data=access_token_data)
     
-    # Optionally create a refresh token
-    refresh_token_data = {"sub": user.email, "scope": "refresh"} # Add scope if needed
-    refresh_token = create_refresh_token(data=refresh_token_data)
+    # Create a refresh token in the given family (new family on login)
+    refresh_token_data = {"sub": email, "scope": "refresh"} # Add scope if needed
+    refresh_token = create_refresh_token(data=refresh_token_data, family_id=family_id)
 
     # 4. Set access token as an httpOnly cookie
     response.set_cookie(
@@ -177,51 +238,94 @@ def login_for_access_token(response: Response, form_data: OAuth2PasswordRequestF
         "refresh_token": refresh_token 
     }
 
+# --- Refresh Token Rotation ---
+
+def _family_expiry() -> float:
+    # A family can't outlive the newest token that could still be issued in it
+    return time.time() + REFRESH_TOKEN_EXPIRE_DAYS * 24 * 3600
+
+def _revoked_for_user(claims: dict, user: models.User) -> bool:
+    # Every family of the user is revoked at once by users.refresh_tokens_revoked_at; tokens without iat predate it
+    revoked_at = user.refresh_tokens_revoked_at
+    if revoked_at is None:
+        return False
+    if revoked_at.tzinfo is None: # SQLite returns naive UTC timestamps
+        revoked_at = revoked_at.replace(tzinfo=timezone.utc)
+    return claims.get("iat", 0) < revoked_at.timestamp()
+
+def _token_store_full_exception(error: RefreshTokenStoreFull) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Server is busy, please try again shortly.",
+        headers={"Retry-After": str(error.retry_after)},
+    )
+
+@router.post("/refresh")
+async def refresh_access_token(request: Request, response: Response, refresh_in: auth_schemas.RefreshRequest, db: AsyncSession = Depends(get_async_db)):
+    claims = decode_refresh_token(refresh_in.refresh_token)
+    if claims is None:
+        raise credentials_exception
+
+    read_from_primary(db) # A revocation (logout, reuse detection) must count at once, not after replica lag
+    store = get_refresh_token_store()
+    if await store.is_family_revoked(db, claims["fid"]):
+        raise credentials_exception
+
+    # The account must still exist and be allowed a session (not deactivated, password not reset since)
+    user = await db.scalar(select(models.User).where(models.email_matches(claims["sub"])))
+    if user is None or user.status not in SIGN_IN_STATUSES or _revoked_for_user(claims, user):
+        raise credentials_exception
+
+    try:
+        first_use = await store.consume(db, claims["jti"], claims["exp"])
+        if not first_use:
+            # This token was already rotated: someone replayed it, so kill every token in its family
+            await store.revoke_family(db, claims["fid"], _family_expiry())
+    except RefreshTokenStoreFull as e:
+        # Fail closed: rotating without recording the jti would make the old token replayable
+        logger.error("Refused token refresh for %s: %s", claims["sub"], e)
+        raise _token_store_full_exception(e)
+
+    if not first_use:
+        await db.commit()
+        logger.warning("Refresh token reuse detected for %s; revoked token family %s", claims['sub'], claims['fid'])
+        await get_audit_log().record("refresh_token_reuse", email=claims["sub"], ip=client_ip(request), data={"family": claims["fid"]})
+        raise credentials_exception
+
+    await db.commit()
+    return _issue_tokens(response, claims["sub"], family_id=claims["fid"])
+
 # --- Password Reset Request --- 
 
 class EmailSchema(BaseModel):
     email: EmailStr
 
-@router.post("/forgot-password")
-def forgot_password(email_data: EmailSchema, db: Session = Depends(get_db)):
-    user = db.query(models.User).filter(models.User.email == email_data.email).first()
+@router.post("/forgot-password", dependencies=[Depends(forgot_password_rate_limit)])
+async def forgot_password(request: Request, email_data: EmailSchema, db: AsyncSession = Depends(get_async_db)):
+    user = await db.scalar(select(models.User).where(models.email_matches(email_data.email)))
+    await get_audit_log().record(
+        "password_reset_requested", user_id=user.id if user else None, email=email_data.email, ip=client_ip(request),
+        data=None if user else {"reason": "unknown_email"},
+    )
     if not user:
         # Avoid confirming if an email exists for security reasons
         # Log this attempt potentially
-        logging.info(f"Password reset attempt for non-existent email: {email_data.email}")
+        logger.info("Password reset attempt for non-existent email: %s", email_data.email)
         # Return a generic success message regardless
         return {"message": "If an account with that email exists, a password reset link has been sent."}
 
     # Generate password reset token
     token = create_password_reset_token(email=user.email)
-    # TODO: Replace localhost:3000 with frontend base URL from config
-    reset_url = f"http://localhost:3000/auth/reset-password/{token}"
-    
-    html_content = f"""
-    <html>
-        <body>
-            <h1>Reset Your ShareYourSpace Password</h1>
-            <p>Please click the link below to reset your password:</p>
-            <a href="{reset_url}">Reset Password</a>
-            <p>This link will expire in 15 minutes.</p>
-            <p>If you did not request a password reset, please ignore this email.</p>
-        </body>
-    </html>
-    """
 
-    try:
-        send_email(
-            to_email=user.email,
-            subject="Reset Your ShareYourSpace Password",
-            html_content=html_content
-        )
-        return {"message": "If an account with that email exists, a password reset link has been sent."}
-    except Exception as e:
-        logging.error(f"Error sending password reset email to {user.email}: {e}")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Could not send password reset email."
-        )
+    # Only queue the email; delivery (and retries) happen in the email worker
+    enqueue_rendered_email(db, render_email(
+        "reset_password",
+        to_email=user.email,
+        token=token,
+        expire_minutes=PASSWORD_RESET_TOKEN_EXPIRE_MINUTES
+    ))
+    await db.commit()
+    return {"message": "If an account with that email exists, a password reset link has been sent."}
 
 # --- Password Reset Confirmation ---
 
@@ -235,8 +339,8 @@ credentials_exception = HTTPException(
         headers={"WWW-Authenticate": "Bearer"},
     )
 
-@router.post("/reset-password")
-def reset_password(reset_data: PasswordResetSchema, db: Session = Depends(get_db)):
+@router.post("/reset-password", dependencies=[Depends(reset_password_rate_limit)])
+async def reset_password(request: Request, reset_data: PasswordResetSchema, db: AsyncSession = Depends(get_async_db)):
     try:
         # 1. Verify the token and extract email
         payload = verify_token(reset_data.token, credentials_exception)
@@ -254,14 +358,15 @@ def reset_password(reset_data: PasswordResetSchema, db: Session = Depends(get_db
         raise e
     except Exception as e:
         # Catch any other unexpected errors during token validation
-        logging.error(f"Password reset token validation error: {e}")
+        logger.error("Password reset token validation error: %s", e)
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, 
             detail="Invalid or expired password reset token."
         )
 
-    # 3. Find the user
-    user = db.query(models.User).filter(models.User.email == email).first()
+    # 3. Find the user (on the primary: the row is updated below)
+    read_from_primary(db)
+    user = await db.scalar(select(models.User).where(models.email_matches(email)))
     if not user:
         # Should not happen if token was valid, but good to check
         raise HTTPException(
@@ -269,21 +374,41 @@ def reset_password(reset_data: PasswordResetSchema, db: Session = Depends(get_db
             detail="User not found."
         )
 
-    # 4. Hash the new password and update the user
-    hashed_password = get_password_hash(reset_data.new_password)
+    # 4. Hash the new password and update the user; sessions started with the old password end
+    hashed_password = await hash_password_async(reset_data.new_password)
     user.hashed_password = hashed_password
+    user.refresh_tokens_revoked_at = datetime.now(timezone.utc) # Revokes every refresh token family of the user
     db.add(user)
-    db.commit()
+    await db.commit()
+    await get_audit_log().record("password_reset", user_id=user.id, email=user.email, ip=client_ip(request))
 
     return {"message": "Password updated successfully."}
 
+# --- Current User ---
+
+@router.get("/me", response_model=schemas.User)
+async def read_current_user(current_user: models.User = Depends(get_current_user)):
+    return current_user
+
 # --- Logout ---
 
 @router.post("/logout")
-def logout(response: Response):
+async def logout(request: Request, response: Response, logout_in: Optional[auth_schemas.RefreshRequest] = None, db: AsyncSession = Depends(get_async_db)):
     """
     Clears the access_token cookie to log the user out.
+    If the refresh token is sent, its whole token family is revoked as well.
     """
+    if logout_in is not None:
+        claims = decode_refresh_token(logout_in.refresh_token)
+        if claims is not None:
+            try:
+                await get_refresh_token_store().revoke_family(db, claims["fid"], _family_expiry())
+            except RefreshTokenStoreFull as e:
+                logger.error("Could not revoke token family on logout for %s: %s", claims["sub"], e)
+                raise _token_store_full_exception(e)
+            await db.commit()
+            await get_audit_log().record("logout", email=claims["sub"], ip=client_ip(request))
+
     response.set_cookie(
         key="access_token",
         value="",
@@ -0,0 +1,72 @@
+from fastapi import APIRouter, Depends, Query, WebSocket, status
+from sqlalchemy import and_, or_, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import settings
+from core.chat import get_chat_gateway, load_blocked_users
+from core.dependencies import authenticate_access_token, get_current_user
+from core.security import decode_access_token
+from database import AsyncSessionLocal, get_async_db
+from models.message import Message
+from models.user import User
+from schemas import chat as chat_schemas
+
+router = APIRouter()
+
+@router.websocket("/ws")
+async def chat_socket(websocket: WebSocket):
+    """
+    Chat gateway (protocol in core.chat). Authenticates once with the access_token cookie.
+    Cookies ride along on cross-site WebSocket handshakes, so the Origin is checked as well.
+    """
+    origin = websocket.headers.get("origin")
+    if origin is not None and origin not in settings.CHAT_ALLOWED_ORIGINS:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    access_token = websocket.cookies.get("access_token")
+    # One short-lived session for everything needed at connect: holding a pooled
+    # connection per open socket would exhaust the pool
+    async with AsyncSessionLocal() as db:
+        user = await authenticate_access_token(db, access_token) # None for deactivated and unverified users too
+        blocked_users = await load_blocked_users(db, user.id) if user is not None else set()
+    if user is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    await websocket.accept()
+    expires_at = decode_access_token(access_token)["exp"] # Cached by authenticate_access_token
+    await get_chat_gateway().serve(websocket, user, blocked_users, expires_at)
+
+
+@router.get("/history/{user_id}", response_model=chat_schemas.ChatHistory)
+async def chat_history(
+    user_id: int,
+    before: str = Query(None, description="Message id to page back from"),
+    limit: int = Query(50, ge=1, le=200),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Messages between the current user and user_id, newest first (persisted within CHAT_PERSIST_FLUSH_MS of delivery)."""
+    conditions = [or_(
+        and_(Message.sender_id == current_user.id, Message.recipient_id == user_id),
+        and_(Message.sender_id == user_id, Message.recipient_id == current_user.id),
+    )]
+    if before is not None:
+        cursor = (await db.execute(select(Message.created_at, Message.id).where(Message.uid == before))).first()
+        if cursor is not None:
+            conditions.append(tuple_(Message.created_at, Message.id) < tuple_(cursor.created_at, cursor.id))
+
+    rows = (await db.scalars(
+        select(Message).where(*conditions).order_by(Message.created_at.desc(), Message.id.desc()).limit(limit)
+    )).all()
+    return chat_schemas.ChatHistory(
+        messages=[
+            chat_schemas.ChatMessage(
+                id=row.uid, sender_id=row.sender_id, recipient_id=row.recipient_id,
+                content=row.content, created_at=row.created_at, read_at=row.read_at,
+            )
+            for row in rows
+        ],
+        next_before=rows[-1].uid if len(rows) == limit else None,
+    )
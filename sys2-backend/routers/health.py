@@ -0,0 +1,43 @@
+import asyncio
+import time
+
+from fastapi import APIRouter, Response, status
+from sqlalchemy import text
+
+from config import settings
+from database import async_engine, engine, get_replica_set, pool_status
+
+router = APIRouter(
+    tags=["health"],
+)
+
+async def _ping_database() -> None:
+    async with async_engine.connect() as connection:
+        await connection.execute(text("SELECT 1"))
+
+@router.get("/db")
+async def database_health(response: Response):
+    """ Checks primary connectivity and reports pool state and replica status (replicas don't affect the status). """
+    started = time.perf_counter()
+    error = None
+    try:
+        await asyncio.wait_for(_ping_database(), timeout=settings.DB_HEALTH_TIMEOUT_SECONDS)
+    except Exception as e: # Timeouts, pool exhaustion, connection refused, ...
+        error = f"{type(e).__name__}: {e}"
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+
+    replicas = get_replica_set()
+    return {
+        "status": "ok" if error is None else "unavailable",
+        "latency_ms": round((time.perf_counter() - started) * 1000, 2),
+        "error": error,
+        "pools": {
+            "primary": pool_status(async_engine.sync_engine),
+            "primary_sync": pool_status(engine),
+            **{name: pool_status(replica.sync_engine) for name, replica in replicas.engines.items()},
+        },
+        "replicas": {
+            name: {"in_rotation": replica in replicas.in_rotation, "lag_seconds": replicas.lag_seconds[name]}
+            for name, replica in replicas.engines.items()
+        },
+    }
@@ -0,0 +1,86 @@
+from typing import List
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import and_, exists, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.dependencies import get_current_user
+from core.enums import UserStatus
+from core.matching import get_matching_backend
+from core.search import get_search_backend
+from database import get_async_db
+from models.block import Block
+from models.user import User
+from schemas import matching as matching_schemas
+
+router = APIRouter()
+
+@router.get("/discover", response_model=List[matching_schemas.MatchResult])
+async def discover_matches(
+    limit: int = Query(20, ge=1, le=100),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Users in the current user's space with the most similar profiles, best first.
+    Excludes the user's own company and blocked users. Empty until the user has a space and an embedding.
+    """
+    matches = await get_matching_backend().discover(db, current_user, limit)
+    if not matches:
+        return []
+
+    # Card details for the matched ids in one query, returned in similarity order
+    users = {
+        row.id: row for row in (await db.execute(
+            select(User.id, User.full_name, User.role, User.company_id).where(User.id.in_([user_id for user_id, _ in matches]))
+        )).all()
+    }
+    return [
+        matching_schemas.MatchResult(
+            id=user_id,
+            full_name=users[user_id].full_name,
+            role=users[user_id].role,
+            company_id=users[user_id].company_id,
+            similarity=round(similarity, 4),
+        )
+        for user_id, similarity in matches if user_id in users
+    ]
+
+@router.get("/search", response_model=List[matching_schemas.SearchResult])
+async def search_space(
+    q: str = Query(..., min_length=1, max_length=200, description="Words of the name, company or tags; each may be a prefix"),
+    limit: int = Query(20, ge=1, le=100),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Users in the current user's space whose name, company or tags match every word of q, best match first.
+    Excludes the user themselves, inactive and blocked users. Empty until the user has a space.
+    """
+    if current_user.space_id is None:
+        return []
+    blocked = exists().where(or_(
+        and_(Block.blocker_id == current_user.id, Block.blocked_id == User.id),
+        and_(Block.blocker_id == User.id, Block.blocked_id == current_user.id),
+    ))
+    hits = await get_search_backend().search(db, q, limit, [
+        User.space_id == current_user.space_id, User.status != UserStatus.INACTIVE, User.id != current_user.id, ~blocked,
+    ])
+    if not hits:
+        return []
+
+    users = {
+        row.id: row for row in (await db.execute(
+            select(User.id, User.full_name, User.role, User.company_id).where(User.id.in_([user_id for user_id, _ in hits]))
+        )).all()
+    }
+    return [
+        matching_schemas.SearchResult(
+            id=user_id,
+            full_name=users[user_id].full_name,
+            role=users[user_id].role,
+            company_id=users[user_id].company_id,
+            score=round(score, 4),
+        )
+        for user_id, score in hits if user_id in users
+    ]
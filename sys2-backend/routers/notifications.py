@@ -0,0 +1,43 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.dependencies import get_current_user
+from core.notifications import list_notifications, mark_read, unread_count
+from database import get_async_db
+from models.user import User
+from schemas import notification as notification_schemas
+
+router = APIRouter()
+
+@router.get("", response_model=notification_schemas.NotificationPage)
+async def read_inbox(
+    before: int = Query(None, description="Notification id to page back from"),
+    limit: int = Query(50, ge=1, le=200),
+    unread_only: bool = False,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """The current user's notifications, newest first. Keyset-paginated: each page is one index range scan."""
+    rows = await list_notifications(db, current_user.id, before=before, limit=limit, unread_only=unread_only)
+    return notification_schemas.NotificationPage(
+        notifications=rows,
+        next_before=rows[-1].id if len(rows) == limit else None,
+    )
+
+
+@router.get("/unread-count", response_model=notification_schemas.UnreadCount)
+async def read_unread_count(current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    """Served from the maintained per-user counter, not by counting the inbox."""
+    return notification_schemas.UnreadCount(unread=await unread_count(db, current_user.id))
+
+
+@router.post("/read", response_model=notification_schemas.MarkReadResult)
+async def mark_notifications_read(
+    request: notification_schemas.MarkReadRequest,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    marked = await mark_read(db, current_user.id, notification_ids=request.ids, up_to=request.up_to)
+    unread = await unread_count(db, current_user.id)
+    await db.commit()
+    return notification_schemas.MarkReadResult(marked=marked, unread=unread)
@@ -0,0 +1,50 @@
+import os
+
+from fastapi import APIRouter, HTTPException, Response, status
+from fastapi.responses import PlainTextResponse
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, generate_latest
+
+from core.instrumentation import get_profiler
+
+router = APIRouter()
+
+
+def _registry():
+    # Under a multi-process server each worker writes to PROMETHEUS_MULTIPROC_DIR; aggregate at scrape time
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
+
+
+@router.get("/metrics", include_in_schema=False)
+def metrics():
+    """ Prometheus text exposition of the default registry. """
+    return Response(generate_latest(_registry()), media_type=CONTENT_TYPE_LATEST)
+
+
+def _require_profiler():
+    profiler = get_profiler()
+    if profiler is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profiling is disabled")
+    return profiler
+
+
+@router.get("/debug/profiles", include_in_schema=False)
+def list_profiles():
+    """ Retained request profiles, slowest first. Only available with PROFILING_ENABLED. """
+    return [
+        {"id": p.id, "method": p.method, "path": p.path, "status": p.status, "duration_ms": p.duration_ms, "forced": p.forced}
+        for p in _require_profiler().profiles()
+    ]
+
+
+@router.get("/debug/profiles/{profile_id}", include_in_schema=False, response_class=PlainTextResponse)
+def get_profile(profile_id: int):
+    """ cProfile stats (top 40 by cumulative time) for one retained profile. """
+    profile = _require_profiler().get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profile not found")
+    return profile.stats
@@ -0,0 +1,111 @@
+from datetime import datetime, timezone
+from typing import List
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.dependencies import get_current_user
+from core.enums import UserRole
+from core.seat_index import as_utc
+from core.workstations import SeatsUnavailable, get_seat_availability, user_allocations
+from database import get_async_db
+from models.user import User
+from models.workstation_allocation import WorkstationAllocation
+from schemas import space as space_schemas
+
+router = APIRouter(responses={404: {"description": "Space not found or without workstations"}})
+
+MEMBER_ADMIN_ROLES = (UserRole.SYS_ADMIN, UserRole.STARTUP_ADMIN, UserRole.CORPORATE_ADMIN)
+
+
+def _check_member(user: User, space_id: int) -> None:
+    if user.role != UserRole.SYS_ADMIN and user.space_id != space_id:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not a member of this space")
+
+
+async def _index(db: AsyncSession, space_id: int):
+    try:
+        return await get_seat_availability().get_index(db, space_id)
+    except (LookupError, ValueError) as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+
+
+@router.get("/{space_id}/availability", response_model=space_schemas.SeatAvailability)
+async def seat_availability(
+    space_id: int,
+    starts_at: datetime = Query(None, description="Defaults to now"),
+    ends_at: datetime = Query(None, description="End of the range; omit for a single point in time"),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Seats free at a moment, or during all of [starts_at, ends_at). Answered from this worker's seat index."""
+    index = await _index(db, space_id)
+    starts_at = as_utc(starts_at) if starts_at is not None else datetime.now(timezone.utc)
+    if ends_at is not None and as_utc(ends_at) <= starts_at:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="ends_at must be after starts_at")
+    free = index.free(starts_at, ends_at) if ends_at is not None else index.free_at(starts_at)
+    return space_schemas.SeatAvailability(space_id=space_id, capacity=index.capacity, starts_at=starts_at, ends_at=ends_at, free_seats=free)
+
+
+@router.get("/{space_id}/availability/members", response_model=space_schemas.MemberAvailability)
+async def member_availability(
+    space_id: int,
+    count: int = Query(1, ge=1, description="Members to add"),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Whether `count` more members can get a seat from now on."""
+    index = await _index(db, space_id)
+    free = index.free(datetime.now(timezone.utc))
+    return space_schemas.MemberAvailability(space_id=space_id, capacity=index.capacity, free_seats=free, requested=count, can_add=free >= count)
+
+
+@router.get("/{space_id}/allocations", response_model=List[space_schemas.Allocation])
+async def list_my_allocations(space_id: int, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    """The current user's current and upcoming allocations in the space."""
+    return await user_allocations(db, space_id, current_user.id)
+
+
+@router.post("/{space_id}/allocations", response_model=space_schemas.Allocation, status_code=status.HTTP_201_CREATED)
+async def create_allocation(
+    space_id: int,
+    allocation_in: space_schemas.AllocationCreate,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Books seats for the current user over [starts_at, ends_at), or, without ends_at,
+    holds member seats until released (company and SYS admins only). 409 if they aren't free.
+    """
+    _check_member(current_user, space_id)
+    if allocation_in.ends_at is None and current_user.role not in MEMBER_ADMIN_ROLES:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Only admins can hold member seats; pass ends_at to book")
+    try:
+        async with get_seat_availability().allocating(db, space_id) as seats:
+            allocation = await seats.allocate(
+                allocation_in.seats, allocation_in.starts_at, allocation_in.ends_at, user_id=current_user.id
+            )
+    except SeatsUnavailable as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    except LookupError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return allocation
+
+
+@router.delete("/{space_id}/allocations/{allocation_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def release_allocation(
+    space_id: int, allocation_id: int, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_async_db),
+):
+    """Releases an allocation now; one that hasn't started yet is cancelled."""
+    try:
+        async with get_seat_availability().allocating(db, space_id) as seats:
+            allocation = await db.get(WorkstationAllocation, allocation_id)
+            if allocation is None or allocation.space_id != space_id:
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Allocation not found")
+            if allocation.user_id != current_user.id and current_user.role != UserRole.SYS_ADMIN:
+                raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not your allocation")
+            await seats.release(allocation)
+    except (LookupError, ValueError) as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
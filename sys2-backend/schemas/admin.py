@@ -0,0 +1,100 @@
+from datetime import datetime
+from typing import Any, Dict, List, Literal, Optional
+
+from pydantic import BaseModel, Field, model_validator
+
+from core.enums import UserRole, UserStatus
+from schemas.user import User
+
+
+class UserFilter(BaseModel):
+    user_ids: Optional[List[int]] = None
+    roles: Optional[List[UserRole]] = None
+    statuses: Optional[List[UserStatus]] = None
+    created_before: Optional[datetime] = None
+
+    @model_validator(mode="after")
+    def require_a_criterion(self):
+        # An empty filter would match every user; make callers say so explicitly via roles/statuses
+        if self.user_ids is None and not self.roles and not self.statuses and self.created_before is None:
+            raise ValueError("At least one filter criterion is required")
+        return self
+
+
+class BulkTransitionRequest(BaseModel):
+    action: Literal["promote", "deactivate", "reassign"]
+    filter: UserFilter
+    target_role: Optional[UserRole] = None # Required for 'reassign'
+    space_id: Optional[int] = None # Required for 'promote': users get its free workstations, first in the queue first
+    notify: bool = True # Queue the matching notification email (promote, deactivate) and in-app notification
+
+
+class BulkTransitionResult(BaseModel):
+    action: str
+    updated: int
+    emails_queued: int
+    notifications_created: int
+
+
+class UserPage(BaseModel):
+    users: List[User]
+    next_after_id: Optional[int] = None # Pass as ?after_id= for the next page; None on the last page
+
+
+class UserSearchHit(User):
+    score: float # Relevance; only comparable within one search
+
+
+class UserSearchResult(BaseModel):
+    users: List[UserSearchHit] # Best match first
+
+
+class AuditEvent(BaseModel):
+    id: int
+    occurred_at: datetime
+    type: str
+    user_id: Optional[int] = None
+    email: Optional[str] = None
+    ip: Optional[str] = None
+    data: Optional[Dict[str, Any]] = None
+
+
+class AuditEventPage(BaseModel):
+    events: List[AuditEvent]
+    next_before_id: Optional[int] = None # Pass as ?before_id= for the next (older) page; None on the last page
+
+
+class WaitlistEntry(BaseModel):
+    id: int
+    email: str
+    full_name: Optional[str] = None
+    role: UserRole
+    status: UserStatus
+    referral_count: int
+    created_at: Optional[datetime] = None
+    waitlist_queued_at: datetime # Queue position: signup time moved earlier by the waitlist bonuses
+
+
+class WaitlistPage(BaseModel):
+    users: List[WaitlistEntry] # In queue order, first in line first
+    # Pass as ?after_queued_at=&after_id= for the next page; None on the last page
+    next_after_queued_at: Optional[datetime] = None
+    next_after_id: Optional[int] = None
+
+
+class WaitlistPromoteRequest(BaseModel):
+    space_id: int
+    limit: Optional[int] = Field(None, ge=1) # At most this many; the space's free workstations are the upper bound
+    notify: bool = True
+
+
+class WaitlistPromotionResult(BaseModel):
+    space_id: int
+    promoted: int
+    free_workstations: int # Left after this promotion
+    emails_queued: int
+    notifications_created: int
+
+
+class WorkstationCapacityUpdate(BaseModel):
+    workstation_capacity: Optional[int] = Field(None, ge=0) # None takes the space out of automatic promotion
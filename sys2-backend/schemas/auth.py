@@ -12,3 +12,7 @@ class TokenData(BaseModel):
     email: Optional[str] = None
     # Add other fields potentially stored in the token payload, like user_id
     # user_id: Optional[int] = None
+
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
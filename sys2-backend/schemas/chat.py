@@ -0,0 +1,18 @@
+from datetime import datetime
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+
+class ChatMessage(BaseModel):
+    id: str # Message uid, as in gateway frames
+    sender_id: int
+    recipient_id: int
+    content: str
+    created_at: datetime
+    read_at: Optional[datetime] = None
+
+
+class ChatHistory(BaseModel):
+    messages: List[ChatMessage] # Newest first
+    next_before: Optional[str] = None # Pass as ?before= for the previous page; None at the start of the conversation
@@ -0,0 +1,21 @@
+from typing import Optional
+
+from pydantic import BaseModel
+
+from core.enums import UserRole
+
+
+class MatchResult(BaseModel):
+    id: int
+    full_name: Optional[str] = None
+    role: UserRole
+    company_id: Optional[int] = None
+    similarity: float # Cosine similarity of the profile embeddings, -1..1
+
+
+class SearchResult(BaseModel):
+    id: int
+    full_name: Optional[str] = None
+    role: UserRole
+    company_id: Optional[int] = None
+    score: float # Relevance; only comparable within one search
@@ -0,0 +1,36 @@
+from datetime import datetime
+from typing import List, Optional
+
+from pydantic import BaseModel, ConfigDict
+
+
+class Notification(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    type: str
+    event_count: int # > 1 when repeats of a coalescing type were folded into this notification
+    actor_id: Optional[int] = None
+    data: Optional[dict] = None
+    created_at: datetime
+    updated_at: datetime # Latest folded event
+    read_at: Optional[datetime] = None
+
+
+class NotificationPage(BaseModel):
+    notifications: List[Notification] # Newest first
+    next_before: Optional[int] = None # Pass as ?before= for the next page; None on the last page
+
+
+class UnreadCount(BaseModel):
+    unread: int
+
+
+class MarkReadRequest(BaseModel):
+    ids: Optional[List[int]] = None # Mark these; omit to mark everything (up to `up_to`, if given)
+    up_to: Optional[int] = None # Newest notification id the client has shown
+
+
+class MarkReadResult(BaseModel):
+    marked: int
+    unread: int
@@ -0,0 +1,37 @@
+from datetime import datetime
+from typing import Optional
+
+from pydantic import BaseModel, ConfigDict, Field
+
+
+class SeatAvailability(BaseModel):
+    space_id: int
+    capacity: int
+    starts_at: datetime
+    ends_at: Optional[datetime] = None # None = from starts_at on
+    free_seats: int # Free during all of the range
+
+
+class MemberAvailability(BaseModel):
+    space_id: int
+    capacity: int
+    free_seats: int # Member seats free from now on
+    requested: int
+    can_add: bool
+
+
+class AllocationCreate(BaseModel):
+    seats: int = Field(1, ge=1)
+    starts_at: Optional[datetime] = None # Defaults to now
+    ends_at: Optional[datetime] = None # None = member seats, held until released
+
+
+class Allocation(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    space_id: int
+    user_id: Optional[int] = None
+    seats: int
+    starts_at: datetime
+    ends_at: Optional[datetime] = None
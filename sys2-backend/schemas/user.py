@@ -1,19 +1,33 @@
-from pydantic import BaseModel, EmailStr
+from datetime import datetime
 from typing import Optional
 
+from pydantic import BaseModel, ConfigDict, EmailStr
+
+from core.enums import UserRole, UserStatus
+
 class UserBase(BaseModel):
-    email: EmailStr
-    is_active: bool = True
-    is_superuser: bool = False
     full_name: Optional[str] = None
 
 class UserCreate(UserBase):
+    email: EmailStr
     password: str
-    role: str # Consider using an Enum for roles
+    role: UserRole # Only Startup, Freelancer and Corporate are accepted by /auth/register
     company_name: Optional[str] = None
+    referrer_email: Optional[EmailStr] = None # The user who referred this one; moves them up the waitlist
 
 class User(UserBase):
-    id: int
+    """
+    A user as returned by the API, read from the ORM object (from_attributes).
+    Fields mirror columns of models.User. The email is a plain str: it was
+    validated on the way in, and re-running email validation on every
+    response costs more than the rest of the serialization.
+    """
+    model_config = ConfigDict(from_attributes=True)
 
-    class Config:
-        orm_mode = True
+    id: int
+    email: str
+    role: UserRole
+    status: UserStatus
+    space_id: Optional[int] = None
+    company_id: Optional[int] = None
+    created_at: Optional[datetime] = None
@@ -0,0 +1,75 @@
+"""Shared fixtures for the test suite.
+
+Tests run against a throwaway SQLite database, so the environment is
+prepared *before* any app module (config, database, ...) is imported, as in
+benchmarks/common.py. Run them from the sys2-backend directory: `python -m pytest`.
+"""
+import os
+import tempfile
+
+import pytest
+
+TEST_DB_PATH = os.path.join(tempfile.gettempdir(), "sys2_test.sqlite3")
+
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{TEST_DB_PATH}",
+    "DATABASE_REPLICA_URLS": "[]",
+    "SECRET_KEY": "test-secret-key",
+    "SENDGRID_API_KEY": "test-sendgrid-key",
+    "EMAIL_TRANSPORT": "memory",
+    "PASSWORD_HASH_WORKERS": "0", # Hash inline: no process pool per test run
+    "PASSWORD_BCRYPT_ROUNDS": "4",
+    "RATE_LIMIT_ENABLED": "false",
+    "LAZY_ROUTERS": "false",
+    "WAITLIST_SCHEDULER_ENABLED": "false",
+    "WORKSTATION_INDEX_PRELOAD": "false",
+})
+
+
+@pytest.fixture(autouse=True)
+def database():
+    """Fresh tables, caches and singletons for every test; their asyncio locks and events bind to one event loop."""
+    from core.audit import set_audit_log
+    from core.chat import set_chat_gateway
+    from core.dependencies import user_cache
+    from core.notifications import set_notification_dispatcher
+    from core.rate_limit import set_rate_limit_backend
+    from core.search import set_search_backend
+    from core.waitlist import set_waitlist_scheduler
+    from core.workstations import set_seat_availability
+    from database import Base, engine
+    import models  # noqa: F401 - registers the models with Base.metadata
+
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    user_cache.clear()
+    for reset in (set_audit_log, set_chat_gateway, set_notification_dispatcher, set_rate_limit_backend,
+                  set_search_backend, set_waitlist_scheduler, set_seat_availability):
+        reset(None)
+    yield engine
+
+
+@pytest.fixture
+def make_user(database):
+    """Inserts a user straight into the database; returns its id."""
+    from core.enums import UserRole, UserStatus
+    from core.security import get_password_hash
+    from models.user import User
+    from sqlalchemy.orm import Session
+
+    def make(email, password="correct-horse", role=UserRole.STARTUP, status=UserStatus.ACTIVE, **values):
+        with Session(database) as session:
+            user = User(email=email, hashed_password=get_password_hash(password), full_name=email.split("@")[0], role=role, status=status, **values)
+            session.add(user)
+            session.commit()
+            return user.id
+    return make
+
+
+@pytest.fixture
+def client():
+    from fastapi.testclient import TestClient
+    from main import create_app
+
+    with TestClient(create_app()) as test_client:
+        yield test_client
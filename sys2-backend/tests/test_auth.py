@@ -0,0 +1,85 @@
+from core.enums import UserRole, UserStatus
+from core.security import create_verification_token, decode_refresh_token
+
+
+def login(client, email, password="correct-horse"):
+    return client.post("/auth/login", data={"username": email, "password": password})
+
+
+def test_login_requires_a_verified_email(client):
+    response = client.post("/auth/register", json={
+        "email": "new@example.com", "password": "correct-horse", "full_name": "New", "role": "Startup",
+    })
+    assert response.status_code == 200
+    assert login(client, "new@example.com").status_code == 401
+
+    assert client.get(f"/auth/verify/{create_verification_token('new@example.com')}").status_code == 200
+    assert login(client, "new@example.com").status_code == 200
+    assert client.get("/auth/me").json()["status"] == UserStatus.ACTIVE_WAITLIST
+
+
+def test_register_rejects_a_registered_email_in_any_case(client, make_user):
+    make_user("taken@example.com")
+    response = client.post("/auth/register", json={
+        "email": "Taken@Example.com", "password": "correct-horse", "full_name": "Taken", "role": "Startup",
+    })
+    assert response.status_code == 400
+
+
+def test_deactivation_ends_every_session(client, make_user):
+    user_id = make_user("member@example.com")
+    make_user("admin@example.com", role=UserRole.SYS_ADMIN)
+
+    tokens = login(client, "member@example.com").json()
+    member_cookie = client.cookies["access_token"]
+    assert client.get("/auth/me").status_code == 200 # Also caches the user row
+    refreshed = client.post("/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert refreshed.status_code == 200
+
+    login(client, "admin@example.com")
+    response = client.post("/admin/users/bulk-transition", json={"action": "deactivate", "filter": {"user_ids": [user_id]}})
+    assert response.status_code == 200
+    assert response.json()["updated"] == 1
+
+    client.cookies.set("access_token", member_cookie)
+    assert client.get("/auth/me").status_code == 401
+    assert client.post("/auth/refresh", json={"refresh_token": refreshed.json()["refresh_token"]}).status_code == 401
+    response = login(client, "member@example.com")
+    assert response.status_code == 403
+    assert response.json()["detail"] == "Inactive user"
+
+
+def test_password_reset_revokes_refresh_tokens(client, make_user):
+    from core.security import create_password_reset_token
+
+    make_user("member@example.com")
+    old = login(client, "member@example.com").json()["refresh_token"]
+    response = client.post("/auth/reset-password", json={
+        "token": create_password_reset_token("member@example.com"), "new_password": "battery-staple",
+    })
+    assert response.status_code == 200
+
+    assert client.post("/auth/refresh", json={"refresh_token": old}).status_code == 401
+    new = login(client, "member@example.com", "battery-staple").json()["refresh_token"]
+    assert client.post("/auth/refresh", json={"refresh_token": new}).status_code == 200
+
+
+def test_full_memory_token_store_refuses_refreshes_instead_of_forgetting_used_tokens(client, make_user, monkeypatch):
+    import asyncio
+    import time
+
+    from core import token_store
+
+    store = token_store.MemoryRefreshTokenStore(max_entries=2)
+    monkeypatch.setattr(token_store, "_store", store)
+    make_user("member@example.com")
+    used = login(client, "member@example.com").json()["refresh_token"]
+    rotated = client.post("/auth/refresh", json={"refresh_token": used})
+    assert rotated.status_code == 200
+    asyncio.run(store.consume(None, "f" * 32, time.time() + 3600)) # Now full of live entries
+
+    replay = client.post("/auth/refresh", json={"refresh_token": used})
+    assert replay.status_code == 503 and int(replay.headers["Retry-After"]) > 0
+    assert client.post("/auth/refresh", json={"refresh_token": rotated.json()["refresh_token"]}).status_code == 503
+    assert len(store) == 2 # The used jti is still recorded
+    assert not asyncio.run(store.consume(None, decode_refresh_token(used)["jti"], time.time() + 3600))
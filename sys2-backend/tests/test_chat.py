@@ -0,0 +1,53 @@
+import pytest
+from starlette.websockets import WebSocketDisconnect
+
+from core.enums import UserRole, UserStatus
+from core.security import create_access_token
+
+
+def login(client, email, password="correct-horse"):
+    client.cookies.clear()
+    response = client.post("/auth/login", data={"username": email, "password": password})
+    assert response.status_code == 200
+    return response.cookies["access_token"]
+
+
+def use_token(client, access_token):
+    client.cookies.clear()
+    client.cookies.set("access_token", access_token)
+
+
+def test_deactivated_user_cannot_connect(client, make_user):
+    make_user("gone@example.com", status=UserStatus.INACTIVE)
+    use_token(client, create_access_token({"sub": "gone@example.com"}))
+    with pytest.raises(WebSocketDisconnect) as closed:
+        with client.websocket_connect("/chat/ws"):
+            pass
+    assert closed.value.code == 1008
+
+
+def test_deactivation_closes_sockets_and_refuses_messages_to_the_user(client, make_user):
+    member_id = make_user("member@example.com")
+    peer_id = make_user("peer@example.com")
+    make_user("admin@example.com", role=UserRole.SYS_ADMIN)
+    peer_cookie = login(client, "peer@example.com")
+    login(client, "member@example.com")
+
+    with client.websocket_connect("/chat/ws") as member_socket:
+        use_token(client, peer_cookie)
+        with client.websocket_connect("/chat/ws") as peer_socket:
+            peer_socket.send_json({"type": "message", "to": member_id, "content": "hi", "client_id": "1"})
+            received = member_socket.receive_json() # Also caches the member as a recipient
+            assert (received["from"], received["content"]) == (peer_id, "hi")
+            assert peer_socket.receive_json()["client_id"] == "1"
+
+            login(client, "admin@example.com")
+            response = client.post("/admin/users/bulk-transition", json={"action": "deactivate", "filter": {"user_ids": [member_id]}})
+            assert response.json()["updated"] == 1
+
+            with pytest.raises(WebSocketDisconnect) as closed:
+                member_socket.receive_json()
+            assert closed.value.code == 1008
+
+            peer_socket.send_json({"type": "message", "to": member_id, "content": "still there?", "client_id": "2"})
+            assert peer_socket.receive_json()["code"] == "forbidden"
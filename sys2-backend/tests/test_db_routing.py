@@ -0,0 +1,190 @@
+"""RoutingSession and read-your-writes stickiness, with two more SQLite files standing in for replicas.
+
+Each database holds one user whose email names it, so a read shows where it was sent.
+"""
+import asyncio
+import os
+import time
+
+import pytest
+from sqlalchemy import create_engine, select, text, update
+from sqlalchemy.orm import Session
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from core import db_routing
+from core.db_routing import STICKY_COOKIE, ReadYourWritesMiddleware, RoutingState, note_write, prefers_primary
+from core.enums import UserRole, UserStatus
+from core.user_admin import apply_bulk_transition
+from database import Base, RoutingSessionLocal, async_engine, create_replica_set, get_replica_set, read_from_primary, set_replica_set
+from models.user import User
+
+
+def _add_marker(sync_engine, name: str) -> None:
+    with Session(sync_engine) as session:
+        session.add(User(email=f"{name}@db.test", hashed_password="-", role=UserRole.STARTUP, status=UserStatus.ACTIVE))
+        session.commit()
+
+
+@pytest.fixture
+def replicas(database, tmp_path):
+    """Two healthy replicas in the rotation; the primary is the test database."""
+    _add_marker(database, "primary")
+    urls = []
+    for name in ("replica1", "replica2"):
+        url = f"sqlite:///{tmp_path / name}.sqlite3"
+        sync_engine = create_engine(url)
+        Base.metadata.create_all(sync_engine)
+        _add_marker(sync_engine, name)
+        sync_engine.dispose()
+        urls.append(url)
+    previous = get_replica_set()
+    set_replica_set(create_replica_set(urls, max_lag_seconds=5))
+    yield urls
+    set_replica_set(previous)
+
+
+def run(coroutine):
+    """Runs a test coroutine, then closes the pooled connections it opened on this event loop."""
+    async def main():
+        try:
+            return await coroutine
+        finally:
+            await get_replica_set().dispose()
+            await async_engine.dispose()
+    return asyncio.run(main())
+
+
+async def _served_by(db) -> str:
+    return (await db.scalar(select(User.email).order_by(User.id).limit(1))).split("@")[0]
+
+
+def test_round_robin_spreads_sessions_across_replicas(replicas):
+    async def scenario():
+        served = []
+        for _ in range(4):
+            async with RoutingSessionLocal() as db:
+                first = await _served_by(db)
+                assert await _served_by(db) == first # A session keeps its replica
+                served.append(first)
+        return served
+
+    assert run(scenario()) == ["replica1", "replica2", "replica1", "replica2"]
+
+
+def test_reads_after_own_write_go_to_the_primary(replicas):
+    async def scenario():
+        async with RoutingSessionLocal() as db:
+            assert (await _served_by(db)).startswith("replica")
+            await db.execute(update(User).where(User.email == "nobody@db.test").values(full_name="x"))
+            after_dml = await _served_by(db)
+        async with RoutingSessionLocal() as db:
+            db.add(User(email="new@db.test", hashed_password="-", role=UserRole.STARTUP, status=UserStatus.WAITLISTED))
+            await db.flush()
+            after_flush = await db.scalar(select(User.id).where(User.email == "new@db.test"))
+            await db.rollback()
+        return after_dml, after_flush
+
+    after_dml, after_flush = run(scenario())
+    assert after_dml == "primary"
+    assert after_flush is not None # Only the primary has the flushed row
+
+
+def test_for_update_and_text_statements_are_pinned_to_the_primary(replicas):
+    async def scenario():
+        async with RoutingSessionLocal() as db:
+            locked = await db.scalar(select(User.email).order_by(User.id).limit(1).with_for_update())
+            raw = await db.scalar(text("SELECT email FROM users ORDER BY id LIMIT 1"))
+            plain = await _served_by(db) # The session itself hasn't written, so plain reads still use a replica
+        async with RoutingSessionLocal() as db:
+            read_from_primary(db)
+            pinned = await _served_by(db)
+        return locked, raw, plain, pinned
+
+    locked, raw, plain, pinned = run(scenario())
+    assert locked == raw == "primary@db.test"
+    assert plain.startswith("replica")
+    assert pinned == "primary"
+
+
+def test_bulk_transition_scans_the_primary_past_a_lagging_replica(replicas, make_user):
+    # The replicas hold only their marker rows, as if they hadn't caught up with these users yet
+    user_ids = [make_user(f"user{i}@example.com") for i in range(5)]
+
+    async def scenario():
+        async with RoutingSessionLocal() as db:
+            return await apply_bulk_transition(db, "reassign", user_ids=user_ids, target_role=UserRole.FREELANCER, notify=False, chunk_size=2)
+
+    assert run(scenario())["updated"] == 5
+
+
+def test_unhealthy_replica_falls_back_to_the_primary(replicas, tmp_path):
+    async def scenario():
+        replica_set = get_replica_set()
+        await replica_set.check(timeout_seconds=1)
+        healthy = len(replica_set.in_rotation)
+
+        os.remove(replicas[0].removeprefix("sqlite:///"))
+        os.mkdir(replicas[0].removeprefix("sqlite:///")) # A directory: SQLite can't open it
+        await replica_set.engines["replica1"].dispose()
+        await replica_set.check(timeout_seconds=1)
+        served_one_down = []
+        for _ in range(3):
+            async with RoutingSessionLocal() as db:
+                served_one_down.append(await _served_by(db))
+
+        replica_set.in_rotation = [] # As after a check that found every replica down or lagging
+        async with RoutingSessionLocal() as db:
+            served_all_down = await _served_by(db)
+        return healthy, replica_set.lag_seconds["replica1"], served_one_down, served_all_down
+
+    healthy, lag, served_one_down, served_all_down = run(scenario())
+    assert healthy == 2
+    assert lag is None
+    assert served_one_down == ["replica2"] * 3
+    assert served_all_down == "primary"
+
+
+def test_sticky_context_reads_from_the_primary_until_it_expires(replicas):
+    async def read_with(state):
+        token = db_routing._routing_state.set(state)
+        try:
+            async with RoutingSessionLocal() as db:
+                return await _served_by(db)
+        finally:
+            db_routing._routing_state.reset(token)
+
+    async def scenario():
+        return (
+            await read_with(RoutingState(primary_until=time.time() + 60)),
+            await read_with(RoutingState(primary_until=time.time() - 1)),
+            await read_with(None), # Outside a request
+        )
+
+    sticky, expired, outside = run(scenario())
+    assert sticky == "primary"
+    assert expired.startswith("replica")
+    assert outside.startswith("replica")
+
+
+def test_middleware_sets_and_honours_the_sticky_cookie():
+    async def endpoint(request):
+        if request.query_params.get("write"):
+            note_write()
+        return JSONResponse({"sticky": prefers_primary()})
+
+    app = ReadYourWritesMiddleware(Starlette(routes=[Route("/", endpoint)]), window_seconds=30)
+    with TestClient(app) as client:
+        assert client.get("/").json() == {"sticky": False}
+        assert STICKY_COOKIE not in client.cookies
+
+        response = client.get("/", params={"write": 1})
+        until = float(response.cookies[STICKY_COOKIE])
+        assert time.time() + 25 < until <= time.time() + 30
+        assert client.get("/").json() == {"sticky": True}
+
+        client.cookies.clear()
+        client.cookies.set(STICKY_COOKIE, f"{time.time() - 1:.3f}") # Window over
+        assert client.get("/").json() == {"sticky": False}
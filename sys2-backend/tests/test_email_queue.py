@@ -0,0 +1,36 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from prometheus_client import REGISTRY
+
+from database import AsyncSessionLocal, async_engine
+from utils.email import MemoryTransport
+from utils.email_queue import enqueue_email, process_outbox_batch, update_queue_gauges
+
+
+def test_queue_gauges_track_pending_depth_and_oldest_age(database):
+    async def run():
+        try:
+            async with AsyncSessionLocal() as db:
+                await update_queue_gauges(db)
+                empty = REGISTRY.get_sample_value("email_pending"), REGISTRY.get_sample_value("email_oldest_pending_age_seconds")
+
+                old = enqueue_email(db, "old@example.com", "Hi", "<p>Hi</p>")
+                old.created_at = datetime.now(timezone.utc) - timedelta(minutes=10)
+                future = enqueue_email(db, "later@example.com", "Hi", "<p>Hi</p>")
+                future.next_attempt_at = datetime.now(timezone.utc) + timedelta(hours=1) # Pending but not due
+                await db.commit()
+                await update_queue_gauges(db)
+                queued = REGISTRY.get_sample_value("email_pending"), REGISTRY.get_sample_value("email_oldest_pending_age_seconds")
+
+                assert await process_outbox_batch(db, MemoryTransport()) == 1
+                await update_queue_gauges(db)
+                drained = REGISTRY.get_sample_value("email_pending"), REGISTRY.get_sample_value("email_oldest_pending_age_seconds")
+                return empty, queued, drained
+        finally:
+            await async_engine.dispose()
+
+    empty, queued, drained = asyncio.run(run())
+    assert empty == (0, 0)
+    assert queued[0] == 2 and 600 <= queued[1] < 660
+    assert drained[0] == 1 and drained[1] < 60
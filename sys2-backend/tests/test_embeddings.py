@@ -0,0 +1,19 @@
+import numpy as np
+
+from core.embeddings import HashingEncoder, build_encoder
+
+
+def test_hashing_encoder_is_deterministic_and_normalized():
+    encoder = build_encoder("hashing", 64)
+    vectors = encoder.encode(["python developer in fintech", "python developer in fintech", ""])
+    assert vectors.shape == (3, 64)
+    assert vectors.dtype == np.float32
+    assert np.allclose(vectors[0], vectors[1])
+    assert np.isclose(np.linalg.norm(vectors[0]), 1.0)
+    assert not vectors[2].any() # A blank profile stays a zero vector
+
+
+def test_encoders_of_different_dims_do_not_share_buckets():
+    small, large = HashingEncoder(8), HashingEncoder(4096)
+    assert small.encode(["rust"]).shape == (1, 8)
+    assert large.encode(["rust"]).shape == (1, 4096)
@@ -0,0 +1,46 @@
+import asyncio
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from config import settings
+from core.matching import NumpyMatchingBackend
+from database import AsyncSessionLocal, async_engine
+from models.profile_embedding import ProfileEmbedding
+from models.space import Space
+from models.user import User
+
+
+def embed(database, user_id, direction):
+    vector = np.zeros(settings.EMBEDDING_DIM, dtype=np.float32)
+    vector[direction] = 1.0
+    with Session(database) as session:
+        session.merge(ProfileEmbedding(user_id=user_id, embedding=vector))
+        session.commit()
+
+
+def discover(backend, user_id):
+    async def main():
+        try:
+            async with AsyncSessionLocal() as db:
+                return await backend.discover(db, await db.get(User, user_id), 10)
+        finally:
+            await async_engine.dispose()
+    return [match_id for match_id, _ in asyncio.run(main())]
+
+
+def test_restarted_worker_rebuilds_a_snapshot_that_missed_changes(database, make_user, tmp_path):
+    with Session(database) as session:
+        space = Space(name="Space", workstation_capacity=10)
+        session.add(space)
+        session.commit()
+        space_id = space.id
+    me, peer = make_user("me@example.com", space_id=space_id), make_user("peer@example.com", space_id=space_id)
+    embed(database, me, 0)
+    embed(database, peer, 0)
+    assert discover(NumpyMatchingBackend(index_dir=str(tmp_path)), me) == [peer]
+
+    # Written while no worker was up to invalidate its index: the snapshot on disk is still within its TTL
+    newcomer = make_user("newcomer@example.com", space_id=space_id)
+    embed(database, newcomer, 1)
+    assert sorted(discover(NumpyMatchingBackend(index_dir=str(tmp_path)), me)) == sorted([peer, newcomer])
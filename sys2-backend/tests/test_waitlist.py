@@ -0,0 +1,76 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from config import settings
+from core.enums import UserStatus
+from core.security import create_verification_token
+from database import async_engine
+from models.user import User
+
+
+def register(client, email, referrer_email=None):
+    response = client.post("/auth/register", json={
+        "email": email, "password": "correct-horse", "full_name": email.split("@")[0], "role": "Startup",
+        "referrer_email": referrer_email,
+    })
+    assert response.status_code == 200
+    return response.json()["id"]
+
+
+def load(database, user_id) -> User:
+    with Session(database) as session:
+        user = session.get(User, user_id)
+        session.expunge(user)
+        return user
+
+
+def test_referral_counts_once_the_referred_user_verifies(client, database):
+    referrer_id = register(client, "referrer@example.com")
+    before = load(database, referrer_id)
+
+    register(client, "friend@example.com", referrer_email="referrer@example.com")
+    register(client, "unverified@example.com", referrer_email="referrer@example.com")
+    assert load(database, referrer_id).referral_count == 0
+
+    token = create_verification_token("friend@example.com")
+    assert client.get(f"/auth/verify/{token}").status_code == 200
+    assert client.get(f"/auth/verify/{token}").status_code == 200 # Already verified: no second credit
+
+    after = load(database, referrer_id)
+    assert after.referral_count == 1
+    moved = before.waitlist_queued_at - after.waitlist_queued_at
+    assert moved == timedelta(days=settings.WAITLIST_REFERRAL_BONUS_DAYS)
+
+
+def test_orm_writes_requeue_without_importing_core_waitlist(database, make_user):
+    # The mapper events live in models.user; a plain sync Session write is enough
+    user_id = make_user("plain@example.com", status=UserStatus.WAITLISTED)
+    with Session(database) as session:
+        user = session.get(User, user_id)
+        user.status = UserStatus.ACTIVE_WAITLIST
+        session.commit()
+        assert user.created_at - user.waitlist_queued_at == timedelta(days=settings.WAITLIST_VERIFIED_BONUS_DAYS)
+
+
+def test_rescore_recomputes_every_waitlisted_user(database, make_user, monkeypatch):
+    from core.waitlist import rescore
+    from database import AsyncSessionLocal
+
+    created_at = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    ids = [make_user(f"w{i}@example.com", status=UserStatus.ACTIVE_WAITLIST, created_at=created_at) for i in range(3)]
+    monkeypatch.setattr(settings, "WAITLIST_VERIFIED_BONUS_DAYS", 100)
+
+    async def run():
+        try:
+            async with AsyncSessionLocal() as db:
+                return await rescore(db, chunk_size=2)
+        finally:
+            await async_engine.dispose()
+
+    assert asyncio.run(run()) == 3
+    with Session(database) as session:
+        queued = session.scalars(select(User.waitlist_queued_at).where(User.id.in_(ids))).all()
+    assert {value.replace(tzinfo=timezone.utc) for value in queued} == {created_at - timedelta(days=100)}
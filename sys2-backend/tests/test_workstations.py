@@ -0,0 +1,95 @@
+import asyncio
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from core.enums import UserRole, UserStatus
+from core.user_admin import apply_bulk_transition
+from core.waitlist import promote_next
+from core.workstations import get_seat_availability, user_allocations
+from database import AsyncSessionLocal, async_engine
+from models.space import Space
+from models.user import User
+from models.workstation_allocation import WorkstationAllocation
+
+
+def run(coroutine):
+    async def main():
+        try:
+            return await coroutine
+        finally:
+            await async_engine.dispose()
+    return asyncio.run(main())
+
+
+def add_space(database, capacity) -> int:
+    with Session(database) as session:
+        space = Space(name=f"Space {capacity}", workstation_capacity=capacity)
+        session.add(space)
+        session.commit()
+        return space.id
+
+
+async def seat_members(space_id, user_ids):
+    async with AsyncSessionLocal() as db:
+        async with get_seat_availability().allocating(db, space_id) as seats:
+            await seats.allocate_members(user_ids)
+        return get_seat_availability()._indexes[space_id][1] # Cached, as a busy worker would have it
+
+
+def test_seat_released_by_deactivation_is_promoted_into_at_once(database, make_user):
+    space_id = add_space(database, 1)
+    member_id = make_user("member@example.com", space_id=space_id)
+    waiting_id = make_user("waiting@example.com", status=UserStatus.ACTIVE_WAITLIST)
+
+    async def scenario():
+        await seat_members(space_id, [member_id])
+        async with AsyncSessionLocal() as db:
+            assert (await promote_next(db, space_id))["promoted"] == 0 # Full
+        async with AsyncSessionLocal() as db:
+            assert (await apply_bulk_transition(db, "deactivate", user_ids=[member_id]))["updated"] == 1
+        async with AsyncSessionLocal() as db:
+            return await promote_next(db, space_id) # Same slot as the release
+
+    result = run(scenario())
+    assert result["promoted"] == 1
+    assert result["free_workstations"] == 0
+    with Session(database) as session:
+        assert session.get(User, waiting_id).status == UserStatus.ACTIVE
+
+
+def test_released_member_seat_is_free_in_the_cached_index(database, make_user):
+    space_id = add_space(database, 1)
+    member_id = make_user("member@example.com", space_id=space_id)
+    make_user("waiting@example.com", status=UserStatus.ACTIVE_WAITLIST)
+
+    async def scenario():
+        await seat_members(space_id, [member_id])
+        async with AsyncSessionLocal() as db:
+            async with get_seat_availability().allocating(db, space_id) as seats:
+                (allocation,) = await user_allocations(db, space_id, member_id)
+                assert await seats.release(allocation)
+                assert seats.free_for_members() == 1
+        async with AsyncSessionLocal() as db:
+            return await promote_next(db, space_id)
+
+    assert run(scenario())["promoted"] == 1
+
+
+def test_bulk_promote_seats_users_in_queue_order(client, database, make_user):
+    space_id = add_space(database, 2)
+    make_user("admin@example.com", role=UserRole.SYS_ADMIN)
+    waiting = [make_user(f"w{i}@example.com", status=UserStatus.ACTIVE_WAITLIST) for i in range(3)]
+    assert client.post("/auth/login", data={"username": "admin@example.com", "password": "correct-horse"}).status_code == 200
+
+    request = {"action": "promote", "filter": {"user_ids": waiting}}
+    assert client.post("/admin/users/bulk-transition", json=request).status_code == 400 # No space_id
+    response = client.post("/admin/users/bulk-transition", json={**request, "space_id": space_id})
+    assert response.status_code == 200
+    assert response.json()["updated"] == 2
+
+    with Session(database) as session:
+        active = session.scalars(select(User.id).where(User.id.in_(waiting), User.status == UserStatus.ACTIVE)).all()
+        seated = session.scalars(select(WorkstationAllocation.user_id).where(WorkstationAllocation.space_id == space_id)).all()
+        assert sorted(active) == sorted(seated) == waiting[:2] # Same created_at day: queue ties break by id
+        assert session.scalar(select(func.count()).select_from(User).where(User.space_id == space_id)) == 2
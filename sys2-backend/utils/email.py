@@ -1,33 +1,201 @@
-import sendgrid
-from sendgrid.helpers.mail import Mail, Email, To, Content
+import abc
+import logging
 import os
+import smtplib
+import threading
+import time
+from email.message import EmailMessage
+from typing import List, Optional
+
 from config import settings # Assuming config.py is one level up
 
-def send_email(to_email: str, subject: str, html_content: str):
-    """Sends an email using SendGrid."""
-    sg = sendgrid.SendGridAPIClient(api_key=settings.SENDGRID_API_KEY)
-    
-    # Ensure you have a verified sender email configured in SendGrid
-    # Replace 'verified_sender@example.com' with your actual verified sender email
-    from_email = Email("verified_sender@example.com") 
-    
-    to_email_obj = To(to_email)
-    content = Content("text/html", html_content)
-    mail = Mail(from_email, to_email_obj, subject, content)
-
-    try:
-        response = sg.client.mail.send.post(request_body=mail.get())
-        print(f"Email sent to {to_email}. Status code: {response.status_code}")
-        # You might want to add more robust logging or return status
-    except Exception as e:
-        print(f"Error sending email to {to_email}: {e}")
-        # Handle the error appropriately (e.g., log it, raise exception)
-        
-# Example usage (optional, remove or comment out for production)
-# if __name__ == '__main__':
-#     # Make sure .env file with SENDGRID_API_KEY is present and loaded correctly
-#     # Requires a settings object instance if run directly
-#     test_to_email = "test_recipient@example.com" 
-#     test_subject = "Test Email from SendGrid"
-#     test_html_content = "<strong>This is a test email.</strong>"
-#     send_email(test_to_email, test_subject, test_html_content)
+logger = logging.getLogger(__name__)
+
+
+class OutgoingEmail:
+    """A single message handed to a transport."""
+
+    def __init__(self, to_email: str, subject: str, html_content: str, text_content: Optional[str] = None):
+        self.to_email = to_email
+        self.subject = subject
+        self.html_content = html_content
+        self.text_content = text_content
+
+
+def build_mime_message(from_email: str, message: OutgoingEmail) -> EmailMessage:
+    mail = EmailMessage()
+    mail["From"] = from_email
+    mail["To"] = message.to_email
+    mail["Subject"] = message.subject
+    if message.text_content:
+        mail.set_content(message.text_content)
+        mail.add_alternative(message.html_content, subtype="html")
+    else:
+        mail.set_content(message.html_content, subtype="html")
+    return mail
+
+
+# --- Transports ---
+# Transports are created once and reused across batches. send_batch returns one
+# entry per message: None on success, otherwise the error for that message.
+
+class EmailTransport(abc.ABC):
+    @abc.abstractmethod
+    def send_batch(self, messages: List[OutgoingEmail]) -> List[Optional[Exception]]:
+        ...
+
+    def close(self) -> None:
+        pass
+
+
+class SendGridTransport(EmailTransport):
+    def __init__(self, api_key: str, from_email: str):
+        # Imported lazily so other transports don't need the SDK
+        import sendgrid
+        self._client = sendgrid.SendGridAPIClient(api_key=api_key)
+        self._from_email = from_email
+
+    def send_batch(self, messages):
+        from sendgrid.helpers.mail import Mail
+
+        results = []
+        for message in messages:
+            mail = Mail(
+                from_email=self._from_email,
+                to_emails=message.to_email,
+                subject=message.subject,
+                plain_text_content=message.text_content,
+                html_content=message.html_content,
+            )
+            try:
+                response = self._client.client.mail.send.post(request_body=mail.get())
+                if response.status_code >= 300:
+                    raise RuntimeError(f"SendGrid returned status {response.status_code}")
+                results.append(None)
+            except Exception as e:
+                results.append(e)
+        return results
+
+
+class SMTPTransport(EmailTransport):
+    """Sends a whole batch over one SMTP connection (e.g. to a local MailHog/Mailpit sink)."""
+
+    def __init__(self, host: str, port: int, from_email: str, username: Optional[str] = None,
+                 password: Optional[str] = None, use_tls: bool = False):
+        self._host = host
+        self._port = port
+        self._from_email = from_email
+        self._username = username
+        self._password = password
+        self._use_tls = use_tls
+
+    def _connect(self) -> smtplib.SMTP:
+        smtp = smtplib.SMTP(self._host, self._port, timeout=30)
+        if self._use_tls:
+            smtp.starttls()
+        if self._username:
+            smtp.login(self._username, self._password or "")
+        return smtp
+
+    def send_batch(self, messages):
+        try:
+            smtp = self._connect()
+        except Exception as e:
+            return [e] * len(messages)
+
+        results = []
+        try:
+            for message in messages:
+                try:
+                    smtp.send_message(build_mime_message(self._from_email, message))
+                    results.append(None)
+                except Exception as e:
+                    results.append(e)
+        finally:
+            try:
+                smtp.quit()
+            except Exception:
+                pass
+        return results
+
+
+class FileTransport(EmailTransport):
+    """Writes each message as an .eml file; useful for local development."""
+
+    def __init__(self, directory: str, from_email: str):
+        self._directory = directory
+        self._from_email = from_email
+        os.makedirs(directory, exist_ok=True)
+
+    def send_batch(self, messages):
+        results = []
+        for message in messages:
+            path = os.path.join(self._directory, f"{time.time_ns()}-{message.to_email}.eml")
+            try:
+                with open(path, "wb") as f:
+                    f.write(build_mime_message(self._from_email, message).as_bytes())
+                results.append(None)
+            except Exception as e:
+                results.append(e)
+        return results
+
+
+class MemoryTransport(EmailTransport):
+    """Keeps sent messages in memory; for tests and benchmarks."""
+
+    def __init__(self):
+        self.sent: List[OutgoingEmail] = []
+        self._lock = threading.Lock()
+
+    def send_batch(self, messages):
+        with self._lock:
+            self.sent.extend(messages)
+        return [None] * len(messages)
+
+
+def create_transport(name: Optional[str] = None) -> EmailTransport:
+    name = (name or settings.EMAIL_TRANSPORT).lower()
+    if name == "sendgrid":
+        return SendGridTransport(settings.SENDGRID_API_KEY, settings.EMAIL_FROM)
+    if name == "smtp":
+        return SMTPTransport(
+            settings.SMTP_HOST, settings.SMTP_PORT, settings.EMAIL_FROM,
+            settings.SMTP_USERNAME, settings.SMTP_PASSWORD, settings.SMTP_USE_TLS,
+        )
+    if name == "file":
+        return FileTransport(settings.EMAIL_FILE_SINK_DIR, settings.EMAIL_FROM)
+    if name == "memory":
+        return MemoryTransport()
+    raise ValueError(f"Unknown EMAIL_TRANSPORT '{name}'. Valid options are 'sendgrid', 'smtp', 'file', 'memory'.")
+
+
+_transport: Optional[EmailTransport] = None
+
+
+def get_transport() -> EmailTransport:
+    """Returns the process-wide transport, creating it on first use."""
+    global _transport
+    if _transport is None:
+        _transport = create_transport()
+    return _transport
+
+
+def set_transport(transport: Optional[EmailTransport]) -> None:
+    """Replaces the process-wide transport (e.g. with a MemoryTransport in tests)."""
+    global _transport
+    if _transport is not None and _transport is not transport:
+        _transport.close()
+    _transport = transport
+
+
+def send_email(to_email: str, subject: str, html_content: str, text_content: Optional[str] = None):
+    """Sends an email immediately through the configured transport.
+
+    Request handlers should use utils.email_queue.enqueue_email instead, so the
+    send happens in the background worker with retries.
+    """
+    error = get_transport().send_batch([OutgoingEmail(to_email, subject, html_content, text_content)])[0]
+    if error is not None:
+        logger.error("Error sending email to %s: %s", to_email, error)
+        raise error
+    logger.info("Email sent to %s", to_email)
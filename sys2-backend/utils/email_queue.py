@@ -0,0 +1,196 @@
+"""Outbox-backed email delivery.
+
+Request handlers only add a row to the `email_outbox` table (in their own
+transaction, see enqueue_email). A background worker claims due rows in
+batches, sends them over the shared transport and either marks them sent,
+reschedules them with exponential backoff, or dead-letters them after
+EMAIL_MAX_ATTEMPTS.
+
+No transaction is open while a batch is sent, so a slow provider holds no
+row locks and no pooled connection. Claiming is a short transaction of its
+own: it counts the attempt and moves next_attempt_at EMAIL_CLAIM_LEASE_SECONDS
+ahead, so other workers skip the rows meanwhile. The results are recorded
+in a second short transaction. If a worker dies mid-send, its rows fall due
+again when the lease runs out.
+
+Queue lag is exported as the email_pending and email_oldest_pending_age_seconds
+gauges, which the worker refreshes at most every EMAIL_WORKER_POLL_SECONDS.
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, Optional
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import bindparam, func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import settings
+from core.metrics import EMAIL_DEAD_LETTERED, EMAIL_OLDEST_PENDING_AGE, EMAIL_PENDING, EMAIL_RETRIED, EMAIL_SEND_SPAN, EMAIL_SENT
+from database import AsyncSessionLocal
+from models.email_outbox import EmailOutbox
+from utils.email import EmailTransport, OutgoingEmail, get_transport
+from utils.email_templates import RenderedEmail
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_email(db: AsyncSession, to_email: str, subject: str, html_content: str, text_content: Optional[str] = None) -> EmailOutbox:
+    """Adds a message to the outbox as part of the caller's transaction; it's sent after the caller commits."""
+    message = EmailOutbox(
+        to_email=to_email,
+        subject=subject,
+        html_content=html_content,
+        text_content=text_content,
+        status="Pending",
+        attempts=0,
+        next_attempt_at=datetime.now(timezone.utc),
+    )
+    db.add(message)
+    return message
+
+
+def enqueue_rendered_email(db: AsyncSession, email: RenderedEmail) -> EmailOutbox:
+    return enqueue_email(db, email.to_email, email.subject, email.html_content, email.text_content)
+
+
+async def enqueue_bulk(db: AsyncSession, emails: Iterable[RenderedEmail]) -> int:
+    """Queues many rendered emails with one executemany INSERT in the caller's transaction."""
+    now = datetime.now(timezone.utc)
+    rows = [
+        {
+            "to_email": email.to_email,
+            "subject": email.subject,
+            "html_content": email.html_content,
+            "text_content": email.text_content,
+            "status": "Pending",
+            "attempts": 0,
+            "next_attempt_at": now,
+        }
+        for email in emails
+    ]
+    if rows:
+        await db.execute(insert(EmailOutbox), rows)
+    return len(rows)
+
+
+def retry_delay_seconds(attempts: int) -> float:
+    return min(settings.EMAIL_RETRY_BASE_SECONDS * 2 ** (attempts - 1), settings.EMAIL_RETRY_MAX_SECONDS)
+
+
+async def update_queue_gauges(db: AsyncSession) -> None:
+    """Sets email_pending and email_oldest_pending_age_seconds from the outbox table."""
+    pending, oldest = (await db.execute(
+        select(func.count(EmailOutbox.id), func.min(EmailOutbox.created_at)).where(EmailOutbox.status == "Pending")
+    )).one()
+    age = 0.0
+    if oldest is not None:
+        if oldest.tzinfo is None: # SQLite returns naive UTC timestamps
+            oldest = oldest.replace(tzinfo=timezone.utc)
+        age = max(0.0, (datetime.now(timezone.utc) - oldest).total_seconds())
+    EMAIL_PENDING.set(pending)
+    EMAIL_OLDEST_PENDING_AGE.set(age)
+
+
+async def claim_outbox_batch(db: AsyncSession, batch_size: Optional[int] = None) -> list:
+    """Leases up to batch_size due messages to this worker and commits; returns their rows, attempts already counted."""
+    now = datetime.now(timezone.utc)
+    ids = (await db.scalars(
+        select(EmailOutbox.id)
+        .where(EmailOutbox.status == "Pending", EmailOutbox.next_attempt_at <= now)
+        .order_by(EmailOutbox.next_attempt_at)
+        .limit(batch_size or settings.EMAIL_WORKER_BATCH_SIZE)
+        .with_for_update(skip_locked=True) # Lets several workers claim at once without taking the same rows
+    )).all()
+    rows = []
+    if ids:
+        rows = (await db.execute(
+            update(EmailOutbox)
+            .where(EmailOutbox.id.in_(ids), EmailOutbox.status == "Pending")
+            .values(attempts=EmailOutbox.attempts + 1, next_attempt_at=now + timedelta(seconds=settings.EMAIL_CLAIM_LEASE_SECONDS))
+            .returning(EmailOutbox.id, EmailOutbox.to_email, EmailOutbox.subject, EmailOutbox.html_content, EmailOutbox.text_content, EmailOutbox.attempts)
+            .execution_options(synchronize_session=False)
+        )).all()
+    await db.commit() # Ends the claim (and releases the row locks) before anything is sent
+    return rows
+
+
+def _outcome_update(**values):
+    # Only while the claim is ours: a lease that ran out and was claimed again has a higher attempt count
+    return (
+        update(EmailOutbox)
+        .where(EmailOutbox.id == bindparam("message_id"), EmailOutbox.attempts == bindparam("claimed_attempts"), EmailOutbox.status == "Pending")
+        .values(**values)
+        .execution_options(synchronize_session=False, dml_strategy="core_only") # One executemany, not ORM bulk-by-primary-key
+    )
+
+
+async def process_outbox_batch(db: AsyncSession, transport: EmailTransport, batch_size: Optional[int] = None) -> int:
+    """Claims up to batch_size due messages, sends them and records the outcome. Returns the batch size."""
+    rows = await claim_outbox_batch(db, batch_size)
+    if not rows:
+        return 0
+
+    messages = [OutgoingEmail(row.to_email, row.subject, row.html_content, row.text_content) for row in rows]
+    with EMAIL_SEND_SPAN.time():
+        results = await run_in_threadpool(transport.send_batch, messages)
+
+    finished_at = datetime.now(timezone.utc)
+    sent, dead, retried = [], [], []
+    for row, error in zip(rows, results):
+        outcome = {"message_id": row.id, "claimed_attempts": row.attempts}
+        if error is None:
+            sent.append(outcome)
+        elif row.attempts >= settings.EMAIL_MAX_ATTEMPTS:
+            dead.append({**outcome, "error": str(error)})
+            EMAIL_DEAD_LETTERED.inc()
+            logger.error("Dead-lettered email %s to %s after %s attempts: %s", row.id, row.to_email, row.attempts, error)
+        else:
+            retried.append({**outcome, "error": str(error), "retry_at": finished_at + timedelta(seconds=retry_delay_seconds(row.attempts))})
+            EMAIL_RETRIED.inc()
+            logger.warning("Email %s to %s failed (attempt %s), retrying: %s", row.id, row.to_email, row.attempts, error)
+
+    if sent:
+        await db.execute(_outcome_update(status="Sent", sent_at=finished_at, last_error=None), sent)
+    if dead:
+        await db.execute(_outcome_update(status="Dead", last_error=bindparam("error")), dead)
+    if retried:
+        await db.execute(_outcome_update(next_attempt_at=bindparam("retry_at"), last_error=bindparam("error")), retried)
+    await db.commit()
+
+    EMAIL_SENT.inc(len(sent))
+    return len(rows)
+
+
+async def run_email_worker() -> None:
+    """Drains the outbox until cancelled; sleeps only when the last batch wasn't full."""
+    transport = get_transport()
+    gauges_updated_at = float("-inf")
+    while True:
+        try:
+            async with AsyncSessionLocal() as db:
+                processed = await process_outbox_batch(db, transport)
+                if time.monotonic() - gauges_updated_at >= settings.EMAIL_WORKER_POLL_SECONDS: # Not once per batch while draining
+                    await update_queue_gauges(db)
+                    gauges_updated_at = time.monotonic()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Email worker batch failed")
+            processed = 0
+        if processed < settings.EMAIL_WORKER_BATCH_SIZE:
+            await asyncio.sleep(settings.EMAIL_WORKER_POLL_SECONDS)
+
+
+def start_email_worker() -> asyncio.Task:
+    return asyncio.create_task(run_email_worker(), name="email-outbox-worker")
+
+
+async def stop_email_worker(task: asyncio.Task) -> None:
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+
@@ -0,0 +1,89 @@
+"""Jinja2 email templates.
+
+Each email is a pair of templates in templates/email: `<name>.html` and
+`<name>.txt`, plus a subject registered in EMAIL_SUBJECTS. Templates are
+compiled once (load_email_templates runs at startup) and kept by Jinja's
+cache; with EMAIL_TEMPLATES_AUTO_RELOAD on, Jinja re-checks each file's
+mtime on render so edits show up without a restart.
+"""
+import os
+from typing import Dict, Iterable, Iterator, Optional
+
+from jinja2 import Environment, FileSystemLoader, StrictUndefined, select_autoescape
+
+from config import settings
+
+DEFAULT_TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "templates", "email")
+
+EMAIL_SUBJECTS = {
+    "verify_email": "Verify your ShareYourSpace Account",
+    "reset_password": "Reset Your ShareYourSpace Password",
+    "waitlist_promoted": "You're off the ShareYourSpace waitlist",
+    "account_deactivated": "Your ShareYourSpace account has been deactivated",
+}
+
+
+class RenderedEmail:
+    def __init__(self, to_email: Optional[str], subject: str, html_content: str, text_content: str):
+        self.to_email = to_email
+        self.subject = subject
+        self.html_content = html_content
+        self.text_content = text_content
+
+
+_environment: Optional[Environment] = None
+
+
+def get_template_environment() -> Environment:
+    global _environment
+    if _environment is None:
+        _environment = Environment(
+            loader=FileSystemLoader(settings.EMAIL_TEMPLATES_DIR or DEFAULT_TEMPLATES_DIR),
+            autoescape=select_autoescape(enabled_extensions=("html",), default_for_string=False),
+            auto_reload=settings.EMAIL_TEMPLATES_AUTO_RELOAD,
+            undefined=StrictUndefined, # A missing variable is a bug, not an empty link
+            cache_size=-1, # Never evict compiled templates
+        )
+        _environment.globals["frontend_base_url"] = settings.FRONTEND_BASE_URL.rstrip("/")
+    return _environment
+
+
+def _get_templates(name: str):
+    if name not in EMAIL_SUBJECTS:
+        raise ValueError(f"Unknown email template '{name}'")
+    environment = get_template_environment()
+    return environment.get_template(f"{name}.html"), environment.get_template(f"{name}.txt")
+
+
+def load_email_templates() -> None:
+    """Compiles every registered template up front so the first request doesn't pay for it."""
+    for name in EMAIL_SUBJECTS:
+        _get_templates(name)
+
+
+def render_email(name: str, to_email: Optional[str] = None, **context) -> RenderedEmail:
+    html_template, text_template = _get_templates(name)
+    return RenderedEmail(
+        to_email=to_email,
+        subject=EMAIL_SUBJECTS[name],
+        html_content=html_template.render(context),
+        text_content=text_template.render(context),
+    )
+
+
+def render_bulk(name: str, recipients: Iterable[Dict], **common) -> Iterator[RenderedEmail]:
+    """Renders one email per recipient dict (which must contain `to_email`).
+
+    Templates are looked up once for the whole batch and `common` is merged
+    into every context, so per-item cost is just the compiled render calls.
+    """
+    html_template, text_template = _get_templates(name)
+    subject = EMAIL_SUBJECTS[name]
+    for recipient in recipients:
+        context = {**common, **recipient}
+        yield RenderedEmail(
+            to_email=recipient["to_email"],
+            subject=subject,
+            html_content=html_template.render(context),
+            text_content=text_template.render(context),
+        )